@@ -0,0 +1,7 @@
+"""
+Shared building blocks for the Django app (``justice/``) and the legal
+assistant service (``legal_assistant.py``).
+
+Nothing in this package imports Django or FastAPI at module level, so both
+processes can use it.
+"""
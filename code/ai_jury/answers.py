@@ -0,0 +1,165 @@
+"""
+Caching answers to questions asked without context.
+
+A question asked without chat history, attachments or retrieved passages
+gets the same answer every time (the LLM runs at temperature 0), so the
+legal assistant keeps answers by normalized question: "What is Article 21?"
+and "what is article 21" share one entry. Keys carry a version, a hash of
+the system prompt and the models, so a prompt or model change starts from
+an empty cache instead of serving answers to the old prompt;
+``manage.py warm_answer_cache`` refills it with the most frequent
+questions from the chat logs before traffic is switched over.
+
+    cache = AnswerCache(backend_from_url('sqlite:////var/lib/ai-jury/answers.sqlite3'),
+                        version=prompt_version(SYSTEM_PROMPT, 'gemini-2.5-flash'))
+    entry = cache.get(question)   # {'answer', 'model', 'created'} or None
+    cache.put(question, answer, model)
+
+Backends: MemoryBackend (LRU, per process) and SQLiteBackend (a file
+shared by every worker on the host).
+"""
+import hashlib
+import json
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from . import metrics
+
+LOOKUPS = metrics.counter('answer_cache_lookups_total', 'Answer cache lookups', ['result'])
+
+_PUNCTUATION_RE = re.compile(r'[^\w\s()]+')
+_SPACE_RE = re.compile(r'\s+')
+
+
+def normalize_question(text):
+    """Lowercase, punctuation (except the brackets of "19(1)(a)") and extra whitespace removed"""
+    return _SPACE_RE.sub(' ', _PUNCTUATION_RE.sub(' ', text.lower())).strip()
+
+
+def prompt_version(*parts):
+    """Short hash of everything that changes the answers: system prompt, models, ..."""
+    return hashlib.sha256('\0'.join(parts).encode()).hexdigest()[:12]
+
+
+class MemoryBackend:
+    """Least recently used entries in an OrderedDict behind one lock"""
+
+    def __init__(self, max_entries=10_000):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # key -> (value, expires)
+        self._lock = threading.Lock()
+
+    def get(self, key, now):
+        with self._lock:
+            item = self._entries.get(key)
+            if item is None:
+                return None
+            if item[1] <= now:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return item[0]
+
+    def set(self, key, value, expires):
+        with self._lock:
+            self._entries[key] = (value, expires)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class SQLiteBackend:
+    """Entries in a SQLite file so every worker, and the warm-up job, share one cache"""
+
+    def __init__(self, path, timeout=5.0, prune_every=1000):
+        self.path = path
+        self.timeout = timeout
+        self.prune_every = prune_every
+        self._local = threading.local()
+        self._sets = 0
+
+    def _connection(self):
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=self.timeout, isolation_level=None,
+                                         check_same_thread=False)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+            connection.execute(
+                'CREATE TABLE IF NOT EXISTS answer_cache (key TEXT PRIMARY KEY, value TEXT NOT NULL, expires REAL NOT NULL)'
+            )
+            self._local.connection = connection
+        return connection
+
+    def get(self, key, now):
+        row = self._connection().execute(
+            'SELECT value FROM answer_cache WHERE key = ? AND expires > ?', (key, now)
+        ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def set(self, key, value, expires):
+        connection = self._connection()
+        connection.execute('INSERT OR REPLACE INTO answer_cache (key, value, expires) VALUES (?, ?, ?)',
+                           (key, json.dumps(value), expires))
+        self._sets += 1
+        if self._sets % self.prune_every == 0:
+            connection.execute('DELETE FROM answer_cache WHERE expires <= ?', (time.time(),))
+
+    def __len__(self):
+        return self._connection().execute('SELECT COUNT(*) FROM answer_cache WHERE expires > ?',
+                                          (time.time(),)).fetchone()[0]
+
+
+def backend_from_url(url):
+    """'memory' or 'sqlite:///path/to/answers.sqlite3'"""
+    if not url or url == 'memory':
+        return MemoryBackend()
+    if url.startswith('sqlite:///'):
+        return SQLiteBackend(url[len('sqlite:///'):])
+    raise ValueError(f'Unknown answer cache backend {url!r}')
+
+
+class AnswerCache:
+    def __init__(self, backend=None, ttl=7 * 86400, version=''):
+        self.backend = backend or MemoryBackend()
+        self.ttl = ttl
+        self.version = version
+        # Since this process started, i.e. since the deploy
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def key(self, question):
+        return f'{self.version}:{normalize_question(question)}'
+
+    def get(self, question, count=True):
+        """The cached entry for `question` or None; `count=False` leaves the hit rate alone"""
+        entry = self.backend.get(self.key(question), time.time())
+        if count:
+            with self._lock:
+                if entry is None:
+                    self.misses += 1
+                else:
+                    self.hits += 1
+            LOOKUPS.inc('miss' if entry is None else 'hit')
+        return entry
+
+    def put(self, question, answer, model):
+        now = time.time()
+        self.backend.set(self.key(question), {'answer': answer, 'model': model, 'created': now}, now + self.ttl)
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'version': self.version,
+            'entries': len(self.backend),
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hits / lookups, 4) if lookups else None,
+        }
@@ -0,0 +1,189 @@
+"""
+Adaptive concurrency limits with load shedding in front of the LLM.
+
+A fixed number of LLM slots suits one upstream latency. When Gemini slows
+down the same calls in flight take longer, everything behind them queues,
+and once queueing plus the call outlast the caller's timeout nearly every
+request fails while still holding a worker: goodput collapses.
+
+The limiter keeps a concurrency limit that follows the latency it observes
+(gradient style). A slow moving average of call latency is the baseline and
+a fast one the current latency. After each call
+
+    gradient = clamp(tolerance * baseline / current, 0.5, 1)
+    limit    = limit * gradient + sqrt(limit)      (smoothed)
+
+so the limit grows by about sqrt(limit) while latency holds and shrinks in
+proportion once it rises past `tolerance` times the baseline. Calls that
+fail or time out back the limit off multiplicatively (AIMD). Requests beyond
+the limit are refused at once with Overloaded and a retry hint, instead of
+queueing for an answer that would arrive after the caller gave up. Lower
+priority classes may only fill a share of the limit, so a letter flood is
+shed before chat is.
+
+    limiter = AdaptiveLimiter('llm', initial_limit=8)
+    with limiter.acquire('interactive'):
+        answer = llm.invoke(...)
+
+A permit used as a context manager records the time inside the block, and a
+failure if it raises; call success(seconds), dropped() or ignore() instead
+to report the outcome yourself. With enabled=False nothing is shed, but the
+limit and status() are still tracked.
+"""
+import math
+import threading
+import time
+
+from . import metrics
+
+# Share of the limit each priority class may fill; unknown classes get background's
+DEFAULT_SHARES = {'interactive': 1.0, 'background': 0.75, 'bulk': 0.5}
+
+_LIMITERS = []
+
+LIMIT = metrics.gauge('concurrency_limit', 'Adaptive concurrency limit', ['limiter'])
+IN_FLIGHT = metrics.gauge('concurrency_in_flight', 'Requests holding an adaptive limiter permit', ['limiter'])
+SHED = metrics.counter('concurrency_shed_total', 'Requests refused by an adaptive limiter', ['limiter', 'priority'])
+OUTCOMES = metrics.counter('concurrency_outcomes_total', 'Permits released by an adaptive limiter',
+                           ['limiter', 'outcome'])
+LIMIT.callback = lambda: {(limiter.name,): round(limiter.limit, 2) for limiter in _LIMITERS}
+IN_FLIGHT.callback = lambda: {(limiter.name,): limiter.in_flight for limiter in _LIMITERS}
+
+
+class Overloaded(Exception):
+    """The limiter is full for this priority; try again in `retry_after` seconds"""
+
+    def __init__(self, name, priority, retry_after):
+        super().__init__(f'{name} is overloaded: {priority} request shed, retry in {retry_after}s')
+        self.priority = priority
+        self.retry_after = retry_after
+
+
+class Permit:
+    """One admitted request; release it exactly once with success, dropped or ignore"""
+
+    def __init__(self, limiter, priority):
+        self.limiter = limiter
+        self.priority = priority
+        self.started = time.monotonic()
+        self.released = False
+
+    def success(self, seconds=None):
+        """The call finished; `seconds` defaults to the time since the permit was taken"""
+        if seconds is None:
+            seconds = time.monotonic() - self.started
+        self._release('success', seconds)
+
+    def dropped(self):
+        """The call failed or timed out, a sign of overload"""
+        self._release('dropped')
+
+    def ignore(self):
+        """Release without a latency sample, e.g. when the request never reached the upstream"""
+        self._release('ignored')
+
+    def _release(self, outcome, seconds=None):
+        if not self.released:
+            self.released = True
+            self.limiter._release(outcome, seconds)
+
+    def __enter__(self):
+        self.started = time.monotonic()
+        return self
+
+    def __exit__(self, exc_type, *exc):
+        if exc_type is None:
+            self.success()
+        else:
+            self.dropped()
+
+
+class AdaptiveLimiter:
+    def __init__(self, name, initial_limit=8, min_limit=1, max_limit=64, tolerance=2.0, smoothing=0.2,
+                 short_window=10, long_window=500, backoff=0.9, shares=None, degraded_seconds=30,
+                 enabled=True):
+        self.name = name
+        self.enabled = enabled
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.tolerance = tolerance
+        self.smoothing = smoothing
+        self.backoff = backoff
+        self.shares = dict(DEFAULT_SHARES if shares is None else shares)
+        # Seconds after the last shed request that status() still reports degraded
+        self.degraded_seconds = degraded_seconds
+        self._short_weight = 2.0 / (short_window + 1)
+        self._long_weight = 2.0 / (long_window + 1)
+        self._lock = threading.Lock()
+        self.limit = float(initial_limit)
+        self.in_flight = 0
+        # Moving averages of call latency in seconds; 0 until the first sample
+        self.latency = 0.0
+        self.baseline = 0.0
+        self._last_shed = None
+        _LIMITERS.append(self)
+
+    def acquire(self, priority='interactive'):
+        """A Permit, or Overloaded straight away if the request is over its class's share of the limit"""
+        with self._lock:
+            allowed = max(self.min_limit, self.limit * self.shares.get(priority, self.shares.get('background', 1.0)))
+            if self.enabled and self.in_flight >= allowed:
+                self._last_shed = time.monotonic()
+                retry_after = self._retry_after()
+            else:
+                self.in_flight += 1
+                return Permit(self, priority)
+        SHED.inc(self.name, priority)
+        raise Overloaded(self.name, priority, retry_after)
+
+    def _release(self, outcome, seconds):
+        with self._lock:
+            in_flight = self.in_flight
+            self.in_flight -= 1
+            if outcome == 'success':
+                self._sample(seconds, in_flight)
+            elif outcome == 'dropped':
+                self.limit = max(self.min_limit, self.limit * self.backoff)
+        OUTCOMES.inc(self.name, outcome)
+
+    def _sample(self, seconds, in_flight):
+        """Move the latency averages and the limit for one successful call (lock held)"""
+        if not self.baseline:
+            self.latency = self.baseline = seconds
+            return
+        self.latency += self._short_weight * (seconds - self.latency)
+        self.baseline += self._long_weight * (seconds - self.baseline)
+        # Let the baseline follow a lasting improvement instead of waiting out the long window
+        if self.baseline > 2 * self.latency:
+            self.baseline *= 0.95
+        # Only a busy limiter learns anything about whether it could take more
+        if in_flight < self.limit / 2:
+            return
+        gradient = max(0.5, min(1.0, self.tolerance * self.baseline / self.latency))
+        target = self.limit * gradient + math.sqrt(self.limit)
+        limit = (1 - self.smoothing) * self.limit + self.smoothing * target
+        self.limit = max(self.min_limit, min(self.max_limit, limit))
+
+    def _retry_after(self):
+        """Rough seconds until a permit frees up (lock held)"""
+        return max(1, math.ceil(self.latency or 1.0))
+
+    def degraded(self):
+        """Latency well above the baseline, or requests shed recently"""
+        with self._lock:
+            slow = self.baseline and self.latency > self.tolerance * self.baseline
+            shedding = self._last_shed is not None and time.monotonic() - self._last_shed < self.degraded_seconds
+        return bool(slow or shedding)
+
+    def status(self):
+        with self._lock:
+            status = {
+                'limit': round(self.limit, 1),
+                'in_flight': self.in_flight,
+                'latency_ms': round(self.latency * 1000, 1),
+                'baseline_ms': round(self.baseline * 1000, 1),
+                'last_shed_seconds_ago': (None if self._last_shed is None
+                                          else round(time.monotonic() - self._last_shed, 1)),
+            }
+        status['degraded'] = self.degraded()
+        return status
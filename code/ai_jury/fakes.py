@@ -0,0 +1,102 @@
+"""
+Deterministic stand-in for ChatGoogleGenerativeAI.
+
+The same prompt always produces the same answer and (without jitter) the
+same delay, so benchmark runs are comparable. Lives in ai_jury rather than
+benchmarks so that the service never imports the benchmark scripts. Latency is modelled as
+
+    latency_ms + jitter + prompt_tokens / prefill_tokens_per_second
+               + answer_tokens / tokens_per_second
+               (+ tail_ms for a tail_rate fraction of prompts)
+
+Run the legal assistant service against it with::
+
+    LEGAL_AI_LLM=fake FAKE_LLM_LATENCY_MS=200 python legal_assistant.py
+"""
+import os
+import random
+import re
+import time
+
+_WORD_RE = re.compile(r"\w+")
+
+FILLER = (
+    'under the constitution the court held that the provision must be read with the relevant '
+    'section of the code and the accused is entitled to a fair hearing before any order'
+).split()
+
+
+class FakeLLMError(RuntimeError):
+    pass
+
+
+class FakeMessage:
+    def __init__(self, content, prompt_tokens, completion_tokens):
+        self.content = content
+        self.usage_metadata = {
+            'input_tokens': prompt_tokens,
+            'output_tokens': completion_tokens,
+            'total_tokens': prompt_tokens + completion_tokens,
+        }
+        self.response_metadata = {'model_name': 'fake'}
+
+
+class FakeChatModel:
+    def __init__(self, latency_ms=300, jitter_ms=0, tokens_per_second=80, answer_tokens=120,
+                 prefill_tokens_per_second=0, error_rate=0.0, tail_rate=0.0, tail_ms=0, seed=0, name='fake'):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.tokens_per_second = tokens_per_second
+        self.answer_tokens = answer_tokens
+        self.prefill_tokens_per_second = prefill_tokens_per_second
+        self.error_rate = error_rate
+        self.tail_rate = tail_rate
+        self.tail_ms = tail_ms
+        self.seed = seed
+        self.name = name
+
+    @classmethod
+    def from_env(cls, name='fake'):
+        return cls(
+            latency_ms=float(os.getenv('FAKE_LLM_LATENCY_MS', 300)),
+            jitter_ms=float(os.getenv('FAKE_LLM_JITTER_MS', 0)),
+            tokens_per_second=float(os.getenv('FAKE_LLM_TOKENS_PER_SEC', 80)),
+            answer_tokens=int(os.getenv('FAKE_LLM_ANSWER_TOKENS', 120)),
+            prefill_tokens_per_second=float(os.getenv('FAKE_LLM_PREFILL_TOKENS_PER_SEC', 0)),
+            error_rate=float(os.getenv('FAKE_LLM_ERROR_RATE', 0)),
+            tail_rate=float(os.getenv('FAKE_LLM_TAIL_RATE', 0)),
+            tail_ms=float(os.getenv('FAKE_LLM_TAIL_MS', 0)),
+            seed=int(os.getenv('FAKE_LLM_SEED', 0)),
+            name=name,
+        )
+
+    def delay_seconds(self, prompt, rng):
+        prompt_tokens = len(_WORD_RE.findall(prompt))
+        delay = self.latency_ms / 1000
+        if self.jitter_ms:
+            delay += rng.uniform(-self.jitter_ms, self.jitter_ms) / 1000
+        if self.prefill_tokens_per_second:
+            delay += prompt_tokens / self.prefill_tokens_per_second
+        if self.tokens_per_second:
+            delay += self.answer_tokens / self.tokens_per_second
+        if self.tail_rate and rng.random() < self.tail_rate:
+            delay += self.tail_ms / 1000
+        return max(0.0, delay)
+
+    def invoke(self, messages, **kwargs):
+        prompt = _prompt_text(messages)
+        rng = random.Random(f'{self.seed}:{prompt}')
+        time.sleep(self.delay_seconds(prompt, rng))
+        if self.error_rate and rng.random() < self.error_rate:
+            raise FakeLLMError('Injected fake LLM failure')
+
+        question_words = _WORD_RE.findall(prompt.lower())[-12:]
+        words = [rng.choice(question_words + FILLER) for _ in range(self.answer_tokens)]
+        content = f"**Answer ({self.name})**\n\n" + ' '.join(words).capitalize() + '.'
+        return FakeMessage(content, len(_WORD_RE.findall(prompt)), self.answer_tokens)
+
+
+def _prompt_text(messages):
+    if isinstance(messages, str):
+        return messages
+    return '\n'.join(getattr(m, 'content', str(m)) for m in messages)
@@ -0,0 +1,95 @@
+"""
+Deferring heavy imports and clients to first use, and preloading them in
+the background once a server is up.
+
+    requests = lazy_import('requests')       # imported on the first attribute access
+    llm = LazyObject(lambda: ChatGoogleGenerativeAI(...))  # built on first use
+    warm_up('requests', llm)                 # after startup, off the request path
+
+A request that arrives while warm-up is still importing a module waits on
+Python's import lock for the same import instead of starting another one.
+"""
+import importlib
+import threading
+import time
+
+from . import metrics
+
+WARMUP = metrics.histogram('warmup_duration_seconds', 'Time the background warm-up took per target', ['target'])
+
+
+class LazyModule:
+    """Stands in for a module until an attribute is needed"""
+
+    def __init__(self, name):
+        self._name = name
+        self._module = None
+
+    def _load(self):
+        if self._module is None:
+            self._module = importlib.import_module(self._name)
+        return self._module
+
+    def __getattr__(self, attr):
+        if attr in ('_name', '_module'):  # not set up yet, e.g. while copying
+            raise AttributeError(attr)
+        return getattr(self._load(), attr)
+
+    def __repr__(self):
+        return f'<lazy module {self._name!r}{" (loaded)" if self._module else ""}>'
+
+
+def lazy_import(name):
+    return LazyModule(name)
+
+
+class LazyObject:
+    """Stands in for the object `factory()` returns, building it once on first use"""
+
+    def __init__(self, factory, name=None):
+        self._factory = factory
+        self.name = name or getattr(factory, '__qualname__', 'object')
+        self._object = None
+        self._lock = threading.Lock()
+
+    def get(self):
+        if self._object is None:
+            with self._lock:
+                if self._object is None:
+                    self._object = self._factory()
+        return self._object
+
+    def __getattr__(self, attr):
+        if attr in ('_factory', '_object', '_lock', 'name'):
+            raise AttributeError(attr)
+        return getattr(self.get(), attr)
+
+
+def _target_name(target):
+    if isinstance(target, str):
+        return target
+    if isinstance(target, LazyObject):
+        return target.name
+    return getattr(target, '__qualname__', repr(target))
+
+
+def warm_up(*targets):
+    """Import module names, build LazyObjects and call callables in a daemon thread; returns the thread"""
+    def run():
+        for target in targets:
+            start = time.perf_counter()
+            try:
+                if isinstance(target, str):
+                    importlib.import_module(target)
+                elif isinstance(target, LazyObject):
+                    target.get()
+                else:
+                    target()
+            except Exception as e:
+                print(f"Warm-up error ({_target_name(target)}): {e}")
+                continue
+            WARMUP.observe(time.perf_counter() - start, _target_name(target))
+
+    thread = threading.Thread(target=run, name='warm-up', daemon=True)
+    thread.start()
+    return thread
@@ -0,0 +1,282 @@
+"""
+Prometheus-style metrics with per-thread counters.
+
+Each thread records into its own dict, so the hot path never takes a lock;
+a lock is only taken the first time a thread records into a metric and when
+the thread exits. The shards are summed when ``/metrics`` is scraped.
+
+    REQUESTS = metrics.counter('http_requests_total', 'HTTP requests', ['route', 'status'])
+    REQUESTS.inc('/query', '200')
+    text = metrics.REGISTRY.render()
+"""
+import bisect
+import threading
+import time
+import weakref
+
+# Request latency buckets in seconds, tuned for a chat turn that ends in an LLM call
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+class _Shards:
+    """
+    Per-thread dicts; each thread only writes to its own. When a thread
+    exits its shard is folded into a shared base under the lock, so
+    short-lived threads (one per request under runserver, expiring worker
+    threads) do not leave shards behind.
+    """
+
+    def __init__(self):
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._base = {}
+        self._shards = {}  # id(holder) -> shard of a live thread
+
+    def get(self):
+        try:
+            return self._local.holder.shard
+        except AttributeError:
+            holder = _Holder()
+            key = id(holder)
+            with self._lock:
+                self._shards[key] = holder.shard
+            # Runs when the thread's locals are dropped, i.e. when it exits
+            weakref.finalize(holder, self._retire, key)
+            self._local.holder = holder
+            return holder.shard
+
+    def _retire(self, key):
+        with self._lock:
+            shard = self._shards.pop(key, None)
+            for labels, value in (shard or {}).items():
+                current = self._base.get(labels)
+                if current is None:
+                    self._base[labels] = list(value) if isinstance(value, list) else value
+                elif isinstance(value, list):
+                    for i, item in enumerate(value):
+                        current[i] += item
+                else:
+                    self._base[labels] = current + value
+
+    def snapshots(self):
+        # Under the lock, so a shard is never counted both live and folded into the base.
+        # dict.copy() is atomic under the GIL, so writers never see a torn read
+        with self._lock:
+            base = {labels: list(value) if isinstance(value, list) else value
+                    for labels, value in self._base.items()}
+            return [base] + [shard.copy() for shard in self._shards.values()]
+
+
+class _Holder:
+    """Thread-local owner of a shard; weakref-able, unlike the dict itself"""
+    __slots__ = ('shard', '__weakref__')
+
+    def __init__(self):
+        self.shard = {}
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._shards = _Shards()
+
+    def _label_text(self, values, extra=''):
+        pairs = [f'{k}="{_escape(v)}"' for k, v in zip(self.labelnames, values)]
+        if extra:
+            pairs.append(extra)
+        return '{' + ','.join(pairs) + '}' if pairs else ''
+
+    def collect(self):
+        raise NotImplementedError
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} {self.kind}']
+        lines.extend(self.collect())
+        return '\n'.join(lines)
+
+
+class Counter(_Metric):
+    kind = 'counter'
+
+    def inc(self, *labels, amount=1):
+        shard = self._shards.get()
+        shard[labels] = shard.get(labels, 0) + amount
+
+    def values(self):
+        totals = {}
+        for shard in self._shards.snapshots():
+            for labels, value in shard.items():
+                totals[labels] = totals.get(labels, 0) + value
+        return totals
+
+    def collect(self):
+        for labels, value in sorted(self.values().items()):
+            yield f'{self.name}{self._label_text(labels)} {_number(value)}'
+
+
+class Gauge(Counter):
+    """
+    Gauge built from per-thread deltas, so inc() and dec() may run on
+    different threads. Use a callback for values that are read, not counted.
+    """
+    kind = 'gauge'
+
+    def __init__(self, name, documentation, labelnames=(), callback=None):
+        super().__init__(name, documentation, labelnames)
+        self.callback = callback
+
+    def dec(self, *labels, amount=1):
+        self.inc(*labels, amount=-amount)
+
+    def values(self):
+        if self.callback is not None:
+            value = self.callback()
+            return value if isinstance(value, dict) else {(): value}
+        return super().values()
+
+
+class Histogram(_Metric):
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, *labels):
+        shard = self._shards.get()
+        state = shard.get(labels)
+        if state is None:
+            # Per-bucket counts (last slot is +Inf), then sum
+            state = shard[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+        state[bisect.bisect_left(self.buckets, value)] += 1
+        state[-1] += value
+
+    def time(self, *labels):
+        return _Timer(self, labels)
+
+    def values(self):
+        totals = {}
+        for shard in self._shards.snapshots():
+            for labels, state in shard.items():
+                total = totals.setdefault(labels, [0] * len(state))
+                for i, value in enumerate(state):
+                    total[i] += value
+        return totals
+
+    def collect(self):
+        for labels, state in sorted(self.values().items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), state[:-1]):
+                cumulative += count
+                le = '+Inf' if bound == float('inf') else _number(bound)
+                extra = f'le="{le}"'
+                yield f'{self.name}_bucket{self._label_text(labels, extra)} {cumulative}'
+            yield f'{self.name}_sum{self._label_text(labels)} {_number(state[-1])}'
+            yield f'{self.name}_count{self._label_text(labels)} {cumulative}'
+
+
+class _Timer:
+    def __init__(self, histogram, labels):
+        self.histogram = histogram
+        self.labels = labels
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.observe(time.perf_counter() - self.start, *self.labels)
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def _get_or_create(self, cls, name, *args, **kwargs):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(name, *args, **kwargs)
+            elif not isinstance(metric, cls):
+                raise ValueError(f'{name} is already registered as a {metric.kind}')
+            return metric
+
+    def counter(self, name, documentation, labelnames=()):
+        return self._get_or_create(Counter, name, documentation, labelnames)
+
+    def gauge(self, name, documentation, labelnames=(), callback=None):
+        return self._get_or_create(Gauge, name, documentation, labelnames, callback=callback)
+
+    def histogram(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self._get_or_create(Histogram, name, documentation, labelnames, buckets=buckets)
+
+    def render(self):
+        with self._lock:
+            metrics = sorted(self._metrics.values(), key=lambda m: m.name)
+        return '\n'.join(metric.render() for metric in metrics) + '\n'
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _number(value):
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+REGISTRY = Registry()
+counter = REGISTRY.counter
+gauge = REGISTRY.gauge
+histogram = REGISTRY.histogram
+
+CACHE_LOOKUPS = counter('cache_lookups_total', 'Cache lookups by cache and result', ['cache', 'result'])
+
+
+def record_cache_lookup(cache, hit):
+    """Count a hit or miss for `cache`; hit rate = hit / (hit + miss)"""
+    CACHE_LOOKUPS.inc(cache, 'hit' if hit else 'miss')
+
+
+class ASGIMetricsMiddleware:
+    """
+    Plain ASGI middleware (no per-request task or BaseHTTPMiddleware wrapping)
+    recording request count, latency and in-flight requests per route.
+    """
+
+    def __init__(self, app, prefix='http'):
+        self.app = app
+        self.requests = counter(f'{prefix}_requests_total', 'HTTP requests', ['route', 'method', 'status'])
+        self.latency = histogram(f'{prefix}_request_duration_seconds', 'HTTP request latency', ['route', 'method'])
+        self.in_flight = gauge(f'{prefix}_requests_in_flight', 'HTTP requests being served')
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            return await self.app(scope, receive, send)
+
+        status = [500]
+
+        async def send_wrapper(message):
+            if message['type'] == 'http.response.start':
+                status[0] = message['status']
+            await send(message)
+
+        self.in_flight.inc()
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            self.in_flight.dec()
+            route = scope.get('route')
+            route = getattr(route, 'path', None) or 'unmatched'
+            method = scope['method']
+            self.latency.observe(time.perf_counter() - start, route, method)
+            self.requests.inc(route, method, str(status[0]))
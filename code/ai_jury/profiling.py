@@ -0,0 +1,192 @@
+"""
+Opt-in profiling of slow requests.
+
+``RequestProfiler.capture(label)`` wraps one request. Traces are kept when the
+request is slower than ``threshold_ms`` or was picked by ``sample_rate``, and
+are written to ``directory``; only the newest ``max_files`` are kept.
+
+Two engines are available:
+
+- ``sampler`` (default): one background thread samples the stacks of the
+  threads currently inside ``capture()`` every ``interval_ms``. The output is
+  in folded-stack format (``frame;frame;frame count``), which flamegraph
+  tools read directly. Cheap enough to leave running on every request.
+- ``cprofile``: deterministic cProfile stats of the request thread. More
+  detail but slower; Python allows one active cProfile at a time, so
+  concurrent requests are skipped while one is being profiled.
+
+When profiling is disabled, callers should not install the profiler at all
+(the Django middleware raises MiddlewareNotUsed), so the cost is zero.
+"""
+import collections
+import cProfile
+import io
+import os
+import pstats
+import random
+import re
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+_NAME_RE = re.compile(
+    r'^(?P<stamp>\d{8}-\d{6}-\d{6})_(?P<ms>\d+)ms_(?P<reason>slow|sampled)_(?P<label>[\w.-]*)\.(?P<ext>folded|txt)$'
+)
+
+
+class _StackSampler(threading.Thread):
+    """Samples the Python stack of registered threads at a fixed interval"""
+
+    def __init__(self, interval):
+        super().__init__(name='request-profiler', daemon=True)
+        self.interval = interval
+        self.active = {}
+        self.wakeup = threading.Event()
+
+    def register(self, ident):
+        stacks = collections.Counter()
+        self.active[ident] = stacks
+        self.wakeup.set()
+        return stacks
+
+    def unregister(self, ident):
+        self.active.pop(ident, None)
+
+    def run(self):
+        while True:
+            if not self.active:
+                self.wakeup.wait()
+                self.wakeup.clear()
+                continue
+            time.sleep(self.interval)
+            frames = sys._current_frames()
+            for ident, stacks in list(self.active.items()):
+                frame = frames.get(ident)
+                if frame is not None:
+                    stacks[_fold(frame)] += 1
+
+
+def _fold(frame):
+    parts = []
+    while frame is not None:
+        code = frame.f_code
+        parts.append(f'{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})')
+        frame = frame.f_back
+    return ';'.join(reversed(parts))
+
+
+class RequestProfiler:
+    def __init__(self, directory, threshold_ms=2000, sample_rate=0.0, max_files=100,
+                 engine='sampler', interval_ms=5):
+        if engine not in ('sampler', 'cprofile'):
+            raise ValueError(f'Unknown profiling engine: {engine}')
+        self.directory = str(directory)
+        self.threshold_ms = threshold_ms
+        self.sample_rate = sample_rate
+        self.max_files = max_files
+        self.engine = engine
+        self._sampler = None
+        self._sampler_lock = threading.Lock()
+        self._interval = interval_ms / 1000
+
+    def _get_sampler(self):
+        if self._sampler is None:
+            with self._sampler_lock:
+                if self._sampler is None:
+                    sampler = _StackSampler(self._interval)
+                    sampler.start()
+                    self._sampler = sampler
+        return self._sampler
+
+    @contextmanager
+    def capture(self, label):
+        """Profile the enclosed block and keep the trace if it is slow or sampled"""
+        sampled = self.sample_rate > 0 and random.random() < self.sample_rate
+        ident = threading.get_ident()
+        profile = stacks = None
+
+        if self.engine == 'cprofile':
+            profile = cProfile.Profile()
+            try:
+                profile.enable()
+            except ValueError:
+                # Another request on another thread is being profiled
+                profile = None
+        else:
+            sampler = self._get_sampler()
+            if ident not in sampler.active:
+                stacks = sampler.register(ident)
+
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            duration_ms = (time.perf_counter() - start) * 1000
+            if profile is not None:
+                profile.disable()
+            if stacks is not None:
+                self._sampler.unregister(ident)
+
+            slow = self.threshold_ms is not None and duration_ms >= self.threshold_ms
+            if slow or sampled:
+                reason = 'slow' if slow else 'sampled'
+                if profile is not None:
+                    self._write(label, duration_ms, reason, 'txt', _format_stats(profile))
+                elif stacks:
+                    folded = '\n'.join(f'{stack} {count}' for stack, count in stacks.most_common())
+                    self._write(label, duration_ms, reason, 'folded', folded + '\n')
+
+    def _write(self, label, duration_ms, reason, ext, content):
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            slug = re.sub(r'[^\w.-]+', '-', label).strip('-')[:80]
+            stamp = datetime.now().strftime('%Y%m%d-%H%M%S-%f')
+            name = f'{stamp}_{int(duration_ms)}ms_{reason}_{slug}.{ext}'
+            with open(os.path.join(self.directory, name), 'w', encoding='utf-8') as f:
+                f.write(content)
+            self._rotate()
+        except OSError as e:
+            print(f"Profiler write error: {e}")
+
+    def _rotate(self):
+        names = sorted(n for n in os.listdir(self.directory) if _NAME_RE.match(n))
+        for name in names[:max(0, len(names) - self.max_files)]:
+            try:
+                os.remove(os.path.join(self.directory, name))
+            except OSError:
+                pass
+
+    def list_traces(self):
+        """Saved traces, newest first"""
+        if not os.path.isdir(self.directory):
+            return []
+        traces = []
+        for name in sorted(os.listdir(self.directory), reverse=True):
+            match = _NAME_RE.match(name)
+            if not match:
+                continue
+            traces.append({
+                'name': name,
+                'created': datetime.strptime(match['stamp'], '%Y%m%d-%H%M%S-%f'),
+                'duration_ms': int(match['ms']),
+                'reason': match['reason'],
+                'label': match['label'],
+                'engine': 'cprofile' if match['ext'] == 'txt' else 'sampler',
+                'size': os.path.getsize(os.path.join(self.directory, name)),
+            })
+        return traces
+
+    def read_trace(self, name):
+        """Contents of a saved trace; raises FileNotFoundError for unknown names"""
+        if not _NAME_RE.match(name):
+            raise FileNotFoundError(name)
+        with open(os.path.join(self.directory, name), encoding='utf-8') as f:
+            return f.read()
+
+
+def _format_stats(profile, limit=60):
+    out = io.StringIO()
+    pstats.Stats(profile, stream=out).sort_stats('cumulative').print_stats(limit)
+    return out.getvalue()
@@ -0,0 +1,207 @@
+"""
+Fitting a prompt into a token budget.
+
+PromptBuilder packs the parts of a prompt by priority: the system prompt
+and the question always go in (the question is truncated only if it alone
+overflows), then attachment chunks, retrieved passages and chat history,
+each with a share of what is left; a share a section does not use passes on
+to the next one.
+
+    builder = PromptBuilder(budget=6000, summarize=summarize_chunk)
+    packed = builder.build(SYSTEM_PROMPT, question, history=history,
+                           attachments=[{'filename': 'lease.pdf', 'chunks': [...]}])
+    packed.messages  # [('system', ...), ('user', ...), ('assistant', ...), ..., ('user', ...)]
+    packed.usage     # estimated tokens per section, plus what was dropped or summarized
+
+Attachment chunks arrive most relevant first. When they do not fit, the
+most relevant half of the attachment budget is kept verbatim and the rest of
+the chunks are summarized (map) and the summaries, if still too long,
+summarized together (reduce) into the other half. Without a `summarize`
+callable, or when a summary call fails, as many whole chunks as fit are kept
+and the overflow is dropped (counted in usage['dropped']).
+
+Token counts are estimates (about four characters per token for Gemini on
+English text); the model's own usage metadata is the bill.
+"""
+import math
+from concurrent.futures import ThreadPoolExecutor
+
+from . import metrics
+
+CHARS_PER_TOKEN = 4
+
+DEFAULT_SHARES = (('attachments', 0.5), ('passages', 0.3), ('history', 0.2))
+
+SUMMARY_HEADER = '\n\n[Summary of the rest of the document]\n'
+
+SUMMARY_ERRORS = metrics.counter('prompt_summary_errors_total',
+                                 'Attachment summaries that failed, so their chunks were dropped instead')
+
+
+def count_tokens(text):
+    """Estimated tokens in `text`"""
+    return math.ceil(len(text) / CHARS_PER_TOKEN) if text else 0
+
+
+def truncate(text, tokens, marker='\n[...]\n'):
+    """`text` cut to about `tokens` tokens, keeping its beginning and end"""
+    if count_tokens(text) <= tokens:
+        return text
+    keep = max(0, tokens * CHARS_PER_TOKEN - len(marker))
+    head = keep * 2 // 3
+    return text[:head] + marker + text[len(text) - (keep - head):] if keep > head else text[:keep]
+
+
+def _split_chunks(chunks, tokens):
+    """(chunks that fit in `tokens`, taken most relevant first, the rest)"""
+    kept, rest = [], []
+    spent = 0
+    for chunk in chunks:
+        cost = count_tokens(chunk['text'])
+        if spent + cost <= tokens:
+            kept.append(chunk)
+            spent += cost
+        else:
+            rest.append(chunk)
+    return kept, rest
+
+
+def _join_chunks(chunks):
+    return '\n...\n'.join(c['text'] for c in sorted(chunks, key=lambda c: c['index']))
+
+
+class PackedPrompt:
+    def __init__(self, messages, usage):
+        self.messages = messages
+        self.usage = usage
+
+    @property
+    def tokens(self):
+        return self.usage['total']
+
+
+class PromptBuilder:
+    def __init__(self, budget=6000, shares=DEFAULT_SHARES, summarize=None, max_map_chunks=8, map_workers=4):
+        self.budget = budget
+        self.shares = shares
+        self.summarize = summarize
+        self.max_map_chunks = max_map_chunks
+        self.map_workers = map_workers
+
+    def build(self, system, question, history=(), passages=(), attachments=(), summarize=None):
+        """
+        `history` is a list of {'role': 'user'|'assistant', 'content'} oldest
+        first, `passages` a list of strings most relevant first, and
+        `attachments` a list of {'filename', 'chunks'} with the chunks most
+        relevant first (each a string or {'index', 'text'}). `summarize`
+        replaces the builder's for this prompt, e.g. to admit each summary
+        call on behalf of the request it is made for.
+        """
+        usage = {'budget': self.budget, 'system': count_tokens(system), 'dropped': {}, 'summarized': 0,
+                 'summary_errors': 0}
+        # A builder without summarize (PROMPT_SUMMARIZE=0) stays without
+        summarize = summarize if self.summarize and summarize else self.summarize
+        question = truncate(question, max(0, self.budget - usage['system']))
+        usage['question'] = count_tokens(question)
+        left = max(0, self.budget - usage['system'] - usage['question'])
+
+        packers = {'attachments': lambda *args: self._pack_attachments(*args, summarize),
+                   'passages': self._pack_passages, 'history': self._pack_history}
+        inputs = {'attachments': attachments, 'passages': passages, 'history': history}
+        packed = {}
+        carry = 0
+        for section, share in self.shares:
+            allowance = int(left * share) + carry
+            packed[section], used, dropped = packers[section](inputs[section], allowance, usage)
+            usage[section] = used
+            if dropped:
+                usage['dropped'][section] = dropped
+            carry = max(0, allowance - used)
+
+        user = question
+        if packed['attachments']:
+            user += '\n\n[Attachments]\n' + packed['attachments']
+        if packed['passages']:
+            user += '\n\n[Relevant law]\n' + packed['passages']
+        messages = [('system', system)] + packed['history'] + [('user', user)]
+        usage['total'] = sum(usage[section] for section in ('system', 'question', 'attachments', 'passages', 'history'))
+        return PackedPrompt(messages, usage)
+
+    def _pack_attachments(self, attachments, allowance, usage, summarize):
+        sections = []
+        used = dropped = 0
+        # Each attachment gets an equal part of the allowance; what one leaves over goes to the next
+        for position, attachment in enumerate(attachments):
+            part = (allowance - used) // (len(attachments) - position)
+            chunks = [c if isinstance(c, dict) else {'index': i, 'text': c}
+                      for i, c in enumerate(attachment.get('chunks') or ())]
+            header = f"\n[Extracted from {attachment.get('filename') or 'attachment'}]\n"
+            text, cost, lost = self._fit_chunks(chunks, part - count_tokens(header), usage, summarize)
+            if text:
+                sections.append(header + text)
+                used += cost + count_tokens(header)
+            dropped += lost
+        return '\n'.join(sections), used, dropped
+
+    def _fit_chunks(self, chunks, allowance, usage, summarize):
+        """Text for one attachment within `allowance`: verbatim chunks, then a summary of the rest"""
+        if allowance <= 0:
+            return '', 0, len(chunks)
+        if sum(count_tokens(c['text']) for c in chunks) <= allowance:
+            kept, rest = chunks, []
+        else:
+            kept, rest = _split_chunks(chunks, allowance // 2 if summarize else allowance)
+
+        text = _join_chunks(kept)
+        lost = len(rest)
+        if rest and summarize:
+            try:
+                summary = self._map_reduce(rest, allowance - count_tokens(text) - count_tokens(SUMMARY_HEADER),
+                                           usage, summarize)
+            except Exception:
+                # Better a prompt without the summary than no answer: fall back to dropping the overflow
+                SUMMARY_ERRORS.inc()
+                usage['summary_errors'] += 1
+                kept, rest = _split_chunks(chunks, allowance)
+                text = _join_chunks(kept)
+                return text, count_tokens(text), len(rest)
+            if summary:
+                text += SUMMARY_HEADER + summary
+                lost = max(0, len(rest) - self.max_map_chunks)
+        return text, count_tokens(text), lost
+
+    def _map_reduce(self, chunks, allowance, usage, summarize):
+        if allowance <= 0:
+            return ''
+        mapped = sorted(chunks[:self.max_map_chunks], key=lambda c: c['index'])
+        with ThreadPoolExecutor(max_workers=self.map_workers) as pool:
+            summaries = list(pool.map(lambda c: summarize(c['text']), mapped))
+        usage['summarized'] += len(mapped)
+        combined = '\n'.join(s.strip() for s in summaries if s)
+        if count_tokens(combined) > allowance:
+            combined = summarize(combined)
+            usage['summarized'] += 1
+        return truncate(combined, allowance)
+
+    def _pack_passages(self, passages, allowance, usage):
+        kept = []
+        used = 0
+        for passage in passages:
+            cost = count_tokens(passage)
+            if used + cost > allowance:
+                break
+            kept.append(passage)
+            used += cost
+        return '\n\n'.join(kept), used, len(passages) - len(kept)
+
+    def _pack_history(self, history, allowance, usage):
+        """The most recent turns that fit, whole, in their original order"""
+        kept = []
+        used = 0
+        for turn in reversed(history):
+            cost = count_tokens(turn['content'])
+            if used + cost > allowance:
+                break
+            kept.append(('assistant' if turn['role'] == 'assistant' else 'user', turn['content']))
+            used += cost
+        return kept[::-1], used, len(history) - len(kept)
@@ -0,0 +1,220 @@
+"""
+Token-bucket rate limiting shared by the Django app and the legal assistant
+service.
+
+A limiter has one bucket per user, per client IP and one global bucket,
+each refilled continuously at its own rate. A request is admitted only if
+every bucket that applies to it has a token; otherwise nothing is taken and
+the caller gets the number of seconds until it would be admitted.
+
+    limiter = RateLimiter('chat', {'user': '10/min', 'ip': '20/min', 'global': '300/min'})
+    decision = limiter.check(user=request.user.pk, ip=client_ip)
+    if not decision.allowed:
+        ...  # 429 with Retry-After: decision.retry_after
+
+Backends: MemoryBackend (one process; a few microseconds per check) and
+SQLiteBackend (a file shared by every worker and service on the host).
+"""
+import math
+import re
+import sqlite3
+import threading
+import time
+from collections import namedtuple
+
+from . import metrics
+
+SCOPES = ('user', 'ip', 'global')
+
+Rule = namedtuple('Rule', ['scope', 'rate', 'capacity'])  # rate in tokens per second
+Decision = namedtuple('Decision', ['allowed', 'retry_after', 'scope'])
+
+ALLOWED = Decision(True, 0, None)
+
+CHECKS = metrics.counter('ratelimit_checks_total', 'Rate limit checks', ['limiter', 'result', 'scope'])
+
+_PERIODS = {'s': 1, 'sec': 1, 'second': 1, 'm': 60, 'min': 60, 'minute': 60,
+            'h': 3600, 'hour': 3600, 'd': 86400, 'day': 86400}
+_RATE_RE = re.compile(r'^\s*(\d+)\s*/\s*(\d*)\s*([a-z]+)\s*$')
+
+
+def parse_rate(text):
+    """'20/min' or '5/10s' -> (tokens per second, bucket capacity); the capacity is the count"""
+    match = _RATE_RE.match(text)
+    if not match or match.group(3) not in _PERIODS:
+        raise ValueError(f'Invalid rate {text!r}, expected e.g. "20/min" or "5/10s"')
+    count = int(match.group(1))
+    seconds = int(match.group(2) or 1) * _PERIODS[match.group(3)]
+    return count / seconds, count
+
+
+class MemoryBackend:
+    """Buckets in a dict behind one lock; per process"""
+
+    clock = staticmethod(time.monotonic)
+
+    def __init__(self, max_keys=100_000):
+        self.max_keys = max_keys
+        self._buckets = {}  # key -> (tokens, updated, full_at)
+        self._lock = threading.Lock()
+
+    def take(self, requests, cost, now):
+        """
+        `requests` is a list of (key, rate, capacity). Takes `cost` tokens from
+        every bucket, or from none; returns (seconds to wait, index of the
+        first bucket that is short) with 0 meaning admitted.
+        """
+        buckets = self._buckets
+        with self._lock:
+            levels = []
+            for key, rate, capacity in requests:
+                bucket = buckets.get(key)
+                if bucket is None:
+                    tokens = capacity
+                else:
+                    tokens = bucket[0] + (now - bucket[1]) * rate
+                    if tokens > capacity:
+                        tokens = capacity
+                if tokens < cost:
+                    return (cost - tokens) / rate, len(levels)
+                levels.append(tokens - cost)
+            for (key, rate, capacity), tokens in zip(requests, levels):
+                buckets[key] = (tokens, now, now + (capacity - tokens) / rate)
+            if len(buckets) > self.max_keys:
+                self._prune(now)
+        return 0.0, None
+
+    def _prune(self, now):
+        # A bucket that has refilled is the same as no bucket
+        for key in [key for key, bucket in self._buckets.items() if bucket[2] <= now]:
+            del self._buckets[key]
+        # Still full of active clients: make room for twice as many before pruning again
+        if len(self._buckets) > self.max_keys:
+            self.max_keys = len(self._buckets) * 2
+
+
+class SQLiteBackend:
+    """
+    Buckets in a SQLite file so all Django workers and the legal assistant
+    service on one host share them. One IMMEDIATE transaction per check.
+    """
+
+    clock = staticmethod(time.time)  # shared between processes, so wall-clock time
+
+    def __init__(self, path, timeout=5.0, prune_every=1000):
+        self.path = path
+        self.timeout = timeout
+        self.prune_every = prune_every
+        self._local = threading.local()
+        self._takes = 0
+
+    def _connection(self):
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=self.timeout, isolation_level=None,
+                                         check_same_thread=False)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+            connection.execute(
+                'CREATE TABLE IF NOT EXISTS ratelimit_buckets '
+                '(key TEXT PRIMARY KEY, tokens REAL NOT NULL, updated REAL NOT NULL, full_at REAL NOT NULL)'
+            )
+            self._local.connection = connection
+        return connection
+
+    def take(self, requests, cost, now):
+        connection = self._connection()
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            levels = []
+            for index, (key, rate, capacity) in enumerate(requests):
+                row = connection.execute(
+                    'SELECT tokens, updated FROM ratelimit_buckets WHERE key = ?', (key,)
+                ).fetchone()
+                tokens = capacity if row is None else min(capacity, row[0] + (now - row[1]) * rate)
+                if tokens < cost:
+                    connection.execute('ROLLBACK')
+                    return (cost - tokens) / rate, index
+                levels.append(tokens - cost)
+            connection.executemany(
+                'INSERT OR REPLACE INTO ratelimit_buckets (key, tokens, updated, full_at) VALUES (?, ?, ?, ?)',
+                [(key, tokens, now, now + (capacity - tokens) / rate)
+                 for (key, rate, capacity), tokens in zip(requests, levels)],
+            )
+            self._takes += 1
+            if self._takes % self.prune_every == 0:
+                connection.execute('DELETE FROM ratelimit_buckets WHERE full_at <= ?', (now,))
+            connection.execute('COMMIT')
+        except BaseException:
+            if connection.in_transaction:
+                connection.execute('ROLLBACK')
+            raise
+        return 0.0, None
+
+
+def backend_from_url(url):
+    """'memory' or 'sqlite:///path/to/ratelimit.sqlite3'"""
+    if not url or url == 'memory':
+        return MemoryBackend()
+    if url.startswith('sqlite:///'):
+        return SQLiteBackend(url[len('sqlite:///'):])
+    raise ValueError(f'Unknown rate limit backend {url!r}')
+
+
+class RateLimited(Exception):
+    """Raised by RateLimiter.require for a request over its limit"""
+
+    def __init__(self, name, decision):
+        super().__init__(f'{name} rate limit exceeded ({decision.scope}), retry in {decision.retry_after}s')
+        self.scope = decision.scope
+        self.retry_after = decision.retry_after
+
+
+class RateLimiter:
+    """Per-user, per-IP and global token buckets for one endpoint group"""
+
+    def __init__(self, name, rules, backend=None):
+        self.name = name
+        self.backend = backend or MemoryBackend()
+        self.rules = []
+        for scope, rate in rules.items():
+            if scope not in SCOPES:
+                raise ValueError(f'Unknown rate limit scope {scope!r}, expected one of {SCOPES}')
+            if rate:
+                self.rules.append(Rule(scope, *parse_rate(rate)))
+        # (scope, key or key prefix, rate, capacity), built once so a check only joins strings
+        self._buckets = [
+            (rule.scope, f'{name}:global' if rule.scope == 'global' else f'{name}:{rule.scope}:', rule.rate, rule.capacity)
+            for rule in self.rules
+        ]
+
+    def check(self, user=None, ip=None, cost=1):
+        """Admit one request (taking `cost` tokens from each bucket) or say how long to wait"""
+        requests = []
+        scopes = []
+        for scope, key, rate, capacity in self._buckets:
+            if scope == 'user':
+                if user is None:
+                    continue
+                key += str(user)
+            elif scope == 'ip':
+                if not ip:
+                    continue
+                key += ip
+            requests.append((key, rate, capacity))
+            scopes.append(scope)
+        if not requests:
+            return ALLOWED
+
+        wait, index = self.backend.take(requests, cost, self.backend.clock())
+        if index is None:
+            CHECKS.inc(self.name, 'allowed', '')
+            return ALLOWED
+        CHECKS.inc(self.name, 'limited', scopes[index])
+        return Decision(False, max(1, math.ceil(wait)), scopes[index])
+
+    def require(self, user=None, ip=None, cost=1):
+        """check(), raising RateLimited instead of returning a refusal"""
+        decision = self.check(user=user, ip=ip, cost=cost)
+        if not decision.allowed:
+            raise RateLimited(self.name, decision)
@@ -0,0 +1,188 @@
+"""
+Routing questions across several LLM backends.
+
+Every backend is a chat model with LangChain's ``invoke(messages)``
+interface. For each question the router orders the backends: short
+questions (``max_words``) go to the cheapest backend that takes them first,
+the rest to the cheapest backend without a limit, then everything else as
+fallbacks; backends that recently failed go last.
+
+The first backend is called on a worker thread. If it raises, the next one
+is tried straight away (failover). If it is still running after its own
+``hedge_percentile`` latency (the 95th percentile of its recent calls, by
+default), a duplicate request goes to the next backend and whichever answers
+first wins (hedging), as long as hedges stay under ``hedge_budget`` of all
+calls so a backend that is slow for everyone is not sent twice the load.
+Once one answers the losers are cancelled: a call that has not started yet
+never reaches its backend (outcome "skipped"), and one already running (an
+HTTP request cannot be interrupted) finishes in the background, only
+updates health and is counted with outcome "cancelled".
+
+    router = ModelRouter([
+        Backend('gemini-2.5-flash-lite', lite, cost=1, max_words=25),
+        Backend('gemini-2.5-flash', flash, cost=4),
+    ])
+    message, backend = router.invoke(messages, question)
+"""
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, CancelledError, ThreadPoolExecutor, wait
+
+from . import metrics
+
+CALLS = metrics.counter('llm_router_calls_total', 'LLM calls made by the router', ['backend', 'kind', 'outcome'])
+LATENCY = metrics.histogram('llm_router_backend_seconds', 'Latency of successful LLM calls', ['backend'])
+
+
+class AllBackendsFailed(Exception):
+    """Every backend raised; the last error is chained"""
+
+
+class Backend:
+    """One model behind the router, with its recent latencies and failures"""
+
+    def __init__(self, name, llm, cost=1, max_words=None, window=200, min_samples=20,
+                 default_hedge_ms=2000, failures_to_trip=3, cooldown=30):
+        self.name = name
+        self.llm = llm
+        self.cost = cost
+        self.max_words = max_words
+        self.min_samples = min_samples
+        self.default_hedge_ms = default_hedge_ms
+        self.failures_to_trip = failures_to_trip
+        self.cooldown = cooldown
+        self._latencies = deque(maxlen=window)
+        self._failures = 0
+        self._down_until = 0.0
+        self._lock = threading.Lock()
+
+    def healthy(self, now=None):
+        return (now or time.monotonic()) >= self._down_until
+
+    def takes(self, words):
+        return self.max_words is None or words <= self.max_words
+
+    def latency_percentile(self, pct):
+        """Seconds, from the recent successful calls; None until there are enough of them"""
+        with self._lock:
+            if len(self._latencies) < self.min_samples:
+                return None
+            ordered = sorted(self._latencies)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+    def hedge_delay(self, pct):
+        latency = self.latency_percentile(pct)
+        return self.default_hedge_ms / 1000 if latency is None else latency
+
+    def record_success(self, seconds):
+        with self._lock:
+            self._latencies.append(seconds)
+            self._failures = 0
+        LATENCY.observe(seconds, self.name)
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._failures >= self.failures_to_trip:
+                # Skip it (except as a last resort) until the cooldown is over
+                self._down_until = time.monotonic() + self.cooldown
+                self._failures = 0
+
+    def status(self):
+        p50, p95 = self.latency_percentile(50), self.latency_percentile(95)
+        return {
+            'healthy': self.healthy(),
+            'p50_ms': None if p50 is None else round(p50 * 1000, 1),
+            'p95_ms': None if p95 is None else round(p95 * 1000, 1),
+        }
+
+
+class ModelRouter:
+    def __init__(self, backends, hedge_percentile=95, hedging=True, hedge_budget=0.1, max_workers=64):
+        if not backends:
+            raise ValueError('ModelRouter needs at least one backend')
+        self.backends = list(backends)
+        self.hedge_percentile = hedge_percentile
+        self.hedging = hedging
+        self.hedge_budget = hedge_budget
+        self._invocations = 0
+        self._hedges = 0
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='llm-router')
+
+    def candidates(self, question):
+        """Backends in the order to try them for this question"""
+        words = len(question.split())
+        now = time.monotonic()
+        # Healthy before unhealthy, then those that take a question this long, then the cheapest
+        return sorted(self.backends, key=lambda b: (not b.healthy(now), not b.takes(words), b.cost))
+
+    def _may_hedge(self):
+        with self._lock:
+            if self._hedges >= self.hedge_budget * self._invocations + 1:
+                return False
+            self._hedges += 1
+            return True
+
+    def _call(self, backend, messages, kind, answered):
+        if answered.is_set():
+            CALLS.inc(backend.name, kind, 'skipped')
+            raise CancelledError
+        start = time.perf_counter()
+        try:
+            message = backend.llm.invoke(messages)
+        except Exception:
+            backend.record_failure()
+            CALLS.inc(backend.name, kind, 'cancelled' if answered.is_set() else 'error')
+            raise
+        backend.record_success(time.perf_counter() - start)
+        if answered.is_set():
+            CALLS.inc(backend.name, kind, 'cancelled')
+        else:
+            # Set here rather than by the caller, so a queued hedge this worker picks up next is skipped
+            answered.set()
+            CALLS.inc(backend.name, kind, 'success')
+        return message
+
+    def invoke(self, messages, question):
+        """(message, backend name) from the first backend to answer"""
+        remaining = deque(self.candidates(question))
+        pending = {}  # future -> backend
+        answered = threading.Event()  # set once a backend has won, for the losers
+        last_error = None
+        with self._lock:
+            self._invocations += 1
+
+        def launch(kind):
+            backend = remaining.popleft()
+            pending[self._executor.submit(self._call, backend, messages, kind, answered)] = backend
+            return backend
+
+        hedge_after = launch('primary').hedge_delay(self.hedge_percentile)
+        while pending:
+            timeout = hedge_after if self.hedging and remaining and hedge_after is not None else None
+            done, _ = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+            if not done:
+                if self._may_hedge():
+                    # Slower than the primary's usual tail: race a duplicate on the next backend
+                    hedge_after = launch('hedge').hedge_delay(self.hedge_percentile)
+                else:
+                    hedge_after = None
+                continue
+            for future in done:
+                backend = pending.pop(future)
+                try:
+                    message = future.result()
+                except Exception as e:
+                    last_error = e
+                    continue
+                for loser in pending:
+                    loser.cancel()
+                return message, backend.name
+            if remaining and not pending:
+                launch('failover')
+        raise AllBackendsFailed('Every LLM backend failed') from last_error
+
+    def status(self):
+        return {backend.name: backend.status() for backend in self.backends}
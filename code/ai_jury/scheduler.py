@@ -0,0 +1,171 @@
+"""
+Priority-aware admission in front of the LLM.
+
+Requests wait for one of `max_concurrency` slots. Waiting requests are
+ordered by weighted fair queuing across priority classes: each request gets
+a virtual finish tag of ``max(virtual clock, class's last tag) + 1/weight``
+and the smallest tag whose class is under its own concurrency cap goes
+next, so interactive chat (weight 8) gets about eight slots for every bulk
+letter (weight 1) while both are queued, and bulk still never starves.
+
+A request that cannot start in time to finish before its deadline (using a
+moving average of that class's service time) is dropped from the queue with
+DeadlineExceeded instead of occupying a slot for an answer nobody waits for.
+
+    scheduler = PriorityScheduler(max_concurrency=8)
+    with scheduler.slot('interactive', deadline=time.monotonic() + 25):
+        answer = llm.invoke(...)
+
+Blocking, for sync handlers running in a thread pool.
+"""
+import threading
+import time
+from collections import deque, namedtuple
+
+from . import metrics
+
+PriorityClass = namedtuple('PriorityClass', ['weight', 'max_concurrency', 'timeout'])
+
+# timeout: seconds a request of this class may wait and run when the caller gives no deadline
+DEFAULT_CLASSES = {
+    'interactive': PriorityClass(weight=8, max_concurrency=None, timeout=30),
+    'background': PriorityClass(weight=3, max_concurrency=None, timeout=120),
+    'bulk': PriorityClass(weight=1, max_concurrency=None, timeout=300),
+}
+
+QUEUED = metrics.gauge('scheduler_queued', 'Requests waiting for an LLM slot', ['priority'])
+RUNNING = metrics.gauge('scheduler_running', 'Requests holding an LLM slot', ['priority'])
+WAIT = metrics.histogram('scheduler_wait_seconds', 'Time spent waiting for an LLM slot', ['priority'])
+DROPPED = metrics.counter('scheduler_dropped_total', 'Requests dropped before their deadline', ['priority'])
+
+
+class DeadlineExceeded(Exception):
+    """The request could not get a slot in time to meet its deadline"""
+
+    def __init__(self, priority, retry_after):
+        super().__init__(f'{priority} request dropped: no LLM slot before its deadline')
+        self.priority = priority
+        self.retry_after = retry_after
+
+
+class _Ticket:
+    __slots__ = ('priority', 'tag', 'deadline', 'granted', 'dropped', 'event')
+
+    def __init__(self, priority, tag, deadline):
+        self.priority = priority
+        self.tag = tag
+        self.deadline = deadline
+        self.granted = False
+        self.dropped = False
+        self.event = threading.Event()
+
+
+class _Slot:
+    """Context manager returned by PriorityScheduler.slot; releases on exit"""
+
+    def __init__(self, scheduler, priority, deadline):
+        self.scheduler = scheduler
+        self.priority = priority
+        self.deadline = deadline
+
+    def __enter__(self):
+        self.started = self.scheduler.acquire(self.priority, self.deadline)
+        return self
+
+    def __exit__(self, *exc):
+        self.scheduler.release(self.priority, time.monotonic() - self.started)
+
+
+class PriorityScheduler:
+    def __init__(self, max_concurrency=8, classes=None, default_priority='background'):
+        self.max_concurrency = max_concurrency
+        self.classes = dict(classes or DEFAULT_CLASSES)
+        self.default_priority = default_priority
+        self._lock = threading.Lock()
+        self._queues = {name: deque() for name in self.classes}
+        self._running = {name: 0 for name in self.classes}
+        self._last_tag = {name: 0.0 for name in self.classes}
+        # Moving average of seconds a slot is held, per class; seeds the deadline check
+        self._service_time = {name: 0.0 for name in self.classes}
+        self._virtual_time = 0.0
+        self._total_running = 0
+        QUEUED.callback = self._queue_depths
+
+    def _queue_depths(self):
+        return {(name,): len(queue) for name, queue in self._queues.items()}
+
+    def priority_for(self, name):
+        """A known priority class for a caller-supplied name (e.g. an X-Priority header)"""
+        return name if name in self.classes else self.default_priority
+
+    def slot(self, priority, deadline=None):
+        priority = self.priority_for(priority)
+        if deadline is None:
+            deadline = time.monotonic() + self.classes[priority].timeout
+        return _Slot(self, priority, deadline)
+
+    def acquire(self, priority, deadline):
+        """Wait for a slot; returns the time it was granted or raises DeadlineExceeded"""
+        arrived = time.monotonic()
+        with self._lock:
+            tag = max(self._virtual_time, self._last_tag[priority]) + 1.0 / self.classes[priority].weight
+            self._last_tag[priority] = tag
+            ticket = _Ticket(priority, tag, deadline)
+            self._queues[priority].append(ticket)
+            self._dispatch(arrived)
+
+        ticket.event.wait(max(0.0, deadline - time.monotonic()))
+        with self._lock:
+            if not ticket.granted:
+                # Timed out, or dropped by the dispatcher as hopeless
+                if not ticket.dropped:
+                    self._queues[priority].remove(ticket)
+                    DROPPED.inc(priority)
+                raise DeadlineExceeded(priority, self._retry_after(priority))
+        granted = time.monotonic()
+        WAIT.observe(granted - arrived, priority)
+        return granted
+
+    def release(self, priority, held_seconds):
+        with self._lock:
+            self._running[priority] -= 1
+            self._total_running -= 1
+            previous = self._service_time[priority]
+            self._service_time[priority] = held_seconds if not previous else 0.8 * previous + 0.2 * held_seconds
+            RUNNING.dec(priority)
+            self._dispatch(time.monotonic())
+
+    def _dispatch(self, now):
+        """Hand free slots to the eligible head-of-queue tickets with the smallest tags (lock held)"""
+        while self._total_running < self.max_concurrency:
+            best = None
+            for name, queue in self._queues.items():
+                self._drop_hopeless(name, queue, now)
+                cap = self.classes[name].max_concurrency
+                if queue and (cap is None or self._running[name] < cap):
+                    if best is None or queue[0].tag < best.tag:
+                        best = queue[0]
+            if best is None:
+                return
+            self._queues[best.priority].popleft()
+            self._virtual_time = best.tag
+            self._running[best.priority] += 1
+            self._total_running += 1
+            RUNNING.inc(best.priority)
+            best.granted = True
+            best.event.set()
+
+    def _drop_hopeless(self, name, queue, now):
+        # Tickets that could not finish before their deadline even if started now
+        expected = self._service_time[name]
+        while queue and queue[0].deadline < now + expected:
+            ticket = queue.popleft()
+            ticket.dropped = True
+            DROPPED.inc(name)
+            ticket.event.set()
+
+    def _retry_after(self, priority):
+        """Rough seconds until the queue ahead of this class has drained (lock held)"""
+        backlog = sum(len(queue) for queue in self._queues.values()) + self._total_running
+        per_slot = self._service_time[priority] or 1.0
+        return max(1, round(backlog * per_slot / self.max_concurrency))
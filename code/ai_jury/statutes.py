@@ -0,0 +1,174 @@
+"""
+Answering "what does Article 14 say" / "IPC 420" from a local statute table.
+
+One compiled regular expression finds Article, Section and Schedule
+references (with the act they belong to, in either order) and named
+provisions ("right to life", "dowry death"). If every reference resolves to
+a provision in data/statutes.json and the rest of the question is only
+lookup phrasing ("what does ... say", "text of ..."), the answer is the
+provision's text with a short templated explanation, in microseconds.
+Anything interpretive ("does Article 21 cover privacy?") is left to the LLM.
+
+    answer = STATUTES.answer("What does Article 21 say?")
+    if answer is not None:
+        return answer.text  # answer.citations: [('constitution', 'article', '21')]
+"""
+import json
+import os
+import re
+from collections import namedtuple
+
+DATA_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'statutes.json')
+
+Citation = namedtuple('Citation', ['act', 'kind', 'number'])
+Answer = namedtuple('Answer', ['text', 'citations'])
+
+ACT_ALIASES = {
+    'constitution': ('constitution', 'constitution of india', 'indian constitution'),
+    'ipc': ('ipc', 'i.p.c', 'i.p.c.', 'indian penal code', 'penal code'),
+    'crpc': ('crpc', 'cr.p.c', 'cr.p.c.', 'cr pc', 'code of criminal procedure', 'criminal procedure code'),
+}
+ORDINALS = ('first', 'second', 'third', 'fourth', 'fifth', 'sixth', 'seventh', 'eighth', 'ninth', 'tenth',
+            'eleventh', 'twelfth')
+ROMAN = ('i', 'ii', 'iii', 'iv', 'v', 'vi', 'vii', 'viii', 'ix', 'x', 'xi', 'xii')
+
+# Words that ask for the text of a provision rather than an opinion about it
+LOOKUP_WORDS = frozenset('''
+    a an the of in to under me what whats is are was does do did says say said state states read reads
+    text full wording provision provisions contents content tell show give quote please about
+    article articles art section sections sec schedule schedules act code india indian and
+    punishment penalty punishable define definition defined provide provides contain contains list
+'''.split())
+
+PART_EXPLANATIONS = {
+    'Part III': '{ref} is in Part III (Fundamental Rights) of the Constitution. These rights can be enforced '
+                'in the Supreme Court under Article 32 and in the High Courts under Article 226.',
+    'Part IV': '{ref} is a Directive Principle of State Policy (Part IV): it guides the State in making laws '
+               'but is not by itself enforceable in a court.',
+}
+FOLLOW_UP = 'Ask a follow-up question for how courts have interpreted it or how it applies to your situation.'
+ABRIDGED = 'Only the main clauses are quoted; the provision has further clauses, provisos or explanations.'
+
+_NUMBER = r'(\d{1,3}[a-z]?)\b(?:\s*\(\w{1,4}\))*'
+_WORD_RE = re.compile(r"[a-z0-9]+(?:-[a-z]+)?")
+
+
+def _alternation(phrases):
+    return '|'.join(re.escape(p).replace(r'\ ', r'\s+') for p in sorted(phrases, key=len, reverse=True))
+
+
+def normalize_number(number):
+    return number.upper()
+
+
+class StatuteIndex:
+    def __init__(self, path=DATA_FILE):
+        with open(path, encoding='utf-8') as f:
+            data = json.load(f)
+        self.acts = data['acts']
+        self.provisions = {}
+        self.aliases = {}
+        for provision in data['provisions']:
+            citation = Citation(provision['act'], provision['kind'], normalize_number(provision['number']))
+            self.provisions[citation] = provision
+            for alias in provision.get('aliases', ()):
+                self.aliases[alias.lower()] = citation
+        self.act_by_alias = {alias: act for act, names in ACT_ALIASES.items() for alias in names}
+        self._pattern = self._compile()
+
+    def _compile(self):
+        act = _alternation(self.act_by_alias)
+        pattern = '|'.join([
+            rf'\b(?:articles?|arts?\.)\s*{_NUMBER.replace("(", "(?P<article>", 1)}'
+            rf'(?:\s*(?:of\s+)?(?:the\s+)?(?P<act_article>{act}))?',
+            rf'(?:\b(?:sections?|secs?\.?|u/s\.?|s\.)\s*{_NUMBER.replace("(", "(?P<section>", 1)}'
+            rf'(?:\s*(?:of\s+)?(?:the\s+)?(?P<act_after>{act}))?)',
+            rf'(?:(?<![\w.])(?P<act_before>{act})\s*(?:sections?|secs?\.?|s\.)?\s*{_NUMBER.replace("(", "(?P<section_after>", 1)})',
+            rf'(?:\b{_NUMBER.replace("(", "(?P<section_number>", 1)}\s*(?:of\s+)?(?:the\s+)?(?P<act_last>{act})(?![\w]))',
+            rf'\b(?P<ordinal>{"|".join(ORDINALS)}|\d{{1,2}}(?:st|nd|rd|th))\s+schedule\b',
+            rf'\bschedule\s+(?P<schedule>\d{{1,2}}|{"|".join(sorted(ROMAN, key=len, reverse=True))})\b',
+            rf'\b(?P<alias>{_alternation(self.aliases)})\b',
+        ])
+        return re.compile(pattern, re.IGNORECASE)
+
+    def _citation(self, match):
+        groups = match.groupdict()
+        if groups['article']:
+            act = groups['act_article']
+            # "Article 14 of the IPC" is not Constitution Article 14; the table has no such provision,
+            # so answer() leaves it to the LLM
+            act = self.act_by_alias[re.sub(r'\s+', ' ', act.lower())] if act else 'constitution'
+            return Citation(act, 'article', normalize_number(groups['article']))
+        for number, act in (('section', 'act_after'), ('section_after', 'act_before'),
+                            ('section_number', 'act_last')):
+            if groups[number]:
+                number = normalize_number(groups[number])
+                if groups[act]:
+                    return Citation(self.act_by_alias[re.sub(r'\s+', ' ', groups[act].lower())], 'section', number)
+                # Most numbers exist in both the IPC and the CrPC: without the act it is the LLM's question
+                return Citation(None, 'section', number)
+        if groups['ordinal']:
+            ordinal = groups['ordinal'].lower()
+            number = ORDINALS.index(ordinal) + 1 if ordinal in ORDINALS else int(re.match(r'\d+', ordinal).group())
+            return Citation('constitution', 'schedule', str(number))
+        if groups['schedule']:
+            value = groups['schedule'].lower()
+            return Citation('constitution', 'schedule', value if value.isdigit() else str(ROMAN.index(value) + 1))
+        return self.aliases[re.sub(r'\s+', ' ', groups['alias'].lower())]
+
+    def find(self, question):
+        """(citations, the question with the references removed)"""
+        citations = []
+        rest = []
+        position = 0
+        for match in self._pattern.finditer(question):
+            citations.append(self._citation(match))
+            rest.append(question[position:match.start()])
+            position = match.end()
+        rest.append(question[position:])
+        return citations, ' '.join(rest)
+
+    def answer(self, question):
+        """An Answer if the question only asks for the text of provisions in the table, else None"""
+        if len(question) > 300:
+            return None
+        citations, rest = self.find(question)
+        if not citations or any(c not in self.provisions for c in citations):
+            return None
+        if set(_WORD_RE.findall(rest.lower())) - LOOKUP_WORDS:
+            return None
+        citations = list(dict.fromkeys(citations))
+        return Answer('\n\n---\n\n'.join(self.render(c) for c in citations), citations)
+
+    def reference(self, citation):
+        if citation.kind == 'article':
+            return f'Article {citation.number}'
+        if citation.kind == 'schedule':
+            return f'The {ORDINALS[int(citation.number) - 1].capitalize()} Schedule'
+        return f'Section {citation.number} of the {self.acts[citation.act]["name"]}'
+
+    def render(self, citation):
+        provision = self.provisions[citation]
+        act = self.acts[citation.act]
+        ref = self.reference(citation)
+        if citation.kind == 'section':
+            heading = f'**{ref} — {provision["title"]}**'
+        elif citation.kind == 'article':
+            heading = f'**{ref} of the {act["name"]} — {provision["title"]}**'
+        else:
+            heading = f'**{ref} to the {act["name"]}**'
+        quoted = '\n'.join(f'> {line}' for line in provision['text'].split('\n'))
+        notes = []
+        if citation.kind == 'article':
+            part = provision.get('part')
+            template = PART_EXPLANATIONS.get(part, '{ref} is in {part} of the Constitution.' if part else '')
+            notes.append(template.format(ref=ref, part=part))
+        if provision.get('abridged'):
+            notes.append(ABRIDGED)
+        if act.get('note'):
+            notes.append(act['note'])
+        notes.append(FOLLOW_UP)
+        return f'{heading}\n\n{quoted}\n\n' + ' '.join(n for n in notes if n)
+
+
+STATUTES = StatuteIndex()
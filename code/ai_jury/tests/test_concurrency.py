@@ -0,0 +1,168 @@
+import random
+import threading
+import time
+import unittest
+
+from ai_jury.concurrency import AdaptiveLimiter, Overloaded
+from ai_jury.fakes import FakeChatModel
+
+
+def load(limiter, seconds, samples):
+    """Report `samples` successful calls of `seconds` each, keeping the limiter full"""
+    permits = []
+    for _ in range(samples):
+        while len(permits) < limiter.limit:
+            permits.append(limiter.acquire())
+        permits.pop(0).success(seconds)
+    for permit in permits:
+        permit.ignore()
+
+
+class LimitTests(unittest.TestCase):
+    def test_limit_shrinks_when_latency_rises_and_recovers(self):
+        limiter = AdaptiveLimiter('test-gradient', initial_limit=8, max_limit=32, enabled=False)
+        load(limiter, 0.1, 100)
+        steady = limiter.limit
+        self.assertGreater(steady, 8)
+
+        load(limiter, 1.0, 30)
+        self.assertGreater(limiter.latency, limiter.tolerance * limiter.baseline)
+        spike = limiter.limit
+        self.assertLess(spike, steady / 2)
+
+        load(limiter, 0.1, 200)
+        self.assertGreater(limiter.limit, 2 * spike)
+        self.assertLessEqual(limiter.latency, limiter.tolerance * limiter.baseline)
+
+    def test_dropped_backs_off(self):
+        limiter = AdaptiveLimiter('test-backoff', initial_limit=10, backoff=0.9)
+        limiter.acquire().dropped()
+        self.assertAlmostEqual(limiter.limit, 9)
+        for _ in range(100):
+            limiter.acquire().dropped()
+        self.assertEqual(limiter.limit, limiter.min_limit)
+
+    def test_permit_released_once(self):
+        limiter = AdaptiveLimiter('test-release')
+        permit = limiter.acquire()
+        permit.success(0.1)
+        permit.dropped()
+        self.assertEqual(limiter.in_flight, 0)
+        self.assertEqual(limiter.limit, 8)
+
+
+class SheddingTests(unittest.TestCase):
+    def test_lower_priorities_are_shed_at_their_share(self):
+        limiter = AdaptiveLimiter('test-shares', initial_limit=4)
+        held = [limiter.acquire('bulk'), limiter.acquire('bulk')]
+        with self.assertRaises(Overloaded) as shed:
+            limiter.acquire('bulk')
+        self.assertEqual(shed.exception.priority, 'bulk')
+
+        held.append(limiter.acquire('background'))
+        with self.assertRaises(Overloaded):
+            limiter.acquire('background')
+
+        held.append(limiter.acquire('interactive'))
+        with self.assertRaises(Overloaded):
+            limiter.acquire('interactive')
+        self.assertEqual(limiter.in_flight, 4)
+
+    def test_disabled_limiter_sheds_nothing(self):
+        limiter = AdaptiveLimiter('test-disabled', initial_limit=1, enabled=False)
+        permits = [limiter.acquire('bulk') for _ in range(5)]
+        self.assertEqual(limiter.in_flight, len(permits))
+
+    def test_retry_after_follows_latency(self):
+        limiter = AdaptiveLimiter('test-retry', initial_limit=1, min_limit=1)
+        permit = limiter.acquire()
+        with self.assertRaises(Overloaded) as shed:
+            limiter.acquire()
+        self.assertEqual(shed.exception.retry_after, 1)
+        permit.success(2.4)
+        held = limiter.acquire()
+        with self.assertRaises(Overloaded) as shed:
+            limiter.acquire()
+        self.assertEqual(shed.exception.retry_after, 3)
+        held.ignore()
+
+    def test_degraded_while_shedding_or_slow(self):
+        limiter = AdaptiveLimiter('test-degraded', initial_limit=1, degraded_seconds=30, enabled=False)
+        self.assertFalse(limiter.degraded())
+        load(limiter, 0.1, 50)
+        self.assertFalse(limiter.degraded())
+        load(limiter, 1.0, 5)
+        self.assertTrue(limiter.degraded())
+        self.assertTrue(limiter.status()['degraded'])
+
+        shedding = AdaptiveLimiter('test-degraded-shed', initial_limit=1)
+        permit = shedding.acquire()
+        with self.assertRaises(Overloaded):
+            shedding.acquire()
+        self.assertTrue(shedding.degraded())
+        permit.ignore()
+
+
+class SlowUpstream:
+    """The fake model behind a fixed number of connections; calls beyond them queue"""
+
+    def __init__(self, llm, capacity):
+        self.llm = llm
+        self.work_factor = 1.0
+        self._connections = threading.Semaphore(capacity)
+
+    def invoke(self, prompt):
+        work = self.llm.delay_seconds(prompt, random.Random(prompt)) * self.work_factor
+        with self._connections:
+            time.sleep(work)
+
+
+class LatencySpikeTests(unittest.TestCase):
+    """Chat turns through a 5x latency spike, each giving up after `timeout` as the Django app does"""
+
+    rate = 40          # turns a second
+    timeout = 0.3      # seconds a turn waits for its answer
+    spike = (0.3, 1.3)  # seconds after the start
+    duration = 1.6
+
+    def run_turns(self, limiter):
+        upstream = SlowUpstream(FakeChatModel(latency_ms=20, tokens_per_second=0), capacity=2)
+        answered, shed = [], []
+        threads = []
+
+        def turn(arrived, prompt):
+            try:
+                permit = limiter.acquire('interactive') if limiter else None
+            except Overloaded:
+                shed.append(arrived)
+                return
+            upstream.invoke(prompt)
+            elapsed = time.monotonic() - began - arrived
+            if permit:
+                permit.success(elapsed) if elapsed <= self.timeout else permit.dropped()
+            if elapsed <= self.timeout:
+                answered.append(arrived)
+
+        began = time.monotonic()
+        i = 0
+        while (elapsed := time.monotonic() - began) < self.duration:
+            upstream.work_factor = 5.0 if self.spike[0] <= elapsed < self.spike[1] else 1.0
+            thread = threading.Thread(target=turn, args=(elapsed, f'What does Article {i} say?'))
+            thread.start()
+            threads.append(thread)
+            i += 1
+            time.sleep(1 / self.rate)
+        for thread in threads:
+            thread.join()
+        during = [arrived for arrived in answered if self.spike[0] <= arrived < self.spike[1]]
+        return len(during) / (self.spike[1] - self.spike[0]), shed
+
+    def test_limiter_keeps_goodput_through_spike(self):
+        goodput, shed = self.run_turns(AdaptiveLimiter('test-spike', initial_limit=4, max_limit=16))
+        # The upstream serves 2 / (5 * 20ms) = 20 calls a second during the spike
+        self.assertGreaterEqual(goodput, 8)
+        self.assertTrue(shed)
+
+
+if __name__ == '__main__':
+    unittest.main()
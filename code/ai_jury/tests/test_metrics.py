@@ -0,0 +1,34 @@
+import threading
+import unittest
+
+from ai_jury import metrics
+
+
+class ShardTests(unittest.TestCase):
+    def test_exited_threads_are_folded_into_the_base(self):
+        counter = metrics.Counter('test_requests_total', 'Requests', ['route'])
+        histogram = metrics.Histogram('test_latency_seconds', 'Latency', buckets=(0.1, 1))
+
+        def work():
+            counter.inc('/query')
+            histogram.observe(0.5)
+
+        for _ in range(200):
+            thread = threading.Thread(target=work)
+            thread.start()
+            thread.join()
+
+        self.assertEqual(counter.values(), {('/query',): 200})
+        self.assertEqual(histogram.values(), {(): [0, 200, 0, 100.0]})
+        self.assertEqual(len(counter._shards._shards), 0)
+        self.assertEqual(len(histogram._shards._shards), 0)
+
+    def test_live_thread_shard_is_counted_once(self):
+        counter = metrics.Counter('test_live_total', 'Live')
+        counter.inc(amount=3)
+        self.assertEqual(counter.values(), {(): 3})
+        self.assertEqual(counter.values(), {(): 3})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,93 @@
+import threading
+import time
+import unittest
+
+from ai_jury.prompts import PromptBuilder, count_tokens
+from ai_jury.ratelimit import RateLimiter
+from ai_jury.scheduler import PriorityScheduler
+
+
+def chunks(n, size=400):
+    return [{'index': i, 'text': f'chunk {i} ' + 'x' * size} for i in range(n)]
+
+
+class SummaryFallbackTests(unittest.TestCase):
+    def test_failed_summary_drops_overflow_instead_of_failing(self):
+        def summarize(text):
+            raise RuntimeError('LLM overloaded')
+
+        builder = PromptBuilder(budget=1000, summarize=summarize)
+        packed = builder.build('system', 'question?', attachments=[{'filename': 'a.pdf', 'chunks': chunks(20)}])
+
+        self.assertEqual(packed.usage['summary_errors'], 1)
+        self.assertGreater(packed.usage['dropped']['attachments'], 0)
+        self.assertNotIn('[Summary', packed.messages[-1][1])
+        # Fits as many whole chunks as the summarizer-less builder would
+        plain = PromptBuilder(budget=1000).build('system', 'question?',
+                                                 attachments=[{'filename': 'a.pdf', 'chunks': chunks(20)}])
+        self.assertEqual(packed.usage['attachments'], plain.usage['attachments'])
+        self.assertLessEqual(packed.tokens, 1000 + count_tokens('system'))
+
+    def test_per_prompt_summarize_replaces_builders(self):
+        calls = []
+
+        def summarize(text):
+            calls.append(text)
+            return 'short'
+
+        builder = PromptBuilder(budget=1000, summarize=lambda text: self.fail('builder summarize used'))
+        packed = builder.build('system', 'question?', attachments=[{'filename': 'a.pdf', 'chunks': chunks(20)}],
+                               summarize=summarize)
+
+        self.assertTrue(calls)
+        self.assertIn('[Summary', packed.messages[-1][1])
+
+
+class SummaryAdmissionTests(unittest.TestCase):
+    """Summaries run inside the request's slot, as /query makes them, and only take rate-limit tokens"""
+
+    def test_saturated_scheduler_still_answers_with_summaries(self):
+        scheduler = PriorityScheduler(max_concurrency=2)
+        limiter = RateLimiter('query', {'user': '100/min'})
+        deadline = time.monotonic() + 3
+        results = []
+
+        def summarize(text):
+            limiter.require(user='u1')
+            time.sleep(0.01)
+            return 'short'
+
+        def query():
+            with scheduler.slot('interactive', deadline):
+                packed = PromptBuilder(budget=1000, summarize=summarize).build(
+                    'system', 'question?', attachments=[{'filename': 'a.pdf', 'chunks': chunks(20)}])
+            results.append((packed, time.monotonic()))
+
+        threads = [threading.Thread(target=query) for _ in range(2)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len(results), 2)
+        for packed, finished in results:
+            self.assertLess(finished, deadline - 2)
+            self.assertGreater(packed.usage['summarized'], 0)
+            self.assertEqual(packed.usage['summary_errors'], 0)
+
+    def test_rate_limited_summary_drops_overflow(self):
+        limiter = RateLimiter('query', {'user': '1/min'})
+
+        def summarize(text):
+            limiter.require(user='u1')
+            return 'short'
+
+        packed = PromptBuilder(budget=1000, summarize=summarize).build(
+            'system', 'question?', attachments=[{'filename': 'a.pdf', 'chunks': chunks(20)}])
+
+        self.assertEqual(packed.usage['summary_errors'], 1)
+        self.assertGreater(packed.usage['dropped']['attachments'], 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
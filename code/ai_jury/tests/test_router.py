@@ -0,0 +1,132 @@
+import threading
+import time
+import unittest
+
+from ai_jury.router import CALLS, AllBackendsFailed, Backend, ModelRouter
+
+
+class FakeBackend:
+    """An in-process chat model: answers `reply` after `delay` seconds, or raises `error`"""
+
+    def __init__(self, reply='answer', delay=0.0, error=None, release=None):
+        self.reply = reply
+        self.delay = delay
+        self.error = error
+        self.release = release  # if set, blocks until the test sets it
+        self.calls = 0
+        self.finished = threading.Event()
+
+    def invoke(self, messages):
+        self.calls += 1
+        try:
+            if self.release is not None:
+                self.release.wait(5)
+            time.sleep(self.delay)
+            if self.error:
+                raise self.error
+            return self.reply
+        finally:
+            self.finished.set()
+
+
+def calls(backend, kind, outcome):
+    return CALLS.values().get((backend, kind, outcome), 0)
+
+
+class FailoverTests(unittest.TestCase):
+    def test_error_fails_over_to_next_backend(self):
+        router = ModelRouter([
+            Backend('failover-a', FakeBackend(error=RuntimeError('quota')), cost=1),
+            Backend('failover-b', FakeBackend(reply='from b'), cost=2),
+        ], hedging=False)
+
+        self.assertEqual(router.invoke(['q'], 'q'), ('from b', 'failover-b'))
+        self.assertEqual(calls('failover-a', 'primary', 'error'), 1)
+        self.assertEqual(calls('failover-b', 'failover', 'success'), 1)
+
+    def test_every_backend_failing_raises(self):
+        router = ModelRouter([
+            Backend('allfail-a', FakeBackend(error=RuntimeError('a')), cost=1),
+            Backend('allfail-b', FakeBackend(error=RuntimeError('b')), cost=2),
+        ], hedging=False)
+
+        with self.assertRaises(AllBackendsFailed):
+            router.invoke(['q'], 'q')
+
+
+class HedgeTests(unittest.TestCase):
+    def test_hedge_fires_after_delay_and_loser_is_cancelled(self):
+        release = threading.Event()
+        slow = FakeBackend(reply='slow', release=release)
+        fast = FakeBackend(reply='fast')
+        router = ModelRouter([
+            Backend('hedge-slow', slow, cost=1, default_hedge_ms=50),
+            Backend('hedge-fast', fast, cost=2),
+        ], hedge_budget=1.0)
+
+        start = time.monotonic()
+        self.assertEqual(router.invoke(['q'], 'q'), ('fast', 'hedge-fast'))
+        elapsed = time.monotonic() - start
+        self.assertGreaterEqual(elapsed, 0.05)
+        self.assertLess(elapsed, 1)
+        self.assertEqual(calls('hedge-fast', 'hedge', 'success'), 1)
+
+        # The primary was already running; it finishes in the background as cancelled
+        release.set()
+        self.assertTrue(slow.finished.wait(5))
+        time.sleep(0.05)
+        self.assertEqual(calls('hedge-slow', 'primary', 'cancelled'), 1)
+        self.assertEqual(calls('hedge-slow', 'primary', 'success'), 0)
+
+    def test_no_hedge_before_delay(self):
+        router = ModelRouter([
+            Backend('nohedge-a', FakeBackend(reply='a', delay=0.01), cost=1, default_hedge_ms=1000),
+            Backend('nohedge-b', FakeBackend(reply='b'), cost=2),
+        ], hedge_budget=1.0)
+
+        self.assertEqual(router.invoke(['q'], 'q'), ('a', 'nohedge-a'))
+        self.assertEqual(router.backends[1].llm.calls, 0)
+
+    def test_hedge_not_started_is_never_sent(self):
+        release = threading.Event()
+        slow = FakeBackend(reply='slow', release=release)
+        hedge = FakeBackend(reply='hedge')
+        # One worker: the hedge waits behind the primary and is cancelled before it starts
+        router = ModelRouter([
+            Backend('queued-slow', slow, cost=1, default_hedge_ms=20),
+            Backend('queued-hedge', hedge, cost=2),
+        ], hedge_budget=1.0, max_workers=1)
+
+        threading.Timer(0.1, release.set).start()
+        self.assertEqual(router.invoke(['q'], 'q'), ('slow', 'queued-slow'))
+        time.sleep(0.05)
+        self.assertEqual(hedge.calls, 0)
+        self.assertEqual(calls('queued-hedge', 'hedge', 'skipped'), 1)
+
+
+class HealthTests(unittest.TestCase):
+    def test_failures_trip_backend_and_cooldown_recovers_it(self):
+        flaky = FakeBackend(error=RuntimeError('down'))
+        primary = Backend('health-a', flaky, cost=1, failures_to_trip=2, cooldown=0.2)
+        fallback = Backend('health-b', FakeBackend(reply='b'), cost=2)
+        router = ModelRouter([primary, fallback], hedging=False)
+
+        for _ in range(2):
+            self.assertEqual(router.invoke(['q'], 'q')[1], 'health-b')
+        self.assertFalse(primary.healthy())
+        self.assertEqual(router.candidates('q')[0], fallback)
+        self.assertFalse(router.status()['health-a']['healthy'])
+
+        # Tripped: skipped while cooling down
+        router.invoke(['q'], 'q')
+        self.assertEqual(flaky.calls, 2)
+
+        time.sleep(0.25)
+        self.assertTrue(primary.healthy())
+        flaky.error = None
+        self.assertEqual(router.invoke(['q'], 'q'), ('answer', 'health-a'))
+        self.assertEqual(router.candidates('q')[0], primary)
+
+
+if __name__ == '__main__':
+    unittest.main()
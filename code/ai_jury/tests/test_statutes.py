@@ -0,0 +1,19 @@
+import unittest
+
+from ai_jury.statutes import STATUTES, Citation
+
+
+class ArticleActTests(unittest.TestCase):
+    def test_article_of_another_act_goes_to_the_llm(self):
+        self.assertEqual(STATUTES.find('What does Article 14 of the IPC say?')[0], [Citation('ipc', 'article', '14')])
+        self.assertIsNone(STATUTES.answer('What does Article 14 of the IPC say?'))
+
+    def test_article_of_the_constitution_is_answered(self):
+        for question in ('What does Article 14 say?', 'Text of Article 14 of the Constitution of India'):
+            answer = STATUTES.answer(question)
+            self.assertIsNotNone(answer, question)
+            self.assertEqual(answer.citations, [Citation('constitution', 'article', '14')])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,178 @@
+"""
+Telling legal questions from everything else before paying for an LLM call.
+
+A logistic regression over hashed word unigrams, word bigrams and character
+trigrams (the trigrams carry misspellings like "contitutin"). Features are
+hashed into a fixed number of buckets, so there is no vocabulary to store and
+a question is scored in a few tens of microseconds with plain Python.
+
+    classifier = TopicClassifier.load()          # data/topic_model.json
+    if classifier.is_off_topic(question):
+        return OFF_TOPIC_REPLY
+
+Models are trained offline (``manage.py train_topic_classifier``) from
+data/topic_seed.jsonl and the chat logs; the saved threshold is the lowest
+off-topic probability at which held-out questions were still rejected with
+the precision asked for, so a legal question is rarely turned away.
+"""
+import json
+import math
+import os
+import random
+import re
+import zlib
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data')
+MODEL_FILE = os.path.join(DATA_DIR, 'topic_model.json')
+SEED_FILE = os.path.join(DATA_DIR, 'topic_seed.jsonl')
+
+# What the system prompt tells the LLM to say to non-legal questions
+OFF_TOPIC_REPLY = 'I am a Legal AI Assistant and can only answer questions related to law.'
+
+LABELS = ('legal', 'off_topic')
+
+_WORD_RE = re.compile(r'[a-z0-9]+')
+
+
+def features(text, dims):
+    """{bucket: weight} of the hashed n-grams of `text`, L2-normalized"""
+    words = _WORD_RE.findall(text.lower())
+    grams = [f'w:{w}' for w in words]
+    grams += [f'b:{a} {b}' for a, b in zip(words, words[1:])]
+    for word in words:
+        padded = f' {word} '
+        grams += [f'c:{padded[i:i + 3]}' for i in range(len(padded) - 2)]
+    counts = {}
+    for gram in grams:
+        h = zlib.crc32(gram.encode())
+        # The top bit picks a sign so colliding n-grams tend to cancel rather than add up
+        bucket = h % dims
+        counts[bucket] = counts.get(bucket, 0.0) + (1.0 if h & 0x80000000 else -1.0)
+    norm = math.sqrt(sum(v * v for v in counts.values())) or 1.0
+    return {bucket: v / norm for bucket, v in counts.items()}
+
+
+def _sigmoid(z):
+    if z < -30:
+        return 0.0
+    return 1.0 / (1.0 + math.exp(-z)) if z < 30 else 1.0
+
+
+class TopicClassifier:
+    def __init__(self, weights=None, bias=0.0, dims=2 ** 18, threshold=0.9, trained_on=None):
+        self.weights = weights or {}
+        self.bias = bias
+        self.dims = dims
+        self.threshold = threshold
+        self.trained_on = trained_on or {}
+
+    def probability(self, text):
+        """Probability that `text` is not a legal question"""
+        return _sigmoid(self.bias + sum(self.weights.get(b, 0.0) * v for b, v in features(text, self.dims).items()))
+
+    def is_off_topic(self, text):
+        return self.probability(text) >= self.threshold
+
+    @classmethod
+    def train(cls, examples, dims=2 ** 18, epochs=30, learning_rate=0.5, l2=1e-4, seed=0):
+        """
+        Fit on `examples`, a list of (text, label) with label 'legal' or
+        'off_topic', by stochastic gradient descent on the log loss; the
+        classes are weighted so that each counts as much as the other.
+        """
+        data = [(features(text, dims), 1.0 if label == 'off_topic' else 0.0) for text, label in examples]
+        positives = sum(y for _, y in data)
+        class_weight = {1.0: len(data) / (2 * positives) if positives else 1.0,
+                        0.0: len(data) / (2 * (len(data) - positives)) if len(data) > positives else 1.0}
+        weights, bias = {}, 0.0
+        rng = random.Random(seed)
+        for epoch in range(epochs):
+            rng.shuffle(data)
+            rate = learning_rate / (1 + epoch * 0.1)
+            for x, y in data:
+                z = bias + sum(weights.get(b, 0.0) * v for b, v in x.items())
+                gradient = (_sigmoid(z) - y) * class_weight[y]
+                for b, v in x.items():
+                    w = weights.get(b, 0.0)
+                    weights[b] = w - rate * (gradient * v + l2 * w)
+                bias -= rate * gradient
+        counts = {label: sum(1 for _, l in examples if l == label) for label in LABELS}
+        return cls({b: w for b, w in weights.items() if abs(w) >= 1e-4}, bias, dims, trained_on=counts)
+
+    def choose_threshold(self, examples, min_precision=0.98, floor=0.8):
+        """
+        Set the threshold to the lowest off-topic probability (not below
+        `floor`) at which rejecting `examples` keeps `min_precision`
+        """
+        scored = sorted(((self.probability(text), label) for text, label in examples), reverse=True)
+        threshold = 1.0
+        rejected = wrong = 0
+        for probability, label in scored:
+            if probability < floor:
+                break
+            rejected += 1
+            wrong += label != 'off_topic'
+            if (rejected - wrong) / rejected >= min_precision:
+                threshold = probability
+        self.threshold = threshold
+        return threshold
+
+    @classmethod
+    def load(cls, path=MODEL_FILE):
+        with open(path, encoding='utf-8') as f:
+            data = json.load(f)
+        return cls({int(b): w for b, w in data['weights'].items()}, data['bias'], data['dims'],
+                   data['threshold'], data.get('trained_on'))
+
+    def save(self, path=MODEL_FILE):
+        data = {
+            'dims': self.dims,
+            'threshold': round(self.threshold, 6),
+            'bias': round(self.bias, 6),
+            'trained_on': self.trained_on,
+            'weights': {str(b): round(w, 5) for b, w in sorted(self.weights.items())},
+        }
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, separators=(',', ':'))
+            f.write('\n')
+
+
+def load_examples(path=SEED_FILE):
+    """(text, label) pairs from a JSON lines file of {"text", "label"}"""
+    examples = []
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            if line.strip():
+                record = json.loads(line)
+                if record.get('label') in LABELS:
+                    examples.append((record['text'], record['label']))
+    return examples
+
+
+def evaluate(classifier, examples, threshold=None):
+    """Precision and recall of rejecting off-topic questions at `threshold` (the classifier's own by default)"""
+    threshold = classifier.threshold if threshold is None else threshold
+    counts = {'tp': 0, 'fp': 0, 'fn': 0, 'tn': 0}
+    for text, label in examples:
+        rejected = classifier.probability(text) >= threshold
+        off_topic = label == 'off_topic'
+        counts[('t' if rejected == off_topic else 'f') + ('p' if rejected else 'n')] += 1
+    return dict(
+        counts,
+        threshold=threshold,
+        precision=counts['tp'] / (counts['tp'] + counts['fp']) if counts['tp'] + counts['fp'] else 1.0,
+        recall=counts['tp'] / (counts['tp'] + counts['fn']) if counts['tp'] + counts['fn'] else 0.0,
+    )
+
+
+def split(examples, holdout=0.2, seed=0):
+    """(train, test), stratified by label"""
+    rng = random.Random(seed)
+    train, test = [], []
+    for label in LABELS:
+        group = [e for e in examples if e[1] == label]
+        rng.shuffle(group)
+        cut = int(len(group) * holdout)
+        test += group[:cut]
+        train += group[cut:]
+    return train, test
@@ -0,0 +1,9 @@
+"""
+Benchmark scripts for AI Jury.
+
+Run them from the ``code/`` directory, e.g.::
+
+    python -m benchmarks.attachment_storage
+
+Each script prints a short report; none of them touch ``justice/db.sqlite3``.
+"""
@@ -0,0 +1,215 @@
+"""
+Chat goodput through an upstream latency spike, with a fixed number of LLM
+slots and with the adaptive concurrency limiter shedding load.
+
+Simulates the legal assistant's /query path in-process. Chat turns arrive at
+--rate per second (Poisson) for --seconds and go to the priority scheduler's
+--slots LLM slots. The fake model behind them shares --capacity calls' worth
+of throughput among everything in flight (processor sharing, like a provider
+slowing every caller down once it is saturated). Between --spike-start and
+--spike-end every call needs --spike-factor times the work. Each turn gives up
+after --timeout seconds, as the Django app does after 30; an answer after
+that counts as a timeout, not goodput. Arrangements:
+
+- fixed: the scheduler alone, as before the limiter
+- service: the service's AdaptiveLimiter in front of the scheduler, shedding with 503
+- client: the Django app's limiter on its RAG calls, the service unchanged
+- both: the two together, as deployed
+
+Goodput is answers delivered within the timeout per second, by when the turn
+arrived (before, during and after the spike). "Wasted" is the worker-seconds
+callers spent on turns that failed anyway.
+
+    python -m benchmarks.adaptive_concurrency --rate 12 --capacity 4 --spike-factor 10
+"""
+import argparse
+import random
+import threading
+import time
+
+from ai_jury.concurrency import AdaptiveLimiter, Overloaded
+from ai_jury.fakes import FakeChatModel, _prompt_text
+from ai_jury.scheduler import DeadlineExceeded, PriorityClass, PriorityScheduler
+
+from .stats import summarize
+
+SERVICE_CLASSES = {
+    'interactive': PriorityClass(weight=8, max_concurrency=None, timeout=30),
+    'background': PriorityClass(weight=3, max_concurrency=4, timeout=120),
+    'bulk': PriorityClass(weight=1, max_concurrency=2, timeout=300),
+}
+
+PHASES = ('before', 'spike', 'after')
+
+
+class SharedUpstream:
+    """
+    The fake model with a finite throughput: `capacity` calls run at full
+    speed and more in flight share it, so each takes longer (processor sharing).
+    """
+
+    def __init__(self, llm, capacity):
+        self.llm = llm
+        self.capacity = capacity
+        self.work_factor = 1.0
+        self._cond = threading.Condition()
+        self._active = 0
+        self._progress = 0.0  # Seconds of work done by every call in flight since the start
+        self._updated = time.monotonic()
+
+    def _advance(self):
+        now = time.monotonic()
+        if self._active:
+            self._progress += (now - self._updated) * min(1.0, self.capacity / self._active)
+        self._updated = now
+
+    def invoke(self, messages):
+        prompt = _prompt_text(messages)
+        work = self.llm.delay_seconds(prompt, random.Random(prompt)) * self.work_factor
+        with self._cond:
+            self._advance()
+            self._active += 1
+            self._cond.notify_all()
+            target = self._progress + work
+            while target - self._progress > 1e-4:
+                self._cond.wait((target - self._progress) / min(1.0, self.capacity / self._active))
+                self._advance()
+            self._active -= 1
+            self._cond.notify_all()
+
+
+class Results:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.answered = {phase: [] for phase in PHASES}
+        self.failed = {phase: {'shed': [], 'dropped': [], 'timeout': []} for phase in PHASES}
+
+    def record(self, phase, outcome, latency_ms):
+        with self.lock:
+            if outcome == 'answered':
+                self.answered[phase].append(latency_ms)
+            else:
+                self.failed[phase][outcome].append(latency_ms)
+
+
+def service_query(scheduler, limiter, upstream, question, deadline):
+    """The service's /query: shed (503), dropped by the scheduler (503) or answered"""
+    permit = limiter.acquire('interactive') if limiter else None
+    try:
+        with scheduler.slot('interactive', deadline):
+            upstream.invoke(question)
+    except DeadlineExceeded:
+        if permit:
+            permit.dropped()
+        raise
+    if permit:
+        # An answer after the caller's deadline is an overload signal, not a latency sample
+        permit.success() if time.monotonic() < deadline else permit.dropped()
+
+
+def chat_turn(scheduler, service_limiter, client_limiter, upstream, results, phase, timeout, question):
+    """One Django send_message: its own limiter, then the RAG call with its timeout"""
+    start = time.monotonic()
+
+    def done(outcome):
+        results.record(phase, outcome, (time.monotonic() - start) * 1000)
+
+    try:
+        permit = client_limiter.acquire('interactive') if client_limiter else None
+    except Overloaded:
+        return done('shed')
+    try:
+        service_query(scheduler, service_limiter, upstream, question, start + timeout)
+    except Overloaded:
+        if permit:
+            permit.dropped()
+        return done('shed')
+    except DeadlineExceeded:
+        if permit:
+            permit.dropped()
+        return done('dropped')
+    elapsed = time.monotonic() - start
+    if elapsed > timeout:
+        # The caller stopped waiting; the answer arrives for nobody
+        if permit:
+            permit.dropped()
+        return done('timeout')
+    if permit:
+        permit.success(elapsed)
+    done('answered')
+
+
+def run(arrangement, args):
+    llm = FakeChatModel(latency_ms=args.latency_ms, jitter_ms=args.latency_ms / 4, tokens_per_second=0)
+    upstream = SharedUpstream(llm, args.capacity)
+    scheduler = PriorityScheduler(args.slots, SERVICE_CLASSES)
+    service_limiter = client_limiter = None
+    if arrangement in ('service', 'both'):
+        service_limiter = AdaptiveLimiter(f'sim-service-{arrangement}', initial_limit=args.slots)
+    if arrangement in ('client', 'both'):
+        client_limiter = AdaptiveLimiter(f'sim-client-{arrangement}', initial_limit=args.slots)
+    results = Results()
+    rng = random.Random(0)
+    threads = []
+    began = time.monotonic()
+    i = 0
+    while (elapsed := time.monotonic() - began) < args.seconds:
+        if elapsed < args.spike_start:
+            phase, upstream.work_factor = 'before', 1.0
+        elif elapsed < args.spike_end:
+            phase, upstream.work_factor = 'spike', args.spike_factor
+        else:
+            phase, upstream.work_factor = 'after', 1.0
+        thread = threading.Thread(target=chat_turn, args=(
+            scheduler, service_limiter, client_limiter, upstream, results, phase, args.timeout,
+            f'What does Article {i} say?'))
+        thread.start()
+        threads.append(thread)
+        i += 1
+        time.sleep(rng.expovariate(args.rate))
+    for thread in threads:
+        thread.join()
+    limits = [limiter.status()['limit'] for limiter in (service_limiter, client_limiter) if limiter]
+    return results, limits
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--slots', type=int, default=8, help='Concurrent LLM calls (LLM_MAX_CONCURRENCY)')
+    parser.add_argument('--capacity', type=float, default=4, help='Calls the upstream serves at full speed')
+    parser.add_argument('--rate', type=float, default=12, help='Chat turns per second')
+    parser.add_argument('--latency-ms', type=float, default=200, help='Fake LLM latency outside the spike')
+    parser.add_argument('--spike-factor', type=float, default=10, help='Work per call during the spike')
+    parser.add_argument('--spike-start', type=float, default=5)
+    parser.add_argument('--spike-end', type=float, default=35)
+    parser.add_argument('--timeout', type=float, default=3, help='Seconds a chat turn waits for its answer')
+    parser.add_argument('--seconds', type=float, default=45)
+    parser.add_argument('--arrangements', default='fixed,service,client,both')
+    args = parser.parse_args()
+
+    durations = {
+        'before': args.spike_start,
+        'spike': args.spike_end - args.spike_start,
+        'after': args.seconds - args.spike_end,
+    }
+    print(f"{args.slots} LLM slots, upstream capacity {args.capacity:g} x {args.latency_ms:.0f} ms, "
+          f"{args.rate:g} chat turns/s, x{args.spike_factor:g} latency from {args.spike_start:g}s "
+          f"to {args.spike_end:g}s, {args.timeout:g}s timeout")
+    print(f"{'':9}{'phase':>7}{'goodput/s':>11}{'p50':>8}{'p95':>8}{'shed':>7}{'dropped':>9}"
+          f"{'timeout':>9}{'fail p50':>10}{'wasted s':>10}")
+    for arrangement in args.arrangements.split(','):
+        results, limits = run(arrangement, args)
+        for phase in PHASES:
+            answered = summarize(results.answered[phase])
+            failed = results.failed[phase]
+            failures = [ms for latencies in failed.values() for ms in latencies]
+            print(f"{arrangement if phase == 'before' else '':9}{phase:>7}"
+                  f"{answered['count'] / durations[phase]:>11.2f}{answered['p50']:>8.0f}{answered['p95']:>8.0f}"
+                  f"{len(failed['shed']):>7}{len(failed['dropped']):>9}{len(failed['timeout']):>9}"
+                  f"{summarize(failures)['p50']:>10.0f}{sum(failures) / 1000:>10.1f}")
+        if limits:
+            print(f"{'':16}final limit {', '.join(f'{limit:g}' for limit in limits)}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,192 @@
+"""
+Latency of the chat message admin change list at millions of rows.
+
+Fills a throwaway database with chat messages (--per-session messages per
+session, spread over --days days, alternating question and answer) and
+times the change list view for each size in --rows, growing the same
+database from one size to the next. Each page is rendered by three admin
+configurations:
+
+- legacy: exact COUNT(*) twice per page, every session listed in the
+  sidebar filter, full content loaded and embedded in each row's tooltip,
+  one session query per row
+- stock dates: the current admin with Django's own date hierarchy, which
+  finds the years, months or days to offer with SELECT DISTINCT
+- current: ChatMessageAdmin as registered
+
+    python -m benchmarks.admin_changelist --rows 1000000 10000000 --db /tmp/admin-bench.sqlite3
+
+Generating 10M rows takes a while and several GB; pass --db to keep the
+database for the next run.
+"""
+import argparse
+import random
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+
+from .django_env import setup_django
+from .stats import summarize
+
+QUESTION = "What does Section {n} of the Indian Penal Code say about cheating and dishonestly inducing delivery?"
+ANSWER = ("### Section {n}\n\nUnder **Section {n}**, whoever cheats and thereby dishonestly induces the person "
+          "deceived to deliver any property is punishable with imprisonment of up to seven years and a fine.\n\n"
+          "1. The deception must exist at the time of the inducement.\n2. Delivery of property must follow.\n\n"
+          "Consult an advocate for the facts of your case.")
+
+
+def fill(connection, total, per_session, days, rng):
+    """Insert chat messages, oldest first, until the table holds `total` rows"""
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT COUNT(*) FROM search_app_chatmessage')
+        have = cursor.fetchone()[0]
+        cursor.execute('PRAGMA cache_size = -500000')
+    if have >= total:
+        return have
+    end = datetime(2026, 1, 1, tzinfo=timezone.utc)
+    start = end - timedelta(days=days)
+    step = (end - start) / total
+    html = '<h3>Section {n}</h3>\n<p>' + 'x' * 300 + '</p>\n'
+    batch_size = 50_000
+    started = time.monotonic()
+    for offset in range(have, total, batch_size):
+        sessions, messages = [], []
+        for i in range(offset, min(offset + batch_size, total)):
+            moment = (start + step * i).strftime('%Y-%m-%d %H:%M:%S.%f')
+            if i % per_session == 0:
+                session_id = uuid.UUID(int=i // per_session + 1).hex
+                sessions.append((session_id, f'Chat about Section {i % 511}', moment, moment))
+            session_id = uuid.UUID(int=i // per_session + 1).hex
+            n = rng.randrange(1, 511)
+            is_user = i % 2 == 0
+            messages.append((
+                uuid.UUID(int=rng.getrandbits(128)).hex, session_id,
+                (QUESTION if is_user else ANSWER).format(n=n), is_user, moment,
+                None if is_user else 2.5, '' if is_user else html.format(n=n),
+            ))
+        with connection.cursor() as cursor:
+            cursor.executemany('INSERT INTO search_app_chatsession (id, title, created_at, updated_at) '
+                               'VALUES (%s, %s, %s, %s)', sessions)
+            cursor.executemany('INSERT INTO search_app_chatmessage (id, session_id, content, is_user, timestamp, '
+                               'thinking_time, content_html) VALUES (%s, %s, %s, %s, %s, %s, %s)', messages)
+        done = offset + len(messages)
+        if done % 1_000_000 < batch_size or done == total:
+            print(f"  {done:,} rows, {time.monotonic() - started:.0f}s", flush=True)
+    with connection.cursor() as cursor:
+        cursor.execute('ANALYZE')
+    return total
+
+
+def admin_classes():
+    from django.contrib import admin
+    from search_app.admin import ChatMessageAdmin
+
+    class LegacyChatMessageAdmin(ChatMessageAdmin):
+        list_filter = ['is_user', 'timestamp', 'session']
+        date_hierarchy = None
+        ordering = ['-timestamp']
+        list_select_related = False
+        paginator = admin.ModelAdmin.paginator
+        show_full_result_count = True
+
+        def get_queryset(self, request):
+            return admin.ModelAdmin.get_queryset(self, request)
+
+        def get_changelist(self, request, **kwargs):
+            return admin.ModelAdmin.get_changelist(self, request, **kwargs)
+
+        def content_preview(self, obj):
+            from django.utils.html import format_html
+            preview = obj.content[:50] + "..." if len(obj.content) > 50 else obj.content
+            return format_html('<span title="{}">{}</span>', obj.content, preview)
+
+    class StockDatesChatMessageAdmin(ChatMessageAdmin):
+        def get_queryset(self, request):
+            return admin.ModelAdmin.get_queryset(self, request)
+
+    return {'legacy': LegacyChatMessageAdmin, 'stock dates': StockDatesChatMessageAdmin,
+            'current': ChatMessageAdmin}
+
+
+def pages(session_id, year, month):
+    """(name, {config: query string or None when that admin can't serve it})"""
+    legacy_session = f'session__id__exact={session_id}'
+    return [
+        ('first page', dict.fromkeys(['legacy', 'stock dates', 'current'], '')),
+        ('page 50', dict.fromkeys(['legacy', 'stock dates', 'current'], 'p=50')),
+        ('answers only', dict.fromkeys(['legacy', 'stock dates', 'current'], 'is_user__exact=0')),
+        ('one session', {'legacy': legacy_session, 'stock dates': f'session={session_id}',
+                         'current': f'session={session_id}'}),
+        ('one year', {'legacy': None, 'stock dates': f'timestamp__year={year}',
+                      'current': f'timestamp__year={year}'}),
+        ('one month', {'legacy': None, 'stock dates': f'timestamp__year={year}&timestamp__month={month}',
+                       'current': f'timestamp__year={year}&timestamp__month={month}'}),
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--rows', type=int, nargs='+', default=[1_000_000, 10_000_000])
+    parser.add_argument('--per-session', type=int, default=20, help='Messages per chat session')
+    parser.add_argument('--days', type=int, default=730, help='Days the messages are spread over')
+    parser.add_argument('--rounds', type=int, default=3)
+    parser.add_argument('--skip-legacy', action='store_true',
+                        help="Don't time the legacy admin (tens of seconds per page at 10M rows)")
+    parser.add_argument('--db', help='Database file to create or reuse (default: a temporary file)')
+    args = parser.parse_args()
+
+    setup_django(args.db)
+    from django.conf import settings
+    from django.contrib.admin import AdminSite
+    from django.contrib.auth.models import User
+    from django.db import connection
+    from django.test import RequestFactory
+    from search_app.models import ChatMessage
+
+    settings.DEBUG = False
+    # The manifest isn't built here; static URLs don't matter for the timings
+    settings.STORAGES['staticfiles'] = {'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage'}
+    user = User.objects.filter(is_superuser=True).first() or User.objects.create_superuser('bench', '', 'bench')
+    factory = RequestFactory()
+    views = {}
+    for name, admin_class in admin_classes().items():
+        if name == 'legacy' and args.skip_legacy:
+            continue
+        site = AdminSite(name='admin')
+        site.register(ChatMessage, admin_class)
+        views[name] = site.get_model_admin(ChatMessage).changelist_view
+
+    def render(view, query):
+        request = factory.get(f'/admin/search_app/chatmessage/?{query}')
+        request.user = user
+        response = view(request)
+        response.render()
+        assert response.status_code == 200, response.status_code
+        return response
+
+    rng = random.Random(0)
+    for total in sorted(args.rows):
+        print(f"Filling to {total:,} messages")
+        fill(connection, total, args.per_session, args.days, rng)
+        middle = ChatMessage.objects.order_by('timestamp').values_list('session_id', 'timestamp')[total // 2]
+        session_id, moment = middle
+        print(f"\n{total:,} messages, {total // args.per_session:,} sessions")
+        print(f"{'':16}" + ''.join(f"{name + ' ms':>18}" for name in views))
+        for page, queries in pages(session_id, moment.year, moment.month):
+            cells = []
+            for name, view in views.items():
+                query = queries[name]
+                if query is None:
+                    cells.append(f"{'-':>18}")
+                    continue
+                times = []
+                for _ in range(args.rounds):
+                    start = time.perf_counter()
+                    render(view, query)
+                    times.append((time.perf_counter() - start) * 1000)
+                cells.append(f"{summarize(times)['p50']:>18.1f}")
+            print(f"{page:16}" + ''.join(cells), flush=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,119 @@
+"""
+Compare inlined attachment text against deduplicated Attachment rows.
+
+Builds the same corpus of repeated uploads twice: once the way send_message
+used to store it (extracted text appended to ChatMessage.content) and once
+with Attachment rows. Reports database size, history payload bytes and the
+bytes of the question the LLM receives.
+
+    python -m benchmarks.attachment_storage --documents 20 --uploads 400
+"""
+import argparse
+import hashlib
+import random
+
+from .django_env import setup_django, sqlite_size
+
+WORDS = (
+    'court petition appellant respondent section article constitution tribunal order '
+    'evidence witness hearing judgment decree clause contract agreement liability '
+    'damages notice plaintiff defendant bail custody offence accused statute provision '
+    'jurisdiction appeal writ mandamus certiorari habeas corpus property tenancy lease'
+).split()
+
+QUESTIONS = [
+    'What does this notice say about the tenancy?',
+    'Summarise the liability clause in this contract',
+    'Is the bail order in this judgment valid?',
+    'Which section of the constitution is cited here?',
+]
+
+
+def make_document(rng, paragraphs=40):
+    return "\n\n".join(
+        " ".join(rng.choice(WORDS) for _ in range(rng.randint(60, 120))).capitalize() + "."
+        for _ in range(paragraphs)
+    )
+
+
+def build_corpus(documents, uploads, sessions, seed):
+    rng = random.Random(seed)
+    docs = [make_document(rng) for _ in range(documents)]
+    # Zipf-like reuse: a few documents are uploaded over and over
+    weights = [1 / (i + 1) for i in range(documents)]
+    return [
+        (i % sessions, rng.choice(QUESTIONS), rng.choices(range(documents), weights)[0])
+        for i in range(uploads)
+    ], docs
+
+
+def history_bytes(client, session_ids):
+    return sum(
+        len(client.get(f'/api/chat/sessions/{sid}/messages/').content)
+        for sid in session_ids
+    )
+
+
+def run(documents, uploads, sessions, seed):
+    setup_django()
+    from django.db import connection
+    from django.test import Client
+    from ai_jury.prompts import PromptBuilder
+    from search_app.attachments import save_attachment, prompt_attachments
+    from search_app.models import ChatSession, ChatMessage, Attachment
+
+    corpus, docs = build_corpus(documents, uploads, sessions, seed)
+    client = Client()
+    builder = PromptBuilder()  # the RAG service's default budget, without summarization
+    results = {}
+
+    for layout in ('inline', 'attachment'):
+        ChatSession.objects.all().delete()
+        Attachment.objects.all().delete()
+        with connection.cursor() as cursor:
+            cursor.execute('VACUUM')
+        baseline = sqlite_size(connection)
+
+        chat_sessions = [ChatSession.objects.create(title=f'session {i}') for i in range(sessions)]
+        prompt_bytes = 0
+        for session_index, question, doc_index in corpus:
+            text = docs[doc_index]
+            name = f'case-{doc_index}.pdf'
+            if layout == 'inline':
+                content = f"{question}\n\n[Attachments]\n\n\n[Extracted from {name}]\n{text}"
+                ChatMessage.objects.create(session=chat_sessions[session_index], content=content)
+                prompt_bytes += len(content.encode())
+            else:
+                sha256 = hashlib.sha256(f'{name}:{doc_index}'.encode()).hexdigest()
+                attachment = save_attachment(sha256, name, 'application/pdf', len(text), text)
+                message = ChatMessage.objects.create(session=chat_sessions[session_index], content=question)
+                message.attachments.add(attachment)
+                packed = builder.build('', question, attachments=prompt_attachments(question, [attachment]))
+                prompt_bytes += len(packed.messages[-1][1].encode())
+
+        results[layout] = {
+            'db_bytes': sqlite_size(connection) - baseline,
+            'history_bytes': history_bytes(client, [s.id for s in chat_sessions]),
+            'prompt_bytes': prompt_bytes,
+        }
+
+    print(f"{uploads} uploads of {documents} distinct documents across {sessions} sessions")
+    print(f"{'':16}{'inline':>14}{'attachment':>14}{'saved':>9}")
+    for key in ('db_bytes', 'history_bytes', 'prompt_bytes'):
+        before, after = results['inline'][key], results['attachment'][key]
+        saved = 100 * (before - after) / before if before else 0
+        print(f"{key:16}{before:>14,}{after:>14,}{saved:>8.1f}%")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--documents', type=int, default=20)
+    parser.add_argument('--uploads', type=int, default=400)
+    parser.add_argument('--sessions', type=int, default=40)
+    parser.add_argument('--seed', type=int, default=7)
+    args = parser.parse_args()
+    run(args.documents, args.uploads, args.sessions, args.seed)
+
+
+if __name__ == '__main__':
+    main()
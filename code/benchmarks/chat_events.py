@@ -0,0 +1,102 @@
+"""
+Requests and bytes per chat turn: refetching the sidebar after every turn
+(the old chat page) versus applying the deltas pushed over /api/chat/events/.
+
+Seeds the sidebar with --sessions existing chats, then plays --turns chat
+turns against the offline servers (fake LLM) both ways. A second tab
+watching the same event stream is measured too; before this change it only
+saw new chats after a reload.
+
+    python -m benchmarks.chat_events --sessions 50 --turns 20
+"""
+import argparse
+import os
+import threading
+
+import requests
+
+from .servers import start_django, start_rag_service
+from .stats import header_bytes
+
+
+class EventTab:
+    """A browser tab listening to the event stream; counts the bytes it receives"""
+
+    def __init__(self, base_url):
+        self.response = requests.get(f'{base_url}/api/chat/events/', stream=True, timeout=60)
+        self.bytes = header_bytes(self.response)
+        self.events = 0
+        self.lock = threading.Lock()
+        threading.Thread(target=self._read, daemon=True).start()
+
+    def _read(self):
+        try:
+            for line in self.response.iter_lines(chunk_size=1):
+                with self.lock:
+                    self.bytes += len(line) + 1
+                    if line.startswith(b'event:'):
+                        self.events += 1
+        except requests.RequestException:
+            pass
+
+    def snapshot(self):
+        with self.lock:
+            return self.bytes, self.events
+
+
+def play_turns(base_url, turns, refetch):
+    """Returns (requests, bytes) over `turns` turns in one chat session"""
+    http = requests.Session()
+    requests_made = bytes_down = 0
+    session_id = http.post(f'{base_url}/api/chat/sessions/create/').json()['session_id']
+    for i in range(turns):
+        response = http.post(f'{base_url}/api/chat/send/', json={
+            'message': f'What does Article {i + 1} of the Constitution say?',
+            'session_id': session_id,
+        })
+        response.raise_for_status()
+        requests_made += 1
+        bytes_down += len(response.content) + header_bytes(response)
+        if refetch:
+            sidebar = http.get(f'{base_url}/api/chat/sessions/')
+            requests_made += 1
+            bytes_down += len(sidebar.content) + header_bytes(sidebar)
+    return requests_made, bytes_down
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--sessions', type=int, default=50, help='Existing chats in the sidebar')
+    parser.add_argument('--turns', type=int, default=20)
+    args = parser.parse_args()
+
+    os.environ.setdefault('FAKE_LLM_LATENCY_MS', '5')
+    os.environ.setdefault('FAKE_LLM_TOKENS_PER_SEC', '0')
+    base_url = start_django(rag_url=start_rag_service())
+
+    from search_app.models import ChatMessage, ChatSession
+    for i in range(args.sessions):
+        session = ChatSession.objects.create(title=f'Earlier question {i}')
+        ChatMessage.objects.create(session=session, content=f'Earlier question {i}', is_user=True)
+        ChatMessage.objects.create(session=session, content='An earlier answer.', is_user=False)
+
+    before_requests, before_bytes = play_turns(base_url, args.turns, refetch=True)
+
+    own_tab, other_tab = EventTab(base_url), EventTab(base_url)
+    own_start, other_start = own_tab.snapshot(), other_tab.snapshot()
+    after_requests, after_bytes = play_turns(base_url, args.turns, refetch=False)
+    # Let the last events reach both tabs
+    threading.Event().wait(0.5)
+    own_bytes = own_tab.snapshot()[0] - own_start[0]
+    other_bytes, other_events = (b - a for a, b in zip(other_start, other_tab.snapshot()))
+
+    turns = args.turns
+    print(f"{args.sessions} chats in the sidebar, {turns} turns")
+    print(f"{'':28}{'requests/turn':>15}{'bytes/turn':>12}")
+    print(f"{'refetch sidebar (before)':28}{before_requests / turns:>15.1f}{before_bytes / turns:>12.0f}")
+    print(f"{'event stream (after)':28}{after_requests / turns:>15.1f}{(after_bytes + own_bytes) / turns:>12.0f}")
+    print(f"other open tab: {other_events / turns:.1f} events, {other_bytes / turns:.0f} bytes per turn, 0 requests")
+
+
+if __name__ == '__main__':
+    main()
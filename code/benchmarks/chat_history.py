@@ -0,0 +1,124 @@
+"""
+Time to load a long chat history, with AI answers pre-rendered at write
+time versus rendered from markdown on every view.
+
+Builds sessions of --messages messages (half AI answers in typical Gemini
+markdown: headings, lists, bold, a table now and then) and times:
+
+- render: markdown to sanitized HTML for every AI answer, i.e. what each
+  view would pay without ChatMessage.content_html (and what the backfill
+  pays once)
+- serialize: building and JSON-encoding the history response from rows
+  already in memory, with and without the HTML
+- endpoint: GET /api/chat/sessions/<id>/messages/ through the Django test
+  client, returning both, and with ?format=html (what the chat page asks
+  for: the stored HTML instead of the markdown)
+
+    python -m benchmarks.chat_history --messages 1000 --rounds 5
+"""
+import argparse
+import json
+import random
+import time
+
+from .django_env import setup_django
+from .stats import summarize
+
+TERMS = ['Article 21', 'Section 438 CrPC', 'IPC 420', 'the High Court', 'anticipatory bail', 'the tenant',
+         'a writ petition', 'the Supreme Court', 'the landlord', 'a legal notice', 'the complainant']
+
+
+def markdown_answer(rng):
+    """An answer shaped like Gemini's: a heading, paragraphs, a list and sometimes a table"""
+    def sentence():
+        return f"Under {rng.choice(TERMS)}, **{rng.choice(TERMS)}** may apply to {rng.choice(TERMS)}."
+    parts = [f"### {rng.choice(TERMS).title()}", ' '.join(sentence() for _ in range(3))]
+    parts.append('\n'.join(f"{i}. {sentence()}" for i in range(1, rng.randint(3, 6))))
+    if rng.random() < 0.3:
+        parts.append('| Provision | Effect |\n|---|---|\n' +
+                     '\n'.join(f"| {rng.choice(TERMS)} | {sentence()} |" for _ in range(3)))
+    parts.append(' '.join(sentence() for _ in range(2)))
+    return '\n\n'.join(parts)
+
+
+def timed(function, rounds):
+    """(summary of the milliseconds per round, result of the last round)"""
+    times = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        result = function()
+        times.append((time.perf_counter() - start) * 1000)
+    return summarize(times), result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--messages', type=int, default=1000, help='Messages per session')
+    parser.add_argument('--rounds', type=int, default=5)
+    args = parser.parse_args()
+
+    setup_django()
+    from django.conf import settings
+    from django.test import Client
+    from search_app.models import ChatMessage, ChatSession
+    from search_app.rendering import markdown_parser, render_markdown
+    from search_app.views import message_data
+
+    settings.DEBUG = False
+    settings.ALLOWED_HOSTS = ['*']
+    rng = random.Random(0)
+    session = ChatSession.objects.create(title='benchmark')
+    messages = []
+    for i in range(args.messages):
+        is_user = i % 2 == 0
+        content = f"What does {rng.choice(TERMS)} say about {rng.choice(TERMS)}?" if is_user else markdown_answer(rng)
+        messages.append(ChatMessage(session=session, content=content, is_user=is_user))
+    markdown_parser()  # import outside the timings
+
+    answers = [m for m in messages if not m.is_user]
+    render, _ = timed(lambda: [render_markdown(m.content) for m in answers], args.rounds)
+    for message in answers:
+        message.content_html = render_markdown(message.content)
+    ChatMessage.objects.bulk_create(messages)
+    rows = list(ChatMessage.objects.filter(session=session).order_by('timestamp'))
+
+    def serialize(with_html):
+        data = [message_data(m) for m in rows]
+        if not with_html:
+            for item in data:
+                del item['content_html']
+        return json.dumps({'messages': data}, default=str)
+
+    def serialize_rendering():
+        data = [dict(message_data(m), content_html='' if m.is_user else render_markdown(m.content)) for m in rows]
+        return json.dumps({'messages': data}, default=str)
+
+    markdown_only, plain = timed(lambda: serialize(False), args.rounds)
+    stored, body = timed(lambda: serialize(True), args.rounds)
+    on_view, _ = timed(serialize_rendering, args.rounds)
+    client = Client()
+    url = f'/api/chat/sessions/{session.id}/messages/'
+    client.get(url)
+    endpoint, response = timed(lambda: client.get(url), args.rounds)
+    html_endpoint, html_response = timed(lambda: client.get(url, {'format': 'html'}), args.rounds)
+    assert response.status_code == html_response.status_code == 200, response.status_code
+
+    print(f"{args.messages} messages ({len(answers)} AI answers, "
+          f"{sum(len(m.content) for m in answers) / len(answers):.0f} characters of markdown each)")
+    print(f"{'':36}{'p50 ms':>9}{'max ms':>9}{'KiB':>8}")
+    lines = [
+        ('render all answers', render, None),
+        ('serialize, markdown only', markdown_only, len(plain)),
+        ('serialize, stored HTML', stored, len(body)),
+        ('serialize, rendering on each view', on_view, len(body)),
+        ('GET messages', endpoint, len(response.content)),
+        ('GET messages?format=html', html_endpoint, len(html_response.content)),
+    ]
+    for name, stats, size in lines:
+        kib = f"{size / 1024:8.0f}" if size else f"{'':8}"
+        print(f"{name:36}{stats['p50']:>9.1f}{stats['max']:>9.1f}{kib}")
+    print(f"per answer: {render['p50'] * 1000 / len(answers):.0f} us to render")
+
+
+if __name__ == '__main__':
+    main()
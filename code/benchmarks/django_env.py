@@ -0,0 +1,54 @@
+"""Shared Django bootstrap for the benchmark scripts"""
+import atexit
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+CODE_DIR = Path(__file__).resolve().parent.parent
+PROJECT_DIR = CODE_DIR / 'justice'
+
+
+def setup_django(db_path=None):
+    """
+    Configure Django against a throwaway SQLite database and migrate it.
+    Returns the database path so callers can inspect or remove it.
+    """
+    if str(PROJECT_DIR) not in sys.path:
+        sys.path.insert(0, str(PROJECT_DIR))
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'justice.settings')
+
+    import django
+    from django.conf import settings
+
+    if db_path is None:
+        fd, db_path = tempfile.mkstemp(prefix='bench-', suffix='.sqlite3')
+        os.close(fd)
+        atexit.register(_remove_database, db_path)
+    database = settings.DATABASES['default']
+    database['NAME'] = db_path
+    # Load tests write from many threads; WAL lets readers run alongside a writer
+    database['OPTIONS'] = {'timeout': 30, 'init_command': 'PRAGMA journal_mode=WAL;'}
+    django.setup()
+
+    from django.core.management import call_command
+    call_command('migrate', verbosity=0, interactive=False)
+    return db_path
+
+
+def _remove_database(db_path):
+    for suffix in ('', '-wal', '-shm'):
+        if os.path.exists(db_path + suffix):
+            os.remove(db_path + suffix)
+
+
+def sqlite_size(connection):
+    """Bytes used by the SQLite database behind `connection`"""
+    with connection.cursor() as cursor:
+        cursor.execute('PRAGMA page_count')
+        page_count = cursor.fetchone()[0]
+        cursor.execute('PRAGMA freelist_count')
+        free_pages = cursor.fetchone()[0]
+        cursor.execute('PRAGMA page_size')
+        page_size = cursor.fetchone()[0]
+    return (page_count - free_pages) * page_size
@@ -0,0 +1,92 @@
+"""
+Import time of the legal assistant service and the Django app.
+
+Imports each in a fresh interpreter under ``python -X importtime`` (best of
+--runs), prints the total and the slowest modules by cumulative time, and
+with --record appends the totals to benchmarks/results/import_time.jsonl
+with the current commit so they can be tracked over time.
+
+    python -m benchmarks.import_time --runs 5 --top 10 --record
+"""
+import argparse
+import datetime
+import json
+import os
+import subprocess
+import sys
+
+CODE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HISTORY = os.path.join(CODE_DIR, 'benchmarks', 'results', 'import_time.jsonl')
+
+TARGETS = {
+    'legal_assistant': (CODE_DIR, 'import legal_assistant'),
+    # What a fresh worker imports before serving its first chat request
+    'django': (os.path.join(CODE_DIR, 'justice'), (
+        "import os, django; os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'justice.settings'); "
+        "django.setup(); import justice.wsgi, justice.urls"
+    )),
+}
+
+
+def import_times(directory, code):
+    """{module: (self us, cumulative us)} from one -X importtime run, plus the top-level total"""
+    env = dict(os.environ, GOOGLE_API_KEY=os.environ.get('GOOGLE_API_KEY', 'x'), WARMUP='0',
+               PYTHONPATH=os.pathsep.join([CODE_DIR, directory]))
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', code], cwd=directory, env=env,
+                            capture_output=True, text=True)
+    if result.returncode:
+        raise RuntimeError(result.stderr[-2000:])
+    modules, total = {}, 0
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        # Top-level imports are not indented; their cumulative times add up to the whole
+        if not name[1:].startswith(' '):
+            total += int(cumulative_us)
+        modules[name.strip()] = (int(self_us), int(cumulative_us))
+    return total, modules
+
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'describe', '--always', '--dirty'], cwd=CODE_DIR, capture_output=True,
+                              text=True).stdout.strip()
+    except OSError:
+        return ''
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--top', type=int, default=10)
+    parser.add_argument('--record', action='store_true', help=f'Append the totals to {os.path.relpath(HISTORY)}')
+    args = parser.parse_args()
+
+    totals = {}
+    for name, (directory, code) in TARGETS.items():
+        total, modules = min((import_times(directory, code) for _ in range(args.runs)), key=lambda r: r[0])
+        totals[name] = round(total / 1000, 1)
+        print(f"{name}: {total / 1000:.0f} ms (best of {args.runs})")
+        slowest = sorted(modules.items(), key=lambda item: item[1][1], reverse=True)[:args.top]
+        for module, (self_us, cumulative_us) in slowest:
+            print(f"  {cumulative_us / 1000:8.1f} ms  {self_us / 1000:7.1f} ms self  {module}")
+
+    previous = None
+    if os.path.exists(HISTORY):
+        with open(HISTORY) as f:
+            lines = [line for line in f if line.strip()]
+        previous = json.loads(lines[-1]) if lines else None
+    if previous:
+        changes = ', '.join(f"{name} {totals[name] - previous['ms'].get(name, 0):+.0f} ms"
+                            for name in totals if name in previous['ms'])
+        print(f"since {previous['revision']} ({previous['date']}): {changes}")
+    if args.record:
+        os.makedirs(os.path.dirname(HISTORY), exist_ok=True)
+        with open(HISTORY, 'a') as f:
+            f.write(json.dumps({'date': datetime.date.today().isoformat(), 'revision': git_revision(),
+                                'python': sys.version.split()[0], 'ms': totals}) + '\n')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,221 @@
+"""
+Load generator for the chat API and the lawyers letter flow.
+
+Drives /api/chat/send/, /api/chat/sessions/ and /lawyers/generate-letter/
+at a fixed concurrency and reports throughput, latency percentiles, errors
+and peak memory.
+
+Offline on one box (Django and the legal assistant service run in this
+process, the LLM is ai_jury.fakes)::
+
+    python -m benchmarks.loadgen --offline --concurrency 8 --requests 400
+
+Against servers that are already running::
+
+    python -m benchmarks.loadgen --base-url http://127.0.0.1:8001 --duration 60
+
+As a CI regression gate::
+
+    python -m benchmarks.loadgen --offline --save benchmarks/baseline.json
+    python -m benchmarks.loadgen --offline --baseline benchmarks/baseline.json --max-regression 0.25
+"""
+import argparse
+import itertools
+import json
+import os
+import random
+import sys
+import threading
+import time
+
+import requests
+
+from .stats import peak_rss_mb, summarize
+
+QUESTIONS = [
+    'What does Article 21 of the Constitution guarantee?',
+    'What is the punishment for cheating under IPC 420?',
+    'Can the police arrest without a warrant under CrPC?',
+    'Explain anticipatory bail under Section 438 CrPC',
+    'What are the fundamental duties of citizens?',
+    'Is a verbal agreement to sell land enforceable?',
+]
+
+
+class VirtualUser:
+    """One simulated browser: keeps its cookies and current chat session"""
+
+    def __init__(self, base_url, rng):
+        self.base_url = base_url
+        self.rng = rng
+        self.http = requests.Session()
+        self.chat_session_id = None
+        self.csrf_token = None
+
+    def chat(self):
+        payload = {'message': self.rng.choice(QUESTIONS)}
+        if self.chat_session_id:
+            payload['session_id'] = self.chat_session_id
+        response = self.http.post(f'{self.base_url}/api/chat/send/', json=payload, timeout=60)
+        if response.ok:
+            self.chat_session_id = response.json().get('session_id')
+            # Start a fresh conversation now and then, like real users do
+            if self.rng.random() < 0.2:
+                self.chat_session_id = None
+        return response
+
+    def sessions(self):
+        return self.http.get(f'{self.base_url}/api/chat/sessions/', timeout=60)
+
+    def letters(self):
+        if self.csrf_token is None:
+            page = self.http.get(f'{self.base_url}/lawyers/legal-letters/', timeout=60)
+            page.raise_for_status()
+            self.csrf_token = self.http.cookies.get('csrftoken')
+        return self.http.post(
+            f'{self.base_url}/lawyers/generate-letter/',
+            data={
+                'letter_type': 'legal_notice',
+                'recipient_info': 'Mr. A. Kumar, 12 MG Road, Bengaluru',
+                'case_details': 'Unpaid rent for six months under a registered lease deed.',
+                'additional_instructions': 'Give fifteen days to pay.',
+            },
+            headers={'X-CSRFToken': self.csrf_token or ''},
+            timeout=60,
+        )
+
+
+def parse_mix(text):
+    mix = {}
+    for part in text.split(','):
+        name, _, weight = part.partition('=')
+        if name not in ('chat', 'sessions', 'letters'):
+            raise argparse.ArgumentTypeError(f'Unknown scenario: {name}')
+        mix[name] = float(weight or 1)
+    return mix
+
+
+def run_load(base_url, concurrency, mix, total_requests=None, duration=None, seed=0):
+    names, weights = zip(*mix.items())
+    results = {name: [] for name in names}
+    errors = {name: 0 for name in names}
+    lock = threading.Lock()
+    counter = itertools.count()
+    deadline = time.monotonic() + duration if duration else None
+
+    def worker(index):
+        rng = random.Random(seed * 1000 + index)
+        user = VirtualUser(base_url, rng)
+        while True:
+            if deadline is not None:
+                if time.monotonic() >= deadline:
+                    return
+            elif next(counter) >= total_requests:
+                return
+            name = rng.choices(names, weights)[0]
+            start = time.perf_counter()
+            try:
+                ok = getattr(user, name)().ok
+            except requests.RequestException:
+                ok = False
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            with lock:
+                if ok:
+                    results[name].append(elapsed_ms)
+                else:
+                    errors[name] += 1
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(concurrency)]
+    started = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    wall = time.perf_counter() - started
+
+    report = {'concurrency': concurrency, 'wall_seconds': wall, 'scenarios': {}}
+    all_latencies = []
+    for name in names:
+        summary = summarize(results[name])
+        summary['errors'] = errors[name]
+        summary['throughput'] = len(results[name]) / wall
+        report['scenarios'][name] = summary
+        all_latencies.extend(results[name])
+    report['overall'] = summarize(all_latencies)
+    report['overall']['errors'] = sum(errors.values())
+    report['overall']['throughput'] = len(all_latencies) / wall
+    report['peak_rss_mb'] = peak_rss_mb()
+    return report
+
+
+def print_report(report):
+    print(f"concurrency {report['concurrency']}, {report['wall_seconds']:.1f}s, "
+          f"peak RSS {report['peak_rss_mb']:.0f} MB")
+    print(f"{'scenario':10}{'ok':>7}{'errors':>8}{'req/s':>9}{'p50':>9}{'p95':>9}{'p99':>9}{'max':>9}  (ms)")
+    rows = list(report['scenarios'].items()) + [('overall', report['overall'])]
+    for name, s in rows:
+        print(f"{name:10}{s['count']:>7}{s['errors']:>8}{s['throughput']:>9.1f}"
+              f"{s['p50']:>9.1f}{s['p95']:>9.1f}{s['p99']:>9.1f}{s['max']:>9.1f}")
+
+
+def compare(report, baseline, tolerance):
+    """List of regressions of `report` against `baseline` beyond `tolerance` (0.25 = 25%)"""
+    problems = []
+    for name, base in baseline['scenarios'].items():
+        current = report['scenarios'].get(name)
+        if not current or not base['count']:
+            continue
+        if current['p95'] > base['p95'] * (1 + tolerance):
+            problems.append(f"{name} p95 {current['p95']:.1f}ms > baseline {base['p95']:.1f}ms")
+        if current['errors'] > base['errors']:
+            problems.append(f"{name} errors {current['errors']} > baseline {base['errors']}")
+    base_rps = baseline['overall']['throughput']
+    if report['overall']['throughput'] < base_rps * (1 - tolerance):
+        problems.append(f"throughput {report['overall']['throughput']:.1f}/s < baseline {base_rps:.1f}/s")
+    return problems
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--base-url', default='http://127.0.0.1:8001', help='Django server to drive')
+    parser.add_argument('--offline', action='store_true',
+                        help='Start Django and the legal assistant (fake LLM) in this process')
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--requests', type=int, default=400)
+    parser.add_argument('--duration', type=float, help='Run for this many seconds instead of --requests')
+    parser.add_argument('--mix', type=parse_mix, default=parse_mix('chat=6,sessions=3,letters=1'))
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--llm-latency-ms', type=float, default=50, help='Fake LLM latency in offline mode')
+    parser.add_argument('--json', action='store_true', help='Print the report as JSON')
+    parser.add_argument('--save', help='Write the report to this file')
+    parser.add_argument('--baseline', help='Fail if worse than the report in this file')
+    parser.add_argument('--max-regression', type=float, default=0.25)
+    args = parser.parse_args()
+
+    base_url = args.base_url
+    if args.offline:
+        from .servers import start_django, start_rag_service
+        os.environ.setdefault('FAKE_LLM_LATENCY_MS', str(args.llm_latency_ms))
+        os.environ.setdefault('FAKE_LLM_TOKENS_PER_SEC', '0')
+        base_url = start_django(rag_url=start_rag_service())
+
+    report = run_load(base_url, args.concurrency, args.mix, args.requests, args.duration, args.seed)
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print_report(report)
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump(report, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            problems = compare(report, json.load(f), args.max_regression)
+        for problem in problems:
+            print(f'REGRESSION: {problem}')
+        if problems:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,111 @@
+"""
+Per-request overhead of the metrics middleware.
+
+Times the Django MetricsMiddleware and the ASGI middleware used by the
+legal assistant service around a no-op view/app, and the raw cost of the
+counter and histogram primitives.
+
+    python -m benchmarks.metrics_overhead --requests 20000
+"""
+import argparse
+import asyncio
+import threading
+import time
+
+from .django_env import setup_django
+
+
+def per_call_us(fn, n):
+    start = time.perf_counter()
+    for _ in range(n):
+        fn()
+    return (time.perf_counter() - start) / n * 1e6
+
+
+def bench_primitives(n):
+    from ai_jury import metrics
+    counter = metrics.counter('bench_counter_total', 'benchmark', ['route'])
+    histogram = metrics.histogram('bench_latency_seconds', 'benchmark', ['route'])
+    results = {
+        'counter.inc': per_call_us(lambda: counter.inc('/api/chat/send/'), n),
+        'histogram.observe': per_call_us(lambda: histogram.observe(0.042, '/api/chat/send/'), n),
+    }
+
+    # Same counter from 8 threads at once: no lock on the hot path
+    def worker():
+        for _ in range(n // 8):
+            counter.inc('/threads')
+    threads = [threading.Thread(target=worker) for _ in range(8)]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    results['counter.inc x8 threads'] = (time.perf_counter() - start) / (n // 8 * 8) * 1e6
+    assert counter.values()[('/threads',)] == n // 8 * 8
+    return results
+
+
+def bench_django(n):
+    from django.http import HttpResponse
+    from django.test import RequestFactory
+    from django.urls import resolve
+    from search_app.middleware import MetricsMiddleware
+
+    request = RequestFactory().get('/api/chat/sessions/')
+    request.resolver_match = resolve('/api/chat/sessions/')
+    response = HttpResponse('ok')
+
+    def view(request):
+        return response
+
+    middleware = MetricsMiddleware(view)
+    bare = per_call_us(lambda: view(request), n)
+    wrapped = per_call_us(lambda: middleware(request), n)
+    return bare, wrapped
+
+
+def bench_asgi(n):
+    from ai_jury.metrics import ASGIMetricsMiddleware
+
+    async def app(scope, receive, send):
+        await send({'type': 'http.response.start', 'status': 200, 'headers': []})
+        await send({'type': 'http.response.body', 'body': b'ok'})
+
+    async def receive():
+        return {'type': 'http.request', 'body': b''}
+
+    async def send(message):
+        pass
+
+    scope = {'type': 'http', 'method': 'POST', 'path': '/query'}
+    middleware = ASGIMetricsMiddleware(app, prefix='bench')
+
+    async def run(target):
+        start = time.perf_counter()
+        for _ in range(n):
+            await target(scope, receive, send)
+        return (time.perf_counter() - start) / n * 1e6
+
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(run(app)), loop.run_until_complete(run(middleware))
+    finally:
+        loop.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--requests', type=int, default=20000)
+    args = parser.parse_args()
+    setup_django()
+
+    for name, us in bench_primitives(args.requests).items():
+        print(f'{name:28}{us:8.2f} us/call')
+    for name, (bare, wrapped) in (('Django middleware', bench_django(args.requests)),
+                                  ('ASGI middleware', bench_asgi(args.requests))):
+        print(f'{name:28}{wrapped - bare:8.2f} us/request overhead ({bare:.2f} -> {wrapped:.2f})')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,107 @@
+"""
+Tail latency and failures with the model router, on fake backends.
+
+Two fake models with injected latency tails stand in for Gemini: a cheap
+"lite" model (fast, for questions of at most 25 words) and a "flash" model.
+A mix of short and long questions is sent --concurrency at a time to:
+
+- single: flash only, as legal_assistant.py called it before
+- routed: short questions to lite, failover on error, no hedging
+- hedged: routed, plus a duplicate request once a call passes the
+  backend's p95
+
+and once more with lite failing --error-rate of its calls. Cost is the sum
+of the backends' relative costs (lite 1, flash 4) over every call made,
+hedges and losers included.
+
+    python -m benchmarks.model_router --questions 400 --tail-rate 0.05
+"""
+import argparse
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from ai_jury.fakes import FakeChatModel
+from ai_jury.router import CALLS, AllBackendsFailed, Backend, ModelRouter
+
+from .stats import summarize
+
+
+def questions(n, short_share, seed=0):
+    rng = random.Random(seed)
+    out = []
+    for i in range(n):
+        if rng.random() < short_share:
+            out.append(f'What does Article {i} of the Constitution say?')
+        else:
+            out.append(f'Question {i}: ' + ' '.join(['my landlord kept the deposit and changed the locks'] * 5))
+    return out
+
+
+def backends(args, lite_error_rate=0.0):
+    lite = FakeChatModel(latency_ms=150, jitter_ms=50, tokens_per_second=0, tail_rate=args.tail_rate,
+                         tail_ms=args.tail_ms, error_rate=lite_error_rate, seed=1, name='lite')
+    flash = FakeChatModel(latency_ms=400, jitter_ms=100, tokens_per_second=0, tail_rate=args.tail_rate,
+                          tail_ms=args.tail_ms, seed=2, name='flash')
+    # A short window minimum: the warm-up run gives hedging real percentiles to start from
+    return (Backend('lite', lite, cost=1, max_words=25, min_samples=10),
+            Backend('flash', flash, cost=4, min_samples=10))
+
+
+def run(router, qs, concurrency, settle=0.0):
+    """Latency summary, failed questions, and calls made by kind plus their total cost"""
+    costs = {backend.name: backend.cost for backend in router.backends}
+
+    def one(question):
+        start = time.perf_counter()
+        try:
+            router.invoke(question, question)
+        except AllBackendsFailed:
+            return None
+        return (time.perf_counter() - start) * 1000
+
+    counts_before = dict(CALLS.values())
+    with ThreadPoolExecutor(concurrency) as pool:
+        results = list(pool.map(one, qs))
+    # Let losing hedges finish so their calls are counted
+    time.sleep(settle)
+    calls = {'cost': 0}
+    for (backend, kind, outcome), value in CALLS.values().items():
+        made = value - counts_before.get((backend, kind, outcome), 0)
+        calls['cost'] += made * costs.get(backend, 0)
+        calls[kind] = calls.get(kind, 0) + made
+    latencies = [r for r in results if r is not None]
+    return summarize(latencies), len(results) - len(latencies), calls
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--questions', type=int, default=400)
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--short-share', type=float, default=0.7, help='Fraction of questions of at most 25 words')
+    parser.add_argument('--tail-rate', type=float, default=0.05, help='Fraction of calls that stall')
+    parser.add_argument('--tail-ms', type=float, default=3000, help='How long a stalled call takes extra')
+    parser.add_argument('--error-rate', type=float, default=0.2, help='Lite failures in the second run')
+    args = parser.parse_args()
+
+    qs = questions(args.questions, args.short_share)
+    warmup = questions(40, args.short_share, seed=1)
+    print(f"{args.questions} questions ({args.short_share:.0%} short), {args.concurrency} at a time, "
+          f"{args.tail_rate:.0%} of calls +{args.tail_ms:.0f} ms")
+    print(f"{'':22}{'p50':>7}{'p95':>7}{'p99':>7}{'max':>7}{'failed':>8}{'hedges':>8}{'failovers':>11}{'cost/q':>8}")
+    for error_rate in sorted({0.0, args.error_rate}):
+        for name in ('single', 'routed', 'hedged'):
+            lite, flash = backends(args, lite_error_rate=error_rate)
+            if name == 'single':
+                router = ModelRouter([flash], hedging=False)
+            else:
+                router = ModelRouter([lite, flash], hedging=name == 'hedged')
+            run(router, warmup, args.concurrency)
+            result, failed, calls = run(router, qs, args.concurrency, settle=args.tail_ms / 1000 + 1)
+            label = f"{name}{f' (lite {error_rate:.0%} err)' if error_rate else ''}"
+            print(f"{label:22}{result['p50']:>7.0f}{result['p95']:>7.0f}{result['p99']:>7.0f}{result['max']:>7.0f}"
+                  f"{failed:>8}{calls.get('hedge', 0):>8}{calls.get('failover', 0):>11}{calls['cost'] / len(qs):>8.2f}")
+
+
+if __name__ == '__main__':
+    main()
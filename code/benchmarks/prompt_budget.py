@@ -0,0 +1,79 @@
+"""
+Prompt tokens and LLM latency by attachment size, with and without the
+prompt token budget.
+
+Sends one question with a chat history and an attachment of each --pages
+size to the legal assistant service on the fake LLM, whose latency grows
+with the prompt (FAKE_LLM_PREFILL_TOKENS_PER_SEC):
+
+- unbounded: a budget no attachment reaches, i.e. every chunk sent verbatim
+  as before
+- budget: the default PROMPT_TOKEN_BUDGET, oversize attachments
+  map-reduce summarized (the summary calls are included in the latency)
+
+Prints the estimated prompt tokens, the input tokens the fake model counted,
+chunks summarized or dropped and the service's LLM time.
+
+    python -m benchmarks.prompt_budget --pages 0 2 10 50 200
+"""
+import argparse
+import os
+import random
+
+import requests
+
+from .attachment_storage import make_document
+from .servers import start_rag_service
+
+HISTORY = [
+    {'role': 'user', 'content': 'My landlord will not return my deposit.'},
+    {'role': 'assistant', 'content': 'Under the tenancy agreement and the relevant rent control act, ' * 6},
+] * 3
+
+
+def chunks_for(pages, rng):
+    """An attachment of `pages` pages (about 3000 characters each) in 1500-character chunks"""
+    text = make_document(rng, paragraphs=pages * 4)
+    return [text[i:i + 1500] for i in range(0, len(text), 1500)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--pages', type=int, nargs='+', default=[0, 2, 10, 50, 200])
+    args = parser.parse_args()
+
+    os.environ.setdefault('FAKE_LLM_LATENCY_MS', '200')
+    os.environ.setdefault('FAKE_LLM_TOKENS_PER_SEC', '0')
+    os.environ.setdefault('FAKE_LLM_PREFILL_TOKENS_PER_SEC', '20000')
+    rag_url = start_rag_service()
+
+    import legal_assistant
+    from ai_jury.prompts import PromptBuilder
+    builders = {
+        'unbounded': PromptBuilder(budget=10 ** 9),
+        'budget': legal_assistant.prompt_builder,
+    }
+
+    rng = random.Random(0)
+    attachments = {pages: chunks_for(pages, rng) for pages in args.pages}
+    print(f"budget {legal_assistant.prompt_builder.budget} tokens; fake LLM "
+          f"{os.environ['FAKE_LLM_LATENCY_MS']} ms + 1 s per {os.environ['FAKE_LLM_PREFILL_TOKENS_PER_SEC']} prompt tokens")
+    print(f"{'':11}{'pages':>6}{'est. tokens':>13}{'input tokens':>14}{'summarized':>12}{'dropped':>9}{'llm ms':>9}")
+    for name, builder in builders.items():
+        legal_assistant.prompt_builder = builder
+        for pages in args.pages:
+            payload = {
+                'question': 'Can my landlord keep the deposit under this lease?',
+                'history': HISTORY,
+                'attachments': [{'filename': 'lease.pdf', 'chunks': attachments[pages]}] if pages else [],
+            }
+            result = requests.post(rag_url, json=payload, timeout=300).json()
+            usage = result['usage']
+            dropped = sum(usage['dropped'].values())
+            print(f"{name:11}{pages:>6}{usage['total']:>13}{usage['input_tokens']:>14}{usage['summarized']:>12}"
+                  f"{dropped:>9}{result['timings']['llm_ms']:>9.0f}")
+    legal_assistant.prompt_builder = builders['budget']
+
+
+if __name__ == '__main__':
+    main()
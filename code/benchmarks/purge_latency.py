@@ -0,0 +1,141 @@
+"""
+Write lock hold time and concurrent chat latency while a long chat session
+is deleted.
+
+Fills one session with --messages messages (one in ten linked to an
+attachment) and deletes it twice, each time while a second thread keeps
+saving chat turns into another session every --interval seconds:
+
+- cascade: ChatSession.delete(), what the admin's delete used to run; the
+  collected messages and attachment links go in one transaction
+- batched: queue_purge() and purge_session(), what the admin and
+  `manage.py purge_chat_sessions` do now
+
+An idle run first gives the chat write latency with nothing else going on.
+
+    python -m benchmarks.purge_latency --messages 200000 --batch-size 500 --pause 0.05
+"""
+import argparse
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+
+from .django_env import setup_django
+from .stats import summarize
+
+
+def fill(connection, session_id, attachment_id, count):
+    """Insert `count` messages into the session with raw SQL (the ORM would take minutes)"""
+    start = datetime(2026, 1, 1, tzinfo=timezone.utc)
+    with connection.cursor() as cursor:
+        for offset in range(0, count, 50_000):
+            messages, links = [], []
+            for i in range(offset, min(offset + 50_000, count)):
+                message_id = uuid.uuid4().hex
+                moment = (start + timedelta(seconds=i)).strftime('%Y-%m-%d %H:%M:%S.%f')
+                messages.append((message_id, session_id, f"Question {i} about Section {i % 511} of the IPC",
+                                 i % 2 == 0, moment, ''))
+                if i % 10 == 0:
+                    links.append((message_id, attachment_id))
+            cursor.executemany('INSERT INTO search_app_chatmessage (id, session_id, content, is_user, timestamp, '
+                               'content_html) VALUES (%s, %s, %s, %s, %s, %s)', messages)
+            cursor.executemany('INSERT INTO search_app_chatmessage_attachments (chatmessage_id, attachment_id) '
+                               'VALUES (%s, %s)', links)
+
+
+class ChatWriter(threading.Thread):
+    """Saves a user message and an AI answer every `interval` seconds, as send_message does, timing each turn"""
+
+    def __init__(self, session, interval):
+        super().__init__(daemon=True)
+        self.session = session
+        self.interval = interval
+        self.latencies = []
+        self.stopping = threading.Event()
+
+    def run(self):
+        from django.db import connection
+        from search_app.models import ChatMessage
+
+        while not self.stopping.is_set():
+            started = time.perf_counter()
+            ChatMessage.objects.create(session=self.session, content='Is this notice valid?', is_user=True)
+            ChatMessage.objects.create(session=self.session, content='It depends on **Section 80** CPC.',
+                                       is_user=False, thinking_time=1.0)
+            self.session.save(update_fields=['updated_at'])
+            self.latencies.append((time.perf_counter() - started) * 1000)
+            self.stopping.wait(self.interval)
+        connection.close()
+
+    def stop(self):
+        self.stopping.set()
+        self.join()
+        return summarize(self.latencies)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--messages', type=int, default=200_000, help='Messages in the deleted session')
+    parser.add_argument('--batch-size', type=int, default=500, help='Messages deleted per transaction')
+    parser.add_argument('--pause', type=float, default=0.05, help='Seconds between purge transactions')
+    parser.add_argument('--interval', type=float, default=0.02, help='Seconds between concurrent chat turns')
+    parser.add_argument('--idle', type=float, default=3.0, help='Seconds of chat writes with nothing else running')
+    parser.add_argument('--db', help='Database file to use (default: a temporary file)')
+    args = parser.parse_args()
+
+    setup_django(args.db)
+    from django.db import connection
+    from django.db.models.deletion import Collector
+    from search_app.models import Attachment, ChatSession, SessionPurge
+    from search_app.retention import queue_purge, purge_session
+
+    attachment = Attachment(sha256='0' * 64, filename='notice.pdf')
+    attachment.text = 'Legal notice under Section 80 of the Code of Civil Procedure. ' * 100
+    attachment.save()
+    live = ChatSession.objects.create(title='Concurrent chat')
+
+    def run(delete):
+        session = ChatSession.objects.create(title='Long session')
+        fill(connection, session.id.hex, attachment.id.hex, args.messages)
+        writer = ChatWriter(live, args.interval)
+        writer.start()
+        time.sleep(0.5)
+        started = time.perf_counter()
+        longest_ms = delete(session)
+        total = time.perf_counter() - started
+        time.sleep(0.5)
+        return total, longest_ms, writer.stop()
+
+    def cascade(session):
+        collector = Collector(using='default')
+        collector.collect([session])
+        # Collector.delete() is the single transaction; collecting beforehand only reads
+        started = time.perf_counter()
+        collector.delete()
+        return (time.perf_counter() - started) * 1000
+
+    def batched(session):
+        queue_purge(ChatSession.objects.filter(id=session.id), SessionPurge.REASON_ADMIN)
+        purge = SessionPurge.objects.get(session_id=session.id)
+        purge_session(purge, args.batch_size, args.pause)
+        return purge.longest_batch_ms
+
+    writer = ChatWriter(live, args.interval)
+    writer.start()
+    time.sleep(args.idle)
+    idle = writer.stop()
+
+    print(f"Deleting a session of {args.messages:,} messages; batches of {args.batch_size}, "
+          f"{args.pause * 1000:.0f} ms apart; a chat turn every {args.interval * 1000:.0f} ms")
+    print(f"{'':10}{'delete s':>10}{'longest txn ms':>16}{'turns':>7}{'turn p50 ms':>13}"
+          f"{'turn p99 ms':>13}{'turn max ms':>13}")
+    print(f"{'idle':10}{'':>10}{'':>16}{idle['count']:>7}{idle['p50']:>13.1f}{idle['p99']:>13.1f}{idle['max']:>13.1f}")
+    for name, delete in (('cascade', cascade), ('batched', batched)):
+        total, longest_ms, turns = run(delete)
+        print(f"{name:10}{total:>10.1f}{longest_ms:>16.1f}{turns['count']:>7}{turns['p50']:>13.1f}"
+              f"{turns['p99']:>13.1f}{turns['max']:>13.1f}", flush=True)
+
+
+if __name__ == '__main__':
+    main()
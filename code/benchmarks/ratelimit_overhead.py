@@ -0,0 +1,70 @@
+"""
+Cost of one rate limit check.
+
+Times RateLimiter.check with the user, IP and global buckets of the chat
+limiter on the in-memory and SQLite backends: one hot client, many distinct
+clients, 8 threads at once, and a limited (rejected) check.
+
+    python -m benchmarks.ratelimit_overhead --checks 100000
+"""
+import argparse
+import os
+import tempfile
+import threading
+import time
+
+from ai_jury.ratelimit import MemoryBackend, RateLimiter, SQLiteBackend
+
+RULES = {'user': '1000000/s', 'ip': '1000000/s', 'global': '1000000/s'}
+
+
+def per_check_us(fn, n):
+    start = time.perf_counter()
+    for i in range(n):
+        fn(i)
+    return (time.perf_counter() - start) / n * 1e6
+
+
+def bench(backend, n):
+    limiter = RateLimiter('bench', RULES, backend=backend)
+    results = {
+        'one client': per_check_us(lambda i: limiter.check(user=42, ip='10.0.0.1'), n),
+        '10k clients': per_check_us(lambda i: limiter.check(user=i % 10000, ip=f'10.0.{i % 10000}'), n),
+    }
+
+    def worker():
+        for i in range(n // 8):
+            limiter.check(user=i % 100, ip='10.0.0.2')
+    threads = [threading.Thread(target=worker) for _ in range(8)]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    results['8 threads'] = (time.perf_counter() - start) / (n // 8 * 8) * 1e6
+
+    strict = RateLimiter('strict', {'user': '1/hour'}, backend=backend)
+    strict.check(user=1)
+    results['rejected'] = per_check_us(lambda i: strict.check(user=1), n)
+    assert not strict.check(user=1).allowed
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--checks', type=int, default=100000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        backends = {
+            'memory': (MemoryBackend(), args.checks),
+            # Every check is a write transaction on the shared file
+            'sqlite': (SQLiteBackend(os.path.join(directory, 'ratelimit.sqlite3')), args.checks // 20),
+        }
+        for backend_name, (backend, n) in backends.items():
+            for name, us in bench(backend, n).items():
+                print(f'{backend_name:8}{name:14}{us:8.2f} us/check')
+
+
+if __name__ == '__main__':
+    main()
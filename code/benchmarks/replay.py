@@ -0,0 +1,206 @@
+"""
+Replay a recorded chat trace against the chat API or the legal assistant.
+
+Reads a trace written by ``manage.py export_chat_trace`` (one user message
+per line with its offset in seconds, conversation and question) and sends
+each question at its recorded offset divided by --speed, or as fast as
+--concurrency allows with --speed max. A turn is sent once the previous
+turn of its conversation has been answered, in the same chat session
+(/api/chat/send/) or with the replayed answers as history (/query);
+--concurrency bounds the requests in flight.
+
+Reports latency percentiles per answer source, the error rate, the share
+of questions answered without an LLM call (statute table, off-topic
+classifier, caches) and how far behind schedule requests were sent. With
+--offline, Django and the legal assistant run in this process on the fake
+LLM, so cache or scheduler changes can be compared on the same trace.
+
+    python manage.py export_chat_trace --output trace.jsonl     # in justice/
+    python -m benchmarks.replay trace.jsonl --offline --speed 10
+    python -m benchmarks.replay trace.jsonl --target query --base-url http://127.0.0.1:8000 --speed max
+"""
+import argparse
+import heapq
+import itertools
+import json
+import os
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from .stats import summarize
+
+# Answers that did not need an LLM call
+LOCAL_SOURCES = ('statute', 'classifier', 'cache')
+FAILED_SOURCES = ('error', 'busy')
+
+
+def load_trace(path, limit=None):
+    """{conversation: [turn, ...]} in trace order"""
+    conversations = defaultdict(list)
+    with open(path, encoding='utf-8') as f:
+        for number, line in enumerate(f):
+            if limit is not None and number >= limit:
+                break
+            if line.strip():
+                turn = json.loads(line)
+                conversations[turn['session']].append(turn)
+    return conversations
+
+
+def parse_speed(text):
+    if text == 'max':
+        return None
+    speed = float(text.rstrip('x'))
+    if speed <= 0:
+        raise argparse.ArgumentTypeError('speed must be positive or "max"')
+    return speed
+
+
+class Replayer:
+    def __init__(self, target, url, speed, timeout=60):
+        self.target = target
+        self.url = url
+        self.speed = speed
+        self.timeout = timeout
+        self.results = []  # (source, latency ms, lag ms)
+        self.lock = threading.Lock()
+        self.started = None
+
+    def send(self, http, turn, state):
+        """(source, response) for one question"""
+        if self.target == 'chat':
+            payload = {'message': turn['question']}
+            if state.get('session_id'):
+                payload['session_id'] = state['session_id']
+            response = http.post(f'{self.url}/api/chat/send/', json=payload, timeout=self.timeout)
+            if not response.ok:
+                return 'error', response
+            data = response.json()
+            state['session_id'] = data.get('session_id')
+            return data.get('ai_message', {}).get('source', 'llm'), response
+
+        payload = {'question': turn['question'], 'history': state.setdefault('history', [])[-10:]}
+        response = http.post(f'{self.url}/query', json=payload, timeout=self.timeout)
+        if response.status_code in (429, 503):
+            return 'busy', response
+        if not response.ok or response.json().get('status') != 'success':
+            return 'error', response
+        data = response.json()
+        state['history'] += [{'role': 'user', 'content': turn['question']},
+                             {'role': 'assistant', 'content': data['answer']}]
+        return data.get('source', 'llm'), response
+
+    def schedule(self, conversation, index):
+        """Queue turn `index` of a conversation, due at its offset (at once for --speed max)"""
+        turns, _ = conversation
+        due = self.started + turns[index]['offset'] / self.speed if self.speed is not None else 0.0
+        with self.ready:
+            heapq.heappush(self.queue, (due, next(self.sequence), conversation, index))
+            self.ready.notify()
+
+    def turn(self, conversation, index, due):
+        turns, state = conversation
+        try:
+            lag = max(0.0, time.perf_counter() - due) * 1000 if self.speed is not None else 0.0
+            start = time.perf_counter()
+            try:
+                source, _ = self.send(state.setdefault('http', requests.Session()), turns[index], state)
+            except (requests.RequestException, ValueError):
+                source = 'error'
+            latency = (time.perf_counter() - start) * 1000
+            with self.lock:
+                self.results.append((source, latency, lag))
+        finally:
+            self.slots.release()
+            # The next turn of the conversation waits for this answer, as the user did
+            if index + 1 < len(turns):
+                self.schedule(conversation, index + 1)
+
+    def run(self, conversations, concurrency):
+        """
+        Send every turn at its due time, each conversation's turns in order;
+        `concurrency` only bounds the requests in flight, so conversations
+        start when the trace says rather than when a worker frees up.
+        """
+        self.queue = []
+        self.sequence = itertools.count()
+        self.ready = threading.Condition()
+        self.slots = threading.BoundedSemaphore(concurrency)
+        self.started = time.perf_counter()
+        total = sum(len(turns) for turns in conversations.values())
+        for turns in conversations.values():
+            if turns:
+                self.schedule((turns, {}), 0)
+
+        futures = []
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            for _ in range(total):
+                with self.ready:
+                    while not self.queue or self.queue[0][0] > time.perf_counter():
+                        self.ready.wait(self.queue[0][0] - time.perf_counter() if self.queue else None)
+                    due, _, conversation, index = heapq.heappop(self.queue)
+                self.slots.acquire()
+                futures.append(pool.submit(self.turn, conversation, index, due))
+        for future in futures:
+            future.result()
+        return time.perf_counter() - self.started
+
+
+def report(results, wall, speed):
+    by_source = defaultdict(list)
+    for source, latency, _ in results:
+        by_source[source].append(latency)
+    total = len(results)
+    failed = sum(len(by_source.get(s, ())) for s in FAILED_SOURCES)
+    local = sum(len(by_source.get(s, ())) for s in LOCAL_SOURCES)
+    answered = total - failed
+    print(f"{total} questions in {wall:.1f}s ({total / wall:.1f}/s) at {f'{speed:g}x' if speed else 'max speed'}")
+    failures = ', '.join(f'{s} {len(by_source.get(s, ()))}' for s in FAILED_SOURCES)
+    print(f"errors {failed} ({failed / total:.1%}: {failures})")
+    print(f"answered without an LLM call: {local} of {answered} ({local / answered if answered else 0:.1%})")
+    print(f"{'source':12}{'count':>7}{'p50':>9}{'p95':>9}{'p99':>9}{'max':>9}  (ms)")
+    rows = sorted(by_source.items(), key=lambda item: -len(item[1]))
+    rows.append(('all', [latency for _, latency, _ in results]))
+    for source, latencies in rows:
+        s = summarize(latencies)
+        print(f"{source:12}{s['count']:>7}{s['p50']:>9.1f}{s['p95']:>9.1f}{s['p99']:>9.1f}{s['max']:>9.1f}")
+    if speed:
+        lag = summarize([lag for _, _, lag in results])
+        print(f"sent behind schedule: p50 {lag['p50']:.0f} ms, p99 {lag['p99']:.0f} ms, max {lag['max']:.0f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('trace', help='JSON lines from manage.py export_chat_trace')
+    parser.add_argument('--target', choices=('chat', 'query'), default='chat',
+                        help='/api/chat/send/ on Django, or /query on the legal assistant')
+    parser.add_argument('--base-url', default='http://127.0.0.1:8001')
+    parser.add_argument('--offline', action='store_true',
+                        help='Start Django and the legal assistant (fake LLM) in this process')
+    parser.add_argument('--speed', type=parse_speed, default=1.0, help='1, 10 (times recorded speed) or max')
+    parser.add_argument('--concurrency', type=int, default=64,
+                        help='Requests in flight at most; at max speed this is the load')
+    parser.add_argument('--limit', type=int, help='Replay only the first N messages')
+    parser.add_argument('--llm-latency-ms', type=float, default=500, help='Fake LLM latency in offline mode')
+    args = parser.parse_args()
+
+    conversations = load_trace(args.trace, args.limit)
+    url = args.base_url.rstrip('/')
+    if args.offline:
+        from .servers import start_django, start_rag_service
+        os.environ.setdefault('FAKE_LLM_LATENCY_MS', str(args.llm_latency_ms))
+        os.environ.setdefault('FAKE_LLM_TOKENS_PER_SEC', '0')
+        rag_url = start_rag_service()
+        url = start_django(rag_url=rag_url) if args.target == 'chat' else rag_url.rsplit('/', 1)[0]
+
+    replayer = Replayer(args.target, url, args.speed)
+    wall = replayer.run(conversations, args.concurrency)
+    report(replayer.results, wall, args.speed)
+
+
+if __name__ == '__main__':
+    main()
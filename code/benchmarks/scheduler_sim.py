@@ -0,0 +1,120 @@
+"""
+Interactive chat latency under a flood of bulk letter requests, with and
+without the priority scheduler in front of the LLM.
+
+Simulates the legal assistant's /query path in-process: --slots concurrent
+LLM calls to the fake model, --bulk clients generating letters back to back
+and chat turns arriving at --chat-rate per second. Each arrangement runs for
+--seconds:
+
+- fifo: every request in one class, served in arrival order (no priorities)
+- priority: chat tagged interactive and letters bulk, as the Django app does,
+  with the service's weights and the bulk concurrency cap
+
+Chat turns give up after --timeout seconds (the Django app's RAG timeout);
+those dropped by the scheduler count as dropped, not as latency.
+
+    python -m benchmarks.scheduler_sim --slots 4 --bulk 32 --chat-rate 4
+"""
+import argparse
+import random
+import threading
+import time
+
+from ai_jury.fakes import FakeChatModel
+from ai_jury.scheduler import DeadlineExceeded, PriorityClass, PriorityScheduler
+
+from .stats import summarize
+
+SERVICE_CLASSES = {
+    'interactive': PriorityClass(weight=8, max_concurrency=None, timeout=30),
+    'background': PriorityClass(weight=3, max_concurrency=None, timeout=120),
+    'bulk': PriorityClass(weight=1, max_concurrency=2, timeout=300),
+}
+
+
+class Results:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.latencies = {'interactive': [], 'bulk': []}
+        self.dropped = {'interactive': 0, 'bulk': 0}
+
+    def record(self, kind, latency_ms=None):
+        with self.lock:
+            if latency_ms is None:
+                self.dropped[kind] += 1
+            else:
+                self.latencies[kind].append(latency_ms)
+
+
+def call(scheduler, llm, results, kind, priority, timeout, question):
+    start = time.perf_counter()
+    try:
+        with scheduler.slot(priority, time.monotonic() + timeout):
+            llm.invoke(question)
+    except DeadlineExceeded:
+        results.record(kind)
+        return
+    results.record(kind, (time.perf_counter() - start) * 1000)
+
+
+def run(scheduler, tagged, args):
+    llm = FakeChatModel(latency_ms=args.latency_ms, jitter_ms=args.latency_ms / 4, tokens_per_second=0)
+    results = Results()
+    stop = time.monotonic() + args.seconds
+    chat_priority, bulk_priority = ('interactive', 'bulk') if tagged else ('background', 'background')
+
+    def bulk_client(n):
+        i = 0
+        while time.monotonic() < stop:
+            call(scheduler, llm, results, 'bulk', bulk_priority, args.bulk_timeout, f'Draft letter {n}.{i}')
+            i += 1
+
+    threads = [threading.Thread(target=bulk_client, args=(n,)) for n in range(args.bulk)]
+    for thread in threads:
+        thread.start()
+    # Chat turns arrive as a Poisson process once the flood is queued
+    time.sleep(args.latency_ms / 1000)
+    rng = random.Random(0)
+    i = 0
+    while time.monotonic() < stop:
+        thread = threading.Thread(target=call, args=(
+            scheduler, llm, results, 'interactive', chat_priority, args.timeout, f'What does Article {i} say?'))
+        thread.start()
+        threads.append(thread)
+        i += 1
+        time.sleep(rng.expovariate(args.chat_rate))
+    for thread in threads:
+        thread.join()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--slots', type=int, default=4, help='Concurrent LLM calls (LLM_MAX_CONCURRENCY)')
+    parser.add_argument('--bulk', type=int, default=32, help='Bulk clients sending letters back to back')
+    parser.add_argument('--chat-rate', type=float, default=4, help='Chat turns per second')
+    parser.add_argument('--latency-ms', type=float, default=200, help='Fake LLM latency')
+    parser.add_argument('--timeout', type=float, default=5, help='Seconds a chat turn waits for its answer')
+    parser.add_argument('--bulk-timeout', type=float, default=30)
+    parser.add_argument('--seconds', type=float, default=10)
+    args = parser.parse_args()
+
+    arrangements = {
+        'fifo': (PriorityScheduler(args.slots, SERVICE_CLASSES), False),
+        'priority': (PriorityScheduler(args.slots, SERVICE_CLASSES), True),
+    }
+    print(f"{args.slots} LLM slots at ~{args.latency_ms:.0f} ms, {args.bulk} bulk clients, "
+          f"{args.chat_rate:g} chat turns/s, {args.seconds:g}s")
+    print(f"{'':10}{'chat p50':>10}{'chat p95':>10}{'chat max':>10}{'chat dropped':>14}{'letters/s':>11}")
+    for name, (scheduler, tagged) in arrangements.items():
+        results = run(scheduler, tagged, args)
+        chat = summarize(results.latencies['interactive'])
+        total_chat = chat['count'] + results.dropped['interactive']
+        letters = len(results.latencies['bulk']) / args.seconds
+        print(f"{name:10}{chat['p50']:>10.0f}{chat['p95']:>10.0f}{chat['max']:>10.0f}"
+              f"{results.dropped['interactive']:>8}/{total_chat:<5}{letters:>11.1f}")
+
+
+if __name__ == '__main__':
+    main()
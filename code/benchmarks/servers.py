@@ -0,0 +1,69 @@
+"""
+In-process servers for offline benchmarks: the legal assistant service on a
+FakeChatModel and the Django app on a throwaway SQLite database.
+"""
+import os
+import socket
+import threading
+import time
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def start_rag_service(port=None, llm=None):
+    """Run legal_assistant.app with uvicorn in a background thread; returns its /query URL"""
+    import uvicorn
+
+    os.environ.setdefault('LEGAL_AI_LLM', 'fake')
+    # Load from one address would trip the per-IP limit; benchmarks measure the service, not the limiter
+    for scope in ('USER', 'IP', 'GLOBAL'):
+        os.environ.setdefault(f'RAG_RATE_LIMIT_{scope}', '')
+    os.environ.setdefault('LLM_ADAPTIVE_CONCURRENCY', '0')
+    import legal_assistant
+    if llm is not None:
+        legal_assistant.set_llm(llm)
+
+    port = port or free_port()
+    server = uvicorn.Server(uvicorn.Config(legal_assistant.app, host='127.0.0.1', port=port, log_level='warning'))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.01)
+    return f'http://127.0.0.1:{port}/query'
+
+
+def start_django(rag_url=None, port=None, configure=None):
+    """
+    Run the Django app on a threaded WSGI server; returns its base URL.
+    `configure(settings)` runs after setup and before the middleware is loaded.
+    """
+    from .django_env import setup_django
+
+    if rag_url:
+        os.environ['RAG_SERVICE_URL'] = rag_url
+    setup_django()
+
+    from django.conf import settings
+    from django.core.servers.basehttp import ThreadedWSGIServer, WSGIRequestHandler
+    from django.core.wsgi import get_wsgi_application
+
+    if rag_url:
+        settings.RAG_SERVICE_URL = rag_url
+    settings.RATE_LIMITS = {}  # as for the RAG service above
+    settings.RAG_CONCURRENCY = {**settings.RAG_CONCURRENCY, 'ENABLED': False}
+    if configure:
+        configure(settings)
+
+    class QuietHandler(WSGIRequestHandler):
+        def log_message(self, *args):
+            pass
+
+    port = port or free_port()
+    httpd = ThreadedWSGIServer(('127.0.0.1', port), QuietHandler, allow_reuse_address=True)
+    httpd.daemon_threads = True
+    httpd.set_app(get_wsgi_application())
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    return f'http://127.0.0.1:{port}'
@@ -0,0 +1,74 @@
+"""
+Signup latency with the email outbox, against a slow local SMTP server.
+
+Compares the time a direct send_mail call takes (what signup used to wait
+for) with the signup request itself, then drains the outbox with the
+send_queued_email worker and reports how many SMTP connections it used.
+
+    python -m benchmarks.signup_latency --users 20 --connect-delay 1.0 --message-delay 0.2
+"""
+import argparse
+import time
+
+from .django_env import setup_django
+from .smtp_sink import SMTPSink
+from .stats import summarize
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--users', type=int, default=20)
+    parser.add_argument('--connect-delay', type=float, default=1.0)
+    parser.add_argument('--message-delay', type=float, default=0.2)
+    args = parser.parse_args()
+
+    sink = SMTPSink(connect_delay=args.connect_delay, message_delay=args.message_delay).start()
+    setup_django()
+
+    from django.conf import settings
+    from django.core.mail import send_mail
+    from django.core.management import call_command
+    from django.test import Client
+    from accounts.models import OutgoingEmail
+
+    settings.EMAIL_BACKEND = 'django.core.mail.backends.smtp.EmailBackend'
+    settings.EMAIL_HOST = '127.0.0.1'
+    settings.EMAIL_PORT = sink.port
+    settings.EMAIL_USE_TLS = False
+    settings.EMAIL_HOST_USER = settings.EMAIL_HOST_PASSWORD = ''
+    # PBKDF2 would dominate the signup time; this benchmark is about email
+    settings.PASSWORD_HASHERS = ['django.contrib.auth.hashers.MD5PasswordHasher']
+
+    direct = []
+    for i in range(3):
+        start = time.perf_counter()
+        send_mail('Verify your email address', 'body', settings.DEFAULT_FROM_EMAIL, [f'direct{i}@example.com'])
+        direct.append((time.perf_counter() - start) * 1000)
+
+    client = Client()
+    signup = []
+    for i in range(args.users):
+        start = time.perf_counter()
+        response = client.post('/accounts/signup/', {
+            'username': f'user{i}', 'first_name': 'Test', 'last_name': 'User',
+            'email': f'user{i}@example.com', 'password1': 'Str0ng-pass-123', 'password2': 'Str0ng-pass-123',
+        })
+        signup.append((time.perf_counter() - start) * 1000)
+        assert response.status_code == 302, response.status_code
+
+    connections_before = sink.connections
+    start = time.perf_counter()
+    call_command('send_queued_email', rate=0, batch_size=args.users, stdout=open('/dev/null', 'w'))
+    drain = time.perf_counter() - start
+
+    direct_stats, signup_stats = summarize(direct), summarize(signup)
+    print(f"SMTP stand-in: {args.connect_delay}s to connect, {args.message_delay}s per message")
+    print(f"direct send_mail   p50 {direct_stats['p50']:8.1f} ms   (what signup used to wait for)")
+    print(f"signup request     p50 {signup_stats['p50']:8.1f} ms   p95 {signup_stats['p95']:.1f} ms")
+    sent = OutgoingEmail.objects.filter(status=OutgoingEmail.STATUS_SENT).count()
+    print(f"worker sent {sent} messages in {drain:.2f}s over "
+          f"{sink.connections - connections_before} SMTP connection(s)")
+
+
+if __name__ == '__main__':
+    main()
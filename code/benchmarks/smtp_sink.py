@@ -0,0 +1,88 @@
+"""
+Local SMTP stand-in that accepts and discards mail, with injectable latency.
+
+    python -m benchmarks.smtp_sink --port 1025 --connect-delay 1.5 --message-delay 0.3
+
+Point Django at it with EMAIL_BACKEND=smtp, EMAIL_HOST=127.0.0.1,
+EMAIL_PORT=1025 and EMAIL_USE_TLS=False.
+"""
+import argparse
+import socketserver
+import threading
+import time
+
+
+class _Handler(socketserver.StreamRequestHandler):
+    def reply(self, text):
+        self.wfile.write(text.encode() + b'\r\n')
+
+    def handle(self):
+        server = self.server
+        with server.lock:
+            server.connections += 1
+        time.sleep(server.connect_delay)
+        self.reply('220 smtp-sink ready')
+        in_data = False
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            if in_data:
+                if line.rstrip(b'\r\n') == b'.':
+                    in_data = False
+                    time.sleep(server.message_delay)
+                    with server.lock:
+                        server.messages += 1
+                    self.reply('250 OK queued')
+                continue
+            command = line[:4].upper()
+            if command in (b'EHLO', b'HELO'):
+                self.reply('250-smtp-sink')
+                self.reply('250 8BITMIME')
+            elif command == b'DATA':
+                in_data = True
+                self.reply('354 End data with <CR><LF>.<CR><LF>')
+            elif command == b'QUIT':
+                self.reply('221 Bye')
+                return
+            else:
+                self.reply('250 OK')
+
+
+class SMTPSink(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, port=0, connect_delay=0.0, message_delay=0.0):
+        super().__init__(('127.0.0.1', port), _Handler)
+        self.connect_delay = connect_delay
+        self.message_delay = message_delay
+        self.connections = 0
+        self.messages = 0
+        self.lock = threading.Lock()
+
+    @property
+    def port(self):
+        return self.server_address[1]
+
+    def start(self):
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--port', type=int, default=1025)
+    parser.add_argument('--connect-delay', type=float, default=0.0, help='Seconds before the greeting')
+    parser.add_argument('--message-delay', type=float, default=0.0, help='Seconds to accept each message')
+    args = parser.parse_args()
+    sink = SMTPSink(args.port, args.connect_delay, args.message_delay)
+    print(f'SMTP sink listening on 127.0.0.1:{sink.port}')
+    try:
+        sink.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,158 @@
+"""
+Bytes transferred and time-to-render for chat.html on a cold and a warm
+browser cache, with the precompressed static pipeline.
+
+Collects static files into a temporary STATIC_ROOT, serves the app with
+DEBUG off, then loads /chat and its same-origin stylesheets and scripts the
+way a browser would:
+
+- uncompressed: no Accept-Encoding and no caching (what static() served)
+- cold: Accept-Encoding br/gzip, empty cache
+- warm: second visit; fresh (immutable) assets come from the cache and the
+  page itself is revalidated with If-None-Match
+
+Time-to-render is modelled for a slow link (--rtt-ms, --kbps): the page,
+then one more round trip for the render-blocking assets in <head>, which
+share the bandwidth. Third-party assets (fonts, the Tailwind Play CDN) are
+listed but not fetched.
+
+    python -m benchmarks.static_assets --rtt-ms 150 --kbps 1600
+"""
+import argparse
+import re
+import shutil
+import tempfile
+import time
+from html.parser import HTMLParser
+from urllib.parse import urljoin, urlparse
+
+import requests
+
+from .servers import start_django
+from .stats import header_bytes
+
+
+class AssetParser(HTMLParser):
+    """Collects stylesheets and scripts, noting which ones block rendering"""
+
+    def __init__(self):
+        super().__init__()
+        self.in_head = False
+        self.assets = []  # (url, blocking)
+
+    def handle_starttag(self, tag, attrs):
+        attrs = dict(attrs)
+        if tag == 'head':
+            self.in_head = True
+        elif tag == 'link' and attrs.get('rel') == 'stylesheet':
+            self.assets.append((attrs['href'], True))
+        elif tag == 'script' and attrs.get('src'):
+            blocking = self.in_head and 'defer' not in attrs and 'async' not in attrs
+            self.assets.append((attrs['src'], blocking))
+
+    def handle_endtag(self, tag):
+        if tag == 'head':
+            self.in_head = False
+
+
+class Browser:
+    """Just enough of a browser cache: max-age freshness and ETag revalidation"""
+
+    def __init__(self, compression=True, cache=True):
+        self.http = requests.Session()
+        self.http.headers['Accept-Encoding'] = 'br, gzip' if compression else 'identity'
+        self.use_cache = cache
+        self.cache = {}  # url -> (fresh until, etag, body)
+
+    def fetch(self, url):
+        """Returns (body, bytes on the wire, requests made)"""
+        cached = self.cache.get(url)
+        if cached and cached[0] > time.time():
+            return cached[2], 0, 0
+        headers = {'If-None-Match': cached[1]} if cached and cached[1] else {}
+        response = self.http.get(url, headers=headers, stream=True)
+        raw = response.raw.read(decode_content=False)
+        wire = len(raw) + header_bytes(response)
+        if response.status_code == 304:
+            body = cached[2]
+        else:
+            response.raise_for_status()
+            body = response.content if not raw else _decode(raw, response.headers.get('Content-Encoding'))
+        if self.use_cache:
+            max_age = re.search(r'max-age=(\d+)', response.headers.get('Cache-Control', ''))
+            fresh_until = time.time() + int(max_age.group(1)) if max_age else 0
+            self.cache[url] = (fresh_until, response.headers.get('ETag'), body)
+        return body, wire, 1
+
+
+def _decode(raw, encoding):
+    if encoding == 'gzip':
+        import gzip
+        return gzip.decompress(raw)
+    if encoding == 'br':
+        import brotli
+        return brotli.decompress(raw)
+    return raw
+
+
+def load_page(browser, page_url, rtt, bytes_per_second):
+    html, page_bytes, page_requests = browser.fetch(page_url)
+    parser = AssetParser()
+    parser.feed(html.decode())
+
+    origin = urlparse(page_url).netloc
+    total_bytes, total_requests, blocking_bytes, blocking_requests = page_bytes, page_requests, 0, 0
+    third_party = []
+    for src, blocking in parser.assets:
+        url = urljoin(page_url, src)
+        if urlparse(url).netloc != origin:
+            third_party.append(url)
+            continue
+        _, wire, made = browser.fetch(url)
+        total_bytes += wire
+        total_requests += made
+        if blocking:
+            blocking_bytes += wire
+            blocking_requests += made
+
+    render = rtt * page_requests + page_bytes / bytes_per_second
+    if blocking_requests:
+        render += rtt + blocking_bytes / bytes_per_second
+    return {'bytes': total_bytes, 'requests': total_requests, 'render_ms': render * 1000, 'third_party': third_party}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--rtt-ms', type=float, default=150)
+    parser.add_argument('--kbps', type=float, default=1600, help='Link speed in kilobits per second')
+    args = parser.parse_args()
+
+    static_root = tempfile.mkdtemp(prefix='bench-static-')
+
+    def configure(settings):
+        from django.core.management import call_command
+        settings.STATIC_ROOT = static_root
+        call_command('build_static', skip_tailwind=True, stdout=open('/dev/null', 'w'))
+        settings.DEBUG = False
+
+    try:
+        page_url = start_django(configure=configure) + '/chat'
+        rtt, bytes_per_second = args.rtt_ms / 1000, args.kbps * 1000 / 8
+
+        uncompressed = load_page(Browser(compression=False, cache=False), page_url, rtt, bytes_per_second)
+        browser = Browser()
+        cold = load_page(browser, page_url, rtt, bytes_per_second)
+        warm = load_page(browser, page_url, rtt, bytes_per_second)
+    finally:
+        shutil.rmtree(static_root, ignore_errors=True)
+
+    print(f"chat.html at {args.rtt_ms:.0f} ms RTT, {args.kbps:.0f} kbit/s")
+    print(f"{'visit':14}{'requests':>10}{'bytes':>10}{'render (ms)':>14}")
+    for name, result in (('uncompressed', uncompressed), ('cold', cold), ('warm', warm)):
+        print(f"{name:14}{result['requests']:>10}{result['bytes']:>10}{result['render_ms']:>14.0f}")
+    for url in cold['third_party']:
+        print(f"not measured (third party): {url}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,36 @@
+"""Small statistics helpers shared by the benchmark scripts"""
+import resource
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile; `values` need not be sorted"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(1, -(-len(ordered) * pct // 100))
+    return ordered[int(rank) - 1]
+
+
+def summarize(latencies_ms):
+    """count, mean and p50/p95/p99/max of a list of latencies in milliseconds"""
+    if not latencies_ms:
+        return {'count': 0, 'mean': 0.0, 'p50': 0.0, 'p95': 0.0, 'p99': 0.0, 'max': 0.0}
+    ordered = sorted(latencies_ms)
+    return {
+        'count': len(ordered),
+        'mean': sum(ordered) / len(ordered),
+        'p50': percentile(ordered, 50),
+        'p95': percentile(ordered, 95),
+        'p99': percentile(ordered, 99),
+        'max': ordered[-1],
+    }
+
+
+def peak_rss_mb():
+    """Peak resident set size of this process (Linux reports KiB)"""
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def header_bytes(response):
+    """Approximate size of a requests.Response's status line and headers on the wire"""
+    return 17 + sum(len(k) + len(v) + 4 for k, v in response.headers.items())
@@ -0,0 +1,108 @@
+"""
+Share of a query log answered by the statute lookup fast path.
+
+Replays questions through ai_jury.statutes (no LLM, no server) and prints
+the fraction answered from the statute table, the lookup time of hits and
+misses, and with --show the questions on each side. --log is a text file
+with one question per line, or JSON lines with a "question" field (as the
+chat export writes); without it a built-in sample of chat questions is
+replayed.
+
+    python -m benchmarks.statute_fast_path --log queries.txt --repeat 100 --show
+"""
+import argparse
+import json
+import time
+
+from ai_jury.statutes import STATUTES
+
+from .stats import summarize
+
+# Roughly the mix seen in the chat: a third plain citation lookups, the rest advice or interpretation
+SAMPLE_LOG = [
+    'What does Article 14 say?',
+    'Article 21',
+    'IPC 420',
+    'What is section 498A IPC?',
+    'Show me the text of Article 19(1)(a)',
+    'What is dowry death',
+    'Section 482 CrPC',
+    'what is an FIR',
+    'Article 32 and Article 226',
+    'What does the Seventh Schedule contain?',
+    'Punishment under section 302 of the Indian Penal Code',
+    'section 154 crpc',
+    'Does Article 21 include the right to privacy?',
+    'Can I file an FIR online?',
+    'My landlord will not return my deposit, what can I do?',
+    'How do I apply for anticipatory bail?',
+    'Explain 302 IPC with case law',
+    'Is a WhatsApp message admissible as evidence?',
+    'My employer has not paid salary for three months',
+    'What is the difference between Article 32 and Article 226?',
+    'Can police arrest without a warrant under section 41 CrPC?',
+    'How to get a divorce by mutual consent?',
+    'Article 356',
+    'section 420',
+    'Is cheque bounce a criminal offence?',
+    'Can my husband take my salary?',
+    'What are my rights if I am arrested?',
+    'How long does a consumer court case take?',
+    'Can a tenant be evicted without notice?',
+    'What is the limitation period for a civil suit?',
+]
+
+
+def load_log(path):
+    questions = []
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            if line.startswith('{'):
+                line = json.loads(line).get('question') or ''
+            if line:
+                questions.append(line)
+    return questions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--log', help='Questions to replay, one per line or JSON lines with "question"')
+    parser.add_argument('--repeat', type=int, default=100, help='Replays of the log, for stable timings')
+    parser.add_argument('--show', action='store_true', help='List the questions served and not served')
+    args = parser.parse_args()
+
+    questions = load_log(args.log) if args.log else SAMPLE_LOG
+    hits, misses = {}, {}
+    hit_us, miss_us = [], []
+    for _ in range(args.repeat):
+        for question in questions:
+            start = time.perf_counter()
+            answer = STATUTES.answer(question)
+            elapsed = (time.perf_counter() - start) * 1e6
+            if answer is None:
+                misses[question] = None
+                miss_us.append(elapsed)
+            else:
+                hits[question] = answer.citations
+                hit_us.append(elapsed)
+
+    served = sum(1 for q in questions if q in hits)
+    print(f"{len(questions)} questions, {len(STATUTES.provisions)} provisions in the table")
+    print(f"served by the fast path: {served} ({served / len(questions):.0%})")
+    for name, timings in (('hit', hit_us), ('miss', miss_us)):
+        stats = summarize(timings)
+        print(f"  {name:5} lookup  p50 {stats['p50']:6.1f} us  p99 {stats['p99']:6.1f} us  max {stats['max']:7.1f} us")
+    if args.show:
+        print('\nserved:')
+        for question, citations in hits.items():
+            print(f"  {question!r} -> {', '.join(f'{c.act} {c.kind} {c.number}' for c in citations)}")
+        print('\nleft to the LLM:')
+        for question in misses:
+            print(f"  {question!r}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,108 @@
+"""
+Precision, recall and latency of the off-topic pre-filter.
+
+With --model, scores that model on --data (labelled JSON lines, e.g. from
+``manage.py train_topic_classifier --dump``). Without it, k-fold cross
+validation: a model is trained on each --folds-1 parts of --data (the seed
+set by default) and scored on the remaining part, with the threshold picked
+the way the training command picks it.
+
+Precision is the share of rejected questions that really were off-topic
+(each miss is a legal question answered with the canned refusal); recall is
+the share of off-topic questions that skipped the LLM call. Also prints the
+per-question classifier latency.
+
+    python -m benchmarks.topic_classifier --folds 5 --show
+    python -m benchmarks.topic_classifier --model ai_jury/data/topic_model.json --data labelled.jsonl
+"""
+import argparse
+import random
+import time
+
+from ai_jury.topic import SEED_FILE, TopicClassifier, evaluate, load_examples
+
+from .stats import summarize
+
+THRESHOLDS = (0.5, 0.6, 0.7, 0.8, 0.9, 0.95)
+
+
+def folds(examples, k, seed=0):
+    """(train, test) for each of `k` stratified folds"""
+    rng = random.Random(seed)
+    parts = [[] for _ in range(k)]
+    for label in ('legal', 'off_topic'):
+        group = [e for e in examples if e[1] == label]
+        rng.shuffle(group)
+        for i, example in enumerate(group):
+            parts[i % k].append(example)
+    for i in range(k):
+        yield [e for j, part in enumerate(parts) if j != i for e in part], parts[i]
+
+
+def print_result(name, result):
+    print(f"  {name:>9}  precision {result['precision']:.3f}  recall {result['recall']:.3f}  "
+          f"(rejected {result['tp'] + result['fp']}, of them legal {result['fp']}; off-topic passed {result['fn']})")
+
+
+def add(total, result):
+    for key in ('tp', 'fp', 'fn', 'tn'):
+        total[key] = total.get(key, 0) + result[key]
+
+
+def rates(total):
+    rejected = total['tp'] + total['fp']
+    return dict(total, precision=total['tp'] / rejected if rejected else 1.0,
+                recall=total['tp'] / (total['tp'] + total['fn']) if total['tp'] + total['fn'] else 0.0)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--data', default=SEED_FILE)
+    parser.add_argument('--model', help='Score this saved model instead of cross-validating')
+    parser.add_argument('--folds', type=int, default=5)
+    parser.add_argument('--min-precision', type=float, default=0.98)
+    parser.add_argument('--show', action='store_true', help='List the misclassified questions')
+    args = parser.parse_args()
+
+    examples = load_examples(args.data)
+    print(f"{len(examples)} examples from {args.data}")
+    if args.model:
+        runs = [(TopicClassifier.load(args.model), examples)]
+    else:
+        runs = []
+        for train, test in folds(examples, args.folds):
+            held, tune = test[::2], test[1::2]
+            classifier = TopicClassifier.train(train)
+            classifier.choose_threshold(tune, args.min_precision)
+            runs.append((classifier, held))
+
+    chosen, fixed = {}, {threshold: {} for threshold in THRESHOLDS}
+    latencies_us = []
+    wrong = []
+    for classifier, test in runs:
+        add(chosen, evaluate(classifier, test))
+        for threshold in THRESHOLDS:
+            add(fixed[threshold], evaluate(classifier, test, threshold))
+        for text, label in test:
+            start = time.perf_counter()
+            off_topic = classifier.is_off_topic(text)
+            latencies_us.append((time.perf_counter() - start) * 1e6)
+            if off_topic != (label == 'off_topic'):
+                wrong.append((text, label, classifier.probability(text)))
+
+    thresholds = ', '.join(f'{c.threshold:.2f}' for c, _ in runs)
+    print(f"rejecting off-topic questions (positive class), threshold {thresholds}:")
+    print_result('chosen', rates(chosen))
+    for threshold, total in fixed.items():
+        print_result(f'at {threshold}', rates(total))
+    stats = summarize(latencies_us)
+    print(f"classifier latency per question: p50 {stats['p50']:.0f} us, p99 {stats['p99']:.0f} us, "
+          f"max {stats['max']:.0f} us")
+    if args.show:
+        print('\nmisclassified at the chosen threshold:')
+        for text, label, probability in sorted(wrong, key=lambda w: w[1]):
+            print(f"  {label:9} p(off-topic)={probability:.2f}  {text!r}")
+
+
+if __name__ == '__main__':
+    main()
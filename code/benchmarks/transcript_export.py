@@ -0,0 +1,171 @@
+"""
+Time and peak memory of exporting chat transcripts.
+
+Fills a database with --messages messages (sessions of --per-session
+messages, one message in fifty linked to an attachment) plus one session
+of --pdf-messages messages, then runs each export in its own process so
+that the peak RSS is the export's own:
+
+- startup: Django set up and nothing exported, the floor for the others
+- jsonl, csv: manage.py export_transcripts over every session, to /dev/null
+- endpoint: GET /admin/chat/export.jsonl through the test client, reading
+  the whole stream
+- pdf: the long session as a PDF
+- in memory (--in-memory): every message loaded into a list and dumped as
+  one JSON document, what an export without streaming would do; at 10M
+  messages it needs tens of GB
+
+    python -m benchmarks.transcript_export --messages 10000000 --db /tmp/export-bench.sqlite3
+"""
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+
+from .django_env import CODE_DIR, setup_django
+from .stats import peak_rss_mb
+
+QUESTION = "My landlord kept the deposit of Rs {n},000 after I left. Can I send a notice under Section {s}?"
+ANSWER = ("### Recovering a security deposit\n\nYes. Send a **legal notice** demanding the Rs {n},000 within 15 days, "
+          "citing Section {s} and the rent agreement.\n\n1. Keep proof of the handover.\n2. File in the civil court "
+          "or consumer forum if there is no reply.")
+PDF_SESSION = uuid.UUID(int=2 ** 127)
+ATTACHMENT_ID = uuid.UUID(int=1)
+
+
+def fill(connection, session_ids, per_session, rng, start):
+    """Insert `per_session` messages into each new session; returns the number inserted"""
+    step = timedelta(seconds=30)
+    inserted = 0
+    sessions, messages, links = [], [], []
+
+    def flush():
+        with connection.cursor() as cursor:
+            cursor.executemany('INSERT INTO search_app_chatsession (id, title, created_at, updated_at) '
+                               'VALUES (%s, %s, %s, %s)', sessions)
+            cursor.executemany('INSERT INTO search_app_chatmessage (id, session_id, content, is_user, timestamp, '
+                               'thinking_time, content_html) VALUES (%s, %s, %s, %s, %s, %s, %s)', messages)
+            cursor.executemany('INSERT INTO search_app_chatmessage_attachments (chatmessage_id, attachment_id) '
+                               'VALUES (%s, %s)', links)
+        sessions.clear()
+        messages.clear()
+        links.clear()
+
+    for number, session_id in enumerate(session_ids):
+        moment = start + timedelta(minutes=number)
+        sessions.append((session_id.hex, f'Security deposit {number}', moment, moment))
+        for i in range(per_session):
+            n, s = rng.randrange(10, 99), rng.randrange(100, 511)
+            message_id = uuid.UUID(int=rng.getrandbits(128)).hex
+            is_user = i % 2 == 0
+            messages.append((message_id, session_id.hex, (QUESTION if is_user else ANSWER).format(n=n, s=s),
+                             is_user, (moment + step * i).strftime('%Y-%m-%d %H:%M:%S.%f'),
+                             None if is_user else 2.5, ''))
+            if rng.random() < 0.02:
+                links.append((message_id, ATTACHMENT_ID.hex))
+        inserted += per_session
+        if len(messages) >= 50_000:
+            flush()
+    flush()
+    return inserted
+
+
+def prepare(args):
+    from django.db import connection
+    from search_app.models import Attachment, ChatMessage, ChatSession
+
+    if not Attachment.objects.filter(id=ATTACHMENT_ID).exists():
+        attachment = Attachment(id=ATTACHMENT_ID, sha256='0' * 64, filename='rent-agreement.pdf')
+        attachment.text = 'This rent agreement is made between the landlord and the tenant. ' * 50
+        attachment.save()
+    rng = random.Random(0)
+    start = datetime(2025, 1, 1, tzinfo=timezone.utc)
+    have = ChatMessage.objects.exclude(session_id=PDF_SESSION).count()
+    if have < args.messages:
+        first = have // args.per_session
+        total = args.messages // args.per_session
+        print(f"Filling {args.messages - have:,} messages", flush=True)
+        started = time.monotonic()
+        for block in range(first, total, 10_000):
+            ids = [uuid.UUID(int=n + 2) for n in range(block, min(block + 10_000, total))]
+            fill(connection, ids, args.per_session, rng, start)
+            print(f"  {min(block + 10_000, total) * args.per_session:,} messages, "
+                  f"{time.monotonic() - started:.0f}s", flush=True)
+    if not ChatSession.objects.filter(id=PDF_SESSION).exists():
+        fill(connection, [PDF_SESSION], args.pdf_messages, rng, start)
+    with connection.cursor() as cursor:
+        cursor.execute('ANALYZE')
+
+
+def child(name, args):
+    """Run one export in this process and print its time, output size and peak RSS as JSON"""
+    setup_django(args.db)
+    from django.conf import settings
+    from django.contrib.auth.models import User
+    from django.core.management import call_command
+    from django.test import Client
+    from search_app.models import ChatMessage
+
+    started = time.perf_counter()
+    size = 0
+    if name in ('jsonl', 'csv'):
+        call_command('export_transcripts', '--format', name, '--output', os.devnull, stdout=open(os.devnull, 'w'))
+    elif name == 'pdf':
+        call_command('export_transcripts', '--format', 'pdf', '--session', str(PDF_SESSION),
+                     '--output', os.devnull, stdout=open(os.devnull, 'w'))
+    elif name == 'endpoint':
+        settings.ALLOWED_HOSTS = ['*']
+        user = User.objects.filter(is_superuser=True).first() or User.objects.create_superuser('bench', '', 'bench')
+        client = Client()
+        client.force_login(user)
+        started = time.perf_counter()
+        response = client.get('/admin/chat/export.jsonl')
+        assert response.status_code == 200, response.status_code
+        for chunk in response.streaming_content:
+            size += len(chunk)
+    elif name == 'in memory':
+        messages = list(ChatMessage.objects.select_related('session').order_by('session_id', 'timestamp'))
+        size = len(json.dumps([{'id': str(m.id), 'session': m.session.title, 'content': m.content,
+                                'timestamp': m.timestamp.isoformat()} for m in messages]))
+    print(json.dumps({'seconds': time.perf_counter() - started, 'bytes': size, 'rss_mb': peak_rss_mb()}))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--messages', type=int, default=10_000_000)
+    parser.add_argument('--per-session', type=int, default=20, help='Messages per chat session')
+    parser.add_argument('--pdf-messages', type=int, default=20_000, help='Messages in the session exported as PDF')
+    parser.add_argument('--in-memory', action='store_true', help='Also time loading everything into memory')
+    parser.add_argument('--db', help='Database file to create or reuse (default: a temporary file)')
+    parser.add_argument('--child', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        return child(args.child, args)
+
+    args.db = setup_django(args.db)
+    prepare(args)
+    names = ['startup', 'jsonl', 'csv', 'endpoint', 'pdf'] + (['in memory'] if args.in_memory else [])
+    print(f"\n{args.messages:,} messages in sessions of {args.per_session}; PDF of {args.pdf_messages:,} messages")
+    print(f"{'':12}{'seconds':>10}{'messages/s':>12}{'peak RSS MB':>13}")
+    for name in names:
+        result = subprocess.run(
+            [sys.executable, '-m', 'benchmarks.transcript_export', '--child', name, '--db', args.db],
+            cwd=CODE_DIR, capture_output=True, text=True,
+        )
+        if result.returncode:
+            print(f"{name:12} failed: {result.stderr.strip().splitlines()[-1]}")
+            continue
+        stats = json.loads(result.stdout.strip().splitlines()[-1])
+        count = {'startup': 0, 'pdf': args.pdf_messages}.get(name, args.messages)
+        rate = f"{count / stats['seconds']:>12,.0f}" if count and stats['seconds'] else f"{'':12}"
+        print(f"{name:12}{stats['seconds']:>10.1f}{rate}{stats['rss_mb']:>13.0f}", flush=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,295 @@
+"""
+Peak memory and time-to-answer of a chat message with a large PDF attached.
+
+Writes a PDF of --pages pages (a paragraph of text and an uncompressed
+--image-kb image on each, like a scanned case file with an OCR layer), and
+runs each way of sending it with a question in its own process, the Django
+app on a threaded WSGI server and the client sending at --mbps:
+
+- multipart: the file in the send_message request, as the chat page used to
+- chunked: the resumable upload API in --chunk-mb chunks, then send_message
+  with the upload's id; PDF pages are extracted while the file arrives
+- chunked, no early: the same with UPLOAD_EARLY_EXTRACTION off
+- resumed: chunked, with the connection dropped halfway through a chunk
+  and the upload resumed from the offset the server reports
+
+The RAG service is a stub that answers at once, so time-to-answer is the
+upload, the extraction and the database. Peak RSS is the whole process,
+server and client; the client never holds more than one 64 KB block.
+
+    python -m benchmarks.upload_latency --pages 300 --image-kb 330 --mbps 10
+"""
+import argparse
+import hashlib
+import http.client
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit
+
+from .django_env import CODE_DIR
+from .stats import peak_rss_mb
+
+BLOCK = 64 * 1024
+QUESTION = 'Summarise the charges and the evidence in this case file.'
+WORDS = (
+    'court petition appellant respondent section article constitution tribunal order '
+    'evidence witness hearing judgment decree clause contract agreement liability '
+    'damages notice plaintiff defendant bail custody offence accused statute provision '
+    'jurisdiction appeal writ mandamus certiorari habeas corpus property tenancy lease'
+).split()
+MODES = ['multipart', 'chunked', 'chunked, no early', 'resumed']
+
+
+def make_pdf(path, pages, image_bytes, seed=0):
+    """A PDF whose page tree, catalog and cross-reference table come after every page, as most writers put them"""
+    rng = random.Random(seed)
+    offsets = {}
+    side = int(image_bytes ** 0.5)
+    with open(path, 'wb') as f:
+        def obj(number, body, stream=None):
+            offsets[number] = f.tell()
+            f.write(f'{number} 0 obj\n'.encode() + body)
+            if stream is not None:
+                f.write(b'\nstream\n' + stream + b'\nendstream')
+            f.write(b'\nendobj\n')
+
+        f.write(b'%PDF-1.4\n%\xe2\xe3\xcf\xd3\n')
+        obj(3, b'<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>')
+        kids = []
+        for page in range(pages):
+            image, content, number = 4 + page * 3, 5 + page * 3, 6 + page * 3
+            pixels = rng.randbytes(side * side)
+            obj(image, f'<< /Type /XObject /Subtype /Image /Width {side} /Height {side} /ColorSpace /DeviceGray '
+                       f'/BitsPerComponent 8 /Length {len(pixels)} >>'.encode(), pixels)
+            lines = [' '.join(rng.choice(WORDS) for _ in range(12)) for _ in range(30)]
+            text = '\n'.join(f'({line}) \'' for line in lines)
+            commands = f'q 495 0 0 300 50 480 cm /Im0 Do Q\nBT /F1 10 Tf 13 TL 50 450 Td\n{text}\nET'.encode()
+            obj(content, f'<< /Length {len(commands)} >>'.encode(), commands)
+            obj(number, (f'<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] /Contents {content} 0 R '
+                         f'/Resources << /Font << /F1 3 0 R >> /XObject << /Im0 {image} 0 R >> >> >>').encode())
+            kids.append(number)
+        obj(2, f'<< /Type /Pages /Count {pages} /Kids [{" ".join(f"{k} 0 R" for k in kids)}] >>'.encode())
+        obj(1, b'<< /Type /Catalog /Pages 2 0 R >>')
+        xref = f.tell()
+        size = max(offsets) + 1
+        f.write(f'xref\n0 {size}\n0000000000 65535 f \n'.encode())
+        f.write(''.join(f'{offsets[n]:010d} 00000 n \n' for n in range(1, size)).encode())
+        f.write(f'trailer\n<< /Size {size} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n'.encode())
+    return os.path.getsize(path)
+
+
+def start_stub_rag():
+    """A RAG_SERVICE_URL that answers every question at once"""
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            self.rfile.read(int(self.headers.get('Content-Length') or 0))
+            body = json.dumps({'status': 'success', 'answer': 'The case file concerns a tenancy dispute.'}).encode()
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return f'http://127.0.0.1:{server.server_address[1]}/query'
+
+
+class Throttle:
+    """Paces the client to `rate` bytes a second over the whole run"""
+
+    def __init__(self, rate):
+        self.rate = rate
+        self.started = time.monotonic()
+        self.sent = 0
+
+    def wait(self, n):
+        self.sent += n
+        ahead = self.sent / self.rate - (time.monotonic() - self.started)
+        if ahead > 0:
+            time.sleep(ahead)
+
+
+def file_blocks(f, length, throttle):
+    while length > 0:
+        data = f.read(min(BLOCK, length))
+        if not data:
+            return
+        throttle.wait(len(data))
+        yield data
+        length -= len(data)
+
+
+def call(base_url, method, path, body=None, headers=None):
+    """Send a request and return (status, decoded JSON)"""
+    url = urlsplit(base_url)
+    conn = http.client.HTTPConnection(url.hostname, url.port, timeout=300)
+    if isinstance(body, dict):
+        body = json.dumps(body).encode()
+        headers = {'Content-Type': 'application/json', **(headers or {})}
+    conn.request(method, path, body=body, headers=headers or {})
+    response = conn.getresponse()
+    data = response.read()
+    conn.close()
+    return response.status, json.loads(data) if data else None
+
+
+def send_multipart(base_url, path, throttle):
+    boundary = 'benchmark-boundary'
+    head = (f'--{boundary}\r\nContent-Disposition: form-data; name="message"\r\n\r\n{QUESTION}\r\n'
+            f'--{boundary}\r\nContent-Disposition: form-data; name="attachments"; filename="case-file.pdf"\r\n'
+            f'Content-Type: application/pdf\r\n\r\n').encode()
+    tail = f'\r\n--{boundary}--\r\n'.encode()
+    size = os.path.getsize(path)
+
+    sent = {}
+
+    def body():
+        yield head
+        with open(path, 'rb') as f:
+            yield from file_blocks(f, size, throttle)
+        yield tail
+        sent['last_byte'] = time.monotonic()
+
+    status, data = call(base_url, 'POST', '/api/chat/send/', body(), {
+        'Content-Type': f'multipart/form-data; boundary={boundary}',
+        'Content-Length': str(len(head) + size + len(tail)),
+    })
+    assert status == 200 and 'error' not in data, data
+    return {**sent, 'text_length': data['user_message']['attachments'][0]['text_length']}
+
+
+def drop_mid_chunk(base_url, upload_id, offset, chunk):
+    """Send half of a chunk and close the connection, as a dropped network would"""
+    url = urlsplit(base_url)
+    with socket.create_connection((url.hostname, url.port)) as sock:
+        sock.sendall((f'PATCH /api/chat/uploads/{upload_id}/ HTTP/1.1\r\nHost: {url.hostname}\r\n'
+                      f'Upload-Offset: {offset}\r\nContent-Length: {len(chunk)}\r\n\r\n').encode())
+        sock.sendall(chunk[:len(chunk) // 2])
+    return len(chunk) // 2
+
+
+def send_chunked(base_url, path, throttle, chunk_size, drop=False):
+    size = os.path.getsize(path)
+    status, data = call(base_url, 'POST', '/api/chat/uploads/', {
+        'filename': 'case-file.pdf', 'content_type': 'application/pdf', 'size': size,
+    })
+    assert status == 201, data
+    upload_id = data['upload_id']
+    wasted = 0
+    with open(path, 'rb') as f:
+        offset = 0
+        while offset < size:
+            f.seek(offset)
+            chunk = f.read(min(chunk_size, size - offset))
+            if drop and offset + len(chunk) >= size // 2:
+                drop = False
+                throttle.wait(len(chunk) // 2)
+                wasted += drop_mid_chunk(base_url, upload_id, offset, chunk)
+                # Resume from wherever the server got to
+                status, data = call(base_url, 'GET', f'/api/chat/uploads/{upload_id}/')
+                offset = data['offset']
+                continue
+            checksum = hashlib.sha256(chunk).hexdigest()
+            pieces = (chunk[i:i + BLOCK] for i in range(0, len(chunk), BLOCK))
+            status, data = call(base_url, 'PATCH', f'/api/chat/uploads/{upload_id}/',
+                                (throttle.wait(len(p)) or p for p in pieces), {
+                                    'Upload-Offset': str(offset), 'Upload-Checksum': f'sha256 {checksum}',
+                                    'Content-Length': str(len(chunk)),
+                                })
+            assert status == 200, data
+            offset = data['offset']
+    last_byte = time.monotonic()
+    status, data = call(base_url, 'POST', f'/api/chat/uploads/{upload_id}/complete/')
+    assert status == 200, data
+    status, data = call(base_url, 'POST', '/api/chat/send/', {'message': QUESTION, 'upload_ids': [upload_id]})
+    assert status == 200 and 'error' not in data, data
+    return {'last_byte': last_byte, 'resent_mb': wasted / 2 ** 20,
+            'text_length': data['user_message']['attachments'][0]['text_length']}
+
+
+def child(mode, args):
+    """Run one mode in this process and print its timings and peak RSS as JSON"""
+    from .servers import start_django
+
+    upload_dir = tempfile.mkdtemp(prefix='uploads-')
+
+    def configure(settings):
+        settings.ALLOWED_HOSTS = ['*']
+        settings.UPLOAD_DIR = upload_dir
+        settings.UPLOAD_EARLY_EXTRACTION = mode != 'chunked, no early'
+
+    base_url = start_django(rag_url=start_stub_rag(), configure=configure)
+    from search_app.uploads import UPLOAD_PAGES
+
+    throttle = Throttle(args.mbps * 2 ** 20)
+    started = time.monotonic()
+    if mode == 'multipart':
+        result = send_multipart(base_url, args.pdf, throttle)
+    else:
+        result = send_chunked(base_url, args.pdf, throttle, args.chunk_mb * 2 ** 20, drop=mode == 'resumed')
+    answered = time.monotonic()
+    pages = UPLOAD_PAGES.values()
+    print(json.dumps({
+        'upload_s': result['last_byte'] - started,
+        'after_s': answered - result['last_byte'],
+        'total_s': answered - started,
+        'early_pages': pages.get(('early',), 0),
+        'text_length': result['text_length'],
+        'resent_mb': result.get('resent_mb', 0),
+        'rss_mb': peak_rss_mb(),
+    }))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--pages', type=int, default=300)
+    parser.add_argument('--image-kb', type=int, default=330, help='Size of the image on each page')
+    parser.add_argument('--mbps', type=float, default=10.0, help='Client upload speed in MB a second')
+    parser.add_argument('--chunk-mb', type=int, default=4)
+    parser.add_argument('--modes', nargs='*', default=MODES, choices=MODES)
+    parser.add_argument('--pdf', help=argparse.SUPPRESS)
+    parser.add_argument('--child', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        return child(args.child, args)
+
+    fd, args.pdf = tempfile.mkstemp(prefix='case-file-', suffix='.pdf')
+    os.close(fd)
+    try:
+        size = make_pdf(args.pdf, args.pages, args.image_kb * 1024)
+        print(f"{size / 2 ** 20:.0f} MB PDF of {args.pages} pages sent at {args.mbps:g} MB/s "
+              f"({size / 2 ** 20 / args.mbps:.1f}s on the wire)")
+        print(f"{'':19}{'upload s':>10}{'answer after s':>16}{'total s':>9}{'early pages':>13}"
+              f"{'resent MB':>11}{'text chars':>12}{'peak RSS MB':>13}")
+        for mode in args.modes:
+            result = subprocess.run(
+                [sys.executable, '-m', 'benchmarks.upload_latency', '--child', mode, '--pdf', args.pdf,
+                 '--mbps', str(args.mbps), '--chunk-mb', str(args.chunk_mb)],
+                cwd=CODE_DIR, capture_output=True, text=True,
+            )
+            if result.returncode:
+                print(f"{mode:19} failed: {result.stderr.strip().splitlines()[-1]}")
+                continue
+            stats = json.loads(result.stdout.strip().splitlines()[-1])
+            print(f"{mode:19}{stats['upload_s']:>10.1f}{stats['after_s']:>16.1f}{stats['total_s']:>9.1f}"
+                  f"{stats['early_pages']:>13}{stats['resent_mb']:>11.1f}{stats['text_length']:>12,}"
+                  f"{stats['rss_mb']:>13.0f}", flush=True)
+    finally:
+        os.remove(args.pdf)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,114 @@
+import time
+from datetime import timedelta
+
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from accounts.models import OutgoingEmail
+
+# Seconds a claimed message stays reserved for its sender, on top of the batch's rate-limited send time
+CLAIM_SECONDS = 300
+
+
+class Command(BaseCommand):
+    help = "Send queued emails in batches over one SMTP connection, with retries and rate limiting"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=50)
+        parser.add_argument('--rate', type=float, default=5.0,
+                            help='Maximum messages per second (0 for no limit)')
+        parser.add_argument('--max-attempts', type=int, default=5)
+        parser.add_argument('--loop', action='store_true', help='Keep polling for new messages')
+        parser.add_argument('--poll-interval', type=float, default=5.0, help='Seconds between polls with --loop')
+
+    def handle(self, *args, **options):
+        while True:
+            sent, failed = self.send_batch(options['batch_size'], options['rate'], options['max_attempts'])
+            if sent or failed:
+                self.stdout.write(f"Sent {sent}, failed {failed}")
+            if not options['loop']:
+                return
+            if sent + failed < options['batch_size']:
+                time.sleep(options['poll_interval'])
+
+    def send_batch(self, batch_size, rate, max_attempts):
+        now = timezone.now()
+        # Pending messages that are due, and ones a sender that died left claimed
+        batch = list(
+            OutgoingEmail.objects.filter(
+                status__in=[OutgoingEmail.STATUS_PENDING, OutgoingEmail.STATUS_SENDING],
+                next_attempt_at__lte=now,
+            ).order_by('next_attempt_at')[:batch_size]
+        )
+        if not batch:
+            return 0, 0
+
+        # One SMTP connection (and TLS handshake/login) for the whole batch
+        connection = get_connection()
+        try:
+            connection.open()
+        except Exception as e:
+            # The server is down; that's not the messages' fault, so no attempt is used up
+            self.stderr.write(f"Could not connect to the mail server: {e}")
+            return 0, 0
+
+        interval = 1 / rate if rate > 0 else 0
+        batch = self.claim(batch, now, timedelta(seconds=CLAIM_SECONDS + len(batch) * interval))
+
+        sent = failed = 0
+        try:
+            for email in batch:
+                started = time.monotonic()
+                message = EmailMultiAlternatives(
+                    subject=email.subject,
+                    body=email.body,
+                    from_email=email.from_email,
+                    to=[email.to],
+                    connection=connection,
+                )
+                if email.html_body:
+                    message.attach_alternative(email.html_body, 'text/html')
+
+                email.attempts += 1
+                try:
+                    message.send()
+                except Exception as e:
+                    failed += 1
+                    email.last_error = str(e)
+                    if email.attempts >= max_attempts:
+                        email.status = OutgoingEmail.STATUS_FAILED
+                    else:
+                        email.status = OutgoingEmail.STATUS_PENDING
+                        # Exponential backoff: 30s, 1m, 2m, ... capped at an hour
+                        backoff = min(3600, 30 * 2 ** (email.attempts - 1))
+                        email.next_attempt_at = timezone.now() + timedelta(seconds=backoff)
+                else:
+                    sent += 1
+                    email.status = OutgoingEmail.STATUS_SENT
+                    email.sent_at = timezone.now()
+                    email.last_error = ''
+                email.save(update_fields=['status', 'attempts', 'last_error', 'next_attempt_at', 'sent_at'])
+
+                if interval:
+                    time.sleep(max(0, interval - (time.monotonic() - started)))
+        finally:
+            connection.close()
+        return sent, failed
+
+    def claim(self, batch, now, lease):
+        """
+        The messages of `batch` this sender won. Each is claimed with a
+        conditional update, so concurrent senders (e.g. two --loop processes)
+        never send the same message; the claim lapses after `lease`.
+        """
+        claimed = []
+        for email in batch:
+            won = OutgoingEmail.objects.filter(
+                id=email.id, status=email.status, next_attempt_at=email.next_attempt_at,
+            ).update(status=OutgoingEmail.STATUS_SENDING, next_attempt_at=now + lease)
+            if won:
+                email.status = OutgoingEmail.STATUS_SENDING
+                email.next_attempt_at = now + lease
+                claimed.append(email)
+        return claimed
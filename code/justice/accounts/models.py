@@ -14,4 +14,38 @@ class EmailVerification(models.Model):
         return (timezone.now() - self.created_at).days > expiration_days
 
     def __str__(self):
-        return f"{self.user.username} - {'Verified' if self.is_verified else 'Pending'}"
\ No newline at end of file
+        return f"{self.user.username} - {'Verified' if self.is_verified else 'Pending'}"
+
+
+class OutgoingEmail(models.Model):
+    """Rendered email waiting to be sent by the send_queued_email command"""
+    STATUS_PENDING = 'pending'
+    STATUS_SENDING = 'sending'
+    STATUS_SENT = 'sent'
+    STATUS_FAILED = 'failed'
+    STATUS_CHOICES = [
+        (STATUS_PENDING, 'Pending'),
+        (STATUS_SENDING, 'Sending'),
+        (STATUS_SENT, 'Sent'),
+        (STATUS_FAILED, 'Failed'),
+    ]
+
+    to = models.EmailField()
+    from_email = models.CharField(max_length=255)
+    subject = models.CharField(max_length=255)
+    body = models.TextField()
+    html_body = models.TextField(blank=True)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=STATUS_PENDING)
+    attempts = models.PositiveIntegerField(default=0)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    # When to try next; while sending, when the claim lapses if the sender died
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['created_at']
+        indexes = [models.Index(fields=['status', 'next_attempt_at'])]
+
+    def __str__(self):
+        return f"{self.subject} -> {self.to} ({self.status})"
\ No newline at end of file
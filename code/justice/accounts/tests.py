@@ -1,3 +1,153 @@
-from django.test import TestCase
+from datetime import timedelta
+from io import StringIO
+from smtplib import SMTPException
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.contrib.messages.storage.fallback import FallbackStorage
+from django.core import mail
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from .decorators import email_verification_required
+from .management.commands.send_queued_email import Command as SendQueuedEmail
+from .models import EmailVerification, OutgoingEmail
+from .utils import _verification_cache_key, queue_email
+
+
+@email_verification_required
+def protected(request):
+    return HttpResponse('ok')
+
+
+class EmailVerificationRequiredTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('asha', 'asha@example.com', 'pw-12345-long')
+
+    def get(self, user):
+        request = RequestFactory().get('/protected/')
+        request.user = user
+        request.session = {}
+        request._messages = FallbackStorage(request)
+        return protected(request)
+
+    def test_verified_user_costs_no_queries_once_cached(self):
+        EmailVerification.objects.create(user=self.user, is_verified=True)
+        self.assertEqual(self.get(self.user).status_code, 200)
+        with self.assertNumQueries(0):
+            self.assertEqual(self.get(self.user).status_code, 200)
+
+    def test_unverified_user_is_redirected_and_cached(self):
+        EmailVerification.objects.create(user=self.user)
+        self.assertEqual(self.get(self.user).status_code, 302)
+        with self.assertNumQueries(0):
+            self.assertEqual(self.get(self.user).url, reverse('profile'))
+
+    def test_missing_record_counts_as_unverified_without_a_write(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.get(self.user)
+        self.assertEqual(response.status_code, 302)
+        self.assertFalse(EmailVerification.objects.exists())
+        self.assertTrue(all(query['sql'].startswith('SELECT') for query in queries.captured_queries))
+
+    def test_verify_email_invalidates_cached_status(self):
+        verification = EmailVerification.objects.create(user=self.user)
+        self.assertEqual(self.get(self.user).status_code, 302)
+
+        self.client.get(reverse('verify_email', args=[verification.token]))
+
+        self.assertIsNone(cache.get(_verification_cache_key(self.user.pk)))
+        self.assertEqual(self.get(self.user).status_code, 200)
+        with CaptureQueriesContext(connection) as queries:
+            self.get(self.user)
+        self.assertEqual(len(queries), 0)
+
+    def test_resend_verification_invalidates_cached_status(self):
+        EmailVerification.objects.create(user=self.user)
+        self.get(self.user)
+        self.assertIs(cache.get(_verification_cache_key(self.user.pk)), False)
+
+        self.client.post(reverse('resend_verification'), {'email': self.user.email})
+
+        self.assertIsNone(cache.get(_verification_cache_key(self.user.pk)))
+
+
+@override_settings(EMAIL_BACKEND='django.core.mail.backends.locmem.EmailBackend')
+class SendQueuedEmailTests(TestCase):
+    def send(self, *args):
+        call_command('send_queued_email', '--rate', '0', *args, stdout=StringIO(), stderr=StringIO())
+
+    def queue(self):
+        return queue_email('Verify your email address', '<p>Hello</p>', 'asha@example.com')
+
+    def test_sends_pending_email(self):
+        email = self.queue()
+        self.send()
+
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].alternatives[0][0], '<p>Hello</p>')
+        email.refresh_from_db()
+        self.assertEqual((email.status, email.attempts), (OutgoingEmail.STATUS_SENT, 1))
+
+    def test_failed_send_backs_off(self):
+        email = self.queue()
+        with mock.patch('django.core.mail.backends.locmem.EmailBackend.send_messages',
+                        side_effect=SMTPException('mailbox unavailable')):
+            self.send()
+
+        email.refresh_from_db()
+        self.assertEqual((email.status, email.attempts), (OutgoingEmail.STATUS_PENDING, 1))
+        self.assertEqual(email.last_error, 'mailbox unavailable')
+        self.assertGreater(email.next_attempt_at, timezone.now() + timedelta(seconds=25))
+
+    def test_fails_for_good_at_max_attempts(self):
+        email = self.queue()
+        OutgoingEmail.objects.filter(id=email.id).update(attempts=2)
+        with mock.patch('django.core.mail.backends.locmem.EmailBackend.send_messages',
+                        side_effect=SMTPException('mailbox unavailable')):
+            self.send('--max-attempts', '3')
+
+        email.refresh_from_db()
+        self.assertEqual((email.status, email.attempts), (OutgoingEmail.STATUS_FAILED, 3))
+
+    def test_connection_failure_uses_no_attempt(self):
+        email = self.queue()
+        with mock.patch('django.core.mail.backends.locmem.EmailBackend.open', side_effect=OSError('refused')):
+            self.send()
+
+        self.assertEqual(mail.outbox, [])
+        email.refresh_from_db()
+        self.assertEqual((email.status, email.attempts), (OutgoingEmail.STATUS_PENDING, 0))
+
+    def test_email_claimed_by_another_sender_is_skipped(self):
+        email = self.queue()
+        OutgoingEmail.objects.filter(id=email.id).update(status=OutgoingEmail.STATUS_SENDING,
+                                                         next_attempt_at=timezone.now() + timedelta(minutes=5))
+        self.send()
+        self.assertEqual(mail.outbox, [])
+
+        # The claim lapses if that sender died
+        OutgoingEmail.objects.filter(id=email.id).update(next_attempt_at=timezone.now())
+        self.send()
+        self.assertEqual(len(mail.outbox), 1)
+
+    def test_lost_claim_is_not_sent(self):
+        email = self.queue()
+        claim = SendQueuedEmail.claim
+
+        def race(command, batch, now, lease):
+            # Another sender claims the message between the select and this claim
+            OutgoingEmail.objects.filter(id=email.id).update(status=OutgoingEmail.STATUS_SENDING,
+                                                             next_attempt_at=now + lease)
+            return claim(command, batch, now, lease)
+
+        with mock.patch.object(SendQueuedEmail, 'claim', race):
+            self.send()
+        self.assertEqual(mail.outbox, [])
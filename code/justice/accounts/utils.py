@@ -1,11 +1,54 @@
-from django.core.mail import send_mail
+from django.core.cache import cache
 from django.template.loader import render_to_string
 from django.utils.html import strip_tags
 from django.conf import settings
 
+from ai_jury.metrics import record_cache_lookup
+from .models import EmailVerification, OutgoingEmail
+
+# Verified is final, so it is cached until invalidated; unverified is re-checked
+# periodically in case the user verified through another worker
+UNVERIFIED_CACHE_TIMEOUT = 300
+
+def _verification_cache_key(user_id):
+    return f'accounts:email_verified:{user_id}'
+
+def is_email_verified(user):
+    """
+    Cached check of the user's email verification status. A read only: users
+    without a verification record (e.g. from createsuperuser) count as
+    unverified, and the profile page creates their record.
+    """
+    key = _verification_cache_key(user.pk)
+    verified = cache.get(key)
+    record_cache_lookup('email_verification', verified is not None)
+    if verified is None:
+        verified = bool(EmailVerification.objects.filter(user=user).values_list('is_verified', flat=True).first())
+        cache.set(key, verified, None if verified else UNVERIFIED_CACHE_TIMEOUT)
+    return verified
+
+def invalidate_email_verification(user):
+    """
+    Drop the cached verification status after it changes
+    """
+    cache.delete(_verification_cache_key(user.pk))
+
+def queue_email(subject, html_message, recipient):
+    """
+    Add a rendered email to the outbox; the send_queued_email command delivers it.
+    Keeps SMTP latency and failures out of the request.
+    """
+    return OutgoingEmail.objects.create(
+        to=recipient,
+        from_email=settings.DEFAULT_FROM_EMAIL,
+        subject=subject,
+        body=strip_tags(html_message),
+        html_body=html_message,
+    )
+
 def send_verification_email(user, verification_token, request):
     """
-    Send email verification link to user
+    Queue the email verification link for the user
     """
     verification_url = request.build_absolute_uri(
         f'/accounts/verify-email/{verification_token.token}/'
@@ -19,20 +62,11 @@ def send_verification_email(user, verification_token, request):
         'verification_url': verification_url,
     })
     
-    plain_message = strip_tags(html_message)
-    
-    send_mail(
-        subject=subject,
-        message=plain_message,
-        from_email=settings.DEFAULT_FROM_EMAIL,
-        recipient_list=[user.email],
-        html_message=html_message,
-        fail_silently=False,
-    )
+    queue_email(subject, html_message, user.email)
 
 def send_welcome_email(user):
     """
-    Send welcome email after successful verification
+    Queue the welcome email after successful verification
     """
     subject = 'Welcome to Our Site!'
     
@@ -40,13 +74,4 @@ def send_welcome_email(user):
         'user': user,
     })
     
-    plain_message = strip_tags(html_message)
-    
-    send_mail(
-        subject=subject,
-        message=plain_message,
-        from_email=settings.DEFAULT_FROM_EMAIL,
-        recipient_list=[user.email],
-        html_message=html_message,
-        fail_silently=False,
-    )
\ No newline at end of file
+    queue_email(subject, html_message, user.email)
\ No newline at end of file
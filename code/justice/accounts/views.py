@@ -1,23 +1,27 @@
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth import login, authenticate
+from django.contrib.auth.models import User
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
+from django.db import transaction
 from django.http import HttpResponse
 from .forms import CustomUserCreationForm
 from .models import EmailVerification
-from .utils import send_verification_email, send_welcome_email
+from .utils import send_verification_email, send_welcome_email, invalidate_email_verification
 
 def signup(request):
     if request.method == 'POST':
         form = CustomUserCreationForm(request.POST)
         if form.is_valid():
-            user = form.save()
-            
-            # Create email verification token
-            verification_token = EmailVerification.objects.create(user=user)
-            
-            # Send verification email
-            send_verification_email(user, verification_token, request)
+            # The user, the token and the queued email are saved together
+            with transaction.atomic():
+                user = form.save()
+                
+                # Create email verification token
+                verification_token = EmailVerification.objects.create(user=user)
+                
+                # Queue verification email (sent by the send_queued_email command)
+                send_verification_email(user, verification_token, request)
             
             messages.success(
                 request, 
@@ -48,6 +52,7 @@ def verify_email(request, token):
             user = verification.user
             user.is_active = True
             user.save()
+            invalidate_email_verification(user)
             
             # Send welcome email
             send_welcome_email(user)
@@ -80,6 +85,7 @@ def resend_verification(request):
             if verification.is_token_expired():
                 verification.delete()
                 verification = EmailVerification.objects.create(user=user)
+            invalidate_email_verification(user)
             
             send_verification_email(user, verification, request)
             messages.success(request, 'Verification email sent! Please check your inbox.')
@@ -98,7 +104,7 @@ def profile(request):
     except EmailVerification.DoesNotExist:
         is_verified = False
         # Create verification record if it doesn't exist
-        EmailVerification.objects.create(user=request.user)
+        email_verification = EmailVerification.objects.create(user=request.user)
     
     return render(request, 'accounts/profile.html', {
         'is_verified': is_verified,
@@ -1,10 +1,15 @@
 from pathlib import Path
 import sys
 import os
+import shutil
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
+# Shared modules (ai_jury, legal_assistant) live next to the Django project
+if str(BASE_DIR.parent) not in sys.path:
+    sys.path.append(str(BASE_DIR.parent))
+
 
 # Quick-start development settings - unsuitable for production
 # See https://docs.djangoproject.com/en/5.2/howto/deployment/checklist/
@@ -18,8 +23,8 @@ DEBUG = True
 ALLOWED_HOSTS = ['*']
 
 TAILWIND_APP_NAME = 'tailwindapp'
-INTERNAL_IPS = "[127.0.0.1]"
-NPM_BIN_PATH = "C:\\Users\\manan\\AppData\\Roaming\\npm\\npm.cmd"
+INTERNAL_IPS = ["127.0.0.1"]
+NPM_BIN_PATH = os.environ.get("NPM_BIN_PATH") or shutil.which("npm") or "C:\\Users\\manan\\AppData\\Roaming\\npm\\npm.cmd"
 
 # Application definition
 
@@ -38,7 +43,13 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'search_app.middleware.MetricsMiddleware',
+    'search_app.middleware.ProfilingMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    # Serves collected, precompressed static files when no CDN is configured
+    'justice.staticfiles.StaticFilesMiddleware',
+    # ETag on every response and 304 Not Modified for matching If-None-Match
+    'django.middleware.http.ConditionalGetMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -53,13 +64,20 @@ TEMPLATES = [
     {
         'BACKEND': 'django.template.backends.django.DjangoTemplates',
         'DIRS': [BASE_DIR, "templates"],
-        'APP_DIRS': True,
         'OPTIONS': {
             'context_processors': [
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
             ],
+            # Keep compiled templates in memory; runserver's autoreloader clears
+            # this cache when a template changes, so it is safe in development too
+            'loaders': [
+                ('django.template.loaders.cached.Loader', [
+                    'django.template.loaders.filesystem.Loader',
+                    'django.template.loaders.app_directories.Loader',
+                ]),
+            ],
         },
     },
 ]
@@ -78,6 +96,19 @@ DATABASES = {
 }
 
 
+# Cache for per-user flags such as email verification status. Use a shared
+# backend (Redis, Memcached) when running several worker processes so that
+# invalidation reaches all of them.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }
+}
+
+# Seconds to keep rendered marketing and lawyers pages (search_app/caching.py); 0 disables
+PAGE_CACHE_TIMEOUT = int(os.environ.get('PAGE_CACHE_TIMEOUT', 600))
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
@@ -113,9 +144,23 @@ USE_TZ = True
 # https://docs.djangoproject.com/en/5.2/howto/static-files/
 
 # Static files (CSS, JavaScript, Images)
-STATIC_URL = '/static/'
+# Set STATIC_URL to a CDN origin (https://cdn.example.com/static/) to stop serving them from Django
+STATIC_URL = os.environ.get('STATIC_URL', '/static/')
 STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles')  # for production
 
+# `python manage.py build_static` writes content-hashed, gzip/brotli-compressed
+# copies to STATIC_ROOT; justice.staticfiles.StaticFilesMiddleware serves them
+# with immutable caching outside DEBUG. Until it has run, {% static %} gives the
+# plain, unhashed URLs.
+STORAGES = {
+    'default': {
+        'BACKEND': 'django.core.files.storage.FileSystemStorage',
+    },
+    'staticfiles': {
+        'BACKEND': 'justice.staticfiles.CompressedManifestStaticFilesStorage',
+    },
+}
+
 # Include extra static directories only if they exist to avoid warnings
 _app_static_dir = os.path.join(BASE_DIR, 'app', 'static')
 STATICFILES_DIRS = [d for d in [_app_static_dir] if os.path.isdir(d)]
@@ -124,6 +169,56 @@ STATICFILES_DIRS = [d for d in [_app_static_dir] if os.path.isdir(d)]
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# Resumable chunked uploads (search_app/uploads.py): partial files live in
+# UPLOAD_DIR until completed, and are deleted once their text is extracted.
+# UPLOAD_EARLY_EXTRACTION=0 waits for the whole file before reading any PDF page.
+UPLOAD_DIR = os.environ.get('UPLOAD_DIR', os.path.join(MEDIA_ROOT, 'uploads'))
+UPLOAD_MAX_SIZE = int(os.environ.get('UPLOAD_MAX_SIZE', 200 * 1024 * 1024))
+UPLOAD_CHUNK_SIZE = int(os.environ.get('UPLOAD_CHUNK_SIZE', 4 * 1024 * 1024))  # Suggested to clients
+UPLOAD_MAX_CHUNK_SIZE = int(os.environ.get('UPLOAD_MAX_CHUNK_SIZE', 16 * 1024 * 1024))
+UPLOAD_EARLY_EXTRACTION = os.environ.get('UPLOAD_EARLY_EXTRACTION', '1') == '1'
+# Uploads one user (or client IP when signed out) may have open at once; expired ones stop counting
+UPLOAD_MAX_OPEN_PER_CLIENT = int(os.environ.get('UPLOAD_MAX_OPEN_PER_CLIENT', 5))
+
+
+# Legal assistant (RAG) service used by chat and letter generation
+# Expected format: {"question": "string"} -> {"answer": "string", "status": "success"}
+RAG_SERVICE_URL = os.environ.get('RAG_SERVICE_URL', 'http://127.0.0.1:8000/query')
+# Shared with the service's CACHE_WARM_TOKEN; manage.py warm_answer_cache sends it to POST /cache/warm
+CACHE_WARM_TOKEN = os.environ.get('CACHE_WARM_TOKEN', '')
+
+# Token-bucket rate limits per user, client IP and overall (ai_jury/ratelimit.py).
+# 'memory' keeps buckets per process; with several workers use a shared file,
+# e.g. RATE_LIMIT_BACKEND=sqlite:////var/lib/ai-jury/ratelimit.sqlite3
+RATE_LIMIT_BACKEND = os.environ.get('RATE_LIMIT_BACKEND', 'memory')
+RATE_LIMITS = {
+    'chat': {'user': '10/min', 'ip': '20/min', 'global': '300/min'},
+    'letters': {'user': '5/min', 'ip': '10/min', 'global': '60/min'},
+    # Chunk, resume and complete requests; starting an upload takes a 'chat' token
+    'uploads': {'user': '120/min', 'ip': '240/min', 'global': '3000/min'},
+}
+
+# Adaptive limit on this process's concurrent RAG calls (ai_jury/concurrency.py). It follows
+# the service's latency; past it chat answers 503 with Retry-After at once instead of saving the
+# question and waiting out the 30s timeout. RAG_ADAPTIVE_CONCURRENCY=0 only tracks the limit.
+RAG_CONCURRENCY = {
+    'ENABLED': os.environ.get('RAG_ADAPTIVE_CONCURRENCY', '1') == '1',
+    'INITIAL_LIMIT': int(os.environ.get('RAG_CONCURRENCY_INITIAL', 8)),
+    'MAX_LIMIT': int(os.environ.get('RAG_CONCURRENCY_MAX', 64)),
+    'TOLERANCE': float(os.environ.get('RAG_LATENCY_TOLERANCE', 2.0)),
+}
+
+# Opt-in profiling of slow or sampled requests (see ai_jury/profiling.py).
+# Traces are shared with the legal assistant service and listed at /admin/chat/profiles/
+PROFILING = {
+    'ENABLED': os.environ.get('PROFILING_ENABLED') == '1',
+    'THRESHOLD_MS': int(os.environ.get('PROFILING_THRESHOLD_MS', 2000)),
+    'SAMPLE_RATE': float(os.environ.get('PROFILING_SAMPLE_RATE', 0)),
+    'ENGINE': os.environ.get('PROFILING_ENGINE', 'sampler'),
+    'DIRECTORY': os.environ.get('PROFILING_DIR', os.path.join(BASE_DIR.parent, 'profiles')),
+    'MAX_FILES': 100,
+}
+
 
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
@@ -0,0 +1,158 @@
+"""
+Static asset pipeline: content-hashed, precompressed files written by
+collectstatic, served from memory-indexed STATIC_ROOT with far-future
+caching when no CDN sits in front of the app.
+"""
+import gzip
+import json
+import mimetypes
+import os
+import posixpath
+from urllib.parse import unquote, urlsplit
+
+from django.conf import settings
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+from django.core.exceptions import MiddlewareNotUsed
+from django.http import FileResponse, HttpResponseNotModified
+from django.utils.http import http_date, parse_etags
+
+try:
+    import brotli
+except ImportError:  # gzip only
+    brotli = None
+
+COMPRESSIBLE_EXTENSIONS = {'.css', '.js', '.mjs', '.map', '.svg', '.html', '.txt', '.json', '.xml', '.ico'}
+MIN_COMPRESS_SIZE = 512
+IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+MUTABLE_MAX_AGE = 60
+
+
+def compress_file(path):
+    """Write path.gz (and path.br when brotli is installed) if they are meaningfully smaller; returns the new paths"""
+    with open(path, 'rb') as f:
+        data = f.read()
+    if len(data) < MIN_COMPRESS_SIZE:
+        return []
+    written = []
+    variants = [('.gz', gzip.compress(data, compresslevel=9, mtime=0))]
+    if brotli is not None:
+        variants.append(('.br', brotli.compress(data, quality=11)))
+    for suffix, compressed in variants:
+        # Not worth a separate file (or the Content-Encoding header) below ~5% savings
+        if len(compressed) < len(data) * 0.95:
+            with open(path + suffix, 'wb') as f:
+                f.write(compressed)
+            written.append(path + suffix)
+    return written
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    """ManifestStaticFilesStorage that also writes gzip and brotli copies of every text asset"""
+
+    def stored_name(self, name):
+        # Files missing from the manifest (build_static not run: dev, tests, benchmarks) keep their
+        # plain URL; the parent would hash the file in STATIC_ROOT instead and raise when it is not there
+        if self.hashed_files.get(self.hash_key(urlsplit(unquote(name)).path.strip())) is None:
+            return name
+        return super().stored_name(name)
+
+    def post_process(self, paths, dry_run=False, **options):
+        yield from super().post_process(paths, dry_run, **options)
+        if dry_run:
+            return
+        for name in sorted(set(self.hashed_files.values()) | set(paths)):
+            if os.path.splitext(name)[1].lower() in COMPRESSIBLE_EXTENSIONS and self.exists(name):
+                for written in compress_file(self.path(name)):
+                    yield name, os.path.relpath(written, self.location), True
+
+
+class StaticFile:
+    """One file under STATIC_ROOT with its precompressed variants, stat'ed once at startup"""
+
+    def __init__(self, path, immutable):
+        stat = os.stat(path)
+        self.path = path
+        self.content_type = mimetypes.guess_type(path)[0] or 'application/octet-stream'
+        if self.content_type.startswith('text/') or self.content_type in ('application/javascript', 'application/json'):
+            self.content_type += '; charset=utf-8'
+        self.etag = '"%x-%x"' % (int(stat.st_mtime), stat.st_size)
+        self.last_modified = http_date(stat.st_mtime)
+        self.cache_control = (
+            f'public, max-age={IMMUTABLE_MAX_AGE}, immutable' if immutable
+            else f'public, max-age={MUTABLE_MAX_AGE}'
+        )
+        # (encoding, path, size), best first
+        self.variants = [
+            (encoding, path + suffix, os.path.getsize(path + suffix))
+            for encoding, suffix in (('br', '.br'), ('gzip', '.gz'))
+            if os.path.isfile(path + suffix)
+        ]
+        self.variants.append((None, path, stat.st_size))
+
+    def pick(self, accept_encoding):
+        """The smallest variant the client accepts, with its own ETag"""
+        accepted = {token.split(';')[0].strip() for token in accept_encoding.split(',')}
+        for encoding, path, size in self.variants:
+            if encoding is None:
+                return encoding, path, size, self.etag
+            if encoding in accepted:
+                return encoding, path, size, f'{self.etag[:-1]}-{encoding}"'
+
+
+def scan_static_root(root):
+    """Index STATIC_ROOT as {url path: StaticFile}; files named in the manifest with a hash are immutable"""
+    hashed = set()
+    manifest_path = os.path.join(root, ManifestStaticFilesStorage.manifest_name)
+    if os.path.isfile(manifest_path):
+        with open(manifest_path) as f:
+            hashed = set(json.load(f).get('paths', {}).values())
+
+    files = {}
+    for directory, _, names in os.walk(root):
+        for name in names:
+            if name.endswith(('.gz', '.br')) and os.path.isfile(os.path.join(directory, name[:-3])):
+                continue
+            path = os.path.join(directory, name)
+            url_path = os.path.relpath(path, root).replace(os.sep, '/')
+            files[url_path] = StaticFile(path, url_path in hashed)
+    return files
+
+
+class StaticFilesMiddleware:
+    """
+    Serves collected static files directly, before the rest of the stack,
+    choosing the brotli or gzip copy the client accepts. Not used in DEBUG
+    (runserver serves static files) or when STATIC_URL points at a CDN.
+    """
+
+    def __init__(self, get_response):
+        static_url = settings.STATIC_URL or ''
+        if settings.DEBUG or '//' in static_url or not settings.STATIC_ROOT or not os.path.isdir(settings.STATIC_ROOT):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.prefix = static_url if static_url.startswith('/') else '/' + static_url
+        self.files = scan_static_root(settings.STATIC_ROOT)
+
+    def __call__(self, request):
+        if request.method in ('GET', 'HEAD') and request.path_info.startswith(self.prefix):
+            static_file = self.files.get(posixpath.normpath(request.path_info[len(self.prefix):]))
+            if static_file is not None:
+                return self.serve(request, static_file)
+        return self.get_response(request)
+
+    def serve(self, request, static_file):
+        encoding, path, size, etag = static_file.pick(request.headers.get('Accept-Encoding', ''))
+        if etag in parse_etags(request.headers.get('If-None-Match', '')):
+            response = HttpResponseNotModified()
+        else:
+            response = FileResponse(open(path, 'rb'))
+            response['Content-Type'] = static_file.content_type
+            response['Content-Length'] = size
+            if encoding:
+                response['Content-Encoding'] = encoding
+            response['Last-Modified'] = static_file.last_modified
+        response['ETag'] = etag
+        response['Cache-Control'] = static_file.cache_control
+        if len(static_file.variants) > 1:
+            response['Vary'] = 'Accept-Encoding'
+        return response
@@ -7,8 +7,9 @@ from django.contrib.auth import views as auth_views
 
 
 urlpatterns = [
-    path('admin/', admin.site.urls),
+    # search_app goes first so its admin/chat/... pages are not swallowed by the admin catch-all
     path('',include('search_app.urls')),
+    path('admin/', admin.site.urls),
     path('accounts/', include('accounts.urls')),
     path('accounts/', include('django.contrib.auth.urls')), 
      path('lawyers/', include('lawyers.urls')),
@@ -0,0 +1,33 @@
+# warmup.py
+"""
+Preloading what the first requests of a fresh worker would otherwise pay
+for: the URLconf and views, the RAG client, the upload extractors, the
+markdown renderer and the most used templates. Runs in a background thread
+started by wsgi.py and asgi.py, so the worker serves requests while it
+warms up.
+"""
+import os
+
+TEMPLATES = ['layout.html', 'index.html', 'chat.html', 'accounts/login.html']
+
+
+def load_urls():
+    from django.urls import get_resolver
+    get_resolver().reverse_dict  # imports every app's urls and views and builds the lookup tables
+
+
+def load_templates():
+    from django.template.loader import get_template
+    for name in TEMPLATES:
+        get_template(name)
+
+
+def start():
+    """Start the warm-up thread unless WARMUP=0; returns it"""
+    if os.environ.get('WARMUP', '1') != '1':
+        return None
+    # After settings are loaded: they put ai_jury on the path
+    from ai_jury.lazy import warm_up
+    from search_app.attachments import preload_extractors
+    from search_app.rendering import markdown_parser
+    return warm_up(load_urls, 'requests', preload_extractors, markdown_parser, load_templates)
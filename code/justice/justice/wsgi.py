@@ -11,6 +11,11 @@ import os
 
 from django.core.wsgi import get_wsgi_application
 
+from justice.warmup import start as start_warmup
+
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'justice.settings')
 
 application = get_wsgi_application()
+
+# Preload views, templates and the RAG client in the background
+start_warmup()
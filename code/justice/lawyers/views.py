@@ -1,12 +1,19 @@
+from django.conf import settings
 from django.shortcuts import render, redirect
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
-import requests
 import json
 from django.utils import timezone
 from accounts.decorators import verified_required
+from search_app.caching import cached_page
+from search_app.ratelimit import check_rate_limit, get_rag_limiter, rag_request_headers
+from ai_jury.concurrency import Overloaded
+from ai_jury.lazy import lazy_import
+
+requests = lazy_import('requests')
 
 #@verified_required
+@cached_page
 def lawyers_dashboard(request):
     return render(request, 'lawyers/dashboard.html')
 
@@ -36,37 +43,63 @@ def generate_legal_letter(request):
         Make it ready to use by a legal professional.
         """
         
-        try:
-            # CALL THE SAME RAG ENDPOINT YOUR CHATBOT USES
-            response = requests.post(
-                'YOUR_EXISTING_RAG_CHAT_ENDPOINT',  # Same as your chatbot
-                json={
-                    'message': rag_prompt,
-                    'context': 'legal_document_generation'  # Optional context flag
-                },
-                headers={'Content-Type': 'application/json'},
-                timeout=30
-            )
+        decision = check_rate_limit('letters', request)
+        permit = None
+        if decision.allowed:
+            try:
+                # Letters may only use part of the RAG concurrency limit, so chat keeps the rest
+                permit = get_rag_limiter().acquire('bulk')
+            except Overloaded:
+                pass
+        if not decision.allowed:
+            # Over the AI letter limit: still give them a letter, from the templates
+            generated_content = generate_fallback_letter(letter_type, case_details, recipient_info, additional_instructions)
+            messages.warning(request, f'AI letter limit reached. Using template generation; try again in {decision.retry_after} seconds.')
+        elif permit is None:
+            generated_content = generate_fallback_letter(letter_type, case_details, recipient_info, additional_instructions)
+            messages.warning(request, 'AI service is busy. Using template generation.')
+        else:
+            try:
+                # CALL THE SAME RAG ENDPOINT YOUR CHATBOT USES
+                response = requests.post(
+                    settings.RAG_SERVICE_URL,  # Same as the chatbot
+                    json={
+                        'question': rag_prompt,
+                    },
+                    # Letters queue behind chat turns for the shared LLM quota
+                    headers={'Content-Type': 'application/json', **rag_request_headers(request, 'bulk', timeout=30)},
+                    timeout=30
+                )
             
-            if response.status_code == 200:
-                # Extract content from your existing RAG response format
-                rag_response = response.json()
-                generated_content = rag_response.get('response', rag_response.get('answer', rag_response.get('content', '')))
+                if response.status_code == 503:
+                    permit.dropped()
+                elif response.status_code == 429:
+                    permit.ignore()
+                else:
+                    permit.success()
+                if response.status_code == 200:
+                    # Extract content from your existing RAG response format
+                    rag_response = response.json()
+                    generated_content = rag_response.get('response', rag_response.get('answer', rag_response.get('content', '')))
                 
-                if generated_content:
-                    # Ensure it's properly formatted as a letter
-                    generated_content = format_as_legal_letter(generated_content, letter_type, recipient_info)
+                    if generated_content:
+                        # Ensure it's properly formatted as a letter
+                        generated_content = format_as_legal_letter(generated_content, letter_type, recipient_info)
+                    else:
+                        generated_content = generate_fallback_letter(letter_type, case_details, recipient_info, additional_instructions)
+                    
+                elif response.status_code in (429, 503):
+                    generated_content = generate_fallback_letter(letter_type, case_details, recipient_info, additional_instructions)
+                    messages.warning(request, 'AI service is busy. Using template generation.')
                 else:
                     generated_content = generate_fallback_letter(letter_type, case_details, recipient_info, additional_instructions)
-                    
-            else:
-                generated_content = generate_fallback_letter(letter_type, case_details, recipient_info, additional_instructions)
-                messages.warning(request, 'RAG service returned an error. Using template generation.')
+                    messages.warning(request, 'RAG service returned an error. Using template generation.')
                 
-        except Exception as e:
-            print(f"RAG Connection Error: {e}")
-            generated_content = generate_fallback_letter(letter_type, case_details, recipient_info, additional_instructions)
-            messages.warning(request, 'Cannot connect to AI service. Using template generation.')
+            except Exception as e:
+                permit.dropped()
+                print(f"RAG Connection Error: {e}")
+                generated_content = generate_fallback_letter(letter_type, case_details, recipient_info, additional_instructions)
+                messages.warning(request, 'Cannot connect to AI service. Using template generation.')
         
         return render(request, 'lawyers/generated_letter.html', {
             'generated_content': generated_content,
@@ -77,6 +110,7 @@ def generate_legal_letter(request):
     return redirect('legal_letters')
 
 #@verified_required
+@cached_page
 def document_templates(request):
     templates = [
         {'name': 'Demand Letter', 'icon': '📄', 'category': 'Civil'},
@@ -1,7 +1,17 @@
-from django.contrib import admin
+import uuid
+from datetime import datetime, time, timedelta
+
+from django.contrib import admin, messages
+from django.contrib.admin.views.main import ChangeList
+from django.utils import timezone
 from django.utils.html import format_html
-from django.db.models import Count
-from .models import ChatSession, ChatMessage
+from django.db.models import Count, Max, Min, QuerySet
+from django.db.models.functions import Substr
+from django.http import StreamingHttpResponse
+from .models import ChatSession, ChatMessage, Attachment, RetentionPolicy, SessionPurge, Upload
+from .exports import FORMATS, export, export_filename, transcript_messages
+from .paginators import EstimatedCountPaginator
+from .retention import queue_purge
 
 class ChatMessageInline(admin.TabularInline):
     model = ChatMessage
@@ -26,18 +36,44 @@ class ChatSessionAdmin(admin.ModelAdmin):
         'updated_at', 
         'session_actions'
     ]
-    list_filter = ['created_at', 'updated_at']
+    list_filter = ['created_at', 'updated_at', 'retention_policy']
     search_fields = ['title', 'id']
     readonly_fields = ['id', 'created_at', 'updated_at', 'message_count_display']
     inlines = [ChatMessageInline]
     ordering = ['-updated_at']
+    actions = ['export_jsonl', 'export_csv']
     
     fieldsets = (
         ('Session Information', {
-            'fields': ('id', 'title', 'created_at', 'updated_at', 'message_count_display')
+            'fields': ('id', 'title', 'created_at', 'updated_at', 'message_count_display', 'retention_policy')
         }),
     )
 
+    def get_queryset(self, request):
+        # Sessions queued for deletion are listed under Session purges until they are gone
+        return super().get_queryset(request).filter(purge_requested_at__isnull=True)
+
+    # Deleting goes through the purge queue (search_app/retention.py): a cascade over a
+    # long session's messages in one transaction would lock the database for seconds
+
+    def get_deleted_objects(self, objs, request):
+        # The stock confirmation page loads every message of the session to list it
+        sessions = ChatSession.objects.filter(pk__in=[obj.pk for obj in objs]).annotate(message_count=Count('messages'))
+        summary = [f"Chat session: {s.title} ({s.message_count} messages)" for s in sessions]
+        model_count = {
+            ChatSession._meta.verbose_name_plural: len(summary),
+            ChatMessage._meta.verbose_name_plural: sum(s.message_count for s in sessions),
+        }
+        return summary, model_count, set(), []
+
+    def delete_model(self, request, obj):
+        self.delete_queryset(request, ChatSession.objects.filter(pk=obj.pk))
+
+    def delete_queryset(self, request, queryset):
+        queued = queue_purge(queryset, SessionPurge.REASON_ADMIN)
+        self.message_user(request, f"{queued} session(s) hidden and queued for deletion in the background.",
+                          messages.INFO)
+
     def id_short(self, obj):
         return str(obj.id)[:8] + "..."
     id_short.short_description = 'Session ID'
@@ -53,12 +89,105 @@ class ChatSessionAdmin(admin.ModelAdmin):
     def session_actions(self, obj):
         return format_html(
             '<a href="/admin/search_app/chatsession/{}/change/" class="button">View</a> '
+            '<a href="/admin/chat/session/{}/export.pdf" class="button" style="margin-left: 10px;">PDF</a> '
             '<a href="/admin/search_app/chatsession/{}/delete/" class="button" style="color: red; margin-left: 10px;">Delete</a>',
-            obj.id, obj.id
+            obj.id, obj.id, obj.id
         )
     session_actions.short_description = 'Actions'
     session_actions.allow_tags = True
 
+    def export_jsonl(self, request, queryset):
+        return self._export('jsonl', queryset)
+    export_jsonl.short_description = 'Export transcripts as JSON lines'
+
+    def export_csv(self, request, queryset):
+        return self._export('csv', queryset)
+    export_csv.short_description = 'Export transcripts as CSV'
+
+    def _export(self, fmt, queryset):
+        messages = transcript_messages(list(queryset.values_list('id', flat=True)))
+        response = StreamingHttpResponse(export(fmt, messages), content_type=FORMATS[fmt])
+        response['Content-Disposition'] = f'attachment; filename="{export_filename(fmt)}"'
+        return response
+
+PREVIEW_LENGTH = 80
+
+class SessionIdFilter(admin.SimpleListFilter):
+    """Filter by a pasted session ID instead of listing every session in the sidebar"""
+    title = 'session ID'
+    parameter_name = 'session'
+    template = 'admin/search_app/session_id_filter.html'
+
+    def lookups(self, request, model_admin):
+        return ()
+
+    def has_output(self):
+        return True
+
+    def queryset(self, request, queryset):
+        if not self.value():
+            return queryset
+        try:
+            session_id = uuid.UUID(self.value().strip())
+        except ValueError:
+            return queryset.none()
+        return queryset.filter(session_id=session_id)
+
+    def choices(self, changelist):
+        # The template renders a text box; this carries the other filters along with it
+        yield {
+            'value': self.value() or '',
+            'clear_link': changelist.get_query_string(remove=[self.parameter_name]),
+            'hidden': [(k, v) for k, v in changelist.params.items() if k != self.parameter_name],
+        }
+
+class IndexedDatesQuerySet(QuerySet):
+    """
+    datetimes() for the admin date hierarchy as one ranged EXISTS per year,
+    month or day, each answered from the timestamp index, instead of a
+    SELECT DISTINCT over every row in the table.
+    """
+
+    def aggregate(self, *args, **kwargs):
+        # The date hierarchy asks for the first and last timestamp together; SQLite reads a
+        # lone MIN() or MAX() off the end of the index but scans the whole index for both
+        if not args and len(kwargs) > 1 and all(isinstance(a, (Min, Max)) for a in kwargs.values()):
+            result = {}
+            for name, aggregate in kwargs.items():
+                result.update(super().aggregate(**{name: aggregate}))
+            return result
+        return super().aggregate(*args, **kwargs)
+
+    def datetimes(self, field_name, kind, order='ASC', tzinfo=None):
+        if kind not in ('year', 'month', 'day'):
+            return super().datetimes(field_name, kind, order, tzinfo)
+        bounds = self.aggregate(first=Min(field_name), last=Max(field_name))
+        if bounds['first'] is None:
+            return []
+        tz = tzinfo or timezone.get_current_timezone()
+        first, last = timezone.localtime(bounds['first'], tz), timezone.localtime(bounds['last'], tz)
+        start = datetime(first.year, first.month if kind != 'year' else 1,
+                         first.day if kind == 'day' else 1, tzinfo=tz)
+        found = []
+        while start <= last:
+            if kind == 'year':
+                end = start.replace(year=start.year + 1)
+            elif kind == 'month':
+                end = start.replace(year=start.year + start.month // 12, month=start.month % 12 + 1)
+            else:
+                end = datetime.combine(start.date() + timedelta(days=1), time(), tzinfo=tz)
+            if self.filter(**{f'{field_name}__gte': start, f'{field_name}__lt': end}).exists():
+                found.append(start)
+            start = end
+        return found if order == 'ASC' else found[::-1]
+
+class ChatMessageChangeList(ChangeList):
+    def get_queryset(self, request, exclude_parameters=None):
+        # Rows show an 80 character preview; the full content and rendered HTML stay in the database
+        return (super().get_queryset(request, exclude_parameters)
+                .annotate(preview=Substr('content', 1, PREVIEW_LENGTH + 1))
+                .defer('content', 'content_html', 'stage_timings'))
+
 @admin.register(ChatMessage)
 class ChatMessageAdmin(admin.ModelAdmin):
     list_display = [
@@ -69,28 +198,46 @@ class ChatMessageAdmin(admin.ModelAdmin):
         'thinking_time',
         'timestamp'
     ]
-    list_filter = ['is_user', 'timestamp', 'session']
+    # A list filter on the session foreign key would load every session into the
+    # sidebar; filter by a session ID instead (also linked from the Session column)
+    list_filter = ['is_user', SessionIdFilter]
+    date_hierarchy = 'timestamp'
     search_fields = ['content', 'session__title', 'session__id']
-    readonly_fields = ['id', 'timestamp', 'session_link']
-    ordering = ['-timestamp']
+    readonly_fields = ['id', 'timestamp', 'session_link', 'stage_timings']
+    # The trailing id matches the (timestamp, id) index, so Django needn't add -pk itself
+    ordering = ['-timestamp', '-id']
+    list_select_related = ['session']
+    paginator = EstimatedCountPaginator
+    # Skips the extra COUNT(*) over the whole table for "N of M selected"
+    show_full_result_count = False
     
     fieldsets = (
         ('Message Information', {
-            'fields': ('id', 'session_link', 'content', 'is_user', 'thinking_time', 'timestamp')
+            'fields': ('id', 'session_link', 'content', 'is_user', 'thinking_time', 'stage_timings', 'timestamp')
         }),
     )
 
+    def get_queryset(self, request):
+        queryset = super().get_queryset(request)
+        return IndexedDatesQuerySet(model=queryset.model, query=queryset.query.chain(), using=queryset._db)
+
+    def get_changelist(self, request, **kwargs):
+        return ChatMessageChangeList
+
     def id_short(self, obj):
         return str(obj.id)[:8] + "..."
     id_short.short_description = 'Message ID'
 
     def session_short(self, obj):
-        return f"{obj.session.title[:20]}..." if len(obj.session.title) > 20 else obj.session.title
+        title = f"{obj.session.title[:20]}..." if len(obj.session.title) > 20 else obj.session.title
+        return format_html('<a href="?session={}" title="Only this session">{}</a>', obj.session_id, title)
     session_short.short_description = 'Session'
 
     def content_preview(self, obj):
-        preview = obj.content[:50] + "..." if len(obj.content) > 50 else obj.content
-        return format_html('<span title="{}">{}</span>', obj.content, preview)
+        preview = getattr(obj, 'preview', None)
+        if preview is None:
+            preview = obj.content[:PREVIEW_LENGTH + 1]
+        return preview[:PREVIEW_LENGTH] + "..." if len(preview) > PREVIEW_LENGTH else preview
     content_preview.short_description = 'Content'
 
     def is_user_display(self, obj):
@@ -111,4 +258,51 @@ class ChatMessageAdmin(admin.ModelAdmin):
         return False
 
     def has_change_permission(self, request, obj=None):
-        return False
\ No newline at end of file
+        return False
+
+@admin.register(RetentionPolicy)
+class RetentionPolicyAdmin(admin.ModelAdmin):
+    list_display = ['name', 'max_age_days', 'max_messages_per_session', 'is_default']
+
+@admin.register(SessionPurge)
+class SessionPurgeAdmin(admin.ModelAdmin):
+    list_display = ['title', 'session_id', 'reason', 'status', 'messages_deleted', 'longest_batch_ms',
+                    'requested_at', 'finished_at']
+    list_filter = ['status', 'reason']
+    search_fields = ['title', 'session_id']
+    readonly_fields = ['session_id', 'title', 'reason', 'status', 'messages_deleted', 'longest_batch_ms',
+                       'last_error', 'requested_at', 'finished_at']
+    ordering = ['-requested_at']
+    actions = ['retry']
+
+    def has_add_permission(self, request):
+        return False
+
+    def retry(self, request, queryset):
+        retried = queryset.filter(status=SessionPurge.STATUS_FAILED).update(status=SessionPurge.STATUS_PENDING)
+        self.message_user(request, f"{retried} purge(s) queued again.")
+    retry.short_description = 'Retry failed purges'
+
+@admin.register(Upload)
+class UploadAdmin(admin.ModelAdmin):
+    list_display = ['filename', 'content_type', 'status', 'received', 'size', 'attachment', 'created_at', 'updated_at']
+    list_filter = ['status']
+    search_fields = ['filename', 'id']
+    readonly_fields = ['id', 'filename', 'content_type', 'size', 'received', 'sha256', 'status', 'early_scanned',
+                       'attachment', 'error', 'created_at', 'updated_at']
+    exclude = ['early_pages']
+    ordering = ['-created_at']
+
+    def has_add_permission(self, request):
+        return False
+
+@admin.register(Attachment)
+class AttachmentAdmin(admin.ModelAdmin):
+    list_display = ['filename', 'content_type', 'size', 'text_length', 'created_at']
+    search_fields = ['filename', 'sha256']
+    readonly_fields = ['id', 'sha256', 'filename', 'content_type', 'size', 'text_length', 'created_at']
+    exclude = ['compressed_text']
+    ordering = ['-created_at']
+
+    def has_add_permission(self, request):
+        return False
@@ -0,0 +1,163 @@
+# attachments.py
+import functools
+import hashlib
+import mimetypes
+import re
+
+from .models import Attachment
+
+
+CHUNK_SIZE = 1500  # Characters per chunk when splitting extracted text
+MAX_PROMPT_CHUNKS = 16  # Chunks per attachment sent to the RAG service, which packs them into its token budget
+
+_WORD_RE = re.compile(r"[a-z0-9]+")
+_STOPWORDS = {
+    'a', 'an', 'and', 'are', 'as', 'at', 'be', 'by', 'can', 'do', 'does', 'for', 'from', 'how',
+    'i', 'in', 'is', 'it', 'me', 'my', 'of', 'on', 'or', 'the', 'this', 'to', 'what', 'with',
+}
+
+
+@functools.cache
+def pdf_extractor():
+    """pdfminer's extract_text, imported on first use; None if not installed"""
+    try:
+        from pdfminer.high_level import extract_text
+    except Exception:
+        return None
+    return extract_text
+
+
+@functools.cache
+def ocr_modules():
+    """(PIL.Image, pytesseract), imported on first use; (None, None) if not installed"""
+    try:
+        from PIL import Image
+        import pytesseract
+    except Exception:
+        return None, None
+    return Image, pytesseract
+
+
+def preload_extractors():
+    """Import the extraction libraries ahead of the first upload (see justice.warmup)"""
+    pdf_extractor()
+    ocr_modules()
+
+
+def file_sha256(f):
+    """Hash an uploaded file without reading it into memory at once"""
+    digest = hashlib.sha256()
+    for chunk in f.chunks():
+        digest.update(chunk)
+    f.seek(0)
+    return digest.hexdigest()
+
+
+def extract_text(f, content_type):
+    """Extract text from a PDF or image upload, '' if unsupported"""
+    try:
+        if content_type == 'application/pdf' and pdf_extractor():
+            # pdfminer takes a path or an io object, not Django's UploadedFile wrappers
+            if hasattr(f, 'temporary_file_path'):
+                return pdf_extractor()(f.temporary_file_path())
+            return pdf_extractor()(getattr(f, 'file', f))
+        if content_type and content_type.startswith('image/'):
+            Image, pytesseract = ocr_modules()
+            if Image and pytesseract:
+                return pytesseract.image_to_string(Image.open(f))
+    except Exception as e:
+        print(f"Attachment extraction error: {e}")
+    return ''
+
+
+def save_attachment(sha256, filename, content_type, size, text):
+    """Get or create the Attachment row for a content hash, filling in its text if it had none"""
+    text = (text or '').strip()
+    attachment, created = Attachment.objects.get_or_create(
+        sha256=sha256,
+        defaults={
+            'filename': filename[:255],
+            'content_type': content_type or '',
+            'size': size,
+            'text': text,
+        },
+    )
+    if not created and text and not attachment.text_length:
+        attachment.text = text
+        attachment.save(update_fields=['text_length', 'compressed_text'])
+    return attachment
+
+
+def store_upload(f):
+    """
+    Store an uploaded file's extracted text, deduplicated by SHA-256.
+    Re-uploads of a known file skip extraction, unless no text was stored
+    for it (extraction failed, or its library was missing) and it is retried.
+    """
+    name = getattr(f, 'name', None) or 'attachment'
+    content_type = getattr(f, 'content_type', None) or mimetypes.guess_type(name)[0]
+    sha256 = file_sha256(f)
+
+    existing = Attachment.objects.filter(sha256=sha256).first()
+    if existing and existing.text_length:
+        return existing
+
+    return save_attachment(sha256, name, content_type, f.size, extract_text(f, content_type))
+
+
+def attachment_ref(attachment):
+    """Lightweight attachment reference for history payloads"""
+    return {
+        'id': attachment.id,
+        'filename': attachment.filename,
+        'content_type': attachment.content_type,
+        'size': attachment.size,
+        'text_length': attachment.text_length,
+    }
+
+
+def split_chunks(text, size=CHUNK_SIZE):
+    """Split text into chunks of roughly `size` characters on paragraph boundaries"""
+    chunks = []
+    current = ''
+    for paragraph in re.split(r"\n\s*\n", text):
+        paragraph = paragraph.strip()
+        if not paragraph:
+            continue
+        # Hard-split paragraphs that are larger than a chunk on their own
+        while len(paragraph) > size:
+            if current:
+                chunks.append(current)
+                current = ''
+            chunks.append(paragraph[:size])
+            paragraph = paragraph[size:]
+        if current and len(current) + len(paragraph) + 2 > size:
+            chunks.append(current)
+            current = paragraph
+        else:
+            current = f"{current}\n\n{paragraph}" if current else paragraph
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+def ranked_chunks(text, question, limit=MAX_PROMPT_CHUNKS):
+    """The chunks of `text` sharing the most terms with `question`, most relevant first, with their positions"""
+    chunks = split_chunks(text)
+    terms = set(_WORD_RE.findall(question.lower())) - _STOPWORDS
+    scores = []
+    for index, chunk in enumerate(chunks):
+        words = _WORD_RE.findall(chunk.lower())
+        scores.append((sum(1 for w in words if w in terms), -index))
+
+    best = sorted(range(len(chunks)), key=lambda i: scores[i], reverse=True)[:limit]
+    return [{'index': i, 'text': chunks[i]} for i in best]
+
+
+def prompt_attachments(message, attachments):
+    """The relevant parts of a message's attachments, in the shape the RAG service's prompt builder takes"""
+    return [
+        {'filename': attachment.filename, 'chunks': ranked_chunks(attachment.text, message)}
+        for attachment in attachments
+        if attachment.text
+    ]
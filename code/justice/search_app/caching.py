@@ -0,0 +1,61 @@
+# caching.py
+import functools
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.utils.cache import patch_cache_control, patch_vary_headers
+
+from ai_jury import metrics
+
+
+def page_cache_key(request):
+    """Cache key for a rendered page: one entry per path and per user (or one for all anonymous visitors)"""
+    user = getattr(request, 'user', None)
+    owner = user.pk if user is not None and user.is_authenticated else 'anon'
+    return f"page:{request.path}:{owner}"
+
+
+def _finish(request, response, etag, timeout):
+    """Add the ETag and caching headers; ConditionalGetMiddleware turns a matching If-None-Match into a 304"""
+    response['ETag'] = etag
+    # The page depends on who is logged in, which is carried by the session cookie
+    patch_vary_headers(response, ['Cookie'])
+    if request.user.is_authenticated:
+        patch_cache_control(response, private=True, max_age=0, must_revalidate=True)
+    else:
+        patch_cache_control(response, public=True, max_age=timeout)
+    return response
+
+
+def cached_page(view):
+    """
+    Cache the rendered page of a view whose output only depends on the URL
+    and the logged-in user. GET/HEAD only; PAGE_CACHE_TIMEOUT = 0 disables it.
+    """
+    @functools.wraps(view)
+    def wrapper(request, *args, **kwargs):
+        timeout = getattr(settings, 'PAGE_CACHE_TIMEOUT', 600)
+        if not timeout or request.method not in ('GET', 'HEAD') or request.GET:
+            return view(request, *args, **kwargs)
+
+        key = page_cache_key(request)
+        entry = cache.get(key)
+        metrics.record_cache_lookup('page', entry is not None)
+        if entry is not None:
+            content, content_type, etag = entry
+            return _finish(request, HttpResponse(content, content_type=content_type), etag, timeout)
+
+        response = view(request, *args, **kwargs)
+        # Don't cache errors, streams or pages carrying a CSRF token or setting cookies
+        if (response.status_code != 200 or response.streaming or response.cookies
+                or request.META.get('CSRF_COOKIE_NEEDS_UPDATE')):
+            return response
+        if hasattr(response, 'render') and callable(response.render):
+            response.render()
+        etag = '"%s"' % hashlib.md5(response.content, usedforsecurity=False).hexdigest()
+        cache.set(key, (response.content, response['Content-Type'], etag), timeout)
+        return _finish(request, response, etag, timeout)
+
+    return wrapper
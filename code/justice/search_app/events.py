@@ -0,0 +1,133 @@
+# events.py
+import asyncio
+import contextlib
+import json
+import threading
+import time
+from collections import deque, namedtuple
+
+from django.core.serializers.json import DjangoJSONEncoder
+
+from ai_jury import metrics
+
+Event = namedtuple('Event', ['id', 'type', 'data'])
+
+# Seconds between keep-alive comments, and before a stream is closed so the
+# browser reconnects (with Last-Event-ID) and proxies don't time it out
+HEARTBEAT_SECONDS = 15
+STREAM_SECONDS = 300
+
+SUBSCRIBERS = metrics.gauge('chat_event_subscribers', 'Open chat event streams')
+PUBLISHED = metrics.counter('chat_events_published_total', 'Chat events published', ['type'])
+
+
+class EventBus:
+    """
+    In-process publish/subscribe for chat updates, with a short history so a
+    reconnecting client can resume from its Last-Event-ID. Publishers may be
+    sync views on any thread; subscribers may be threads (WSGI) or coroutines
+    (ASGI). With several worker processes each has its own bus, so run the
+    event stream on one ASGI worker or move this onto Redis pub/sub.
+    """
+
+    def __init__(self, history=500):
+        self._lock = threading.Lock()
+        self._history = deque(maxlen=history)
+        self._next_id = 1
+        self._wakers = set()
+
+    @property
+    def last_id(self):
+        with self._lock:
+            return self._next_id - 1
+
+    def publish(self, event_type, data):
+        with self._lock:
+            event = Event(self._next_id, event_type, data)
+            self._next_id += 1
+            self._history.append(event)
+            wakers = list(self._wakers)
+        PUBLISHED.inc(event_type)
+        for wake in wakers:
+            wake()
+        return event
+
+    def since(self, last_id):
+        """Events after `last_id`, or None if some of them are gone (dropped from the history, or a restart)"""
+        with self._lock:
+            if last_id >= self._next_id or (self._history and last_id < self._history[0].id - 1):
+                return None
+            return [event for event in self._history if event.id > last_id]
+
+    def stream(self, last_id=None):
+        """Blocking generator of SSE chunks, for WSGI servers (holds one thread per open tab)"""
+        wakeup = threading.Event()
+        with self._subscription(wakeup.set):
+            deadline = time.monotonic() + STREAM_SECONDS
+            last_id = self.last_id if last_id is None else last_id
+            yield 'retry: 3000\n\n'
+            while time.monotonic() < deadline:
+                wakeup.clear()
+                chunk, last_id = self._pending(last_id)
+                if chunk:
+                    yield chunk
+                elif not wakeup.wait(HEARTBEAT_SECONDS):
+                    yield ': keep-alive\n\n'
+
+    async def astream(self, last_id=None):
+        """Async generator of SSE chunks, for the ASGI entry point"""
+        loop = asyncio.get_running_loop()
+        wakeup = asyncio.Event()
+        with self._subscription(lambda: loop.call_soon_threadsafe(wakeup.set)):
+            deadline = time.monotonic() + STREAM_SECONDS
+            last_id = self.last_id if last_id is None else last_id
+            yield 'retry: 3000\n\n'
+            while time.monotonic() < deadline:
+                wakeup.clear()
+                chunk, last_id = self._pending(last_id)
+                if chunk:
+                    yield chunk
+                    continue
+                try:
+                    await asyncio.wait_for(wakeup.wait(), HEARTBEAT_SECONDS)
+                except asyncio.TimeoutError:
+                    yield ': keep-alive\n\n'
+
+    def _pending(self, last_id):
+        events = self.since(last_id)
+        if events is None:
+            # Too far behind to replay; the client reloads its state instead
+            return f'id: {self.last_id}\nevent: reset\ndata: {{}}\n\n', self.last_id
+        if not events:
+            return '', last_id
+        return ''.join(format_event(event) for event in events), events[-1].id
+
+    @contextlib.contextmanager
+    def _subscription(self, wake):
+        with self._lock:
+            self._wakers.add(wake)
+        SUBSCRIBERS.inc()
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._wakers.discard(wake)
+            SUBSCRIBERS.dec()
+
+
+def format_event(event):
+    data = json.dumps(event.data, cls=DjangoJSONEncoder, separators=(',', ':'))
+    return f'id: {event.id}\nevent: {event.type}\ndata: {data}\n\n'
+
+
+def session_data(session, message_count):
+    """The sidebar entry for a session, as returned by get_chat_sessions"""
+    return {
+        'id': session.id,
+        'title': session.title,
+        'message_count': message_count,
+        'last_activity': session.updated_at.strftime('%Y-%m-%d %H:%M'),
+    }
+
+
+bus = EventBus()
@@ -0,0 +1,171 @@
+"""
+Chat transcripts as JSON lines, CSV or PDF, generated while the rows are read.
+
+Messages are read in one query ordered by session and time (served by the
+(session, timestamp) index) with `.iterator(chunk_size=...)`, so only one
+chunk of rows is in memory at a time whether the export covers one session
+or the whole table. The generators feed both StreamingHttpResponse and
+`manage.py export_transcripts`.
+"""
+import csv
+import itertools
+from collections import defaultdict, namedtuple
+from datetime import datetime, time
+
+from django.core.management.base import CommandError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils import timezone
+
+from .models import ChatMessage
+from .pdf import PdfWriter
+
+FORMATS = {
+    'jsonl': 'application/x-ndjson',
+    'csv': 'text/csv',
+    'pdf': 'application/pdf',
+}
+CHUNK_SIZE = 2000
+
+ROW_FIELDS = ['id', 'session_id', 'is_user', 'timestamp', 'thinking_time', 'content',
+              'session__title', 'session__created_at', 'session__updated_at']
+Row = namedtuple('Row', ['id', 'session_id', 'is_user', 'timestamp', 'thinking_time', 'content',
+                         'title', 'created_at', 'updated_at'])
+
+CSV_COLUMNS = ['session_id', 'session_title', 'message_id', 'role', 'timestamp', 'thinking_time',
+               'attachments', 'content']
+
+
+def parse_day(value):
+    """Start of the day `value` (YYYY-MM-DD) in the current time zone; ValueError if malformed"""
+    return timezone.make_aware(datetime.combine(datetime.strptime(value, '%Y-%m-%d').date(), time.min))
+
+
+def day_option(value):
+    """parse_day for the --since/--until options of management commands"""
+    try:
+        return parse_day(value)
+    except ValueError:
+        raise CommandError(f"Expected a date like 2025-01-31, got {value!r}")
+
+
+def transcript_messages(sessions=None, since=None, until=None):
+    """Messages to export, in session and time order"""
+    messages = ChatMessage.objects.order_by('session_id', 'timestamp')
+    if sessions is not None:
+        messages = messages.filter(session__in=sessions)
+    if since:
+        messages = messages.filter(timestamp__gte=since)
+    if until:
+        messages = messages.filter(timestamp__lt=until)
+    return messages
+
+
+def transcript_rows(messages, chunk_size=CHUNK_SIZE):
+    """
+    (Row, attachment filenames) per message, where Row holds ROW_FIELDS.
+    Plain tuples rather than model instances, and the filenames of a whole
+    chunk in one query: building a ChatMessage and a prefetched related
+    manager per row took most of the export's time.
+    """
+    rows = messages.values_list(*ROW_FIELDS).iterator(chunk_size=chunk_size)
+    while chunk := [Row(*row) for row in itertools.islice(rows, chunk_size)]:
+        filenames = defaultdict(list)
+        links = (ChatMessage.attachments.through.objects
+                 .filter(chatmessage_id__in=[row.id for row in chunk])
+                 .values_list('chatmessage_id', 'attachment__filename'))
+        for message_id, filename in links:
+            filenames[message_id].append(filename)
+        for row in chunk:
+            yield row, filenames.get(row.id, [])
+
+
+def message_record(row, attachments):
+    return {
+        'type': 'message',
+        'id': row.id,
+        'session_id': row.session_id,
+        'role': 'user' if row.is_user else 'assistant',
+        'timestamp': row.timestamp,
+        'thinking_time': row.thinking_time,
+        'attachments': attachments,
+        'content': row.content,
+    }
+
+
+def session_record(row):
+    return {
+        'type': 'session',
+        'id': row.session_id,
+        'title': row.title,
+        'created_at': row.created_at,
+        'updated_at': row.updated_at,
+    }
+
+
+def export_jsonl(messages, chunk_size=CHUNK_SIZE):
+    """A session record before each session's messages, one JSON object per line"""
+    encoder = DjangoJSONEncoder(ensure_ascii=False, separators=(',', ':'))
+    current = None
+    for row, attachments in transcript_rows(messages, chunk_size):
+        if row.session_id != current:
+            current = row.session_id
+            yield encoder.encode(session_record(row)) + '\n'
+        yield encoder.encode(message_record(row, attachments)) + '\n'
+
+
+class _Echo:
+    """csv.writer target that hands back each row instead of buffering it"""
+
+    def write(self, value):
+        return value
+
+
+def export_csv(messages, chunk_size=CHUNK_SIZE):
+    """One row per message, with the session repeated on each row"""
+    writer = csv.writer(_Echo())
+    yield writer.writerow(CSV_COLUMNS)
+    for row, attachments in transcript_rows(messages, chunk_size):
+        yield writer.writerow([
+            row.session_id,
+            row.title,
+            row.id,
+            'user' if row.is_user else 'assistant',
+            row.timestamp.isoformat(),
+            '' if row.thinking_time is None else row.thinking_time,
+            '; '.join(attachments),
+            row.content,
+        ])
+
+
+def export_pdf(session, messages, chunk_size=CHUNK_SIZE):
+    """One session's transcript as a PDF, a page at a time"""
+    pdf = PdfWriter(title=session.title)
+    yield from pdf.add(session.title, bold=True)
+    yield from pdf.add(f"Session {session.id}, started {session.created_at:%Y-%m-%d %H:%M} UTC")
+    yield from pdf.add('')
+    for row, attachments in transcript_rows(messages, chunk_size):
+        heading = f"{'User' if row.is_user else 'AI'}, {row.timestamp:%Y-%m-%d %H:%M:%S}"
+        if row.thinking_time is not None:
+            heading += f" ({row.thinking_time}s)"
+        yield from pdf.add(heading, bold=True)
+        if attachments:
+            yield from pdf.add(f"Attachments: {', '.join(attachments)}")
+        # The markdown source; the PDF has no rich text
+        yield from pdf.add(row.content)
+        yield from pdf.add('')
+    yield pdf.close()
+
+
+def export(fmt, messages, session=None, chunk_size=CHUNK_SIZE):
+    """Chunks of the export in `fmt` (one of FORMATS); PDF is per session"""
+    if fmt == 'jsonl':
+        return export_jsonl(messages, chunk_size)
+    if fmt == 'csv':
+        return export_csv(messages, chunk_size)
+    if fmt == 'pdf':
+        return export_pdf(session, messages, chunk_size)
+    raise ValueError(f"Unknown export format {fmt!r}")
+
+
+def export_filename(fmt, session=None):
+    return f"transcript-{session.id}.{fmt}" if session else f"transcripts.{fmt}"
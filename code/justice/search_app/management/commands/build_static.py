@@ -0,0 +1,32 @@
+import os
+
+from django.conf import settings
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    help = "Build the Tailwind stylesheet, then collect hashed, gzip/brotli-compressed static files into STATIC_ROOT"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--skip-tailwind', action='store_true',
+                            help='Use the existing Tailwind build (or the Play CDN fallback)')
+
+    def handle(self, *args, **options):
+        if not options['skip_tailwind']:
+            try:
+                call_command('tailwind', 'build')
+            except (CommandError, OSError) as e:
+                self.stderr.write(f"Tailwind build failed, pages will use the Play CDN: {e}")
+
+        call_command('collectstatic', interactive=False, verbosity=0)
+
+        totals = {'': 0, '.gz': 0, '.br': 0}
+        for directory, _, names in os.walk(settings.STATIC_ROOT):
+            for name in names:
+                suffix = os.path.splitext(name)[1]
+                totals[suffix if suffix in totals else ''] += os.path.getsize(os.path.join(directory, name))
+        self.stdout.write(
+            f"Collected {totals[''] / 1024:.0f} KiB into {settings.STATIC_ROOT} "
+            f"(gzip copies {totals['.gz'] / 1024:.0f} KiB, brotli copies {totals['.br'] / 1024:.0f} KiB)"
+        )
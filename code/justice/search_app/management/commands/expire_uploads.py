@@ -0,0 +1,16 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+
+from search_app.uploads import expire_uploads
+
+
+class Command(BaseCommand):
+    help = "Delete resumable uploads that have not been touched for a while, and their partial files"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--hours', type=float, default=24, help='Age since the last chunk or status change')
+
+    def handle(self, *args, **options):
+        deleted = expire_uploads(timedelta(hours=options['hours']))
+        self.stdout.write(f"Deleted {deleted} uploads")
@@ -0,0 +1,51 @@
+import json
+import sys
+
+from django.core.management.base import BaseCommand
+from django.db.models import Count
+
+from search_app.exports import day_option
+from search_app.models import ChatMessage
+
+
+class Command(BaseCommand):
+    help = "Export user chat messages as a time-ordered trace for benchmarks/replay.py"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--output', help='JSON lines file (default: stdout)')
+        parser.add_argument('--since', type=day_option, help='First day to include (YYYY-MM-DD)')
+        parser.add_argument('--until', type=day_option, help='Day to stop before (YYYY-MM-DD)')
+        parser.add_argument('--limit', type=int, help='Stop after this many messages')
+
+    def handle(self, *args, **options):
+        messages = (ChatMessage.objects.filter(is_user=True)
+                    .annotate(attachment_count=Count('attachments'))
+                    .order_by('timestamp'))
+        if options['since']:
+            messages = messages.filter(timestamp__gte=options['since'])
+        if options['until']:
+            messages = messages.filter(timestamp__lt=options['until'])
+        if options['limit']:
+            messages = messages[:options['limit']]
+
+        out = open(options['output'], 'w', encoding='utf-8') if options['output'] else sys.stdout
+        # Sessions are numbered in order of appearance so the trace carries no database ids
+        sessions = {}
+        start = None
+        count = 0
+        try:
+            rows = messages.values_list('timestamp', 'session_id', 'content', 'attachment_count')
+            for timestamp, session_id, content, attachment_count in rows.iterator():
+                start = start or timestamp
+                out.write(json.dumps({
+                    'offset': round((timestamp - start).total_seconds(), 3),
+                    'session': sessions.setdefault(session_id, len(sessions)),
+                    'question': content,
+                    'attachments': attachment_count,
+                }) + '\n')
+                count += 1
+        finally:
+            if options['output']:
+                out.close()
+        if options['output']:
+            self.stdout.write(f"Wrote {count} messages from {len(sessions)} sessions to {options['output']}")
@@ -0,0 +1,50 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from search_app.exports import CHUNK_SIZE, FORMATS, day_option, export, transcript_messages
+from search_app.models import ChatSession
+
+
+class Command(BaseCommand):
+    help = "Write chat transcripts as JSON lines or CSV (all or some sessions), or one session as PDF"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--format', choices=list(FORMATS), default='jsonl')
+        parser.add_argument('--session', action='append', help='Session ID to export (repeatable; default: all)')
+        parser.add_argument('--since', type=day_option, help='First day to include (YYYY-MM-DD)')
+        parser.add_argument('--until', type=day_option, help='Day to stop before (YYYY-MM-DD)')
+        parser.add_argument('--output', help='File to write (default: stdout)')
+        parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE, help='Rows fetched per database round trip')
+
+    def handle(self, *args, **options):
+        fmt = options['format']
+        sessions = options['session']
+        session = None
+        if fmt == 'pdf':
+            if not sessions or len(sessions) != 1:
+                raise CommandError("PDF exports are per session: pass exactly one --session")
+            try:
+                session = ChatSession.objects.get(id=sessions[0])
+            except (ChatSession.DoesNotExist, ValueError):
+                raise CommandError(f"No chat session {sessions[0]}")
+        messages = transcript_messages(sessions, options['since'], options['until'])
+        chunks = export(fmt, messages, session, options['chunk_size'])
+
+        binary = fmt == 'pdf'
+        if options['output'] and binary:
+            out = open(options['output'], 'wb')
+        elif options['output']:
+            out = open(options['output'], 'w', encoding='utf-8', newline='')
+        else:
+            out = sys.stdout.buffer if binary else sys.stdout
+        written = 0
+        try:
+            for chunk in chunks:
+                out.write(chunk)
+                written += len(chunk)
+        finally:
+            if options['output']:
+                out.close()
+        if options['output']:
+            self.stdout.write(f"Wrote {written} {'bytes' if binary else 'characters'} to {options['output']}")
@@ -0,0 +1,52 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from search_app.models import SessionPurge
+from search_app.retention import enforce_retention, purge_session
+
+
+class Command(BaseCommand):
+    help = "Delete queued chat sessions in small batched transactions, and apply the retention policies"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500, help='Messages deleted per transaction')
+        parser.add_argument('--pause', type=float, default=0.05,
+                            help='Seconds to sleep between transactions, leaving the database to chat requests')
+        parser.add_argument('--retention', action='store_true', help='Also apply the retention policies')
+        parser.add_argument('--retention-interval', type=float, default=3600,
+                            help='Seconds between retention runs with --loop')
+        parser.add_argument('--loop', action='store_true', help='Keep polling for queued sessions')
+        parser.add_argument('--poll-interval', type=float, default=10.0, help='Seconds between polls with --loop')
+
+    def handle(self, *args, **options):
+        batch_size, pause = options['batch_size'], options['pause']
+        next_retention = 0
+        while True:
+            if options['retention'] and time.monotonic() >= next_retention:
+                queued, trimmed = enforce_retention(batch_size, pause)
+                if queued or trimmed:
+                    self.stdout.write(f"Retention: queued {queued} sessions, trimmed {trimmed} messages")
+                next_retention = time.monotonic() + options['retention_interval']
+
+            purged = self.purge_pending(batch_size, pause)
+            if not options['loop']:
+                return
+            if not purged:
+                time.sleep(options['poll_interval'])
+
+    def purge_pending(self, batch_size, pause):
+        purged = 0
+        for purge in SessionPurge.objects.filter(status=SessionPurge.STATUS_PENDING).order_by('requested_at'):
+            started = time.monotonic()
+            try:
+                deleted = purge_session(purge, batch_size, pause)
+            except Exception as e:
+                self.stderr.write(f"Could not purge session {purge.session_id}: {e}")
+                continue
+            purged += 1
+            self.stdout.write(
+                f"Purged {purge.title!r}: {deleted} messages in {time.monotonic() - started:.1f}s, "
+                f"longest transaction {purge.longest_batch_ms:.1f} ms"
+            )
+        return purged
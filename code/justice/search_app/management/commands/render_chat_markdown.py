@@ -0,0 +1,41 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from search_app.models import ChatMessage
+from search_app.rendering import render_markdown
+
+
+class Command(BaseCommand):
+    help = "Fill in ChatMessage.content_html for AI answers saved before it was rendered at write time"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true',
+                            help='Re-render every AI answer, e.g. after changing the renderer options')
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        messages = ChatMessage.objects.filter(is_user=False)
+        if not options['all']:
+            messages = messages.filter(content_html='')
+        total = messages.count()
+        started = time.monotonic()
+        done = 0
+        batch_size = options['batch_size']
+        # Keyset pagination on the primary key: rows rendered in one batch drop out of the
+        # content_html='' filter, so offsets would skip rows
+        last_id = None
+        while True:
+            page = messages.order_by('id').only('id', 'content')
+            if last_id is not None:
+                page = page.filter(id__gt=last_id)
+            batch = list(page[:batch_size])
+            if not batch:
+                break
+            for message in batch:
+                message.content_html = render_markdown(message.content)
+            ChatMessage.objects.bulk_update(batch, ['content_html'])
+            done += len(batch)
+            last_id = batch[-1].id
+            self.stdout.write(f"Rendered {done}/{total}")
+        self.stdout.write(f"Rendered {done} AI answers in {time.monotonic() - started:.1f}s")
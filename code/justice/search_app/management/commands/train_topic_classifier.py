@@ -0,0 +1,95 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from ai_jury.topic import MODEL_FILE, OFF_TOPIC_REPLY, SEED_FILE, TopicClassifier, evaluate, load_examples, split
+from search_app.models import ChatMessage
+
+# Replies the chat view writes when the AI service failed; they say nothing about the question
+FAILED_REPLIES = (
+    "Sorry, I'm having trouble connecting to the AI service",
+    'No response from AI service',
+    'The AI service is busy right now',
+)
+
+
+def label_from_reply(reply):
+    """'off_topic' if the assistant gave the canned refusal, None if it failed, else 'legal'"""
+    if OFF_TOPIC_REPLY in reply:
+        return 'off_topic'
+    if reply.startswith(FAILED_REPLIES):
+        return None
+    return 'legal'
+
+
+def logged_examples():
+    """(question, label) for each user message in the chat logs, labelled by the reply that followed it"""
+    examples = []
+    question = None
+    messages = (ChatMessage.objects.filter(attachments__isnull=True)
+                .order_by('session_id', 'timestamp')
+                .values_list('session_id', 'is_user', 'content'))
+    previous_session = None
+    for session_id, is_user, content in messages.iterator():
+        if session_id != previous_session:
+            question, previous_session = None, session_id
+        if is_user:
+            question = content.strip()
+        elif question:
+            label = label_from_reply(content)
+            if label:
+                examples.append((question, label))
+            question = None
+    return examples
+
+
+class Command(BaseCommand):
+    help = "Train the classifier that answers off-topic questions without calling the LLM"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--output', default=MODEL_FILE)
+        parser.add_argument('--data', action='append', default=[],
+                            help='Extra labelled JSON lines ({"text", "label": "legal"|"off_topic"}); repeatable')
+        parser.add_argument('--no-seed', action='store_true', help=f'Leave out {SEED_FILE}')
+        parser.add_argument('--no-logs', action='store_true', help='Leave out the chat logs')
+        parser.add_argument('--dump', help='Write the labelled examples to this file for review and exit')
+        parser.add_argument('--holdout', type=float, default=0.25,
+                            help='Share of the examples held out to pick the threshold')
+        parser.add_argument('--min-precision', type=float, default=0.98,
+                            help='Precision of rejections the threshold must keep on the held-out examples')
+        parser.add_argument('--dims', type=int, default=2 ** 18, help='Hashed feature buckets')
+        parser.add_argument('--epochs', type=int, default=30)
+
+    def handle(self, *args, **options):
+        examples = [] if options['no_seed'] else load_examples(SEED_FILE)
+        for path in options['data']:
+            examples += load_examples(path)
+        logged = [] if options['no_logs'] else logged_examples()
+        examples += logged
+        # The same question asked many times would otherwise dominate training and the held-out set
+        examples = list(dict.fromkeys((text.lower(), label) for text, label in examples))
+        counts = {label: sum(1 for _, l in examples if l == label) for label in ('legal', 'off_topic')}
+        if not all(counts.values()):
+            raise CommandError(f"Need examples of both classes, got {counts}")
+        self.stdout.write(f"{len(examples)} examples ({counts['legal']} legal, {counts['off_topic']} off-topic; "
+                          f"{len(logged)} from the chat logs)")
+
+        if options['dump']:
+            with open(options['dump'], 'w', encoding='utf-8') as f:
+                for text, label in examples:
+                    f.write(json.dumps({'text': text, 'label': label}) + '\n')
+            self.stdout.write(f"Wrote {options['dump']}")
+            return
+
+        train, test = split(examples, options['holdout'])
+        classifier = TopicClassifier.train(train, dims=options['dims'], epochs=options['epochs'])
+        threshold = classifier.choose_threshold(test, options['min_precision'])
+        result = evaluate(classifier, test)
+        self.stdout.write(f"Held out {len(test)}: threshold {threshold:.3f}, precision {result['precision']:.2f}, "
+                          f"recall {result['recall']:.2f} ({result['fp']} legal questions rejected)")
+
+        # The threshold carries over to a model refitted on everything
+        final = TopicClassifier.train(examples, dims=options['dims'], epochs=options['epochs'])
+        final.threshold = threshold
+        final.save(options['output'])
+        self.stdout.write(f"Saved {len(final.weights)} weights to {options['output']}")
@@ -0,0 +1,102 @@
+import time
+from collections import Counter
+from datetime import timedelta
+
+import requests
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Exists, OuterRef
+from django.utils import timezone
+
+from ai_jury.answers import normalize_question
+from search_app.models import ChatMessage
+
+
+def frequent_questions(top, days=None):
+    """
+    [(question, times asked)] for the `top` most frequent normalized questions, most frequent first.
+    Only the first message of each session counts: later ones are sent with history, and the
+    service only caches answers to questions asked without it.
+    """
+    earlier = ChatMessage.objects.filter(session=OuterRef('session'), timestamp__lt=OuterRef('timestamp'))
+    messages = ChatMessage.objects.filter(is_user=True, attachments__isnull=True).filter(~Exists(earlier))
+    if days:
+        messages = messages.filter(timestamp__gte=timezone.now() - timedelta(days=days))
+    counts = Counter()
+    spellings = {}
+    for content in messages.values_list('content', flat=True).iterator():
+        key = normalize_question(content)
+        if key:
+            counts[key] += 1
+            spellings.setdefault(key, Counter())[content.strip()] += 1
+    # Send the way it is most often typed; the service normalizes it the same way
+    return [(spellings[key].most_common(1)[0][0], n) for key, n in counts.most_common(top)]
+
+
+class Command(BaseCommand):
+    help = "Answer the most frequent chat questions ahead of traffic so they are served from the answer cache"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--top', type=int, default=200, help='Number of distinct questions to warm')
+        parser.add_argument('--days', type=int, help='Only count questions from the last N days')
+        parser.add_argument('--batch-size', type=int, default=20, help='Questions per request to the service')
+        parser.add_argument('--concurrency', type=int, default=4,
+                            help='Questions the service answers at once (within its background LLM slots)')
+        parser.add_argument('--url', help='Legal assistant base URL (default: from RAG_SERVICE_URL)')
+        parser.add_argument('--dry-run', action='store_true', help='List the questions and exit')
+        parser.add_argument('--report', action='store_true',
+                            help="Only print the service's answer cache hit rate since it started")
+
+    def handle(self, *args, **options):
+        base_url = (options['url'] or settings.RAG_SERVICE_URL.rsplit('/', 1)[0]).rstrip('/')
+        if options['report']:
+            self.report(base_url)
+            return
+
+        questions = frequent_questions(options['top'], options['days'])
+        asked = sum(n for _, n in questions)
+        self.stdout.write(f"{len(questions)} questions, asked {asked} times in the chat logs")
+        if options['dry_run'] or not questions:
+            for question, n in questions:
+                self.stdout.write(f"{n:6}  {question}")
+            return
+        if not settings.CACHE_WARM_TOKEN:
+            raise CommandError("Set CACHE_WARM_TOKEN here and on the legal assistant service")
+
+        totals = {'warmed': 0, 'cached': 0, 'local': 0, 'failed': 0, 'upstream_calls': 0}
+        started = time.monotonic()
+        batch_size = options['batch_size']
+        for offset in range(0, len(questions), batch_size):
+            batch = [question for question, _ in questions[offset:offset + batch_size]]
+            try:
+                response = requests.post(
+                    f'{base_url}/cache/warm',
+                    json={'questions': batch, 'concurrency': options['concurrency']},
+                    headers={'X-Warm-Token': settings.CACHE_WARM_TOKEN},
+                    timeout=600,
+                )
+                response.raise_for_status()
+            except requests.RequestException as e:
+                raise CommandError(f"Warming failed after {offset} questions: {e}")
+            result = response.json()
+            for key in totals:
+                totals[key] += result.get(key, 0)
+            for error in result.get('errors', ()):
+                self.stderr.write(f"  {error}")
+            self.stdout.write(
+                f"[{offset + len(batch)}/{len(questions)}] warmed {totals['warmed']}, already cached "
+                f"{totals['cached']}, answered locally {totals['local']}, failed {totals['failed']}; "
+                f"{totals['upstream_calls']} LLM calls, {time.monotonic() - started:.0f}s"
+            )
+        self.stdout.write(f"Cache entries: {result['answer_cache']['entries']} "
+                          f"(version {result['answer_cache']['version']})")
+
+    def report(self, base_url):
+        try:
+            cache = requests.get(f'{base_url}/health', timeout=10).json()['answer_cache']
+        except (requests.RequestException, ValueError, KeyError) as e:
+            raise CommandError(f"Could not read the answer cache stats: {e}")
+        rate = 'n/a' if cache['hit_rate'] is None else f"{cache['hit_rate']:.1%}"
+        self.stdout.write(f"Answer cache since the service started: hit rate {rate} "
+                          f"({cache['hits']} hits, {cache['misses']} misses), {cache['entries']} entries, "
+                          f"version {cache['version']}")
@@ -0,0 +1,75 @@
+# middleware.py
+import functools
+import time
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+
+from ai_jury import metrics
+from ai_jury.profiling import RequestProfiler
+
+REQUESTS = metrics.counter('django_requests_total', 'HTTP requests', ['route', 'method', 'status'])
+LATENCY = metrics.histogram('django_request_duration_seconds', 'HTTP request latency', ['route', 'method'])
+IN_FLIGHT = metrics.gauge('django_requests_in_flight', 'HTTP requests being served')
+DB_QUERIES = metrics.histogram(
+    'django_db_queries_per_request', 'Database queries per request', ['route'],
+    buckets=(0, 1, 2, 5, 10, 20, 50, 100),
+)
+
+
+class MetricsMiddleware:
+    """Records request counts, latency, DB query counts and in-flight requests per URL route"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        queries = [0]
+
+        def count_queries(execute, sql, params, many, context):
+            queries[0] += 1
+            return execute(sql, params, many, context)
+
+        IN_FLIGHT.inc()
+        start = time.perf_counter()
+        status = 500
+        try:
+            with connections['default'].execute_wrapper(count_queries):
+                response = self.get_response(request)
+            status = response.status_code
+            return response
+        finally:
+            IN_FLIGHT.dec()
+            # Label by URL pattern, not path, so session UUIDs don't explode cardinality
+            match = request.resolver_match
+            route = '/' + match.route if match else 'unmatched'
+            LATENCY.observe(time.perf_counter() - start, route, request.method)
+            REQUESTS.inc(route, request.method, str(status))
+            DB_QUERIES.observe(queries[0], route)
+
+
+@functools.cache
+def get_profiler():
+    config = settings.PROFILING
+    return RequestProfiler(
+        directory=config['DIRECTORY'],
+        threshold_ms=config.get('THRESHOLD_MS', 2000),
+        sample_rate=config.get('SAMPLE_RATE', 0.0),
+        max_files=config.get('MAX_FILES', 100),
+        engine=config.get('ENGINE', 'sampler'),
+    )
+
+
+class ProfilingMiddleware:
+    """Saves a profile of requests that are slow or sampled; removed entirely when disabled"""
+
+    def __init__(self, get_response):
+        if not settings.PROFILING.get('ENABLED'):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.profiler = get_profiler()
+
+    def __call__(self, request):
+        with self.profiler.capture(f'django {request.method} {request.path}'):
+            return self.get_response(request)
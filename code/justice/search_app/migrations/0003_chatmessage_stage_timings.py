@@ -0,0 +1,18 @@
+# Generated by Django 5.2.7 on 2026-10-19 11:11
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('search_app', '0002_attachment'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='chatmessage',
+            name='stage_timings',
+            field=models.JSONField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.7 on 2026-10-19 11:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('search_app', '0003_chatmessage_stage_timings'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='chatmessage',
+            name='content_html',
+            field=models.TextField(blank=True, default=''),
+        ),
+    ]
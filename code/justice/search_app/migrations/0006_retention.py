@@ -0,0 +1,56 @@
+# Generated by Django 5.2.7 on 2026-10-19 13:14
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('search_app', '0005_chatmessage_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RetentionPolicy',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100, unique=True)),
+                ('max_age_days', models.PositiveIntegerField(blank=True, null=True)),
+                ('max_messages_per_session', models.PositiveIntegerField(blank=True, null=True)),
+                ('is_default', models.BooleanField(default=False)),
+            ],
+            options={
+                'verbose_name_plural': 'retention policies',
+            },
+        ),
+        migrations.AddField(
+            model_name='chatsession',
+            name='purge_requested_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='chatsession',
+            name='retention_policy',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='sessions', to='search_app.retentionpolicy'),
+        ),
+        migrations.CreateModel(
+            name='SessionPurge',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('session_id', models.UUIDField(db_index=True)),
+                ('title', models.CharField(max_length=255)),
+                ('reason', models.CharField(choices=[('admin', 'Deleted in the admin'), ('retention', 'Retention policy')], max_length=10)),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('done', 'Done'), ('failed', 'Failed')], default='pending', max_length=10)),
+                ('messages_deleted', models.PositiveBigIntegerField(default=0)),
+                ('longest_batch_ms', models.FloatField(blank=True, null=True)),
+                ('last_error', models.TextField(blank=True)),
+                ('requested_at', models.DateTimeField(auto_now_add=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'ordering': ['requested_at'],
+                'indexes': [models.Index(fields=['status', 'requested_at'], name='search_app__status_de0851_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 5.2.7 on 2026-10-19 14:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('search_app', '0007_upload'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='upload',
+            name='client',
+            field=models.CharField(blank=True, max_length=64),
+        ),
+        migrations.AddIndex(
+            model_name='upload',
+            index=models.Index(fields=['client', 'status'], name='search_app__client_14d8d4_idx'),
+        ),
+    ]
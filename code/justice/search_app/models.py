@@ -1,15 +1,66 @@
 import uuid
+import zlib
 from django.db import models
 
+from .rendering import render_markdown
+
+class RetentionPolicy(models.Model):
+    """How long chat sessions are kept; sessions without a policy follow the default one"""
+    name = models.CharField(max_length=100, unique=True)
+    max_age_days = models.PositiveIntegerField(null=True, blank=True)  # Days since a session's last message
+    max_messages_per_session = models.PositiveIntegerField(null=True, blank=True)  # Oldest messages go first
+    is_default = models.BooleanField(default=False)
+
+    class Meta:
+        verbose_name_plural = 'retention policies'
+
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        if self.is_default:
+            RetentionPolicy.objects.filter(is_default=True).exclude(pk=self.pk).update(is_default=False)
+
+    def __str__(self):
+        return self.name
+
 class ChatSession(models.Model):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     title = models.CharField(max_length=255)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+    retention_policy = models.ForeignKey(RetentionPolicy, on_delete=models.SET_NULL, null=True, blank=True,
+                                         related_name='sessions')
+    # Set when the session is queued for deletion; it is hidden from the chat until the purger removes it
+    purge_requested_at = models.DateTimeField(null=True, blank=True)
     
     class Meta:
         ordering = ['-updated_at']
 
+class Attachment(models.Model):
+    """Text extracted from an uploaded file, stored once per file content hash"""
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    sha256 = models.CharField(max_length=64, unique=True)
+    filename = models.CharField(max_length=255)
+    content_type = models.CharField(max_length=100, blank=True)
+    size = models.PositiveBigIntegerField(default=0)  # Size of the uploaded file in bytes
+    text_length = models.PositiveIntegerField(default=0)
+    compressed_text = models.BinaryField(blank=True, default=b'')  # zlib-compressed UTF-8 text
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    @property
+    def text(self):
+        if not self.compressed_text:
+            return ''
+        return zlib.decompress(bytes(self.compressed_text)).decode('utf-8')
+
+    @text.setter
+    def text(self, value):
+        value = value or ''
+        self.text_length = len(value)
+        self.compressed_text = zlib.compress(value.encode('utf-8')) if value else b''
+
+    def __str__(self):
+        return self.filename
+
 class ChatMessage(models.Model):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     session = models.ForeignKey(ChatSession, on_delete=models.CASCADE, related_name='messages')
@@ -17,6 +68,95 @@ class ChatMessage(models.Model):
     is_user = models.BooleanField(default=True)
     timestamp = models.DateTimeField(auto_now_add=True)
     thinking_time = models.FloatField(null=True, blank=True)  # Time taken by AI to respond
+    stage_timings = models.JSONField(null=True, blank=True)  # Milliseconds per stage of the chat turn
+    attachments = models.ManyToManyField(Attachment, related_name='messages', blank=True)
+    content_html = models.TextField(blank=True, default='')  # AI answers rendered from markdown, sanitized
     
     class Meta:
-        ordering = ['timestamp']
\ No newline at end of file
+        ordering = ['timestamp']
+        indexes = [
+            # Admin change list, newest first, and its date hierarchy
+            models.Index(fields=['timestamp', 'id'], name='chatmessage_time_idx'),
+            # A session's history in order
+            models.Index(fields=['session', 'timestamp'], name='chatmessage_session_time_idx'),
+        ]
+
+    def save(self, *args, update_fields=None, **kwargs):
+        # Rendered once here instead of on every view of the chat history
+        if not self.is_user and (update_fields is None or 'content' in update_fields):
+            self.content_html = render_markdown(self.content)
+            if update_fields is not None:
+                update_fields = {*update_fields, 'content_html'}
+        super().save(*args, update_fields=update_fields, **kwargs)
+
+class SessionPurge(models.Model):
+    """A chat session waiting to be deleted in batches by the purge_chat_sessions command"""
+    STATUS_PENDING = 'pending'
+    STATUS_DONE = 'done'
+    STATUS_FAILED = 'failed'
+    STATUS_CHOICES = [
+        (STATUS_PENDING, 'Pending'),
+        (STATUS_DONE, 'Done'),
+        (STATUS_FAILED, 'Failed'),
+    ]
+    REASON_ADMIN = 'admin'
+    REASON_RETENTION = 'retention'
+    REASON_CHOICES = [
+        (REASON_ADMIN, 'Deleted in the admin'),
+        (REASON_RETENTION, 'Retention policy'),
+    ]
+
+    # Not a foreign key: the row records the purge after the session is gone
+    session_id = models.UUIDField(db_index=True)
+    title = models.CharField(max_length=255)
+    reason = models.CharField(max_length=10, choices=REASON_CHOICES)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=STATUS_PENDING)
+    messages_deleted = models.PositiveBigIntegerField(default=0)
+    longest_batch_ms = models.FloatField(null=True, blank=True)  # Longest write transaction of the purge
+    last_error = models.TextField(blank=True)
+    requested_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['requested_at']
+        indexes = [models.Index(fields=['status', 'requested_at'])]
+
+    def __str__(self):
+        return f"{self.title} ({self.status})"
+
+class Upload(models.Model):
+    """A file sent in chunks through the resumable upload API, before it becomes an Attachment"""
+    STATUS_OPEN = 'open'
+    STATUS_COMPLETING = 'completing'
+    STATUS_COMPLETE = 'complete'
+    STATUS_FAILED = 'failed'
+    STATUS_CHOICES = [
+        (STATUS_OPEN, 'Receiving chunks'),
+        (STATUS_COMPLETING, 'Completing'),
+        (STATUS_COMPLETE, 'Complete'),
+        (STATUS_FAILED, 'Failed'),
+    ]
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    filename = models.CharField(max_length=255)
+    content_type = models.CharField(max_length=100, blank=True)
+    size = models.PositiveBigIntegerField()  # Declared by the client when the upload starts
+    received = models.PositiveBigIntegerField(default=0)  # Bytes stored so far; the next chunk's offset
+    sha256 = models.CharField(max_length=64, blank=True)  # Optional, checked when the upload completes
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=STATUS_OPEN)
+    # Text of PDF pages extracted while the rest of the file was still arriving, by page object number
+    early_pages = models.JSONField(default=dict, blank=True)
+    early_scanned = models.PositiveBigIntegerField(default=0)  # Bytes covered by the last early extraction
+    attachment = models.ForeignKey(Attachment, on_delete=models.SET_NULL, null=True, blank=True,
+                                   related_name='uploads')
+    error = models.TextField(blank=True)
+    # Who started it, 'user:<id>' or 'ip:<address>', for the cap on uploads open at once
+    client = models.CharField(max_length=64, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [models.Index(fields=['status', 'updated_at']), models.Index(fields=['client', 'status'])]
+
+    def __str__(self):
+        return f"{self.filename} ({self.received}/{self.size})"
@@ -0,0 +1,58 @@
+"""
+Paginators for tables too large to COUNT(*) on every page view.
+
+Django's Paginator runs an exact COUNT(*) over the filtered queryset for
+every page, which at millions of chat messages takes longer than the page
+itself. EstimatedCountPaginator reads the row count of an unfiltered table
+from the database's own statistics and counts filtered querysets only up
+to a cap: past that the admin shows "10,000+"-sized pagination and the
+filters or the date hierarchy are the way to narrow it down.
+
+SQLite keeps no row statistics, and MAX(rowid) only ever grows: after the
+batched purges and retention trims (retention.py) it would offer pages past
+the end. There, unfiltered tables get the capped count too.
+"""
+from django.core.paginator import Paginator
+from django.db import connections
+from django.utils.functional import cached_property
+
+ESTIMATE_QUERIES = {
+    # Updated by VACUUM/ANALYZE and autovacuum; -1 before the first ANALYZE
+    'postgresql': "SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass",
+    # InnoDB's sampled estimate, refreshed with the table statistics
+    'mysql': "SELECT table_rows FROM information_schema.tables "
+             "WHERE table_schema = DATABASE() AND table_name = %s",
+}
+
+
+def estimated_row_count(model, using='default'):
+    """Approximate number of rows in `model`'s table, or None when the database can't tell"""
+    connection = connections[using]
+    sql = ESTIMATE_QUERIES.get(connection.vendor)
+    if sql is None:
+        return None
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [model._meta.db_table])
+        row = cursor.fetchone()
+    if not row or row[0] is None or row[0] < 0:
+        return None
+    return int(row[0])
+
+
+class EstimatedCountPaginator(Paginator):
+    # Below this many rows an exact count is cheap, so the estimate is not used
+    exact_below = 10_000
+    # Filtered querysets are counted up to this many rows
+    count_cap = 10_000
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if not hasattr(queryset, 'query'):
+            return super().count
+        if not queryset.query.where:
+            estimate = estimated_row_count(queryset.model, queryset.db)
+            if estimate is not None:
+                return estimate if estimate >= self.exact_below else queryset.count()
+        # COUNT(*) over a LIMITed subquery stops after count_cap + 1 matching rows
+        return queryset.order_by()[:self.count_cap + 1].count()
@@ -0,0 +1,115 @@
+"""
+A minimal text-only PDF writer that streams its output page by page.
+
+Only the current page's lines and one byte offset per PDF object are kept
+in memory, so a transcript of any length is written in constant memory
+apart from 8 bytes per object for the cross-reference table. Text is set
+in the standard Helvetica fonts (no embedding) with WinAnsi encoding;
+characters outside Windows-1252 are written as '?'.
+"""
+import textwrap
+import zlib
+from array import array
+
+PAGE_WIDTH, PAGE_HEIGHT = 595, 842  # A4 in points
+MARGIN = 50
+FONT_SIZE = 10
+LEADING = 13
+LINES_PER_PAGE = (PAGE_HEIGHT - 2 * MARGIN) // LEADING
+# Helvetica averages about half an em per character
+WRAP_WIDTH = int((PAGE_WIDTH - 2 * MARGIN) / (FONT_SIZE * 0.52))
+
+# Objects 1-5 are written around the pages; page content streams and pages follow from 6
+CATALOG, PAGES, FONT, BOLD_FONT, INFO = 1, 2, 3, 4, 5
+
+
+def pdf_string(text):
+    return '(' + text.replace('\\', '\\\\').replace('(', '\\(').replace(')', '\\)') + ')'
+
+
+class PdfWriter:
+    """
+    Feed lines with `add()` and iterate the bytes it returns; `close()`
+    returns the trailer:
+
+        pdf = PdfWriter(title='Transcript')
+        for text in paragraphs:
+            yield from pdf.add(text)
+        yield pdf.close()
+    """
+
+    def __init__(self, title=''):
+        self.title = title
+        self.offsets = array('Q', [0] * (INFO + 1))  # Byte offset of each object, by number
+        self.position = 0
+        self.page_objects = array('Q')
+        self.lines = []  # (bold, text) on the current page
+        self.started = False
+
+    def add(self, text, bold=False):
+        """Wrapped lines of `text`, plus bytes for any page that filled up"""
+        chunks = []
+        if not self.started:
+            self.started = True
+            chunks.append(self._write(b'%PDF-1.4\n%\xe2\xe3\xcf\xd3\n'))
+            for number, font in ((FONT, 'Helvetica'), (BOLD_FONT, 'Helvetica-Bold')):
+                chunks.append(self._object(number, f'<< /Type /Font /Subtype /Type1 /BaseFont /{font} '
+                                                   f'/Encoding /WinAnsiEncoding >>'.encode()))
+        for paragraph in text.split('\n'):
+            for line in textwrap.wrap(paragraph, WRAP_WIDTH) or ['']:
+                self.lines.append((bold, line))
+                if len(self.lines) == LINES_PER_PAGE:
+                    chunks.append(self._page())
+        return [chunk for chunk in chunks if chunk]
+
+    def close(self):
+        """The last page, page tree, catalog and cross-reference table"""
+        chunks = [] if self.started else self.add('')
+        if self.lines or not self.page_objects:
+            chunks.append(self._page())
+        kids = ' '.join(f'{number} 0 R' for number in self.page_objects)
+        pages = f'<< /Type /Pages /Count {len(self.page_objects)} /Kids [{kids}] >>'
+        chunks.append(self._object(PAGES, pages.encode()))
+        chunks.append(self._object(CATALOG, f'<< /Type /Catalog /Pages {PAGES} 0 R >>'.encode()))
+        info = f'<< /Title {pdf_string(self.title)} /Producer (AI Jury) >>'
+        chunks.append(self._object(INFO, info.encode('cp1252', 'replace')))
+        xref = [f'xref\n0 {len(self.offsets)}\n', '0000000000 65535 f \n']
+        xref.extend(f'{offset:010d} 00000 n \n' for offset in self.offsets[1:])
+        xref.append(f'trailer\n<< /Size {len(self.offsets)} /Root {CATALOG} 0 R /Info {INFO} 0 R >>\n'
+                    f'startxref\n{self.position}\n%%EOF\n')
+        chunks.append(self._write(''.join(xref).encode()))
+        return b''.join(chunks)
+
+    def _page(self):
+        commands = [f'BT\n{LEADING} TL\n{MARGIN} {PAGE_HEIGHT - MARGIN} Td']
+        font = None
+        for bold, text in self.lines:
+            if bold != font:
+                commands.append(f'/F{2 if bold else 1} {FONT_SIZE} Tf')
+                font = bold
+            commands.append(f'{pdf_string(text)} \'')
+        commands.append('ET')
+        self.lines = []
+        content = zlib.compress('\n'.join(commands).encode('cp1252', 'replace'))
+        content_number = self._next_number()
+        chunks = [self._object(content_number, f'<< /Length {len(content)} /Filter /FlateDecode >>\nstream\n'.encode()
+                               + content + b'\nendstream')]
+        page_number = self._next_number()
+        self.page_objects.append(page_number)
+        chunks.append(self._object(page_number, (
+            f'<< /Type /Page /Parent {PAGES} 0 R /MediaBox [0 0 {PAGE_WIDTH} {PAGE_HEIGHT}] '
+            f'/Resources << /Font << /F1 {FONT} 0 R /F2 {BOLD_FONT} 0 R >> >> /Contents {content_number} 0 R >>'
+        ).encode()))
+        return b''.join(chunks)
+
+    def _next_number(self):
+        self.offsets.append(0)
+        return len(self.offsets) - 1
+
+    def _object(self, number, body):
+        self.offsets[number] = self.position
+        return self._write(f'{number} 0 obj\n'.encode() + body + b'\nendobj\n')
+
+    def _write(self, data):
+        self.position += len(data)
+        return data
@@ -0,0 +1,89 @@
+# ratelimit.py
+import functools
+
+from django.conf import settings
+from django.http import JsonResponse
+
+from ai_jury.concurrency import AdaptiveLimiter
+from ai_jury.ratelimit import RateLimiter, backend_from_url
+
+
+@functools.cache
+def get_backend():
+    return backend_from_url(settings.RATE_LIMIT_BACKEND)
+
+
+@functools.cache
+def get_limiter(name):
+    return RateLimiter(name, settings.RATE_LIMITS.get(name, {}), backend=get_backend())
+
+
+@functools.cache
+def get_rag_limiter():
+    """This process's adaptive limit on concurrent calls to the RAG service"""
+    config = settings.RAG_CONCURRENCY
+    return AdaptiveLimiter(
+        'rag',
+        enabled=config.get('ENABLED', True),
+        initial_limit=config.get('INITIAL_LIMIT', 8),
+        max_limit=config.get('MAX_LIMIT', 64),
+        tolerance=config.get('TOLERANCE', 2.0),
+    )
+
+
+def client_ip(request):
+    """The client address; behind a reverse proxy, have it set REMOTE_ADDR (e.g. uvicorn --proxy-headers)"""
+    return request.META.get('REMOTE_ADDR', '')
+
+
+def client_key(request):
+    """'user:<id>' for a signed-in user, else 'ip:<address>'"""
+    if request.user.is_authenticated:
+        return f'user:{request.user.pk}'
+    return f'ip:{client_ip(request)}'
+
+
+def rag_request_headers(request, priority, timeout):
+    """
+    Who the RAG call is made for, so the legal assistant can apply its own
+    per-user and per-IP limits, and how it should be scheduled: its priority
+    class and how many seconds we will wait for the answer.
+    """
+    headers = {'X-Forwarded-For': client_ip(request), 'X-Priority': priority, 'X-Request-Timeout': str(timeout)}
+    if request.user.is_authenticated:
+        headers['X-User-Id'] = str(request.user.pk)
+    return headers
+
+
+def check_rate_limit(name, request):
+    """Take a token from the `name` limiter's user, IP and global buckets for this request"""
+    user = request.user.pk if request.user.is_authenticated else None
+    return get_limiter(name).check(user=user, ip=client_ip(request))
+
+
+def rate_limit(name):
+    """Answer over-limit requests with 429 and Retry-After instead of calling the view"""
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(request, *args, **kwargs):
+            decision = check_rate_limit(name, request)
+            if not decision.allowed:
+                response = JsonResponse({
+                    'error': f'Too many requests. Please try again in {decision.retry_after} seconds.',
+                    'retry_after': decision.retry_after,
+                }, status=429)
+                response['Retry-After'] = str(decision.retry_after)
+                return response
+            return view(request, *args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def overloaded_response(error):
+    """503 with Retry-After for a request the RAG limiter shed"""
+    response = JsonResponse({
+        'error': f'The AI service is busy right now. Please try again in {error.retry_after} seconds.',
+        'retry_after': error.retry_after,
+    }, status=503)
+    response['Retry-After'] = str(error.retry_after)
+    return response
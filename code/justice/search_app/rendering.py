@@ -0,0 +1,24 @@
+"""
+AI answers rendered from markdown to HTML that is safe to put in a page.
+
+Rendered once, when the answer is saved (ChatMessage.content_html), rather
+than on every view of the chat history. Raw HTML in the answer is escaped,
+links with javascript:, vbscript:, file: or data: URLs are left as text
+(markdown-it's link validation) and images are not rendered, so the output
+needs no further sanitizing.
+"""
+import functools
+
+
+@functools.cache
+def markdown_parser():
+    """markdown-it, imported on first use (or by justice.warmup)"""
+    # After changing these options, re-render stored answers: manage.py render_chat_markdown --all
+    from markdown_it import MarkdownIt
+    return (MarkdownIt('commonmark', {'html': False, 'breaks': True})
+            .enable(['table', 'strikethrough'])
+            .disable('image'))
+
+
+def render_markdown(text):
+    return markdown_parser().render(text or '')
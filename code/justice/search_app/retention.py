@@ -0,0 +1,170 @@
+"""
+Deleting chat sessions in small batches.
+
+Deleting a ChatSession cascades through all of its messages (and their
+attachment links) in one transaction, which holds the SQLite write lock
+until the last row is gone and makes every chat request wait behind it.
+Instead, sessions are queued as SessionPurge rows, hidden from the chat
+straight away, and deleted by `manage.py purge_chat_sessions` a batch of
+messages per transaction with a pause between batches, so chat writes
+interleave with the purge. The admin's delete and the retention policies
+both go through the queue.
+"""
+import time
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import Count, Q
+from django.utils import timezone
+
+from ai_jury import metrics
+
+from .events import bus
+from .models import ChatMessage, ChatSession, RetentionPolicy, SessionPurge
+
+PURGE_BATCH_SECONDS = metrics.histogram(
+    'chat_purge_batch_seconds', 'Time each purge transaction held the database write lock',
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5),
+)
+PURGED_MESSAGES = metrics.counter('chat_purged_messages_total', 'Chat messages deleted by the purger', ['reason'])
+PURGED_SESSIONS = metrics.counter('chat_purged_sessions_total', 'Chat sessions deleted by the purger', ['reason'])
+
+# Sessions are marked in groups this size, keeping each UPDATE short and under SQLite's variable limit
+QUEUE_BATCH_SIZE = 500
+
+
+def queue_purge(sessions, reason):
+    """
+    Hide `sessions` (a ChatSession queryset) from the chat and queue them for
+    deletion. Sessions already queued are skipped. Returns the number queued.
+    """
+    pending = list(sessions.filter(purge_requested_at__isnull=True).values_list('id', flat=True))
+    now = timezone.now()
+    queued = []
+    for start in range(0, len(pending), QUEUE_BATCH_SIZE):
+        with transaction.atomic():
+            # Writing first takes the write lock (see delete_messages); the timestamp then picks out
+            # the sessions this call marked, skipping any queued meanwhile
+            ChatSession.objects.filter(
+                id__in=pending[start:start + QUEUE_BATCH_SIZE], purge_requested_at__isnull=True
+            ).update(purge_requested_at=now)
+            group = list(ChatSession.objects.filter(
+                id__in=pending[start:start + QUEUE_BATCH_SIZE], purge_requested_at=now
+            ).values_list('id', 'title'))
+            SessionPurge.objects.bulk_create([
+                SessionPurge(session_id=session_id, title=title, reason=reason) for session_id, title in group
+            ])
+        queued.extend(session_id for session_id, _ in group)
+    for session_id in queued:
+        bus.publish('session_deleted', {'id': session_id})
+    return len(queued)
+
+
+def delete_in_batches(next_ids, batch_size=500, pause=0.05):
+    """
+    Delete ChatMessages `batch_size` at a time until `next_ids(batch_size)`
+    returns no more IDs, sleeping `pause` seconds between transactions.
+    Returns (messages deleted, longest transaction in milliseconds).
+    """
+    deleted = 0
+    longest_ms = 0.0
+    while True:
+        # Read outside the transaction: with WAL it doesn't block writers
+        ids = next_ids(batch_size)
+        if not ids:
+            return deleted, longest_ms
+        started = time.perf_counter()
+        delete_messages(ChatMessage.objects.filter(id__in=ids))
+        elapsed = time.perf_counter() - started
+        PURGE_BATCH_SECONDS.observe(elapsed)
+        deleted += len(ids)
+        longest_ms = max(longest_ms, elapsed * 1000)
+        if pause:
+            time.sleep(pause)
+
+
+def delete_messages(messages):
+    """
+    Delete a queryset of ChatMessages and their attachment links (the
+    Attachment rows are shared and stay) in one transaction.
+    """
+    with transaction.atomic():
+        # A plain DELETE first takes SQLite's write lock up front. The ORM's delete()
+        # reads the rows before writing, and a transaction that has read can't wait
+        # for the lock: it fails with "database is locked" if a chat request commits
+        ChatMessage.attachments.through.objects.filter(chatmessage__in=messages).delete()
+        messages.delete()
+
+
+def purge_session(purge, batch_size=500, pause=0.05):
+    """Carry out a queued SessionPurge: the session's messages in batches, then the session itself"""
+    messages = ChatMessage.objects.filter(session_id=purge.session_id)
+
+    def next_ids(limit):
+        return list(messages.order_by().values_list('id', flat=True)[:limit])
+
+    try:
+        deleted, longest_ms = delete_in_batches(next_ids, batch_size, pause)
+        started = time.perf_counter()
+        with transaction.atomic():
+            # Also takes any message a request saved after the last batch
+            delete_messages(messages)
+            ChatSession.objects.filter(id=purge.session_id).delete()
+        longest_ms = max(longest_ms, (time.perf_counter() - started) * 1000)
+    except Exception as e:
+        purge.status = SessionPurge.STATUS_FAILED
+        purge.last_error = str(e)
+        purge.save(update_fields=['status', 'last_error'])
+        raise
+    purge.status = SessionPurge.STATUS_DONE
+    purge.messages_deleted = deleted
+    purge.longest_batch_ms = round(longest_ms, 2)
+    purge.finished_at = timezone.now()
+    purge.last_error = ''
+    purge.save(update_fields=['status', 'messages_deleted', 'longest_batch_ms', 'finished_at', 'last_error'])
+    PURGED_MESSAGES.inc(purge.reason, amount=deleted)
+    PURGED_SESSIONS.inc(purge.reason)
+    return deleted
+
+
+def policy_sessions(policy):
+    """Sessions governed by `policy`: its own, plus those without a policy if it is the default"""
+    sessions = ChatSession.objects.filter(purge_requested_at__isnull=True)
+    if policy.is_default:
+        return sessions.filter(Q(retention_policy=policy) | Q(retention_policy__isnull=True))
+    return sessions.filter(retention_policy=policy)
+
+
+def enforce_retention(batch_size=500, pause=0.05, now=None):
+    """
+    Apply every retention policy: queue sessions idle for longer than
+    max_age_days and trim the oldest messages of sessions over
+    max_messages_per_session. Returns (sessions queued, messages trimmed).
+    """
+    now = now or timezone.now()
+    queued = trimmed = 0
+    for policy in RetentionPolicy.objects.all():
+        sessions = policy_sessions(policy)
+        if policy.max_age_days is not None:
+            cutoff = now - timedelta(days=policy.max_age_days)
+            queued += queue_purge(sessions.filter(updated_at__lt=cutoff), SessionPurge.REASON_RETENTION)
+        limit = policy.max_messages_per_session
+        if limit is not None:
+            over = (sessions.annotate(message_count=Count('messages'))
+                    .filter(message_count__gt=limit).values_list('id', flat=True))
+            for session_id in over:
+                trimmed += trim_session(session_id, limit, batch_size, pause)
+    return queued, trimmed
+
+
+def trim_session(session_id, keep, batch_size=500, pause=0.05):
+    """Delete all but the newest `keep` messages of a session; returns the number deleted"""
+    newest_first = ChatMessage.objects.filter(session_id=session_id).order_by('-timestamp', '-id')
+
+    def next_ids(limit):
+        # Each batch removes the rows just past the kept ones, so the offset stays put
+        return list(newest_first.values_list('id', flat=True)[keep:keep + limit])
+
+    deleted, _ = delete_in_batches(next_ids, batch_size, pause)
+    PURGED_MESSAGES.inc(SessionPurge.REASON_RETENTION, amount=deleted)
+    return deleted
@@ -0,0 +1,625 @@
+let currentSessionId = null;
+let isProcessing = false;
+let hasUserSentMessage = false; // Track if user actually sent something
+
+// Live updates: the server pushes new messages and sidebar changes over SSE,
+// so this tab only refetches when the event stream is unavailable
+const clientId = (window.crypto && crypto.randomUUID) ? crypto.randomUUID() : String(Math.random()).slice(2);
+let liveUpdates = false;
+let chatSessions = new Map(); // session id -> sidebar entry
+const renderedMessageIds = new Set();
+
+// Utility functions (keep these the same)
+function autoResize(el) {
+    el.style.height = 'auto';
+    el.style.height = Math.min(el.scrollHeight, 200) + 'px';
+}
+
+function formatTimeAgo(dateString) {
+    const date = new Date(dateString);
+    const now = new Date();
+    const diffMs = now - date;
+    const diffMins = Math.floor(diffMs / 60000);
+    const diffHours = Math.floor(diffMs / 3600000);
+    const diffDays = Math.floor(diffMs / 86400000);
+    
+    if (diffMins < 1) return 'just now';
+    if (diffMins < 60) return `${diffMins}m ago`;
+    if (diffHours < 24) return `${diffHours}h ago`;
+    if (diffDays < 7) return `${diffDays}d ago`;
+    return date.toLocaleDateString();
+}
+
+// SMARTER: Chat session management
+async function createNewChat(showWelcome = true) {
+    try {
+        // Reset the message tracker
+        hasUserSentMessage = false;
+        
+        const response = await fetch('/api/chat/sessions/create/', {
+            method: 'POST',
+            headers: {
+                'X-CSRFToken': getCSRFToken(),
+                'Content-Type': 'application/json',
+            },
+        });
+        
+        if (!response.ok) {
+            throw new Error(`HTTP error! status: ${response.status}`);
+        }
+        
+        const data = await response.json();
+        currentSessionId = data.session_id;
+        
+        // SMARTER: Only update title if we have a real one
+        if (data.title && data.title !== 'New chat') {
+            document.getElementById('chat-title').textContent = data.title;
+        } else {
+            document.getElementById('chat-title').textContent = 'New chat';
+        }
+        
+        document.getElementById('messages').innerHTML = '';
+        renderedMessageIds.clear();
+        
+        // SMARTER: Only show welcome if requested
+        if (showWelcome) {
+            addWelcomeMessage();
+        }
+        
+        // SMARTER: Don't immediately load sessions (avoids showing empty chats)
+        // We'll load sessions after user sends first message
+        
+        // SMARTER: Save to localStorage
+        saveCurrentSession();
+        
+    } catch (error) {
+        console.error('Error creating new chat:', error);
+        alert('Error creating new chat. Please check if the API server is running.');
+    }
+}
+
+// SMARTER: Load chat sessions with empty chat filtering
+async function loadChatSessions() {
+    try {
+        const response = await fetch('/api/chat/sessions/');
+        
+        if (!response.ok) {
+            throw new Error(`HTTP error! status: ${response.status}`);
+        }
+        
+        const data = await response.json();
+        chatSessions = new Map((data.sessions || []).map(session => [String(session.id), session]));
+        renderChatSessions();
+    } catch (error) {
+        console.error('Error loading chat sessions:', error);
+        document.getElementById('chat-list').innerHTML = '<p class="px-4 py-3 text-sm text-zinc-500">Error loading chats</p>';
+    }
+}
+
+// Draw the sidebar from chatSessions
+function renderChatSessions() {
+    const sessions = Array.from(chatSessions.values());
+    const chatList = document.getElementById('chat-list');
+    
+    chatList.innerHTML = '';
+    
+    if (sessions.length > 0) {
+        // SMARTER: Filter out empty or useless chats
+        const meaningfulSessions = sessions.filter(session => {
+            // Don't show sessions with no messages or only system messages
+            return (session.message_count || 0) > 0 && 
+                   session.title !== 'New chat' &&
+                   session.title !== 'Untitled chat';
+        });
+        
+        if (meaningfulSessions.length > 0) {
+            meaningfulSessions.forEach(session => {
+                const button = document.createElement('button');
+                button.className = 'w-full text-left px-4 py-3 hover:bg-zinc-50 focus:bg-zinc-50 transition-colors duration-200';
+                button.innerHTML = `
+                    <p class="text-sm font-medium dark:text-white text-black truncate">${session.title || 'Untitled chat'}</p>
+                    <p class="text-xs text-zinc-500 truncate">${formatTimeAgo(session.last_activity || session.created_at)} • ${session.message_count || 0} messages</p>
+                `;
+                button.onclick = () => loadChatSession(session.id);
+                chatList.appendChild(button);
+            });
+        } else {
+            chatList.innerHTML = '<p class="px-4 py-3 text-sm text-zinc-500">No chats yet</p>';
+        }
+    } else {
+        chatList.innerHTML = '<p class="px-4 py-3 text-sm text-zinc-500">No chats yet</p>';
+    }
+}
+
+// SMARTER: Load specific chat session
+async function loadChatSession(sessionId) {
+    try {
+        const response = await fetch(`/api/chat/sessions/${sessionId}/messages/?format=html`);
+        
+        if (!response.ok) {
+            throw new Error(`HTTP error! status: ${response.status}`);
+        }
+        
+        const data = await response.json();
+        
+        currentSessionId = sessionId;
+        hasUserSentMessage = true; // We're loading an existing chat with messages
+        
+        const messagesContainer = document.getElementById('messages');
+        messagesContainer.innerHTML = '';
+        renderedMessageIds.clear();
+        
+        if (data.messages && data.messages.length > 0) {
+            data.messages.forEach(message => {
+                addMessageToChat(message.content, message.is_user, message.timestamp, message.thinking_time, message.id, message.content_html);
+            });
+            // SMARTER: Update title based on actual content
+            updateChatTitleFromMessages(data.messages);
+        } else {
+            // This shouldn't happen with our filtering, but just in case
+            addWelcomeMessage();
+        }
+        
+        messagesContainer.scrollTop = messagesContainer.scrollHeight;
+        
+        // SMARTER: Save to localStorage
+        saveCurrentSession();
+        
+        // Refresh session list (the event stream keeps it current otherwise)
+        if (!liveUpdates) {
+            loadChatSessions();
+        }
+        
+    } catch (error) {
+        console.error('Error loading chat session:', error);
+        alert('Error loading chat session.');
+    }
+}
+
+// SMARTER: Generate better chat titles from message content
+function updateChatTitleFromMessages(messages) {
+    const userMessages = messages.filter(msg => msg.is_user);
+    if (userMessages.length > 0) {
+        const firstUserMessage = userMessages[0].content;
+        // Create a smart title from first message
+        let title = firstUserMessage.substring(0, 50); // First 50 chars
+        if (firstUserMessage.length > 50) {
+            title += '...';
+        }
+        document.getElementById('chat-title').textContent = title;
+    }
+}
+
+function addWelcomeMessage() {
+    const messagesContainer = document.getElementById('messages');
+    const welcomeMsg = document.createElement('div');
+    welcomeMsg.className = 'flex items-start gap-3';
+    welcomeMsg.innerHTML = `
+        <div class="mt-0.5 inline-flex h-8 w-8 items-center justify-center rounded-md bg-indigo-600 text-white ring-1 ring-indigo-500/40">AI</div>
+        <div class="flex-1">
+            <div class="rounded-xl ring-1 ring-zinc-200 bg-white px-4 py-4 shadow-sm">
+                <div class="prose prose-zinc max-w-none text-sm dark:text-white text-black">
+                    <p>Hello! I'm your AI Jury assistant. I can help you analyze legal cases, find relevant precedents from Supreme Court verdicts, and provide judicial insights. How can I assist you today?</p>
+                </div>
+            </div>
+        </div>
+    `;
+    messagesContainer.appendChild(welcomeMsg);
+}
+
+// SMARTER: Message handling
+async function sendMessage(e) {
+    e.preventDefault();
+    
+    if (isProcessing) return;
+    
+    const input = document.getElementById('chat-input');
+    const message = input.value.trim();
+    
+    if (!message) return;
+    
+    // SMARTER: Track that user has actually sent a message
+    hasUserSentMessage = true;
+    
+    // If no session exists, create one first
+    if (!currentSessionId) {
+        await createNewChat(false); // Don't show welcome - we're about to add real messages
+        if (!currentSessionId) {
+            alert('Failed to create chat session');
+            return;
+        }
+    }
+    
+    isProcessing = true;
+    
+    // Disable input while sending
+    input.disabled = true;
+    document.getElementById('send-button').disabled = true;
+    
+    // Add user message to chat immediately
+    addMessageToChat(message, true);
+    input.value = '';
+    autoResize(input);
+    
+    try {
+        // Build multipart form data to support attachments
+        const formData = new FormData();
+        formData.append('message', message);
+        formData.append('session_id', currentSessionId);
+        if (window.__selectedFiles && window.__selectedFiles.length > 0) {
+            // Files went ahead through the resumable upload API when they were picked;
+            // any whose upload failed are sent with the message instead
+            const uploadIds = await Promise.all(window.__uploads);
+            window.__selectedFiles.forEach((file, i) => {
+                if (uploadIds[i]) {
+                    formData.append('upload_ids', uploadIds[i]);
+                } else {
+                    formData.append('attachments', file);
+                }
+            });
+        }
+
+        const response = await fetch('/api/chat/send/', {
+            method: 'POST',
+            headers: {
+                'X-CSRFToken': getCSRFToken(),
+                'X-Chat-Client': clientId,
+            },
+            body: formData,
+        });
+        
+        if (response.status === 429 || response.status === 503) {
+            // Rate limited, or the AI service is overloaded: say when to try again instead of the generic error
+            const limited = await response.json();
+            addMessageToChat(limited.error, false);
+            return;
+        }
+        
+        if (!response.ok) {
+            throw new Error(`HTTP error! status: ${response.status}`);
+        }
+        
+        const data = await response.json();
+        
+        if (data.error) {
+            throw new Error(data.error);
+        }
+        
+        // Update session ID if a new one was created
+        if (data.session_id) {
+            currentSessionId = data.session_id;
+        }
+        
+        // SMARTER: Update chat title based on the first user message
+        if (data.title && data.title !== 'New chat') {
+            document.getElementById('chat-title').textContent = data.title;
+        }
+        
+        // Add AI response to chat
+        if (data.ai_message) {
+            addMessageToChat(
+                data.ai_message.content, 
+                false, 
+                data.ai_message.timestamp, 
+                data.ai_message.thinking_time,
+                data.ai_message.id,
+                data.ai_message.content_html
+            );
+        } else if (data.response) {
+            addMessageToChat(
+                data.response, 
+                false, 
+                new Date().toISOString()
+            );
+        }
+        
+        // SMARTER: Only update sessions after real conversation happens
+        // (pushed by the server when the event stream is connected)
+        if (!liveUpdates) {
+            loadChatSessions();
+        }
+        
+        // SMARTER: Save current session
+        saveCurrentSession();
+        
+    } catch (error) {
+        console.error('Error sending message:', error);
+        addMessageToChat(
+            "Sorry, I encountered an error while processing your request. Please check if the RAG API server is running and try again.", 
+            false
+        );
+    } finally {
+        // Re-enable input
+        input.disabled = false;
+        document.getElementById('send-button').disabled = false;
+        input.focus();
+        isProcessing = false;
+    }
+}
+
+// SMARTER: Save current session to localStorage
+function saveCurrentSession() {
+    if (currentSessionId) {
+        localStorage.setItem('lastChatSession', currentSessionId);
+    }
+}
+
+// SMARTER: Load last session from localStorage
+async function loadLastSession() {
+    const lastSessionId = localStorage.getItem('lastChatSession');
+    if (lastSessionId) {
+        // Verify the session still exists and has messages
+        try {
+            const response = await fetch(`/api/chat/sessions/${lastSessionId}/messages/?format=html`);
+            if (response.ok) {
+                const data = await response.json();
+                if (data.messages && data.messages.length > 0) {
+                    await loadChatSession(lastSessionId);
+                    return true; // Successfully loaded last session
+                }
+            }
+        } catch (error) {
+            console.log('Last session no longer available');
+        }
+    }
+    return false; // No valid last session
+}
+
+// SMARTER: Improved New Chat button handler
+async function handleNewChat() {
+    // Only create new chat if we're not already in an empty one
+    if (!currentSessionId || hasUserSentMessage) {
+        await createNewChat(true);
+    } else {
+        // We're already in a new empty chat, just clear and show welcome
+        document.getElementById('messages').innerHTML = '';
+        addWelcomeMessage();
+        document.getElementById('chat-title').textContent = 'New chat';
+        hasUserSentMessage = false;
+    }
+}
+
+// Update the New Chat button in your HTML:
+// Change: onclick="createNewChat()" to onclick="handleNewChat()"
+
+// Plain text as HTML: user messages, and AI answers saved before they were pre-rendered
+function escapeHtml(text) {
+    const div = document.createElement('div');
+    div.textContent = text;
+    return div.innerHTML.replace(/\n/g, '<br>');
+}
+
+// `contentHtml` is the server-rendered, sanitized HTML of an AI answer (ChatMessage.content_html)
+function addMessageToChat(content, isUser, timestamp = null, thinkingTime = null, messageId = null, contentHtml = null) {
+    if (messageId !== null) {
+        renderedMessageIds.add(messageId);
+    }
+    const messages = document.getElementById('messages');
+    const wrapper = document.createElement('div');
+    wrapper.className = 'flex items-start gap-3';
+    
+    const now = new Date();
+    const timeString = timestamp ? formatTimeAgo(timestamp) : now.toLocaleTimeString([], {hour: '2-digit', minute:'2-digit'});
+    
+    if (isUser) {
+        wrapper.innerHTML = `
+            <div class="mt-0.5 inline-flex h-8 w-8 items-center justify-center rounded-md bg-zinc-200 text-zinc-700 ring-1 ring-zinc-300">U</div>
+            <div class="flex-1">
+                <div class="rounded-xl ring-1 ring-zinc-200 bg-white px-4 py-3 shadow-sm">
+                    <p class="text-sm dark:text-white text-black">${escapeHtml(content)}</p>
+                </div>
+                <div class="mt-2 text-[11px] text-zinc-500">you • ${timeString}</div>
+            </div>
+        `;
+    } else {
+        const thinkingTimeHtml = thinkingTime ? `
+            <span class="inline-flex items-center gap-1">
+                <svg xmlns="http://www.w3.org/2000/svg" viewBox="0 0 24 24" fill="none" stroke="currentColor" class="h-3.5 w-3.5"><path stroke-linecap="round" stroke-linejoin="round" stroke-width="1.5" d="M12 6v6l4 2"/></svg>
+                thinking time: ${thinkingTime}s
+            </span>
+        ` : '';
+        
+        wrapper.innerHTML = `
+            <div class="mt-0.5 inline-flex h-8 w-8 items-center justify-center rounded-md bg-indigo-600 text-white ring-1 ring-indigo-500/40">AI</div>
+            <div class="flex-1">
+                <div class="rounded-xl ring-1 ring-zinc-200 bg-white px-4 py-4 shadow-sm">
+                    <div class="prose prose-zinc max-w-none text-sm dark:text-white text-black">
+                        ${contentHtml || escapeHtml(content)}
+                    </div>
+                </div>
+                <div class="mt-2 flex items-center gap-3 text-[11px] text-zinc-500">
+                    <span>AI Jury • ${timeString}</span>
+                    ${thinkingTimeHtml}
+                </div>
+            </div>
+        `;
+    }
+    
+    messages.appendChild(wrapper);
+    messages.scrollTop = messages.scrollHeight;
+}
+
+// Utility function to get CSRF token
+function getCSRFToken() {
+    const name = 'csrftoken';
+    let cookieValue = null;
+    if (document.cookie && document.cookie !== '') {
+        const cookies = document.cookie.split(';');
+        for (let i = 0; i < cookies.length; i++) {
+            const cookie = cookies[i].trim();
+            if (cookie.substring(0, name.length + 1) === (name + '=')) {
+                cookieValue = decodeURIComponent(cookie.substring(name.length + 1));
+                break;
+            }
+        }
+    }
+    return cookieValue;
+}
+
+// SMARTER: Clear chat function
+function clearChat() {
+    if (confirm('Are you sure you want to clear this chat?')) {
+        document.getElementById('messages').innerHTML = '';
+        addWelcomeMessage();
+        hasUserSentMessage = false;
+        document.getElementById('chat-title').textContent = 'New chat';
+    }
+}
+
+function exportChat() {
+    alert('Export feature coming soon!');
+}
+
+// Apply server-pushed changes instead of refetching
+function connectChatEvents() {
+    if (!window.EventSource) return;
+    const events = new EventSource('/api/chat/events/');
+
+    events.addEventListener('open', () => { liveUpdates = true; });
+    events.addEventListener('error', () => { liveUpdates = false; });
+
+    events.addEventListener('message', (e) => {
+        const data = JSON.parse(e.data);
+        // This tab already drew its own turn from the send response
+        if (data.client_id === clientId || String(data.session_id) !== String(currentSessionId)) return;
+        const message = data.message;
+        if (renderedMessageIds.has(message.id)) return;
+        addMessageToChat(message.content, message.is_user, message.timestamp, message.thinking_time, message.id, message.content_html);
+    });
+
+    events.addEventListener('session', (e) => {
+        const session = JSON.parse(e.data);
+        const id = String(session.id);
+        // Most recently active first
+        chatSessions.delete(id);
+        chatSessions = new Map([[id, session], ...chatSessions]);
+        renderChatSessions();
+        if (id === String(currentSessionId) && session.title !== 'New chat') {
+            document.getElementById('chat-title').textContent = session.title;
+        }
+    });
+
+    // Deleted in the admin or by a retention policy
+    events.addEventListener('session_deleted', (e) => {
+        const id = String(JSON.parse(e.data).id);
+        chatSessions.delete(id);
+        renderChatSessions();
+        if (id === String(currentSessionId)) {
+            localStorage.removeItem('lastChatSession');
+            currentSessionId = null;
+            document.getElementById('messages').innerHTML = '';
+            addWelcomeMessage();
+            hasUserSentMessage = false;
+            document.getElementById('chat-title').textContent = 'New chat';
+        }
+    });
+
+    // The server could not replay what we missed (restart or long disconnect)
+    events.addEventListener('reset', () => {
+        loadChatSessions();
+        if (currentSessionId && hasUserSentMessage) {
+            loadChatSession(currentSessionId);
+        }
+    });
+}
+
+// SMARTER: Initialize when page loads
+document.addEventListener('DOMContentLoaded', async function() {
+    connectChatEvents();
+
+    // Try to load the last session first
+    const loadedLastSession = await loadLastSession();
+    
+    if (!loadedLastSession) {
+        // No valid last session, start fresh but don't create empty chat
+        loadChatSessions();
+        addWelcomeMessage();
+        document.getElementById('chat-title').textContent = 'New chat';
+    }
+    
+    // Focus on input field
+    document.getElementById('chat-input').focus();
+});
+
+// Add search functionality (keep this the same)
+document.getElementById('search-chats').addEventListener('input', function(e) {
+    const searchTerm = e.target.value.toLowerCase();
+    const chatItems = document.querySelectorAll('#chat-list button');
+    
+    chatItems.forEach(item => {
+        const text = item.textContent.toLowerCase();
+        if (text.includes(searchTerm)) {
+            item.style.display = 'block';
+        } else {
+            item.style.display = 'none';
+        }
+    });
+});
+
+// Handle file selection and show small badges near the send button
+window.__selectedFiles = [];
+window.__uploads = [];  // Promise of each selected file's upload id, null if the upload failed
+function handleFileSelect(fileList) {
+    const files = Array.from(fileList || []);
+    if (files.length === 0) return;
+    // Only allow images and PDFs
+    const accepted = files.filter(f => (f.type && (f.type.startsWith('image/') || f.type === 'application/pdf')));
+    window.__selectedFiles = accepted;
+    // Start uploading while the question is typed
+    window.__uploads = accepted.map(file => uploadFile(file).catch(error => {
+        console.error(`Upload of ${file.name} failed:`, error);
+        return null;
+    }));
+}
+
+// Resumable uploads: chunks with checksums, retried and resumed from the server's offset
+const UPLOAD_RETRIES = 5;
+
+async function sha256Hex(buffer) {
+    // crypto.subtle only exists on HTTPS and localhost; the checksum is optional
+    if (!(window.crypto && window.crypto.subtle)) return null;
+    const digest = await window.crypto.subtle.digest('SHA-256', buffer);
+    return Array.from(new Uint8Array(digest), b => b.toString(16).padStart(2, '0')).join('');
+}
+
+async function uploadFile(file) {
+    const created = await fetch('/api/chat/uploads/', {
+        method: 'POST',
+        headers: {'Content-Type': 'application/json', 'X-CSRFToken': getCSRFToken()},
+        body: JSON.stringify({filename: file.name, content_type: file.type, size: file.size}),
+    });
+    const upload = await created.json();
+    if (!created.ok) throw new Error(upload.error || `HTTP error! status: ${created.status}`);
+
+    const url = `/api/chat/uploads/${upload.upload_id}/`;
+    let offset = upload.offset;
+    let failures = 0;
+    while (offset < file.size) {
+        try {
+            const buffer = await file.slice(offset, offset + upload.chunk_size).arrayBuffer();
+            const headers = {'Upload-Offset': String(offset), 'X-CSRFToken': getCSRFToken()};
+            const checksum = await sha256Hex(buffer);
+            if (checksum) headers['Upload-Checksum'] = `sha256 ${checksum}`;
+            const response = await fetch(url, {method: 'PATCH', headers, body: buffer});
+            const data = await response.json();
+            if (response.ok || (response.status === 409 && data.offset != null && data.offset !== offset)) {
+                // Stored, or the server already has more than we thought: go on from its offset
+                offset = data.offset;
+                failures = 0;
+                continue;
+            }
+            throw new Error(data.error || `HTTP error! status: ${response.status}`);
+        } catch (error) {
+            if (++failures > UPLOAD_RETRIES) throw error;
+            await new Promise(resolve => setTimeout(resolve, 500 * 2 ** failures));
+            // The chunk may have been stored before the connection dropped
+            const status = await fetch(url).then(r => r.json()).catch(() => null);
+            if (status && status.offset != null) offset = status.offset;
+        }
+    }
+
+    const completed = await fetch(`${url}complete/`, {method: 'POST', headers: {'X-CSRFToken': getCSRFToken()}});
+    const data = await completed.json();
+    if (!completed.ok) throw new Error(data.error || `HTTP error! status: ${completed.status}`);
+    return data.upload_id;
+}
@@ -0,0 +1,35 @@
+// Update footer year
+(function(){
+    var el = document.getElementById('year');
+    if (el) { el.textContent = new Date().getFullYear(); }
+})();
+
+// Theme toggle functionality
+const themeToggle = document.getElementById('theme-toggle');
+const themeIconDark = document.getElementById('theme-icon-dark');
+const themeIconLight = document.getElementById('theme-icon-light');
+
+// Set initial state to dark mode
+document.documentElement.classList.add('dark');
+themeIconDark.classList.add('hidden');
+themeIconLight.classList.remove('hidden');
+
+themeToggle.addEventListener('click', function() {
+    if (document.documentElement.classList.contains('dark')) {
+        document.documentElement.classList.remove('dark');
+        localStorage.theme = 'light';
+        themeIconDark.classList.remove('hidden');
+        themeIconLight.classList.add('hidden');
+    } else {
+        document.documentElement.classList.add('dark');
+        localStorage.theme = 'dark';
+        themeIconDark.classList.add('hidden');
+        themeIconLight.classList.remove('hidden');
+    }
+});
+
+// Mobile menu functionality
+function toggleMobileMenu() {
+    const mobileMenu = document.getElementById('mobile-menu');
+    mobileMenu.classList.toggle('hidden');
+}
@@ -0,0 +1,32 @@
+# assets.py
+import functools
+
+from django import template
+from django.contrib.staticfiles import finders
+from django.templatetags.static import static
+from django.utils.html import format_html
+from django.utils.safestring import mark_safe
+
+register = template.Library()
+
+TAILWIND_CSS = 'css/dist/styles.css'
+
+# In-browser Tailwind compiler; only used until `manage.py build_static` has built the stylesheet
+TAILWIND_PLAY_CDN = mark_safe(
+    '<script src="https://cdn.tailwindcss.com"></script>\n'
+    "    <script>tailwind.config = { darkMode: 'class' }</script>"
+)
+
+
+@functools.cache
+def tailwind_built():
+    """Whether the compiled Tailwind stylesheet exists (checked once per process)"""
+    return finders.find(TAILWIND_CSS) is not None
+
+
+@register.simple_tag
+def tailwind_assets():
+    """The compiled Tailwind stylesheet, or the Play CDN when it has not been built"""
+    if tailwind_built():
+        return format_html('<link rel="stylesheet" href="{}">', static(TAILWIND_CSS))
+    return TAILWIND_PLAY_CDN
@@ -1,3 +1,244 @@
-from django.test import TestCase
+import io
+import shutil
+import tempfile
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from .attachments import store_upload
+from .management.commands.warm_answer_cache import frequent_questions
+from .models import Attachment, ChatMessage, ChatSession, RetentionPolicy, SessionPurge, Upload
+from .paginators import EstimatedCountPaginator
+from .retention import enforce_retention, purge_session, queue_purge, trim_session
+from .uploads import UploadError, append_chunk, create_upload, part_path
+
+
+class StoreUploadTests(TestCase):
+    def upload(self):
+        return SimpleUploadedFile('judgment.pdf', b'%PDF-1.4 same bytes', content_type='application/pdf')
+
+    def test_failed_extraction_is_retried_on_reupload(self):
+        with mock.patch('search_app.attachments.pdf_extractor', return_value=None):
+            first = store_upload(self.upload())
+        self.assertEqual(first.text_length, 0)
+
+        with mock.patch('search_app.attachments.pdf_extractor', return_value=lambda f: 'Article 21'):
+            second = store_upload(self.upload())
+        self.assertEqual(second.id, first.id)
+        self.assertEqual(Attachment.objects.get(id=first.id).text, 'Article 21')
+
+    def test_extracted_file_is_not_read_again(self):
+        with mock.patch('search_app.attachments.pdf_extractor', return_value=lambda f: 'Article 21'):
+            first = store_upload(self.upload())
+        extractor = mock.Mock(return_value='other')
+        with mock.patch('search_app.attachments.pdf_extractor', return_value=extractor):
+            second = store_upload(self.upload())
+        self.assertEqual(second.id, first.id)
+        extractor.assert_not_called()
+
+
+class FrequentQuestionsTests(TestCase):
+    def test_only_first_message_of_each_session_counts(self):
+        for _ in range(2):
+            session = ChatSession.objects.create(title='Bail')
+            ChatMessage.objects.create(session=session, content='What is bail?', is_user=True)
+            ChatMessage.objects.create(session=session, content='Bail is...', is_user=False)
+            ChatMessage.objects.create(session=session, content='Tell me more', is_user=True)
+
+        self.assertEqual(frequent_questions(10), [('What is bail?', 2)])
+
+
+@override_settings(RATE_LIMITS={})
+class SendMessageTests(TestCase):
+    def test_answer_is_returned_rendered(self):
+        rag = mock.Mock(status_code=200)
+        rag.json.return_value = {'status': 'success', 'answer': '**Article 21** protects *life*.', 'source': 'llm'}
+        with mock.patch('search_app.views.requests') as requests:
+            requests.post.return_value = rag
+            response = self.client.post(reverse('send_message'), {'message': 'What is Article 21?'},
+                                        content_type='application/json')
+
+        self.assertEqual(response.status_code, 200)
+        answer = response.json()['ai_message']
+        self.assertIn('<strong>Article 21</strong>', answer['content_html'])
+        self.assertEqual(answer['content_html'], ChatMessage.objects.get(id=answer['id']).content_html)
+
+
+@override_settings(RATE_LIMITS={}, UPLOAD_MAX_OPEN_PER_CLIENT=2, UPLOAD_EARLY_EXTRACTION=False)
+class UploadTests(TestCase):
+    def setUp(self):
+        upload_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, upload_dir)
+        self.enterContext(self.settings(UPLOAD_DIR=upload_dir))
+
+    def start(self, **headers):
+        return self.client.post(reverse('start_upload'), {'filename': 'brief.txt', 'size': 8},
+                                content_type='application/json', **headers)
+
+    def test_open_uploads_are_capped_per_client(self):
+        self.assertEqual(self.start().status_code, 201)
+        self.assertEqual(self.start().status_code, 201)
+        self.assertEqual(self.start().status_code, 429)
+        self.assertEqual(self.start(REMOTE_ADDR='10.0.0.2').status_code, 201)
+
+        Upload.objects.filter(client='ip:127.0.0.1').update(status=Upload.STATUS_COMPLETE)
+        self.assertEqual(self.start().status_code, 201)
+
+    def completed_upload(self, client):
+        attachment = Attachment.objects.create(sha256='b' * 64, filename='brief.txt')
+        return Upload.objects.create(filename='brief.txt', size=8, received=8, status=Upload.STATUS_COMPLETE,
+                                     attachment=attachment, client=client)
+
+    def send(self, upload, **headers):
+        with mock.patch('search_app.views.requests') as requests:
+            requests.post.return_value = mock.Mock(status_code=200,
+                                                   json=lambda: {'status': 'success', 'answer': 'ok'})
+            return self.client.post(reverse('send_message'),
+                                    {'message': 'Summarise it', 'upload_ids': [str(upload.id)]},
+                                    content_type='application/json', **headers)
+
+    def test_only_the_client_that_uploaded_can_attach(self):
+        upload = self.completed_upload('ip:127.0.0.1')
+        self.assertEqual(self.send(upload, REMOTE_ADDR='10.0.0.2').status_code, 400)
+        self.assertFalse(ChatMessage.objects.exists())
+
+        response = self.send(upload)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([a['id'] for a in response.json()['user_message']['attachments']], [str(upload.attachment_id)])
+
+    def test_offset_moves_only_after_the_chunk_is_written(self):
+        upload = create_upload('brief.txt', 'text/plain', 8)
+        with mock.patch('search_app.uploads.shutil.copyfileobj', side_effect=OSError('disk full')):
+            with self.assertRaises(OSError):
+                append_chunk(upload, 0, io.BytesIO(b'abcd'), 4)
+        upload.refresh_from_db()
+        self.assertEqual(upload.received, 0)
+
+        self.assertEqual(append_chunk(upload, 0, io.BytesIO(b'abcd'), 4), 4)
+        with open(part_path(upload), 'rb') as part:
+            self.assertEqual(part.read(4), b'abcd')
+
+    def test_chunk_stored_by_another_request_is_refused(self):
+        upload = create_upload('brief.txt', 'text/plain', 8)
+        stale = Upload.objects.get(id=upload.id)
+        append_chunk(upload, 0, io.BytesIO(b'abcd'), 4)
+        with self.assertRaises(UploadError) as refused:
+            append_chunk(stale, 0, io.BytesIO(b'wxyz'), 4)
+        self.assertEqual((refused.exception.status, refused.exception.offset), (409, 4))
+        with open(part_path(upload), 'rb') as part:
+            self.assertEqual(part.read(4), b'abcd')
+
+
+class StaticUrlTests(TestCase):
+    def test_pages_render_before_static_files_are_built(self):
+        self.client.force_login(User.objects.create_superuser('admin', 'admin@example.com', 'pw-12345-long'))
+        response = self.client.get(reverse('admin:search_app_chatmessage_changelist'))
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, '/static/admin/css/base.css')
+
+    def test_built_files_get_hashed_urls(self):
+        with mock.patch.dict(staticfiles_storage.hashed_files, {'admin/css/base.css': 'admin/css/base.0123abcd.css'}):
+            self.assertEqual(staticfiles_storage.url('admin/css/base.css'), '/static/admin/css/base.0123abcd.css')
+
+
+class RetentionTests(TestCase):
+    def session(self, messages=0, title='Bail', **fields):
+        session = ChatSession.objects.create(title=title, **fields)
+        start = timezone.now() - timedelta(hours=1)
+        for i in range(messages):
+            message = ChatMessage.objects.create(session=session, content=f'message {i}')
+            ChatMessage.objects.filter(id=message.id).update(timestamp=start + timedelta(minutes=i))
+        return session
+
+    def test_queue_purge_hides_sessions_and_skips_queued_ones(self):
+        first, second = self.session(), self.session()
+        self.assertEqual(queue_purge(ChatSession.objects.filter(id=first.id), SessionPurge.REASON_ADMIN), 1)
+        first.refresh_from_db()
+        self.assertIsNotNone(first.purge_requested_at)
+
+        self.assertEqual(queue_purge(ChatSession.objects.all(), SessionPurge.REASON_ADMIN), 1)
+        self.assertEqual(sorted(SessionPurge.objects.values_list('session_id', flat=True)),
+                         sorted([first.id, second.id]))
+
+    def test_purge_session_deletes_messages_links_and_session(self):
+        session = self.session(messages=5)
+        attachment = Attachment.objects.create(sha256='a' * 64, filename='lease.pdf')
+        for message in session.messages.all():
+            message.attachments.add(attachment)
+        other = self.session(messages=2)
+        queue_purge(ChatSession.objects.filter(id=session.id), SessionPurge.REASON_ADMIN)
+        purge = SessionPurge.objects.get(session_id=session.id)
+
+        self.assertEqual(purge_session(purge, batch_size=2, pause=0), 5)
+
+        self.assertFalse(ChatSession.objects.filter(id=session.id).exists())
+        self.assertFalse(ChatMessage.objects.filter(session_id=session.id).exists())
+        self.assertFalse(ChatMessage.attachments.through.objects.exists())
+        self.assertTrue(Attachment.objects.filter(id=attachment.id).exists())
+        self.assertEqual(other.messages.count(), 2)
+        purge.refresh_from_db()
+        self.assertEqual((purge.status, purge.messages_deleted), (SessionPurge.STATUS_DONE, 5))
+        self.assertIsNotNone(purge.finished_at)
+
+    def test_trim_keeps_the_newest_messages(self):
+        session = self.session(messages=6)
+        newest = list(session.messages.order_by('-timestamp', '-id').values_list('id', flat=True)[:2])
+        # Same timestamp as the second newest: the higher id goes first
+        tie = ChatMessage.objects.create(session=session, content='tie')
+        ChatMessage.objects.filter(id=tie.id).update(
+            timestamp=ChatMessage.objects.get(id=newest[1]).timestamp)
+        expected = list(session.messages.order_by('-timestamp', '-id').values_list('id', flat=True)[:3])
+
+        self.assertEqual(trim_session(session.id, 3, batch_size=2, pause=0), 4)
+        self.assertEqual(sorted(session.messages.values_list('id', flat=True)), sorted(expected))
+
+    def test_default_policy_covers_sessions_without_one(self):
+        RetentionPolicy.objects.create(name='Default', max_age_days=30, is_default=True)
+        kept = RetentionPolicy.objects.create(name='Keep', max_age_days=None)
+        unassigned = self.session()
+        assigned = self.session(retention_policy=kept)
+        ChatSession.objects.update(updated_at=timezone.now() - timedelta(days=31))
+
+        self.assertEqual(enforce_retention(pause=0), (1, 0))
+        self.assertEqual(list(SessionPurge.objects.values_list('session_id', flat=True)), [unassigned.id])
+        assigned.refresh_from_db()
+        self.assertIsNone(assigned.purge_requested_at)
+
+    def test_failed_purge_is_marked_and_can_be_retried(self):
+        session = self.session(messages=3)
+        queue_purge(ChatSession.objects.filter(id=session.id), SessionPurge.REASON_ADMIN)
+        purge = SessionPurge.objects.get(session_id=session.id)
+
+        with mock.patch('search_app.retention.delete_messages', side_effect=RuntimeError('database is locked')):
+            with self.assertRaises(RuntimeError):
+                purge_session(purge, pause=0)
+        purge.refresh_from_db()
+        self.assertEqual((purge.status, purge.last_error), (SessionPurge.STATUS_FAILED, 'database is locked'))
+        self.assertEqual(session.messages.count(), 3)
+
+        # The admin's retry action puts it back in the queue
+        SessionPurge.objects.filter(id=purge.id).update(status=SessionPurge.STATUS_PENDING)
+        purge.refresh_from_db()
+        self.assertEqual(purge_session(purge, pause=0), 3)
+        purge.refresh_from_db()
+        self.assertEqual((purge.status, purge.last_error), (SessionPurge.STATUS_DONE, ''))
+        self.assertFalse(ChatSession.objects.filter(id=session.id).exists())
+
+
+class EstimatedCountPaginatorTests(TestCase):
+    def test_count_follows_deletes_and_stops_at_the_cap(self):
+        session = ChatSession.objects.create(title='Bail')
+        for i in range(6):
+            ChatMessage.objects.create(session=session, content=f'message {i}')
+        ChatMessage.objects.filter(id__in=ChatMessage.objects.order_by('-timestamp').values('id')[:2]).delete()
+
+        self.assertEqual(EstimatedCountPaginator(ChatMessage.objects.all(), 2).count, 4)
+        capped = EstimatedCountPaginator(ChatMessage.objects.all(), 2)
+        capped.count_cap = 2
+        self.assertEqual(capped.count, 3)
@@ -0,0 +1,56 @@
+# timing.py
+import time
+from contextlib import contextmanager
+
+# Stages recorded for each chat turn, in the order they run
+CHAT_STAGES = ['extract', 'history', 'rag', 'llm', 'db', 'total']
+
+
+class StageTimer:
+    """Collects wall-clock time per named stage of a request, in milliseconds"""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.stages = {}
+
+    @contextmanager
+    def stage(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, (time.perf_counter() - start) * 1000)
+
+    def add(self, name, ms):
+        self.stages[name] = round(self.stages.get(name, 0) + ms, 2)
+
+    def finish(self):
+        """Record the total time since the timer was created and return all stages"""
+        self.stages['total'] = round((time.perf_counter() - self.started) * 1000, 2)
+        return self.stages
+
+    def server_timing(self):
+        """Format the stages as a Server-Timing header value"""
+        return ", ".join(f"{name};dur={ms:.1f}" for name, ms in self.stages.items())
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return None
+    rank = max(1, -(-len(sorted_values) * pct // 100))  # ceil without floats
+    return sorted_values[int(rank) - 1]
+
+
+def stage_percentiles(timings, stages=CHAT_STAGES, pcts=(50, 95, 99)):
+    """p50/p95/p99 per stage over a list of stage_timings dicts"""
+    rows = []
+    for stage in stages:
+        values = sorted(t[stage] for t in timings if t and stage in t)
+        if not values:
+            continue
+        row = {'stage': stage, 'count': len(values)}
+        for pct in pcts:
+            row[f'p{pct}'] = percentile(values, pct)
+        rows.append(row)
+    return rows
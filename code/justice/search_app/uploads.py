@@ -0,0 +1,565 @@
+"""
+Resumable chunked uploads of large attachments.
+
+A multipart upload to send_message is buffered by Django, read again in full
+by the extractor, and lost if the connection drops. Instead the chat page
+can send a file ahead of the message in chunks:
+
+    POST  /api/chat/uploads/                  {filename, content_type, size, sha256?} -> upload_id
+    PATCH /api/chat/uploads/<id>/             raw bytes; Upload-Offset and optional
+                                              Upload-Checksum: sha256 <hex> headers
+    GET   /api/chat/uploads/<id>/             where to resume after a dropped connection
+    POST  /api/chat/uploads/<id>/complete/    -> the Attachment, once every byte is in
+
+and then pass `upload_ids` to send_message. Each chunk is streamed to disk
+and checked before the upload's offset moves past it, so a failed or
+repeated chunk is simply sent again. While a PDF is still arriving, the
+pages whose objects are already on disk are extracted in a background
+thread; completing the upload only has to read the pages that came last.
+"""
+import fcntl
+import functools
+import hashlib
+import os
+import re
+import shutil
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from io import StringIO
+from types import SimpleNamespace
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import F
+from django.utils import timezone
+
+from ai_jury import metrics
+
+from .attachments import extract_text, save_attachment
+from .models import Attachment, Upload
+
+UPLOAD_BYTES = metrics.counter('chat_upload_bytes_total', 'Bytes received in upload chunks')
+UPLOAD_PAGES = metrics.counter('chat_upload_pdf_pages_total', 'PDF pages of completed uploads, by when they were '
+                               'extracted', ['extracted'])
+
+READ_SIZE = 64 * 1024
+# Early extraction runs again once this much more has arrived and the previous run is over. Each run
+# rescans the object headers received so far (a few ms a MB) and reads only the pages it has not seen
+EARLY_STEP_BYTES = 1024 * 1024
+
+OBJECT_LINE = re.compile(rb'^(\d+)\s+(\d+)\s+obj\b')
+
+_executor = None
+_scans = {}  # Upload id -> Future of the early extraction running in this process
+_lock = threading.Lock()
+
+
+class UploadError(Exception):
+    """A request the upload API refuses; `status` is the HTTP status to answer with"""
+
+    def __init__(self, message, status=400, offset=None):
+        super().__init__(message)
+        self.status = status
+        self.offset = offset
+
+
+@functools.cache
+def pdf_modules():
+    """The pdfminer pieces for page-at-a-time extraction, imported on first use; None if not installed"""
+    try:
+        from pdfminer.converter import TextConverter
+        from pdfminer.layout import LAParams
+        from pdfminer.pdfdocument import LITERAL_OBJSTM, PDFDocument, PDFNoValidXRef, PDFXRef
+        from pdfminer.pdfinterp import PDFPageInterpreter, PDFResourceManager
+        from pdfminer.pdfpage import LITERAL_PAGE, PDFPage
+        from pdfminer.pdfparser import PDFParser, PDFStreamParser, PDFSyntaxError
+        from pdfminer.pdftypes import PDFObjRef, PDFStream
+        from pdfminer.psparser import PSEOF, PSException
+    except Exception:
+        return None
+    return SimpleNamespace(**locals())
+
+
+def part_path(upload):
+    return os.path.join(settings.UPLOAD_DIR, f'{upload.id}.part')
+
+
+def is_pdf(upload):
+    return upload.content_type == 'application/pdf' or upload.filename.lower().endswith('.pdf')
+
+
+def create_upload(filename, content_type, size, sha256='', client=''):
+    """
+    Start an upload of `size` bytes and create its empty part file. `client`
+    identifies who starts it; each may have UPLOAD_MAX_OPEN_PER_CLIENT open.
+    """
+    if not filename:
+        raise UploadError('filename required')
+    if not isinstance(size, int) or size <= 0:
+        raise UploadError('size must be a positive number of bytes')
+    if size > settings.UPLOAD_MAX_SIZE:
+        raise UploadError(f'Files are limited to {settings.UPLOAD_MAX_SIZE} bytes', status=413)
+    sha256 = (sha256 or '').lower()
+    if sha256 and (len(sha256) != 64 or any(c not in '0123456789abcdef' for c in sha256)):
+        raise UploadError('sha256 must be 64 hex digits')
+    if client and Upload.objects.filter(client=client, status__in=[Upload.STATUS_OPEN, Upload.STATUS_COMPLETING]
+                                        ).count() >= settings.UPLOAD_MAX_OPEN_PER_CLIENT:
+        raise UploadError(f'At most {settings.UPLOAD_MAX_OPEN_PER_CLIENT} uploads may be open at once; '
+                          'complete one first', status=429)
+
+    upload = Upload(filename=filename[:255], content_type=(content_type or '')[:100], size=size, sha256=sha256,
+                    client=client[:64])
+    os.makedirs(settings.UPLOAD_DIR, exist_ok=True)
+    open(part_path(upload), 'wb').close()
+    upload.save()
+    return upload
+
+
+def parse_checksum(header):
+    """The hex digest of an `Upload-Checksum: sha256 <hex>` header, '' without one"""
+    if not header:
+        return ''
+    algorithm, _, digest = header.strip().partition(' ')
+    if algorithm.lower() != 'sha256' or len(digest.strip()) != 64:
+        raise UploadError('Upload-Checksum must be "sha256 <64 hex digits>"')
+    return digest.strip().lower()
+
+
+def append_chunk(upload, offset, stream, length, checksum=''):
+    """
+    Write `length` bytes read from `stream` at `offset`, which must be the
+    upload's current offset. The chunk goes to a file of its own first and is
+    only copied into the part file once it has all arrived and matches its
+    checksum. The offset moves after the copy, so everything before it is on
+    disk for early extraction and the next chunk. Returns the new offset.
+    """
+    if upload.status != Upload.STATUS_OPEN:
+        raise UploadError(f'Upload is {upload.status}', status=409, offset=upload.received)
+    if offset != upload.received:
+        raise UploadError(f'Expected offset {upload.received}', status=409, offset=upload.received)
+    if length <= 0:
+        raise UploadError('Empty chunk; send Content-Length', status=411, offset=offset)
+    if length > settings.UPLOAD_MAX_CHUNK_SIZE:
+        raise UploadError(f'Chunks are limited to {settings.UPLOAD_MAX_CHUNK_SIZE} bytes', status=413, offset=offset)
+    if offset + length > upload.size:
+        raise UploadError(f'Chunk goes past the declared size of {upload.size} bytes', offset=offset)
+
+    chunk_path = os.path.join(settings.UPLOAD_DIR, f'{upload.id}.{uuid.uuid4().hex}.chunk')
+    try:
+        digest = hashlib.sha256()
+        written = 0
+        with open(chunk_path, 'wb') as chunk:
+            while written < length:
+                data = stream.read(min(READ_SIZE, length - written))
+                if not data:
+                    break
+                digest.update(data)
+                chunk.write(data)
+                written += len(data)
+        if written != length:
+            raise UploadError(f'Chunk ended after {written} of {length} bytes', offset=offset)
+        if checksum and digest.hexdigest() != checksum:
+            raise UploadError('Chunk checksum mismatch', offset=offset)
+
+        end = offset + length
+        with open(chunk_path, 'rb') as chunk, open(part_path(upload), 'r+b') as part:
+            # One writer per upload across worker processes; the lock goes with the file
+            fcntl.flock(part, fcntl.LOCK_EX)
+            current = Upload.objects.filter(id=upload.id).values_list('status', 'received').first()
+            if current != (Upload.STATUS_OPEN, offset):
+                raise UploadError('Another request stored this chunk first', status=409,
+                                  offset=current[1] if current else None)
+            part.seek(offset)
+            shutil.copyfileobj(chunk, part, READ_SIZE)
+            part.flush()
+            stored = Upload.objects.filter(id=upload.id, status=Upload.STATUS_OPEN, received=offset).update(
+                received=end, updated_at=timezone.now()
+            )
+            if not stored:
+                current = Upload.objects.filter(id=upload.id).values_list('received', flat=True).first()
+                raise UploadError('The upload changed while this chunk was written', status=409, offset=current)
+    finally:
+        if os.path.exists(chunk_path):
+            os.remove(chunk_path)
+
+    UPLOAD_BYTES.inc(amount=length)
+    upload.received = end
+    schedule_early_pages(upload)
+    return end
+
+
+def complete_upload(upload):
+    """
+    Turn a fully received upload into an Attachment, deduplicated by content
+    hash like store_upload(). Completing a completed upload returns its
+    Attachment again.
+    """
+    # The pages an early extraction in this process is still reading would otherwise be read twice.
+    # Once every byte is in no new one starts, and it can only save its pages while the upload is open
+    with _lock:
+        scan = _scans.get(upload.id)
+    if scan:
+        scan.result()
+
+    claimed = Upload.objects.filter(id=upload.id, status=Upload.STATUS_OPEN, received=F('size')).update(
+        status=Upload.STATUS_COMPLETING, updated_at=timezone.now()
+    )
+    upload.refresh_from_db()
+    if not claimed:
+        if upload.status == Upload.STATUS_COMPLETE and upload.attachment:
+            return upload.attachment
+        if upload.status == Upload.STATUS_OPEN:
+            raise UploadError(f'Only {upload.received} of {upload.size} bytes received', status=409,
+                              offset=upload.received)
+        raise UploadError(f'Upload is {upload.status}', status=409, offset=upload.received)
+
+    path = part_path(upload)
+    try:
+        digest = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for data in iter(lambda: f.read(READ_SIZE), b''):
+                digest.update(data)
+        sha256 = digest.hexdigest()
+        if upload.sha256 and upload.sha256 != sha256:
+            Upload.objects.filter(id=upload.id).update(status=Upload.STATUS_FAILED,
+                                                       error=f'Received file has SHA-256 {sha256}')
+            os.remove(path)
+            raise UploadError('File checksum mismatch; start the upload again', status=422)
+
+        attachment = Attachment.objects.filter(sha256=sha256).first()
+        # As in store_upload(), a file stored without text gets another extraction attempt
+        if not attachment or not attachment.text_length:
+            text = upload_text(upload, path)
+            attachment = save_attachment(sha256, upload.filename, upload.content_type, upload.size, text)
+    except UploadError:
+        raise
+    except Exception as e:
+        # Leave it open so that completing can be retried
+        Upload.objects.filter(id=upload.id).update(status=Upload.STATUS_OPEN, error=str(e))
+        raise
+
+    Upload.objects.filter(id=upload.id).update(status=Upload.STATUS_COMPLETE, attachment=attachment,
+                                               early_pages={}, error='', updated_at=timezone.now())
+    if os.path.exists(path):
+        os.remove(path)
+    return attachment
+
+
+def expire_uploads(older_than):
+    """
+    Delete uploads last touched before `older_than` (a timedelta ago), with
+    their partial files and any chunk files left by interrupted requests.
+    Completed ones only lose the row; their Attachment stays. Returns the
+    number of uploads deleted.
+    """
+    cutoff = timezone.now() - older_than
+    expired = list(Upload.objects.filter(updated_at__lt=cutoff).values_list('id', flat=True))
+    for upload_id in expired:
+        path = os.path.join(settings.UPLOAD_DIR, f'{upload_id}.part')
+        if os.path.exists(path):
+            os.remove(path)
+    Upload.objects.filter(id__in=expired).delete()
+    if os.path.isdir(settings.UPLOAD_DIR):
+        for entry in os.scandir(settings.UPLOAD_DIR):
+            if entry.name.endswith('.chunk') and entry.stat().st_mtime < cutoff.timestamp():
+                os.remove(entry.path)
+    return len(expired)
+
+
+def upload_text(upload, path):
+    """Text of a completed upload, reusing the PDF pages extracted while it arrived"""
+    if is_pdf(upload) and pdf_modules():
+        try:
+            return pdf_text(path, upload.early_pages)
+        except Exception as e:
+            print(f"Attachment extraction error: {e}")
+            return ''
+    with open(path, 'rb') as f:
+        return extract_text(f, upload.content_type)
+
+
+class PageReader:
+    """Extracts one page's text at a time with the layout settings of pdfminer's extract_text"""
+
+    def __init__(self):
+        pdf = pdf_modules()
+        resources = pdf.PDFResourceManager()
+        self.output = StringIO()
+        device = pdf.TextConverter(resources, self.output, laparams=pdf.LAParams())
+        self.interpreter = pdf.PDFPageInterpreter(resources, device)
+
+    def text(self, page):
+        self.output.seek(0)
+        self.output.truncate()
+        self.interpreter.process_page(page)
+        return self.output.getvalue()
+
+
+def pdf_text(path, early_pages):
+    """
+    The same text as pdfminer's extract_text, page by page in document order.
+    Pages in `early_pages` (text by page object number) are not read again,
+    unless the file has incremental updates that could have replaced them.
+    Objects are not cached, so memory does not grow with the file.
+    """
+    pdf = pdf_modules()
+    reader = None
+    texts = []
+    with open(path, 'rb') as f:
+        document = pdf.PDFDocument(pdf.PDFParser(f), caching=False)
+        if len(document.xrefs) > 1:
+            early_pages = {}
+        for page in pdf.PDFPage.create_pages(document):
+            text = early_pages.get(str(page.pageid))
+            if text is None:
+                reader = reader or PageReader()
+                text = reader.text(page)
+                UPLOAD_PAGES.inc('at_completion')
+            else:
+                UPLOAD_PAGES.inc('early')
+            texts.append(text)
+    return ''.join(texts)
+
+
+def schedule_early_pages(upload):
+    """Extract the pages received so far in the background, unless a run is going or little has arrived since"""
+    if not settings.UPLOAD_EARLY_EXTRACTION or not is_pdf(upload) or not pdf_modules():
+        return
+    with _lock:
+        running = _scans.get(upload.id)
+        if running and not running.done():
+            return  # It carries on with what has arrived when it is done
+        if not _claim_scan(upload):
+            return
+        global _executor
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix='upload-pages')
+        scan = _executor.submit(_scan_early_pages, upload.id, upload.received)
+        _scans[upload.id] = scan
+    scan.add_done_callback(functools.partial(_forget_scan, upload.id))
+
+
+def _claim_scan(upload):
+    """Whether to scan the upload up to its current offset; across worker processes only one request gets a yes"""
+    # The last chunk is better left to completion, which parses the whole file anyway
+    if upload.status != Upload.STATUS_OPEN or upload.received >= upload.size:
+        return False
+    if upload.received - upload.early_scanned < EARLY_STEP_BYTES:
+        return False
+    return bool(Upload.objects.filter(id=upload.id, status=Upload.STATUS_OPEN, early_scanned=upload.early_scanned)
+                .update(early_scanned=upload.received))
+
+
+def _forget_scan(upload_id, scan):
+    with _lock:
+        if _scans.get(upload_id) is scan:
+            del _scans[upload_id]
+
+
+def _scan_early_pages(upload_id, limit):
+    try:
+        upload = Upload.objects.get(id=upload_id)
+        known = dict(upload.early_pages)
+        while True:
+            texts = early_page_texts(part_path(upload), limit, known)
+            if texts:
+                known.update(texts)
+                Upload.objects.filter(id=upload_id, status=Upload.STATUS_OPEN).update(early_pages=known)
+            # Go on with the chunks that arrived during this run
+            upload = Upload.objects.defer('early_pages').get(id=upload_id)
+            if not _claim_scan(upload):
+                return
+            limit = upload.received
+    except Exception as e:
+        print(f"Early page extraction error: {e}")
+    finally:
+        connection.close()
+
+
+class _Prefix:
+    """The first `size` bytes of a file, for a parser that must not see a half-written object"""
+
+    def __init__(self, f, size):
+        self.f = f
+        self.size = size
+
+    def seek(self, pos, whence=os.SEEK_SET):
+        if whence == os.SEEK_CUR:
+            pos += self.f.tell()
+        elif whence == os.SEEK_END:
+            pos += self.size
+        return self.f.seek(min(pos, self.size))
+
+    def tell(self):
+        return self.f.tell()
+
+    def read(self, n=-1):
+        remaining = self.size - self.f.tell()
+        return self.f.read(remaining if n < 0 else min(n, remaining)) if remaining > 0 else b''
+
+
+def last_object_end(f, limit):
+    """Offset just past the last `endobj` and the byte after it before `limit`, 0 if there is none"""
+    # The parser needs the delimiter after the keyword to see where the object ends
+    keyword = b'endobj'
+    end = limit
+    while end > 0:
+        start = max(0, end - READ_SIZE)
+        f.seek(start)
+        found = f.read(end - start).rfind(keyword, 0, end - start - 1)
+        if found >= 0:
+            return start + found + len(keyword) + 1
+        # Overlap blocks so that a keyword split between two is still found
+        end = start + len(keyword) if start else 0
+    return 0
+
+
+def early_page_texts(path, limit, known):
+    """
+    Text of the complete pages among the first `limit` bytes of a PDF still
+    being uploaded, by page object number, skipping those in `known`.
+
+    The page tree and the cross-reference table usually come last, so the
+    objects are found by scanning (see scan_objects). A page is read only
+    when its content streams and resources (fonts, images, attributes
+    inherited from its parents) have all arrived.
+    """
+    pdf = pdf_modules()
+
+    class PartialDocument(pdf.PDFDocument):
+        def __init__(self, parser):
+            try:
+                super().__init__(parser, caching=False, fallback=False)
+            except pdf.PDFSyntaxError:
+                pass  # No cross-reference table or trailer yet; scan_objects() supplies the objects
+
+        def find_xref(self, parser):
+            raise pdf.PDFNoValidXRef('Upload incomplete')
+
+    texts = {}
+    with open(path, 'rb') as f:
+        end = last_object_end(f, limit)
+        if not end:
+            return texts
+        parser = pdf.PDFParser(_Prefix(f, end))
+        document = PartialDocument(parser)
+        xref, candidates = scan_objects(parser)
+        document.xrefs.append(xref)
+        reader = None
+        for objid in candidates:
+            if str(objid) in known:
+                continue
+            try:
+                obj = document.getobj(objid)
+                if not isinstance(obj, dict) or obj.get('Type') is not pdf.LITERAL_PAGE:
+                    continue
+                attrs = _page_attrs(document, xref, obj)
+                if attrs is None:
+                    continue
+                reader = reader or PageReader()
+                texts[str(objid)] = reader.text(pdf.PDFPage(document, objid, attrs, None))
+            except Exception:
+                continue  # Left for completion to read
+    return texts
+
+
+def scan_objects(parser):
+    """
+    A cross-reference of the objects `parser` can see, and the numbers of
+    those that may be pages: the page dictionaries, and every object packed
+    in an object stream. pdfminer's own scan for damaged files reads stream
+    data a line at a time looking for `endstream`, which costs about as much
+    as the rest of the extraction for image-heavy scans; this one skips
+    streams by their /Length.
+    """
+    pdf = pdf_modules()
+    xref = pdf.PDFXRef()
+    candidates = []
+    parser.seek(0)
+    while True:
+        try:
+            pos, line = parser.nextline()
+        except pdf.PSEOF:
+            break
+        match = OBJECT_LINE.match(line)
+        if not match:
+            continue
+        objid, genno = int(match[1]), int(match[2])
+        xref.offsets[objid] = (None, pos, genno)
+        try:
+            parser.seek(pos)
+            for _ in range(3):  # The object number, generation and `obj`
+                parser.nexttoken()
+            _, obj = parser.nextobject()
+        except pdf.PSEOF:
+            break
+        except pdf.PSException:
+            continue
+        if isinstance(obj, dict) and obj.get('Type') is pdf.LITERAL_PAGE:
+            candidates.append(objid)
+        elif isinstance(obj, pdf.PDFStream) and obj.get('Type') is pdf.LITERAL_OBJSTM:
+            # The stream starts with pairs of object number and offset
+            header = pdf.PDFStreamParser(obj.get_data())
+            numbers = []
+            try:
+                while len(numbers) < 2 * int(obj.get('N', 0)):
+                    numbers.append(header.nextobject()[1])
+            except pdf.PSEOF:
+                pass
+            for index, packed in enumerate(numbers[::2]):
+                if isinstance(packed, int):
+                    xref.offsets[packed] = (objid, index, 0)
+                    candidates.append(packed)
+    return xref, candidates
+
+
+def _page_attrs(document, xref, page):
+    """A page's attributes with those inherited from its parents, or None if any of them has not arrived"""
+    pdf = pdf_modules()
+    attrs = dict(page)
+    parent = page.get('Parent')
+    seen = set()
+    while 'Resources' not in attrs or 'MediaBox' not in attrs:
+        if not isinstance(parent, pdf.PDFObjRef) or parent.objid in seen or not _has(xref, parent.objid):
+            return None
+        seen.add(parent.objid)
+        node = document.getobj(parent.objid)
+        if not isinstance(node, dict):
+            return None
+        for key in pdf.PDFPage.INHERITABLE_ATTRS:
+            if key not in attrs and key in node:
+                attrs[key] = node[key]
+        parent = node.get('Parent')
+    if not _arrived(document, xref, attrs.get('Resources'), set()):
+        return None
+    if not _arrived(document, xref, attrs.get('Contents'), set()):
+        return None
+    return attrs
+
+
+def _has(xref, objid):
+    try:
+        xref.get_pos(objid)
+    except KeyError:
+        return False
+    return True
+
+
+def _arrived(document, xref, value, seen):
+    """Whether every object `value` refers to, directly or through other objects, is in the scanned part"""
+    pdf = pdf_modules()
+    if isinstance(value, pdf.PDFObjRef):
+        if value.objid in seen:
+            return True
+        seen.add(value.objid)
+        if not _has(xref, value.objid):
+            return False
+        value = document.getobj(value.objid)
+    if isinstance(value, pdf.PDFStream):
+        value = value.attrs
+    if isinstance(value, dict):
+        return all(_arrived(document, xref, v, seen) for k, v in value.items() if k != 'Parent')
+    if isinstance(value, list):
+        return all(_arrived(document, xref, v, seen) for v in value)
+    return True
@@ -17,10 +17,20 @@ urlpatterns = [
     path('api/chat/sessions/create/', views.create_chat_session, name='create_chat_session'),
     path('api/chat/sessions/<uuid:session_id>/messages/', views.get_chat_messages, name='get_chat_messages'),
     path('api/chat/send/', views.send_message, name='send_message'),
+    path('api/chat/attachments/<uuid:attachment_id>/', views.get_attachment, name='get_attachment'),
+    path('api/chat/uploads/', views.start_upload, name='start_upload'),
+    path('api/chat/uploads/<uuid:upload_id>/', views.upload_chunk, name='upload_chunk'),
+    path('api/chat/uploads/<uuid:upload_id>/complete/', views.finish_upload, name='finish_upload'),
+    path('api/chat/events/', views.chat_events, name='chat_events'),
+    path('metrics', views.metrics_view, name='metrics'),
     path('admin/chat/dashboard/', views.chat_admin_dashboard, name='chat_admin_dashboard'),
+    path('admin/chat/profiles/', views.profile_list, name='profile_list'),
+    path('admin/chat/profiles/<str:name>', views.profile_detail, name='profile_detail'),
     path('admin/chat/session/<uuid:session_id>/analytics/', views.session_analytics, name='session_analytics'),
+    path('admin/chat/session/<uuid:session_id>/export.<str:fmt>', views.export_transcripts, name='export_session'),
+    path('admin/chat/export.<str:fmt>', views.export_transcripts, name='export_transcripts'),
 
-] + static(settings.STATIC_URL, document_root=settings.STATIC_ROOT)
+]
 
 if settings.DEBUG:
     urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
\ No newline at end of file
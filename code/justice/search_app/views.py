@@ -1,46 +1,47 @@
 # views.py
 import uuid
 import json
-import requests
-import mimetypes
-from io import BytesIO
-from django.http import JsonResponse
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.http import Http404, HttpResponse, JsonResponse, StreamingHttpResponse
 from django.shortcuts import render, redirect, reverse, get_object_or_404
 from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_http_methods
 from django.contrib.admin.views.decorators import staff_member_required
-from .models import ChatSession, ChatMessage
-from django.db.models import Count, Avg
+from .models import ChatSession, ChatMessage, Attachment, Upload
+from .attachments import store_upload, attachment_ref, prompt_attachments
+from .timing import StageTimer, stage_percentiles
+from .middleware import get_profiler
+from .caching import cached_page
+from .events import bus, session_data
+from .ratelimit import client_key, get_rag_limiter, overloaded_response, rag_request_headers, rate_limit
+from .exports import FORMATS, export, export_filename, parse_day, transcript_messages
+from .uploads import UploadError, append_chunk, complete_upload, create_upload, parse_checksum
+from django.db.models import Count, Avg, Prefetch
 from django.utils import timezone
 from datetime import timedelta
 from accounts.decorators import verified_required
+from ai_jury import metrics
+from ai_jury.concurrency import Overloaded
+from ai_jury.lazy import lazy_import
 
-# try:
-#     from pdfminer.high_level import extract_text as pdf_extract_text
-# except Exception:
-#     pdf_extract_text = None
+requests = lazy_import('requests')  # on the first RAG call, or preloaded by justice.warmup
 
-# try:
-#     from PIL import Image
-#     import pytesseract
-# except Exception:
-#     Image = None
-#     pytesseract = None
 
-
-# Your RAG service URL - update this with your AI team's endpoint
-# Expected format: {"question": "string"} -> {"answer": "string", "status": "success"}
-RAG_SERVICE_URL = "http://127.0.0.1:8000/query"  # Replace with your AI team's actual endpoint
+RAG_LATENCY = metrics.histogram('rag_request_duration_seconds', 'Latency of calls to the RAG service', ['outcome'])
 
 
 
 
+@cached_page
 def index(request):
     return render(request, "index.html")    
 
+@cached_page
 def services(request):
     return render(request, "services.html")
 
+@cached_page
 def about(request):
     return render(request, "about.html")
 
@@ -52,35 +53,47 @@ def chat(request):
 @require_http_methods(["GET"])
 def get_chat_sessions(request):
     """Get all chat sessions for the sidebar"""
-    sessions = ChatSession.objects.all().order_by('-created_at')
+    # Sessions queued for deletion disappear at once, before the purger gets to them
+    sessions = ChatSession.objects.filter(purge_requested_at__isnull=True).order_by('-created_at')
     sessions_data = []
     
     for session in sessions:
-        sessions_data.append({
-            'id': session.id,
-            'title': session.title,
-            'message_count': session.messages.count(),
-            'last_activity': session.updated_at.strftime('%Y-%m-%d %H:%M')
-        })
+        sessions_data.append(session_data(session, session.messages.count()))
     
     return JsonResponse({'sessions': sessions_data})
 
+def message_data(message, attachments=()):
+    """A chat message as the chat page renders it"""
+    return {
+        'id': message.id,
+        'content': message.content,
+        'content_html': message.content_html,  # AI answers only; user messages are plain text
+        'is_user': message.is_user,
+        'timestamp': message.timestamp.strftime('%H:%M'),
+        'thinking_time': message.thinking_time,
+        'attachments': [attachment_ref(a) for a in attachments]
+    }
+
 @require_http_methods(["GET"])
 def get_chat_messages(request, session_id):
     """Get messages for a specific chat session"""
     try:
-        session = ChatSession.objects.get(id=session_id)
-        messages = session.messages.all().order_by('timestamp')
+        session = ChatSession.objects.get(id=session_id, purge_requested_at__isnull=True)
+        # Attachments are returned as references; their text is fetched on demand
+        messages = session.messages.all().order_by('timestamp').defer('stage_timings').prefetch_related(
+            Prefetch('attachments', queryset=Attachment.objects.defer('compressed_text'))
+        )
         
+        # ?format=html leaves out the markdown of rendered AI answers, ?format=markdown the HTML
+        output = request.GET.get('format')
         messages_data = []
         for message in messages:
-            messages_data.append({
-                'id': message.id,
-                'content': message.content,
-                'is_user': message.is_user,
-                'timestamp': message.timestamp.strftime('%H:%M'),
-                'thinking_time': message.thinking_time
-            })
+            data = message_data(message, message.attachments.all())
+            if output == 'html' and message.content_html:
+                del data['content']
+            elif output == 'markdown':
+                del data['content_html']
+            messages_data.append(data)
         
         return JsonResponse({'messages': messages_data})
     
@@ -89,77 +102,88 @@ def get_chat_messages(request, session_id):
 
 @csrf_exempt
 @require_http_methods(["POST"])
+@rate_limit('chat')
 def send_message(request):
     """Send message to RAG service and save response"""
+    timer = StageTimer()
+    rag_permit = None
     try:
         files = []
-        extracted_texts = []
 
         if request.content_type and request.content_type.startswith('multipart/form-data'):
             # Multipart with possible attachments
             message_content = request.POST.get('message')
             session_id = request.POST.get('session_id')
             files = request.FILES.getlist('attachments')
+            upload_ids = request.POST.getlist('upload_ids')
         else:
             data = json.loads(request.body)
             message_content = data.get('message')
             session_id = data.get('session_id')
+            upload_ids = data.get('upload_ids') or []
         
         if not message_content:
             return JsonResponse({'error': 'Message content required'}, status=400)
+
+        # Files sent ahead through the resumable upload API are already extracted
+        uploaded = []
+        if upload_ids:
+            try:
+                upload_ids = [uuid.UUID(str(upload_id)) for upload_id in upload_ids]
+            except ValueError:
+                return JsonResponse({'error': 'Invalid upload id'}, status=400)
+            # Only the user (or, signed out, the address) that started an upload can attach it
+            uploads = {u.id: u for u in Upload.objects.filter(id__in=upload_ids, client=client_key(request))
+                       .defer('early_pages').select_related('attachment')}
+            if any(upload_id not in uploads for upload_id in upload_ids):
+                return JsonResponse({'error': 'Unknown upload id'}, status=400)
+            if any(not uploads[upload_id].attachment for upload_id in upload_ids):
+                return JsonResponse({'error': 'Uploads must be completed before the message is sent'}, status=400)
+            uploaded = list({uploads[upload_id].attachment_id: uploads[upload_id].attachment
+                             for upload_id in upload_ids}.values())
+
+        # While the RAG service is slow and this process already has as many calls waiting on it as
+        # its latency allows, refuse now rather than save the question and wait out the timeout
+        try:
+            rag_permit = get_rag_limiter().acquire('interactive')
+        except Overloaded as e:
+            return overloaded_response(e)
         
         # Get or create chat session
         if session_id:
-            chat_session = ChatSession.objects.get(id=session_id)
+            chat_session = ChatSession.objects.get(id=session_id, purge_requested_at__isnull=True)
+            # Sessions start out as "New chat"; name them after their first message
+            if chat_session.title == 'New chat':
+                chat_session.title = message_content[:50] + "..." if len(message_content) > 50 else message_content
         else:
             chat_session = ChatSession.objects.create(
                 title=message_content[:50] + "..." if len(message_content) > 50 else message_content
             )
         
-        # Extract text from attachments, if any
+        # Extract text from attachments once per file content; repeats reuse the stored text
+        attachments = uploaded
         if files:
-            for f in files:
-                name = getattr(f, 'name', 'attachment')
-                content_type = getattr(f, 'content_type', None) or mimetypes.guess_type(name)[0]
-                text_out = ''
-                try:
-                    if content_type == 'application/pdf' and pdf_extract_text:
-                        # Read file into memory and extract
-                        text_out = pdf_extract_text(f)
-                    elif content_type and content_type.startswith('image/') and Image and pytesseract:
-                        image = Image.open(f)
-                        text_out = pytesseract.image_to_string(image)
-                    else:
-                        # Unsupported type or missing libs
-                        text_out = ''
-                except Exception as _e:
-                    text_out = ''
-                if text_out:
-                    extracted_texts.append(f"\n\n[Extracted from {name}]\n{text_out.strip()}")
-
-        # Augment message with extracted text
-        if extracted_texts:
-            message_content = (message_content or '').strip()
-            attachments_blob = "\n".join(extracted_texts)
-            if message_content:
-                message_content = f"{message_content}\n\n[Attachments]\n{attachments_blob}"
-            else:
-                message_content = f"[Attachments]\n{attachments_blob}"
+            with timer.stage('extract'):
+                attachments = attachments + [store_upload(f) for f in files]
 
-        # Save user message
-        user_message = ChatMessage.objects.create(
-            session=chat_session,
-            content=message_content,
-            is_user=True
-        )
+        # Save user message; attachment text stays on the Attachment rows
+        with timer.stage('db'):
+            user_message = ChatMessage.objects.create(
+                session=chat_session,
+                content=message_content,
+                is_user=True
+            )
+            if attachments:
+                user_message.attachments.add(*attachments)
         
         # Call RAG service
         # Build brief chat history (last 10 messages before the current one)
-        prior_messages = list(
-            ChatMessage.objects.filter(session=chat_session)
-            .exclude(id=user_message.id)
-            .order_by('timestamp')
-        )
+        with timer.stage('history'):
+            prior_messages = list(
+                ChatMessage.objects.filter(session=chat_session)
+                .exclude(id=user_message.id)
+                .order_by('timestamp')
+            )
         # Keep only the most recent 10
         prior_messages = prior_messages[-10:]
 
@@ -171,70 +195,228 @@ def send_message(request):
             for m in prior_messages
         ]
 
-        # Simple payload format that matches your AI team's expected format
+        # The RAG service fits the history and attachment chunks into its prompt token budget
         rag_payload = {
-            'question': message_content
+            'question': message_content,
+            'history': history,
+            'attachments': prompt_attachments(message_content, attachments),
         }
         
         try:
             # Make request to your RAG service
-            response = requests.post(
-                RAG_SERVICE_URL,
-                json=rag_payload,
-                timeout=30
-            )
-            response.raise_for_status()
-            
-            rag_response = response.json()
-            # Handle your AI team's response format
-            if rag_response.get('status') == 'success':
-                ai_message_content = rag_response.get('answer', 'No response from AI service')
+            with timer.stage('rag'):
+                response = requests.post(
+                    settings.RAG_SERVICE_URL,
+                    json=rag_payload,
+                    headers=rag_request_headers(request, 'interactive', timeout=30),
+                    timeout=30
+                )
+            if response.status_code in (429, 503):
+                # The service's own limits (e.g. the shared LLM quota) are exhausted, or it could not
+                # schedule the question before our timeout
+                retry_after = response.headers.get('Retry-After', 'a few')
+                ai_message_content = f"The AI service is busy right now. Please try again in {retry_after} seconds."
+                ai_source = 'busy'
+                RAG_LATENCY.observe(timer.stages['rag'] / 1000, 'limited')
+                # The service shedding load is a sign of overload; its per-user limits are not
+                if response.status_code == 503:
+                    rag_permit.dropped()
+                else:
+                    rag_permit.ignore()
             else:
-                ai_message_content = rag_response.get('error', 'No response from AI service')
-            thinking_time = 0  # Your AI team doesn't provide thinking_time
+                response.raise_for_status()
+            
+                rag_response = response.json()
+                # Handle your AI team's response format
+                if rag_response.get('status') == 'success':
+                    ai_message_content = rag_response.get('answer', 'No response from AI service')
+                    # Where the answer came from: the LLM, or a local shortcut such as the statute table
+                    ai_source = rag_response.get('source', 'llm')
+                else:
+                    ai_message_content = rag_response.get('error', 'No response from AI service')
+                    ai_source = 'error'
+                # The RAG service reports how long the question queued for an LLM slot and the call itself took
+                timings = rag_response.get('timings') or {}
+                if timings.get('queue_ms') is not None:
+                    timer.add('queue', timings['queue_ms'])
+                if timings.get('llm_ms') is not None:
+                    timer.add('llm', timings['llm_ms'])
+                if timings.get('classify_ms') is not None:
+                    timer.add('classify', timings['classify_ms'])
+                RAG_LATENCY.observe(timer.stages['rag'] / 1000, 'success')
+                rag_permit.success(timer.stages['rag'] / 1000)
             
         except requests.RequestException as e:
             ai_message_content = "Sorry, I'm having trouble connecting to the AI service. Please try again later."
-            thinking_time = 0
+            ai_source = 'error'
+            RAG_LATENCY.observe(timer.stages.get('rag', 0) / 1000, 'error')
+            rag_permit.dropped()
             print(f"RAG service error: {e}")
         
-        # Save AI response
-        ai_message = ChatMessage.objects.create(
-            session=chat_session,
-            content=ai_message_content,
-            is_user=False,
-            thinking_time=thinking_time
-        )
+        # Time the user waited on the AI, in seconds
+        thinking_time = round(timer.stages.get('rag', 0) / 1000, 2)
+        
+        # Save AI response. Its own insert is only included in the Server-Timing header.
+        with timer.stage('db'):
+            ai_message = ChatMessage.objects.create(
+                session=chat_session,
+                content=ai_message_content,
+                is_user=False,
+                thinking_time=thinking_time,
+                stage_timings=timer.finish()
+            )
+        timer.finish()
+
+        # Bumps updated_at (and saves a new title); open chat tabs get the turn pushed to them
+        chat_session.save(update_fields=['title', 'updated_at'])
+        client_id = request.headers.get('X-Chat-Client', '')
+        for message, message_attachments in ((user_message, attachments), (ai_message, ())):
+            bus.publish('message', {
+                'session_id': chat_session.id,
+                'client_id': client_id,
+                'message': message_data(message, message_attachments),
+            })
+        bus.publish('session', session_data(chat_session, chat_session.messages.count()))
         
-        return JsonResponse({
+        result = JsonResponse({
             'session_id': chat_session.id,
+            'title': chat_session.title,
             'user_message': {
                 'id': user_message.id,
                 'content': user_message.content,
-                'timestamp': user_message.timestamp.strftime('%H:%M')
+                'timestamp': user_message.timestamp.strftime('%H:%M'),
+                'attachments': [attachment_ref(a) for a in attachments]
             },
             'ai_message': {
                 'id': ai_message.id,
                 'content': ai_message.content,
+                'content_html': ai_message.content_html,
                 'timestamp': ai_message.timestamp.strftime('%H:%M'),
-                'thinking_time': thinking_time
+                'thinking_time': thinking_time,
+                'source': ai_source,
             }
         })
+        result['Server-Timing'] = timer.server_timing()
+        return result
         
     except Exception as e:
+        if rag_permit:
+            rag_permit.ignore()
         return JsonResponse({'error': str(e)}, status=500)
 
+@require_http_methods(["GET"])
+def get_attachment(request, attachment_id):
+    """Get the extracted text of an attachment"""
+    attachment = get_object_or_404(Attachment, id=attachment_id)
+    return JsonResponse({**attachment_ref(attachment), 'text': attachment.text})
+
+def upload_data(upload):
+    return {
+        'upload_id': upload.id,
+        'filename': upload.filename,
+        'size': upload.size,
+        'offset': upload.received,
+        'status': upload.status,
+        'attachment': attachment_ref(upload.attachment) if upload.attachment else None,
+    }
+
+def upload_error(error):
+    """JSON for a refused upload request, with the offset to resume from when there is one"""
+    response = JsonResponse({'error': str(error), 'offset': error.offset}, status=error.status)
+    if error.offset is not None:
+        response['Upload-Offset'] = error.offset
+    return response
+
+@csrf_exempt
+@require_http_methods(["POST"])
+@rate_limit('chat')
+def start_upload(request):
+    """Start a resumable upload: {filename, content_type, size, sha256?}"""
+    try:
+        data = json.loads(request.body)
+    except ValueError:
+        data = None
+    if not isinstance(data, dict):
+        return JsonResponse({'error': 'Expected a JSON object'}, status=400)
+    try:
+        upload = create_upload(data.get('filename'), data.get('content_type'), data.get('size'), data.get('sha256'),
+                               client=client_key(request))
+    except UploadError as e:
+        return upload_error(e)
+    return JsonResponse({**upload_data(upload), 'chunk_size': settings.UPLOAD_CHUNK_SIZE}, status=201)
+
+@csrf_exempt
+@require_http_methods(["GET", "PATCH"])
+@rate_limit('uploads')
+def upload_chunk(request, upload_id):
+    """GET where to resume an upload; PATCH the next chunk as the raw request body"""
+    upload = get_object_or_404(Upload.objects.defer('early_pages').select_related('attachment'), id=upload_id)
+    if request.method == 'GET':
+        response = JsonResponse(upload_data(upload))
+        response['Upload-Offset'] = upload.received
+        response['Cache-Control'] = 'no-store'
+        return response
+
+    try:
+        offset = int(request.headers['Upload-Offset'])
+        length = int(request.META.get('CONTENT_LENGTH') or 0)
+    except (KeyError, ValueError):
+        return upload_error(UploadError('Upload-Offset header required', offset=upload.received))
+    try:
+        offset = append_chunk(upload, offset, request, length, parse_checksum(request.headers.get('Upload-Checksum')))
+    except UploadError as e:
+        return upload_error(e)
+    response = JsonResponse({'upload_id': upload.id, 'offset': offset, 'size': upload.size})
+    response['Upload-Offset'] = offset
+    return response
+
+@csrf_exempt
+@require_http_methods(["POST"])
+@rate_limit('uploads')
+def finish_upload(request, upload_id):
+    """Extract the text of a fully received upload; its id can then be sent with a chat message"""
+    upload = get_object_or_404(Upload.objects.defer('early_pages'), id=upload_id)
+    try:
+        attachment = complete_upload(upload)
+    except UploadError as e:
+        return upload_error(e)
+    upload.refresh_from_db(fields=['status', 'received'])
+    upload.attachment = attachment
+    return JsonResponse(upload_data(upload))
+
 @csrf_exempt
 @require_http_methods(["POST"])
 def create_chat_session(request):
     """Create a new chat session"""
     chat_session = ChatSession.objects.create(title="New chat")
+    bus.publish('session', session_data(chat_session, 0))
     
     return JsonResponse({
         'session_id': chat_session.id,
         'title': chat_session.title
     })
 
+@require_http_methods(["GET"])
+def chat_events(request):
+    """Server-sent events with new chat messages and session list changes"""
+    last_event_id = request.headers.get('Last-Event-ID')
+    last_event_id = int(last_event_id) if last_event_id and last_event_id.isdigit() else None
+    # Served asynchronously under ASGI; WSGI servers hold a thread per open stream
+    if isinstance(request, ASGIRequest):
+        stream = bus.astream(last_event_id)
+    else:
+        stream = bus.stream(last_event_id)
+    response = StreamingHttpResponse(stream, content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'  # Don't let nginx buffer the stream
+    return response
+
+def metrics_view(request):
+    """Prometheus scrape endpoint, limited to staff and INTERNAL_IPS"""
+    if not (request.user.is_staff or request.META.get('REMOTE_ADDR') in settings.INTERNAL_IPS):
+        return HttpResponse(status=403)
+    return HttpResponse(metrics.REGISTRY.render(), content_type=metrics.CONTENT_TYPE)
+
 # Additional admin views for analytics
 
 @staff_member_required
@@ -279,6 +461,12 @@ def chat_admin_dashboard(request):
         thinking_time__isnull=False
     ).aggregate(avg_time=Avg('thinking_time'))['avg_time']
     
+    # Latency percentiles per stage over the most recent AI responses
+    recent_timings = ChatMessage.objects.filter(
+        is_user=False,
+        stage_timings__isnull=False
+    ).order_by('-timestamp').values_list('stage_timings', flat=True)[:1000]
+    
     context = {
         'total_sessions': total_sessions,
         'total_messages': total_messages,
@@ -288,10 +476,46 @@ def chat_admin_dashboard(request):
         'daily_stats': daily_stats,
         'most_active_sessions': most_active_sessions,
         'avg_thinking_time': round(avg_thinking_time, 2) if avg_thinking_time else 0,
+        'stage_percentiles': stage_percentiles(list(recent_timings)),
     }
     
     return render(request, 'admin/chat_dashboard.html', context)
 
+@staff_member_required
+def profile_list(request):
+    return render(request, 'admin/profiles.html', {
+        'profiling': settings.PROFILING,
+        'traces': get_profiler().list_traces(),
+    })
+
+@staff_member_required
+def profile_detail(request, name):
+    try:
+        content = get_profiler().read_trace(name)
+    except FileNotFoundError:
+        raise Http404('Trace not found')
+    return HttpResponse(content, content_type='text/plain; charset=utf-8')
+
+@staff_member_required
+def export_transcripts(request, fmt, session_id=None):
+    """
+    Stream one session's transcript (JSONL, CSV or PDF) or every session's
+    (JSONL or CSV), optionally limited with ?since= and ?until= (YYYY-MM-DD)
+    """
+    if fmt not in FORMATS or (fmt == 'pdf' and session_id is None):
+        raise Http404('Unknown export format')
+    session = get_object_or_404(ChatSession, id=session_id) if session_id else None
+    try:
+        since = parse_day(request.GET['since']) if request.GET.get('since') else None
+        until = parse_day(request.GET['until']) if request.GET.get('until') else None
+    except ValueError:
+        return HttpResponse('Dates must look like 2025-01-31', status=400, content_type='text/plain')
+    messages = transcript_messages([session.id] if session else None, since, until)
+    response = StreamingHttpResponse(export(fmt, messages, session), content_type=FORMATS[fmt])
+    response['Content-Disposition'] = f'attachment; filename="{export_filename(fmt, session)}"'
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
 @staff_member_required
 def session_analytics(request, session_id):
     try:
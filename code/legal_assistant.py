@@ -1,17 +1,66 @@
 
 
 
+import functools
+import hmac
 import os
-from fastapi import FastAPI
-import uvicorn
+import time
+from contextlib import nullcontext
+from concurrent.futures import ThreadPoolExecutor
+import anyio.to_thread
+from fastapi import FastAPI, Request, Response
+from fastapi.responses import JSONResponse, PlainTextResponse
 from pydantic import BaseModel
-from langchain_google_genai import ChatGoogleGenerativeAI
-from langchain.prompts import ChatPromptTemplate
 from dotenv import load_dotenv
+from ai_jury import metrics
+from ai_jury.concurrency import AdaptiveLimiter, Overloaded
+from ai_jury.answers import AnswerCache, normalize_question, prompt_version, backend_from_url as answer_cache_backend
+from ai_jury.lazy import LazyObject, lazy_import, warm_up
+from ai_jury.profiling import RequestProfiler
+from ai_jury.prompts import PromptBuilder
+from ai_jury.ratelimit import RateLimiter, backend_from_url
+from ai_jury.router import CALLS as ROUTER_CALLS, Backend, ModelRouter
+from ai_jury.scheduler import DeadlineExceeded, PriorityClass, PriorityScheduler
+from ai_jury.statutes import STATUTES
+from ai_jury.topic import MODEL_FILE, OFF_TOPIC_REPLY, TopicClassifier
 
 load_dotenv()
 
-llm = ChatGoogleGenerativeAI(model="gemini-2.5-flash", temperature=0, google_api_key=os.getenv("GOOGLE_API_KEY"))
+# LangChain and the Gemini client take about a second to import; they load on first use or in warm_up_llm
+lc_messages = lazy_import("langchain_core.messages")
+
+def gemini_client(model):
+    from langchain_google_genai import ChatGoogleGenerativeAI
+    return ChatGoogleGenerativeAI(model=model, temperature=0, google_api_key=os.getenv("GOOGLE_API_KEY"))
+
+def build_llm(model, index=0):
+    # LEGAL_AI_LLM=fake swaps Gemini for the deterministic offline model in ai_jury/fakes.py
+    if os.getenv("LEGAL_AI_LLM") == "fake":
+        from ai_jury.fakes import FakeChatModel
+        llm = FakeChatModel.from_env(name=model)
+        llm.seed += index  # independent fake latencies per backend
+        return llm
+    return LazyObject(lambda: gemini_client(model), name=model)
+
+def build_router():
+    """
+    LLM_MODELS lists the models cheapest first, each optionally limited to
+    questions of at most N words ("name:N"); short questions go to the first
+    model that takes them, the others are fallbacks and hedges.
+    """
+    backends = []
+    for cost, entry in enumerate(filter(None, os.getenv("LLM_MODELS", "gemini-2.5-flash-lite:25,gemini-2.5-flash").split(",")), 1):
+        name, _, max_words = entry.strip().partition(":")
+        backends.append(Backend(name, build_llm(name, cost), cost=cost, max_words=int(max_words) if max_words else None))
+    return ModelRouter(backends, hedge_percentile=float(os.getenv("LLM_HEDGE_PERCENTILE", 95)),
+                       hedging=os.getenv("LLM_HEDGING", "1") == "1")
+
+router = build_router()
+
+def set_llm(new_llm):
+    """Replace the models used by ask_legal_ai, e.g. with a FakeChatModel in benchmarks"""
+    global router
+    router = new_llm if isinstance(new_llm, ModelRouter) else ModelRouter([Backend(getattr(new_llm, "name", "custom"), new_llm)])
 
 LEGAL_SYSTEM_PROMPT = """
 You are a Legal AI Assistant with expert knowledge of the Indian Constitution, Indian Penal Code (IPC),
@@ -26,16 +75,43 @@ Criminal Procedure Code (CrPC), and Indian laws.
 - Always be concise, clear, and legally accurate.
 """
 
-# --- Prompt Template ---
-prompt = ChatPromptTemplate.from_messages([
-    ("system", LEGAL_SYSTEM_PROMPT),
-    ("human", "{question}")
-])
+SUMMARY_PROMPT = (
+    "Summarize this extract of a legal document in a few sentences. "
+    "Keep names, dates, amounts, sections and articles."
+)
+
+def summarize_chunk(text: str, admit=None):
+    """
+    Map/reduce step for attachments that do not fit the prompt budget. `admit`
+    is called first to take a rate-limit token for the request it is made for;
+    raising (e.g. RateLimited) makes the prompt builder drop the overflow instead.
+    The call runs in the request's own scheduler slot and llm_limiter permit:
+    taking more of either while holding one can wait on itself until the deadline.
+    """
+    if admit:
+        admit()
+    # An empty routing question sends it to the cheapest model
+    message, _ = router.invoke(lc_messages.convert_to_messages([("system", SUMMARY_PROMPT), ("user", text)]), "")
+    return message.content
+
+# Estimated input tokens per question: system prompt, question, then attachments, passages and history
+prompt_builder = PromptBuilder(
+    budget=int(os.getenv("PROMPT_TOKEN_BUDGET", 6000)),
+    summarize=summarize_chunk if os.getenv("PROMPT_SUMMARIZE", "1") == "1" else None,
+)
 
 # --- Function ---
-def ask_legal_ai(question: str):
-    chain = prompt | llm
-    return chain.invoke({"question": question}).content
+def ask_legal_ai(question: str, history=(), attachments=(), passages=(), admit=None):
+    """(answer, name of the model that gave it, token usage); `admit` as for summarize_chunk"""
+    packed = prompt_builder.build(LEGAL_SYSTEM_PROMPT, question, history=history,
+                                  attachments=attachments, passages=passages,
+                                  summarize=functools.partial(summarize_chunk, admit=admit) if admit else None)
+    message, model = router.invoke(lc_messages.convert_to_messages(packed.messages), packed.messages[-1][1])
+    usage = dict(packed.usage)
+    reported = getattr(message, "usage_metadata", None) or {}
+    usage["input_tokens"] = reported.get("input_tokens")
+    usage["output_tokens"] = reported.get("output_tokens")
+    return message.content, model, usage
 
 
 # ---------------------- FastAPI ----------------------
@@ -45,9 +121,141 @@ app = FastAPI(
     description="API for querying Indian Constitution using LangChain",
     version="1.0.0"           
 )
+app.add_middleware(metrics.ASGIMetricsMiddleware, prefix="legal_assistant")
+
+LLM_LATENCY = metrics.histogram("llm_invoke_duration_seconds", "Latency of the upstream LLM call", ["outcome"])
+LLM_LATENCY_BY_PROMPT = metrics.histogram(
+    "llm_invoke_by_prompt_size_seconds", "Latency of successful LLM calls by estimated prompt tokens", ["prompt_tokens"])
+PROMPT_TOKENS = metrics.histogram(
+    "llm_prompt_tokens", "Estimated prompt tokens per question", buckets=(250, 500, 1000, 2000, 4000, 8000, 16000, 32000))
+
+STATUTE_LOOKUPS = metrics.counter("statute_fast_path_total", "Questions checked against the statute table", ["result"])
+STATUTE_LATENCY = metrics.histogram("statute_lookup_duration_seconds", "Time to match and answer from the statute table",
+                                    buckets=(0.00001, 0.00005, 0.0001, 0.0005, 0.001, 0.005))
+
+TOPIC_CHECKS = metrics.counter("topic_classifier_total", "Questions scored by the off-topic pre-filter", ["result"])
+TOPIC_LATENCY = metrics.histogram("topic_classifier_duration_seconds", "Time to score a question with the off-topic pre-filter",
+                                  buckets=(0.00001, 0.00005, 0.0001, 0.0005, 0.001, 0.005))
+
+def prompt_size(tokens):
+    """Label for LLM_LATENCY_BY_PROMPT"""
+    for limit, label in ((1000, "<1k"), (4000, "1k-4k"), (16000, "4k-16k")):
+        if tokens < limit:
+            return label
+    return "16k+"
+
+# Opt-in profiling of slow or sampled queries; traces go to the same directory the Django admin lists
+profiler = None
+if os.getenv("PROFILING_ENABLED") == "1":
+    profiler = RequestProfiler(
+        directory=os.getenv("PROFILING_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "profiles")),
+        threshold_ms=int(os.getenv("PROFILING_THRESHOLD_MS", 2000)),
+        sample_rate=float(os.getenv("PROFILING_SAMPLE_RATE", 0)),
+        engine=os.getenv("PROFILING_ENGINE", "sampler"),
+    )
+
+def profiled(label):
+    return profiler.capture(label) if profiler else nullcontext()
+
+# Token buckets in front of the LLM quota. Set RATE_LIMIT_BACKEND=sqlite:///... (as for Django)
+# to share them between workers; an empty RAG_RATE_LIMIT_* turns that bucket off.
+limiter = RateLimiter("query", {
+    "user": os.getenv("RAG_RATE_LIMIT_USER", "20/min"),
+    "ip": os.getenv("RAG_RATE_LIMIT_IP", "60/min"),
+    "global": os.getenv("RAG_RATE_LIMIT_GLOBAL", "300/min"),
+}, backend=backend_from_url(os.getenv("RATE_LIMIT_BACKEND", "memory")))
+
+# Callers allowed to say who the request is for (the Django app sends X-Forwarded-For and X-User-Id)
+TRUSTED_PROXIES = set(filter(None, os.getenv("RAG_TRUSTED_PROXIES", "127.0.0.1,::1").split(",")))
+
+# Answers to questions asked without history or attachments, shared by workers with
+# ANSWER_CACHE=sqlite:///... (off to disable); the version changes with the system prompt and the models
+ANSWER_CACHE_URL = os.getenv("ANSWER_CACHE", "memory")
+ANSWER_CACHE_ENABLED = ANSWER_CACHE_URL != "off"
+answer_cache = AnswerCache(
+    answer_cache_backend(ANSWER_CACHE_URL if ANSWER_CACHE_ENABLED else "memory"),
+    ttl=int(os.getenv("ANSWER_CACHE_TTL", 7 * 86400)),
+    version=prompt_version(LEGAL_SYSTEM_PROMPT, *(backend.name for backend in router.backends)),
+)
+
+# Shared secret for POST /cache/warm (manage.py warm_answer_cache); unset turns the endpoint off
+CACHE_WARM_TOKEN = os.getenv("CACHE_WARM_TOKEN", "")
+
+def client_identity(request: Request):
+    """(user, ip) the request is made for"""
+    peer = request.client.host if request.client else ""
+    if peer in TRUSTED_PROXIES:
+        forwarded = request.headers.get("x-forwarded-for", "").split(",")[0].strip()
+        return request.headers.get("x-user-id") or None, forwarded or peer
+    return None, peer
+
+# Slots for concurrent LLM calls, shared by priority class: chat turns (X-Priority: interactive) get
+# about 8 slots for every bulk letter while both queue, and bulk never holds more than its cap
+scheduler = PriorityScheduler(
+    max_concurrency=int(os.getenv("LLM_MAX_CONCURRENCY", 8)),
+    classes={
+        "interactive": PriorityClass(weight=8, max_concurrency=None, timeout=30),
+        "background": PriorityClass(weight=3, max_concurrency=int(os.getenv("LLM_BACKGROUND_CONCURRENCY", 4)), timeout=120),
+        "bulk": PriorityClass(weight=1, max_concurrency=int(os.getenv("LLM_BULK_CONCURRENCY", 2)), timeout=300),
+    },
+)
+
+# Requests admitted to the scheduler at once (queued or running), adapted to LLM latency: past the
+# limit /query answers 503 with Retry-After straight away instead of queueing for an answer that would
+# arrive after the caller's timeout. Bulk and background requests may fill only part of it.
+# LLM_ADAPTIVE_CONCURRENCY=0 only tracks the limit, for /health and /metrics.
+llm_limiter = AdaptiveLimiter(
+    "llm",
+    enabled=os.getenv("LLM_ADAPTIVE_CONCURRENCY", "1") == "1",
+    initial_limit=int(os.getenv("LLM_MAX_CONCURRENCY", 8)),
+    max_limit=int(os.getenv("LLM_MAX_IN_FLIGHT", 64)),
+    tolerance=float(os.getenv("LLM_LATENCY_TOLERANCE", 2.0)),
+)
+
+def request_deadline(request: Request):
+    """When the caller stops waiting (X-Request-Timeout seconds from now), or None for the class default"""
+    try:
+        timeout = float(request.headers["x-request-timeout"])
+    except (KeyError, ValueError):
+        return None
+    # Leave the caller a moment to receive the answer
+    return time.monotonic() + max(0.0, timeout - 1)
+
+@app.on_event("startup")
+def widen_thread_pool():
+    # Queued /query calls wait in worker threads; the default 40 would let a bulk flood
+    # occupy them all before interactive requests even reach the scheduler
+    anyio.to_thread.current_default_thread_limiter().total_tokens = int(os.getenv("RAG_WORKER_THREADS", 200))
+
+@app.on_event("startup")
+def warm_up_llm():
+    # Load LangChain and build the model clients in the background so the first question does not pay for it
+    if os.getenv("WARMUP", "1") == "1":
+        warm_up("langchain_core.messages",
+                *(backend.llm for backend in router.backends if isinstance(backend.llm, LazyObject)))
+
+class HistoryTurn(BaseModel):
+    role: str
+    content: str
+
+class AttachmentChunks(BaseModel):
+    filename: str = ""
+    chunks: list = []  # most relevant first; strings or {"index", "text"}
 
 class Query(BaseModel):
     question: str
+    history: list[HistoryTurn] = []
+    attachments: list[AttachmentChunks] = []
+    passages: list[str] = []
+
+    @property
+    def cacheable(self):
+        """Asked without context, so the answer depends on the question alone"""
+        return ANSWER_CACHE_ENABLED and not (self.history or self.attachments or self.passages)
+
+class WarmRequest(BaseModel):
+    questions: list[str]
+    concurrency: int = 4
 
 @app.get("/")
 def home():
@@ -55,29 +263,221 @@ def home():
         "message": "Welcome to Legal Assistant API",
         "endpoints": {
             "/query": "POST - Ask questions about the Indian Constitution",
-            "/health": "GET - Check API health"
+            "/health": "GET - Check API health",
+            "/metrics": "GET - Prometheus metrics"
         }
     }
 
 @app.get("/health")
 def health_check():
-    return {"status": "healthy", "message": "Service is running"}
+    # Degraded while LLM latency is well above its baseline or requests are being shed; still 200,
+    # since a slow upstream would take every replica out of rotation at once
+    concurrency = llm_limiter.status()
+    return {"status": "degraded" if concurrency["degraded"] else "healthy", "message": "Service is running",
+            "models": router.status(), "concurrency": concurrency, "answer_cache": answer_cache.stats()}
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def metrics_endpoint():
+    return PlainTextResponse(metrics.REGISTRY.render(), media_type=metrics.CONTENT_TYPE)
+
+def load_topic_classifier():
+    """The off-topic pre-filter (TOPIC_MODEL, trained with manage.py train_topic_classifier), or None"""
+    if os.getenv("TOPIC_FILTER", "1") != "1":
+        return None
+    try:
+        return TopicClassifier.load(os.getenv("TOPIC_MODEL", MODEL_FILE))
+    except (OSError, ValueError, KeyError) as e:
+        print(f"Topic classifier disabled: {e}")
+        return None
+
+topic_classifier = load_topic_classifier()
+
+def classify_topic(query: Query):
+    """(off-topic probability or None if not scored, milliseconds spent)"""
+    # Follow-ups ("what about my brother?") only make sense with the history, and attachments are the topic
+    if topic_classifier is None or query.history or query.attachments or query.passages:
+        return None, 0.0
+    start = time.perf_counter()
+    probability = topic_classifier.probability(query.question)
+    elapsed = time.perf_counter() - start
+    TOPIC_LATENCY.observe(elapsed)
+    TOPIC_CHECKS.inc("off_topic" if probability >= topic_classifier.threshold else "legal")
+    return probability, round(elapsed * 1000, 3)
+
+def statute_answer(query: Query, http_response: Response):
+    """The /query response for a plain citation lookup ("What does Article 14 say?"), or None"""
+    if query.attachments or query.passages:
+        return None
+    start = time.perf_counter()
+    answer = STATUTES.answer(query.question)
+    elapsed = time.perf_counter() - start
+    STATUTE_LATENCY.observe(elapsed)
+    STATUTE_LOOKUPS.inc("hit" if answer else "miss")
+    if answer is None:
+        return None
+    lookup_ms = round(elapsed * 1000, 3)
+    http_response.headers["Server-Timing"] = f"statute;dur={lookup_ms:.3f}"
+    return {
+        "answer": answer.text,
+        "status": "success",
+        "model": "statute-lookup",
+        "source": "statute",
+        "citations": [f"{c.act}:{c.kind}:{c.number}" for c in answer.citations],
+        "timings": {"lookup_ms": lookup_ms},
+    }
 
 @app.post("/query") 
-def query_constitution(query: Query):
+def query_constitution(query: Query, request: Request, http_response: Response):
+    # Citation lookups are answered from the local statute table without touching the LLM quota
+    fast = statute_answer(query, http_response)
+    if fast is not None:
+        return fast
+    # Confidently off-topic questions get the reply the system prompt would have made the LLM give
+    off_topic, classify_ms = classify_topic(query)
+    if off_topic is not None and off_topic >= topic_classifier.threshold:
+        http_response.headers["Server-Timing"] = f"classify;dur={classify_ms:.3f}"
+        return {
+            "answer": OFF_TOPIC_REPLY,
+            "status": "success",
+            "model": "topic-classifier",
+            "source": "classifier",
+            "off_topic_probability": round(off_topic, 3),
+            "timings": {"classify_ms": classify_ms},
+        }
+    if query.cacheable:
+        start = time.perf_counter()
+        cached = answer_cache.get(query.question)
+        if cached is not None:
+            cache_ms = round((time.perf_counter() - start) * 1000, 3)
+            http_response.headers["Server-Timing"] = f"classify;dur={classify_ms:.3f}, cache;dur={cache_ms:.3f}"
+            return {
+                "answer": cached["answer"],
+                "status": "success",
+                "model": cached["model"],
+                "source": "cache",
+                "timings": {"cache_ms": cache_ms, "classify_ms": classify_ms},
+            }
+    user, ip = client_identity(request)
+    decision = limiter.check(user=user, ip=ip)
+    if not decision.allowed:
+        return JSONResponse(
+            {"status": "error", "message": f"Rate limit exceeded ({decision.scope}), retry in {decision.retry_after}s"},
+            status_code=429,
+            headers={"Retry-After": str(decision.retry_after)},
+        )
+    priority = scheduler.priority_for(request.headers.get("x-priority"))
+    deadline = request_deadline(request)
+    try:
+        permit = llm_limiter.acquire(priority)
+    except Overloaded as e:
+        return JSONResponse(
+            {"status": "error", "message": f"LLM overloaded ({e.priority} requests shed), retry in {e.retry_after}s"},
+            status_code=503,
+            headers={"Retry-After": str(e.retry_after)},
+        )
+    queued = time.perf_counter()
     try:
-        # Use the existing ask_legal_ai function to get response
-        response = ask_legal_ai(query.question)
+        with scheduler.slot(priority, deadline):
+            # Use the existing ask_legal_ai function to get response
+            start = time.perf_counter()
+            try:
+                with profiled("rag POST /query"):
+                    response, model, usage = ask_legal_ai(
+                        query.question,
+                        history=[turn.model_dump() for turn in query.history],
+                        attachments=[attachment.model_dump() for attachment in query.attachments],
+                        passages=query.passages,
+                        admit=functools.partial(limiter.require, user=user, ip=ip),
+                    )
+            except Exception:
+                LLM_LATENCY.observe(time.perf_counter() - start, "error")
+                raise
+            llm_ms = round((time.perf_counter() - start) * 1000, 2)
+            LLM_LATENCY.observe(llm_ms / 1000, "success")
+            LLM_LATENCY_BY_PROMPT.observe(llm_ms / 1000, prompt_size(usage["total"]))
+            PROMPT_TOKENS.observe(usage["total"])
+        # An answer after the caller gave up is as much a sign of overload as a failure
+        if deadline is not None and time.monotonic() > deadline:
+            permit.dropped()
+        else:
+            permit.success()
+        if query.cacheable:
+            answer_cache.put(query.question, response, model)
+        queue_ms = round((start - queued) * 1000, 2)
+        http_response.headers["Server-Timing"] = (
+            f"classify;dur={classify_ms:.3f}, queue;dur={queue_ms:.1f}, llm;dur={llm_ms:.1f}")
         
         return {
             "answer": response,
-            "status": "success"
+            "status": "success",
+            "model": model,
+            "source": "llm",
+            "usage": usage,
+            "timings": {"llm_ms": llm_ms, "queue_ms": queue_ms, "classify_ms": classify_ms}
         }
+    except DeadlineExceeded as e:
+        permit.dropped()
+        return JSONResponse(
+            {"status": "error", "message": f"LLM busy ({e.priority} queue), retry in {e.retry_after}s"},
+            status_code=503,
+            headers={"Retry-After": str(e.retry_after)},
+        )
     except Exception as e:
+        permit.dropped()
         return {
             "status": "error",
             "message": str(e)
         }
 
+def upstream_calls():
+    """LLM calls made so far, hedges, failovers and summaries included"""
+    return sum(count for (_, _, outcome), count in ROUTER_CALLS.values().items() if outcome != "skipped")
+
+def warm_question(question):
+    """'cached', 'local' (answered without the LLM anyway), 'warmed' or raises"""
+    if STATUTES.answer(question) is not None or (
+            topic_classifier is not None and topic_classifier.is_off_topic(question)):
+        return "local"
+    if answer_cache.get(question, count=False) is not None:
+        return "cached"
+    with llm_limiter.acquire("background"), scheduler.slot("background"):
+        response, model, _ = ask_legal_ai(question)
+    answer_cache.put(question, response, model)
+    return "warmed"
+
+@app.post("/cache/warm")
+def warm_answer_cache(batch: WarmRequest, request: Request):
+    """Answer `questions` at background priority and cache the answers (manage.py warm_answer_cache)"""
+    if not CACHE_WARM_TOKEN or not hmac.compare_digest(request.headers.get("x-warm-token", "").encode(),
+                                                       CACHE_WARM_TOKEN.encode()):
+        return JSONResponse({"status": "error", "message": "Cache warming is not enabled for this caller"},
+                            status_code=403)
+    start = time.perf_counter()
+    calls = upstream_calls()
+    results = {"warmed": 0, "cached": 0, "local": 0, "failed": 0}
+    errors = []
+
+    def warm(question):
+        try:
+            return warm_question(question)
+        except Exception as e:
+            errors.append(f"{question[:60]}: {e}")
+            return "failed"
+
+    # Spellings of one question share a cache entry; answer each only once
+    questions = list({normalize_question(q): q for q in batch.questions}.values())
+    with ThreadPoolExecutor(max_workers=max(1, min(batch.concurrency, 16))) as pool:
+        for outcome in pool.map(warm, questions):
+            results[outcome] += 1
+    return {
+        "status": "success",
+        **results,
+        "upstream_calls": upstream_calls() - calls,
+        "seconds": round(time.perf_counter() - start, 2),
+        "errors": errors[:5],
+        "answer_cache": answer_cache.stats(),
+    }
+
 if __name__ == "__main__":
-    uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
+    import uvicorn
+    uvicorn.run(app, host="0.0.0.0", port=8000)